@@ -0,0 +1,61 @@
+"""Composite and partial indexes for hot status/time filters
+
+Revision ID: 3c9e1f0a7b21
+Revises:
+Create Date: 2026-10-16 09:00:00
+
+Mirrors the ``__table_args__`` indexes in database/models.py, so databases
+created before them catch up (``create_tables`` only builds indexes for new
+tables). Every index is IF NOT EXISTS; on PostgreSQL they are built
+CONCURRENTLY outside the migration transaction, except on partitioned
+tables, where PostgreSQL does not allow it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e1f0a7b21'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, partial-index predicate)
+INDEXES = [
+    ('ix_telegram_accounts_status_freeze', 'telegram_accounts', ['status', 'freeze_timestamp'], None),
+    ('ix_telegram_accounts_hold_due', 'telegram_accounts', ['status', 'hold_until'], 'hold_until IS NOT NULL'),
+    ('ix_account_sales_status_created', 'account_sales', ['status', 'created_at'], None),
+    ('ix_account_sales_created_at', 'account_sales', ['created_at'], None),
+    ('ix_withdrawals_status_created', 'withdrawals', ['status', 'created_at'], None),
+    ('ix_withdrawals_status_updated', 'withdrawals', ['status', 'updated_at'], None),
+    ('ix_withdrawals_status_settled', 'withdrawals', ['status', sa.text('coalesce(processed_at, updated_at)')], None),
+    ('ix_withdrawals_user_created', 'withdrawals', ['user_id', 'created_at'], None),
+    ('ix_activity_logs_user_created', 'activity_logs', ['user_id', 'created_at'], 'user_id IS NOT NULL'),
+]
+
+
+def _is_partitioned(table: str) -> bool:
+    return bool(op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"
+    ), {'t': table}).scalar())
+
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    for name, table, columns, where in INDEXES:
+        kw = {}
+        if where:
+            kw = {'postgresql_where': sa.text(where), 'sqlite_where': sa.text(where)}
+        if postgres and not _is_partitioned(table):
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **kw)
+        else:
+            op.create_index(name, table, columns, if_not_exists=True, **kw)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
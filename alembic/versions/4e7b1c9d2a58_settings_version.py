@@ -0,0 +1,37 @@
+"""Version row for the system_settings change feed
+
+Revision ID: 4e7b1c9d2a58
+Revises: 9a6c4e2d8b17
+Create Date: 2026-10-16 20:00:00
+
+Adds the single-row ``settings_version`` counter that every settings write
+advances (see database/settings_feed.py) and seeds it at version 0.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7b1c9d2a58'
+down_revision: Union[str, None] = '9a6c4e2d8b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if 'settings_version' not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            'settings_version',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('changed_at', sa.DateTime(), nullable=True),
+        )
+    op.execute("INSERT INTO settings_version (id, version) SELECT 1, 0 "
+               "WHERE NOT EXISTS (SELECT 1 FROM settings_version WHERE id = 1)")
+
+
+def downgrade() -> None:
+    op.drop_table('settings_version')
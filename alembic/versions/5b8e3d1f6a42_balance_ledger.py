@@ -0,0 +1,59 @@
+"""Append-only balance ledger and per-user snapshots
+
+Revision ID: 5b8e3d1f6a42
+Revises: 7d4a2b9c5e13
+Create Date: 2026-10-16 15:00:00
+
+Creates ``balance_ledger`` and ``balance_snapshots`` (see
+database/balance_ledger.py) and opens every non-zero balance with an OPENING
+entry, so the ledger reproduces ``users.balance`` from the start.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e3d1f6a42'
+down_revision: Union[str, None] = '7d4a2b9c5e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'balance_ledger' not in tables:
+        op.create_table(
+            'balance_ledger',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('amount', sa.Float(), nullable=False),
+            sa.Column('balance_after', sa.Float(), nullable=False),
+            sa.Column('kind', sa.String(20), nullable=False),
+            sa.Column('reference', sa.String(100), nullable=True, unique=True),
+            sa.Column('note', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    op.create_index('ix_balance_ledger_user', 'balance_ledger', ['user_id', 'id'], if_not_exists=True)
+    if 'balance_snapshots' not in tables:
+        op.create_table(
+            'balance_snapshots',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('last_entry_id', sa.Integer(), nullable=False),
+            sa.Column('balance', sa.Float(), nullable=False),
+            sa.Column('taken_at', sa.DateTime(), nullable=True),
+        )
+
+    op.execute(
+        "INSERT INTO balance_ledger (user_id, amount, balance_after, kind, reference, created_at) "
+        "SELECT id, balance, balance, 'OPENING', 'opening:' || id, CURRENT_TIMESTAMP FROM users "
+        "WHERE balance IS NOT NULL AND balance <> 0 AND NOT EXISTS "
+        "(SELECT 1 FROM balance_ledger l WHERE l.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('balance_snapshots')
+    op.drop_index('ix_balance_ledger_user', table_name='balance_ledger', if_exists=True)
+    op.drop_table('balance_ledger')
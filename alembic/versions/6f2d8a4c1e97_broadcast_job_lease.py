@@ -0,0 +1,40 @@
+"""Owner lease for broadcast jobs
+
+Revision ID: 6f2d8a4c1e97
+Revises: 4e7b1c9d2a58
+Create Date: 2026-10-17 09:00:00
+
+Adds the ``owner`` / ``lease_expires_at`` columns services/broadcast.py uses
+to let exactly one process send a broadcast at a time.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2d8a4c1e97'
+down_revision: Union[str, None] = '4e7b1c9d2a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    ('owner', sa.String(64)),
+    ('lease_expires_at', sa.DateTime()),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'broadcast_jobs' not in inspector.get_table_names():
+        return  # Created with these columns by create_tables()
+    existing = {column['name'] for column in inspector.get_columns('broadcast_jobs')}
+    for name, type_ in COLUMNS:
+        if name not in existing:
+            op.add_column('broadcast_jobs', sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('broadcast_jobs', name)
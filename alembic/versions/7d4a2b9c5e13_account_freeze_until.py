@@ -0,0 +1,48 @@
+"""Stored freeze expiry for the account expiry scheduler
+
+Revision ID: 7d4a2b9c5e13
+Revises: 3c9e1f0a7b21
+Create Date: 2026-10-16 12:00:00
+
+Adds ``telegram_accounts.freeze_until`` (freeze_timestamp + duration),
+backfills it for accounts frozen with a duration, and indexes it the same
+way as ``hold_until``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4a2b9c5e13'
+down_revision: Union[str, None] = '3c9e1f0a7b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('telegram_accounts')}
+    if 'freeze_until' not in columns:
+        op.add_column('telegram_accounts', sa.Column('freeze_until', sa.DateTime(), nullable=True))
+
+    if bind.dialect.name == 'postgresql':
+        deadline = "freeze_timestamp + freeze_duration_hours * interval '1 hour'"
+    else:
+        deadline = "datetime(freeze_timestamp, '+' || freeze_duration_hours || ' hours')"
+    op.execute(
+        f"UPDATE telegram_accounts SET freeze_until = {deadline} "
+        "WHERE status = 'FROZEN' AND freeze_until IS NULL "
+        "AND freeze_timestamp IS NOT NULL AND freeze_duration_hours IS NOT NULL"
+    )
+
+    op.create_index(
+        'ix_telegram_accounts_freeze_due', 'telegram_accounts', ['status', 'freeze_until'], if_not_exists=True,
+        postgresql_where=sa.text('freeze_until IS NOT NULL'), sqlite_where=sa.text('freeze_until IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_telegram_accounts_freeze_due', table_name='telegram_accounts', if_exists=True)
+    op.drop_column('telegram_accounts', 'freeze_until')
@@ -0,0 +1,33 @@
+"""Persistent dirty-day queue for daily rollups
+
+Revision ID: 8b3f5a7d2c64
+Revises: 6f2d8a4c1e97
+Create Date: 2026-10-17 12:00:00
+
+Creates ``rollup_dirty_days`` (see database/rollups.py): writes mark their
+day in the same transaction, and the rollup refresh drains it, so marks
+survive restarts and are shared between processes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f5a7d2c64'
+down_revision: Union[str, None] = '6f2d8a4c1e97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if 'rollup_dirty_days' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'rollup_dirty_days',
+            sa.Column('day', sa.Date(), primary_key=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_dirty_days')
@@ -0,0 +1,56 @@
+"""Claim columns for the leader withdrawal queue
+
+Revision ID: 9a6c4e2d8b17
+Revises: 5b8e3d1f6a42
+Create Date: 2026-10-16 18:00:00
+
+Adds the queue position, claim lease and review stamp columns used by
+database/withdrawal_queue.py, backfills ``priority_at`` with the same
+formula as the model default, and indexes the claim and throughput queries.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6c4e2d8b17'
+down_revision: Union[str, None] = '5b8e3d1f6a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mirrors database.models.WITHDRAWAL_PRIORITY_SECONDS_PER_UNIT at the time of writing
+PRIORITY_SECONDS_PER_UNIT = 60
+
+COLUMNS = [
+    ('priority_at', sa.DateTime()),
+    ('claimed_by', sa.Integer()),
+    ('claimed_at', sa.DateTime()),
+    ('claim_expires_at', sa.DateTime()),
+    ('reviewed_at', sa.DateTime()),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = {column['name'] for column in sa.inspect(bind).get_columns('withdrawals')}
+    for name, type_ in COLUMNS:
+        if name not in existing:
+            op.add_column('withdrawals', sa.Column(name, type_, nullable=True))
+
+    if bind.dialect.name == 'postgresql':
+        priority = f"created_at - amount * {PRIORITY_SECONDS_PER_UNIT} * interval '1 second'"
+    else:
+        priority = f"datetime(created_at, '-' || (amount * {PRIORITY_SECONDS_PER_UNIT}) || ' seconds')"
+    op.execute(f"UPDATE withdrawals SET priority_at = {priority} WHERE priority_at IS NULL")
+
+    op.create_index('ix_withdrawals_status_priority', 'withdrawals', ['status', 'priority_at'], if_not_exists=True)
+    op.create_index('ix_withdrawals_reviewed_at', 'withdrawals', ['reviewed_at'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_withdrawals_reviewed_at', table_name='withdrawals', if_exists=True)
+    op.drop_index('ix_withdrawals_status_priority', table_name='withdrawals', if_exists=True)
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('withdrawals', name)
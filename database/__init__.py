@@ -2,6 +2,7 @@
 Database configuration and session management.
 """
 import os
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -61,6 +62,77 @@ def close_db_session(db):
     """Close a database session."""
     db.close()
 
+# =============================================================================
+# ASYNC ENGINE - asyncpg for PostgreSQL, aiosqlite for local SQLite
+# =============================================================================
+
+def _to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart."""
+    if url.startswith('postgresql+psycopg2://'):
+        return url.replace('postgresql+psycopg2://', 'postgresql+asyncpg://', 1)
+    if url.startswith('postgresql://'):
+        return url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    if url.startswith('sqlite:///'):
+        return url.replace('sqlite:///', 'sqlite+aiosqlite:///', 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or _to_async_url(DATABASE_URL)
+
+# Created lazily so the async driver is only imported by processes that use it
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    """Get (creating on first use) the shared async engine."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        engine_kwargs = {
+            'pool_recycle': 3600,
+            'echo': os.getenv('DEBUG', 'False').lower() == 'true',
+        }
+        if not ASYNC_DATABASE_URL.startswith('sqlite'):
+            engine_kwargs.update(
+                pool_size=int(os.getenv('DB_ASYNC_POOL_SIZE', '20')),
+                max_overflow=int(os.getenv('DB_ASYNC_MAX_OVERFLOW', '30')),
+                pool_pre_ping=True,
+            )
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_kwargs)
+        # expire_on_commit=False keeps loaded rows usable after the session closes,
+        # which handlers rely on when they format messages outside the block
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+@asynccontextmanager
+async def db_session():
+    """
+    Async database session for use inside handlers.
+
+    Usage:
+        async with db_session() as db:
+            user = await AsyncUserService.get_user_by_telegram_id(db, telegram_id)
+    """
+    get_async_engine()
+    session = _AsyncSessionLocal()
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+async def dispose_async_engine():
+    """Close all pooled async connections (call on shutdown)."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
 class DatabaseManager:
     """Database manager for handling database operations."""
     
@@ -0,0 +1,301 @@
+"""
+Append-only balance ledger.
+
+Every change to ``users.balance`` is a single conditional UPDATE ... RETURNING
+(no read first) plus one ``balance_ledger`` row holding the change and the
+resulting balance, both in the caller's transaction. Debits only apply while
+the balance covers them, so concurrent sales, approvals and adjustments can
+neither lose an update nor overdraw; the row lock taken by the UPDATE orders
+them. ``users.balance`` stays the O(1) current balance.
+
+``take_snapshots`` (scheduled from real_main.py) checkpoints each user's ledger
+into ``balance_snapshots``, so ``ledger_balance`` - the balance rebuilt from
+the ledger, used to audit ``users.balance`` - only sums the entries written
+since. Entries may carry a unique ``reference`` (``withdrawal:<id>``) so one
+business event is never booked twice.
+
+Withdrawals are debited when a leader approves them (``approve_withdrawal``)
+and refunded only if that debit happened (``reject_withdrawal``); only an
+approved (debited, not refunded) withdrawal can be paid out
+(``complete_withdrawal``). All three move the withdrawal with a status-guarded
+UPDATE, so two leaders pressing the same button - or a stale button after a
+rejection - cannot both win.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import get_db_session, close_db_session, withdrawal_queue
+from .models import BalanceLedgerEntry, BalanceSnapshot, User, Withdrawal, WithdrawalStatus
+from .rollups import mark_dirty_on_commit
+from .user_cache import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+BALANCE_SNAPSHOT_INTERVAL = int(os.getenv('BALANCE_SNAPSHOT_INTERVAL', '3600'))
+SET_BALANCE_RETRIES = 5
+
+# Ledger entry kinds
+OPENING = 'OPENING'
+SALE = 'SALE'
+WITHDRAWAL = 'WITHDRAWAL'
+WITHDRAWAL_REFUND = 'WITHDRAWAL_REFUND'
+ADJUSTMENT = 'ADJUSTMENT'
+
+
+class BalanceError(Exception):
+    """A balance change could not be applied."""
+
+
+class InsufficientBalance(BalanceError):
+    """The debit is larger than the user's current balance."""
+
+    def __init__(self, user_id: int, amount: float, balance: float):
+        super().__init__(f"User {user_id} balance ${balance:.2f} does not cover ${-amount:.2f}")
+        self.user_id = user_id
+        self.amount = amount
+        self.balance = balance
+
+
+class WithdrawalConflict(BalanceError):
+    """The withdrawal is missing or no longer in a state that allows the change."""
+
+
+def _sync_identity(db: Session, model, pk: int, **values) -> None:
+    """Refresh an already-loaded object with values a bulk UPDATE wrote (no lazy load, no history)."""
+    obj = db.identity_map.get(db.identity_key(model, pk))
+    if obj is not None:
+        for key, value in values.items():
+            set_committed_value(obj, key, value)
+
+
+def apply(db: Session, user_id: int, amount: float, kind: str, reference: Optional[str] = None,
+          note: Optional[str] = None, allow_negative: bool = False) -> float:
+    """
+    Add ``amount`` (negative to debit) to a user's balance and record it.
+
+    Runs in the caller's transaction; nothing is visible until it commits.
+    Returns the new balance. Raises ``InsufficientBalance`` when a debit would
+    take the balance below zero (unless ``allow_negative``), and the database's
+    IntegrityError when ``reference`` was already booked.
+    """
+    conditions = [User.id == user_id]
+    if amount < 0 and not allow_negative:
+        conditions.append(func.coalesce(User.balance, 0) + amount >= 0)
+    row = db.execute(
+        update(User).where(*conditions)
+        .values(balance=func.coalesce(User.balance, 0) + amount)
+        .returning(User.balance, User.telegram_user_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        # Only the failure path reads: tell a missing user from a short balance
+        balance = db.execute(select(User.balance).where(User.id == user_id)).first()
+        if balance is None:
+            raise BalanceError(f"User {user_id} not found")
+        raise InsufficientBalance(user_id, amount, balance[0] or 0.0)
+
+    db.execute(insert(BalanceLedgerEntry).values(
+        user_id=user_id, amount=amount, balance_after=row.balance, kind=kind,
+        reference=reference, note=note, created_at=datetime.utcnow(),
+    ))
+    _sync_identity(db, User, user_id, balance=row.balance)
+    invalidate_on_commit(db, row.telegram_user_id, user_id)
+    return row.balance
+
+
+def set_balance(db: Session, user_id: int, balance: float, note: Optional[str] = None) -> float:
+    """
+    Set a user's balance to an absolute value, recording the difference.
+
+    The difference is applied with a compare-and-set on the balance it was
+    computed from, retried if a concurrent change got there first.
+    """
+    for _ in range(SET_BALANCE_RETRIES):
+        current = db.execute(select(User.balance).where(User.id == user_id)).first()
+        if current is None:
+            raise BalanceError(f"User {user_id} not found")
+        current = current[0] or 0.0
+        row = db.execute(
+            update(User).where(User.id == user_id, func.coalesce(User.balance, 0) == current)
+            .values(balance=balance)
+            .returning(User.balance, User.telegram_user_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is not None:
+            if balance != current:
+                db.execute(insert(BalanceLedgerEntry).values(
+                    user_id=user_id, amount=balance - current, balance_after=row.balance,
+                    kind=ADJUSTMENT, note=note, created_at=datetime.utcnow(),
+                ))
+            _sync_identity(db, User, user_id, balance=row.balance)
+            invalidate_on_commit(db, row.telegram_user_id, user_id)
+            return row.balance
+    raise BalanceError(f"User {user_id} balance kept changing; not set")
+
+
+def _transition(db: Session, withdrawal_id: int, from_statuses: Iterable[str], to_status: str,
+                leader_id: Optional[int]) -> Any:
+    """
+    Move a withdrawal between statuses with one guarded UPDATE; the returned row or None.
+
+    A leader acting on a withdrawal another leader has a live claim on is
+    refused like any other stale state (see database/withdrawal_queue.py).
+    """
+    now = datetime.utcnow()
+    conditions = [Withdrawal.id == withdrawal_id, Withdrawal.status.in_(list(from_statuses))]
+    values = {'status': to_status, 'updated_at': now, 'processed_at': now, 'reviewed_at': now,
+              'claim_expires_at': None,
+              'assigned_leader_id': func.coalesce(Withdrawal.assigned_leader_id, leader_id)}
+    if leader_id is not None:
+        conditions.append(withdrawal_queue.open_to(leader_id, now))
+        values.update(claimed_by=leader_id, claimed_at=case(
+            (Withdrawal.claimed_by == leader_id, func.coalesce(Withdrawal.claimed_at, now)), else_=now))
+    row = db.execute(
+        update(Withdrawal).where(*conditions).values(**values)
+        .returning(Withdrawal.user_id, Withdrawal.amount, Withdrawal.created_at, Withdrawal.assigned_leader_id,
+                   Withdrawal.claimed_by, Withdrawal.claimed_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is not None:
+        _sync_identity(db, Withdrawal, withdrawal_id, status=to_status, updated_at=now, processed_at=now,
+                       reviewed_at=now, claim_expires_at=None, assigned_leader_id=row.assigned_leader_id,
+                       claimed_by=row.claimed_by, claimed_at=row.claimed_at)
+        mark_dirty_on_commit(db, row.created_at)  # Withdrawal rollups are bucketed by status
+    return row
+
+
+def approve_withdrawal(db: Session, withdrawal_id: int, leader_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Approve a PENDING withdrawal and debit its amount from the user.
+
+    Raises ``WithdrawalConflict`` if it is not pending any more (already
+    handled by someone else) or another leader holds its claim, and
+    ``InsufficientBalance`` if the balance no longer covers it; roll back the
+    session in either case. The caller commits.
+    """
+    row = _transition(db, withdrawal_id, [WithdrawalStatus.PENDING], WithdrawalStatus.APPROVED, leader_id)
+    if row is None:
+        raise WithdrawalConflict(f"Withdrawal {withdrawal_id} is not pending")
+    balance = apply(db, row.user_id, -row.amount, WITHDRAWAL, reference=f"withdrawal:{withdrawal_id}")
+    return {'user_id': row.user_id, 'amount': row.amount, 'balance': balance}
+
+
+def reject_withdrawal(db: Session, withdrawal_id: int, leader_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Reject a PENDING or APPROVED withdrawal, refunding it if it was debited.
+
+    Raises ``WithdrawalConflict`` if it is already completed or rejected. The
+    caller commits.
+    """
+    row = _transition(db, withdrawal_id, [WithdrawalStatus.PENDING, WithdrawalStatus.APPROVED],
+                      WithdrawalStatus.REJECTED, leader_id)
+    if row is None:
+        raise WithdrawalConflict(f"Withdrawal {withdrawal_id} can no longer be rejected")
+    debited = db.execute(
+        select(BalanceLedgerEntry.id).where(BalanceLedgerEntry.reference == f"withdrawal:{withdrawal_id}")
+    ).first()
+    refunded = debited is not None
+    if refunded:
+        balance = apply(db, row.user_id, row.amount, WITHDRAWAL_REFUND,
+                        reference=f"withdrawal:{withdrawal_id}:refund")
+    else:
+        balance = db.execute(select(User.balance).where(User.id == row.user_id)).scalar()
+    return {'user_id': row.user_id, 'amount': row.amount, 'balance': balance, 'refunded': refunded}
+
+
+def complete_withdrawal(db: Session, withdrawal_id: int, leader_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Mark an APPROVED withdrawal as paid out.
+
+    Raises ``WithdrawalConflict`` if it was never approved (so never debited),
+    was rejected and refunded, or is already completed. The caller commits.
+    """
+    row = _transition(db, withdrawal_id, [WithdrawalStatus.APPROVED], WithdrawalStatus.COMPLETED, leader_id)
+    if row is None:
+        raise WithdrawalConflict(f"Withdrawal {withdrawal_id} is not approved")
+    return {'user_id': row.user_id, 'amount': row.amount}
+
+
+# Async sessions run the same statements on their underlying sync session
+
+async def aapply(db: AsyncSession, user_id: int, amount: float, kind: str, reference: Optional[str] = None,
+                 note: Optional[str] = None, allow_negative: bool = False) -> float:
+    return await db.run_sync(apply, user_id, amount, kind, reference, note, allow_negative)
+
+
+async def aset_balance(db: AsyncSession, user_id: int, balance: float, note: Optional[str] = None) -> float:
+    return await db.run_sync(set_balance, user_id, balance, note)
+
+
+async def aapprove_withdrawal(db: AsyncSession, withdrawal_id: int, leader_id: Optional[int] = None) -> Dict[str, Any]:
+    return await db.run_sync(approve_withdrawal, withdrawal_id, leader_id)
+
+
+async def areject_withdrawal(db: AsyncSession, withdrawal_id: int, leader_id: Optional[int] = None) -> Dict[str, Any]:
+    return await db.run_sync(reject_withdrawal, withdrawal_id, leader_id)
+
+
+async def acomplete_withdrawal(db: AsyncSession, withdrawal_id: int, leader_id: Optional[int] = None) -> Dict[str, Any]:
+    return await db.run_sync(complete_withdrawal, withdrawal_id, leader_id)
+
+
+# =============================================================================
+# SNAPSHOTS
+# =============================================================================
+
+def ledger_balance(db: Session, user_id: int) -> float:
+    """A user's balance rebuilt from the latest snapshot plus the entries after it."""
+    snapshot = db.execute(
+        select(BalanceSnapshot.last_entry_id, BalanceSnapshot.balance).where(BalanceSnapshot.user_id == user_id)
+    ).first()
+    last_entry_id, balance = snapshot or (0, 0.0)
+    since = db.execute(
+        select(func.coalesce(func.sum(BalanceLedgerEntry.amount), 0.0))
+        .where(BalanceLedgerEntry.user_id == user_id, BalanceLedgerEntry.id > last_entry_id)
+    ).scalar()
+    return balance + since
+
+
+def take_snapshots() -> int:
+    """
+    Checkpoint every user whose ledger grew since their last snapshot.
+
+    A user's snapshot is their newest entry's ``balance_after``: the UPDATE
+    row lock serialises a user's entries, so ids grow in commit order per user.
+    Returns the number of snapshots written.
+    """
+    db = get_db_session()
+    try:
+        newest = (
+            select(BalanceLedgerEntry.user_id, func.max(BalanceLedgerEntry.id).label('entry_id'))
+            .outerjoin(BalanceSnapshot, BalanceSnapshot.user_id == BalanceLedgerEntry.user_id)
+            .where(BalanceLedgerEntry.id > func.coalesce(BalanceSnapshot.last_entry_id, 0))
+            .group_by(BalanceLedgerEntry.user_id)
+            .subquery()
+        )
+        rows = db.execute(
+            select(newest.c.user_id, newest.c.entry_id, BalanceLedgerEntry.balance_after)
+            .join(BalanceLedgerEntry, BalanceLedgerEntry.id == newest.c.entry_id)
+        ).all()
+        if not rows:
+            return 0
+        now = datetime.utcnow()
+        db.execute(delete(BalanceSnapshot).where(BalanceSnapshot.user_id.in_([r.user_id for r in rows])))
+        db.execute(insert(BalanceSnapshot), [
+            {'user_id': r.user_id, 'last_entry_id': r.entry_id, 'balance': r.balance_after, 'taken_at': now}
+            for r in rows
+        ])
+        db.commit()
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        close_db_session(db)
@@ -0,0 +1,279 @@
+"""
+Cold archive for old ``activity_logs`` rows.
+
+Rows past their table's age limit are streamed out of the database
+(server-side cursor on PostgreSQL, keyset batches elsewhere), written as
+gzip-compressed JSON Lines part files partitioned by day::
+
+    <ARCHIVE_DIR>/<table>/<YYYY>/<MM>/<DD>/part-<n>.jsonl.gz
+
+and deleted from the hot table one batch at a time, after that batch's
+parts are fsynced and renamed into place (so a part is never half
+written). A crash between the write and the delete archives those rows
+twice; readers drop the duplicates by id.
+
+When the table is partitioned by month (database/log_retention.py) there
+is no per-row delete: each expired partition is exported whole and then
+dropped by ``drop_expired_partitions``. Rows of a month that is not over
+yet stay hot until it is.
+
+``read_archive`` / ``archived_days`` are the query side for reports and
+``python -m database.cold_archive query``. Dashboard totals are unaffected:
+they come from ``daily_stats`` (database/rollups.py), which keeps the
+archived days. Rebuilding the rollups from scratch would not see archived
+rows.
+
+``account_sales`` is not archived: all-time sale figures (top sellers, the
+sale statistics in utils/runtime_settings.py, the admin settings screens)
+are still counted from the hot table.
+"""
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import column, delete, select, table as table_clause, text
+from sqlalchemy.engine import Engine
+
+from .log_retention import LOG_TABLES, drop_expired_partitions, expired_partitions, is_partitioned
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv(
+    'ARCHIVE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archive'),
+)
+ACTIVITY_ARCHIVE_AFTER_DAYS = int(os.getenv('ACTIVITY_ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '2000'))
+ARCHIVE_BATCH_PAUSE = 0.05
+
+
+@dataclass
+class ArchiveSource:
+    """A hot table whose old rows move to the cold archive."""
+    model: Any
+    after_days: int
+    time_column: str = 'created_at'
+    keep_sql: Optional[str] = None  # Rows that stay hot regardless of age
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+
+ARCHIVE_SOURCES: Dict[str, ArchiveSource] = {
+    'activity_logs': ArchiveSource(ActivityLog, ACTIVITY_ARCHIVE_AFTER_DAYS),
+}
+
+_run_lock = threading.Lock()
+
+
+def _engine() -> Engine:
+    from . import engine
+    return engine
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def _day_dir(root: str, table: str, day: date) -> str:
+    return os.path.join(root, table, f"{day:%Y}", f"{day:%m}", f"{day:%d}")
+
+
+# =============================================================================
+# WRITING
+# =============================================================================
+
+class _DayParts:
+    """Rows of the current batch, grouped into one part file per day."""
+
+    def __init__(self, root: str, table: str):
+        self.root = root
+        self.table = table
+        self._lines: Dict[date, List[str]] = {}
+
+    def add(self, day: date, line: str) -> None:
+        self._lines.setdefault(day, []).append(line)
+
+    def commit(self) -> int:
+        """Write, fsync and rename every part, so the rows can leave the database."""
+        for day, lines in self._lines.items():
+            folder = _day_dir(self.root, self.table, day)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"part-{time.time_ns()}.jsonl.gz")
+            with open(path + '.tmp', 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as zipped:
+                    zipped.write(''.join(lines).encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(path + '.tmp', path)
+        written = len(self._lines)
+        self._lines = {}
+        return written
+
+
+def _iter_batches(engine: Engine, source: ArchiveSource, cutoff: datetime, batch_size: int,
+                  partition: str = None) -> Iterator[List[Dict]]:
+    table = source.model.__table__
+    if partition:
+        # One partition of the table, read directly
+        table = table_clause(partition, *(column(c.name, c.type) for c in table.columns))
+    condition = table.c[source.time_column] < cutoff
+    if source.keep_sql:
+        condition = condition & text(f"NOT ({source.keep_sql})")
+    stmt = select(table).where(condition).order_by(table.c.id)
+
+    if engine.dialect.name == 'postgresql':
+        # One server-side cursor; deletes run on other connections as batches complete
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+            for rows in result.mappings().partitions(batch_size):
+                yield [dict(row) for row in rows]
+        return
+
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            rows = [dict(row) for row in conn.execute(
+                stmt.where(table.c.id > last_id).limit(batch_size)
+            ).mappings()]
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def archive_table(source: ArchiveSource, engine: Engine = None, root: str = None,
+                  batch_size: int = None, pause: float = ARCHIVE_BATCH_PAUSE, now: datetime = None) -> int:
+    """Move rows of ``source`` older than its age limit to the archive; returns the row count."""
+    engine = engine or _engine()
+    root = root or ARCHIVE_DIR
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    cutoff = (now or datetime.utcnow()) - timedelta(days=source.after_days)
+    table = source.model.__table__
+
+    log_table = LOG_TABLES.get(source.name)
+    if log_table is not None:
+        with engine.connect() as conn:
+            partitioned = is_partitioned(conn, source.name)
+        if partitioned:
+            return _archive_partitions(source, log_table, engine, root, batch_size, cutoff)
+
+    archived = 0
+    parts = _DayParts(root, source.name)
+    for rows in _iter_batches(engine, source, cutoff, batch_size):
+        for row in rows:
+            parts.add(row[source.time_column].date(), json.dumps(row, default=_json_value) + '\n')
+        parts.commit()
+        with engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.id.in_([row['id'] for row in rows])))
+        archived += len(rows)
+        if pause:
+            time.sleep(pause)
+
+    if archived:
+        logger.info(f"Archived {archived} {source.name} rows older than {cutoff:%Y-%m-%d}")
+    return archived
+
+
+def _archive_partitions(source: ArchiveSource, log_table, engine: Engine, root: str,
+                        batch_size: int, cutoff: datetime) -> int:
+    """Export each monthly partition that ends by ``cutoff``, then drop it; returns the row count."""
+    with engine.connect() as conn:
+        expired = expired_partitions(conn, source.name, cutoff)
+
+    archived = 0
+    parts = _DayParts(root, source.name)
+    for name, end in expired:
+        exported = 0
+        for rows in _iter_batches(engine, source, end, batch_size, partition=name):
+            for row in rows:
+                parts.add(row[source.time_column].date(), json.dumps(row, default=_json_value) + '\n')
+            parts.commit()
+            exported += len(rows)
+        # Every partition up to this one is exported, so dropping through its end drops only those
+        drop_expired_partitions(engine, log_table, end)
+        archived += exported
+        logger.info(f"Archived partition {name} ({exported} rows)")
+    return archived
+
+
+def run_cold_archive(engine: Engine = None, root: str = None) -> Dict[str, Any]:
+    """Archive every source table; concurrent calls are skipped."""
+    if not _run_lock.acquire(blocking=False):
+        return {'skipped': True}
+    try:
+        return {name: archive_table(source, engine, root) for name, source in ARCHIVE_SOURCES.items()}
+    finally:
+        _run_lock.release()
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def archived_days(table: str, root: str = None) -> List[date]:
+    """Days that have archived rows for ``table``, oldest first."""
+    base = os.path.join(root or ARCHIVE_DIR, table)
+    days = []
+    for folder, _, names in os.walk(base):
+        if any(name.endswith('.jsonl.gz') for name in names):
+            try:
+                days.append(date(*(int(part) for part in os.path.relpath(folder, base).split(os.sep))))
+            except (TypeError, ValueError):
+                continue
+    return sorted(days)
+
+
+def read_archive(table: str, start: date, end: date, where: Callable[[Dict], bool] = None,
+                 root: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield archived rows of ``table`` created between ``start`` and ``end``
+    (inclusive), oldest day first. Timestamps come back as ISO strings.
+    """
+    root = root or ARCHIVE_DIR
+    day = start
+    while day <= end:
+        folder = _day_dir(root, table, day)
+        if os.path.isdir(folder):
+            seen = set()
+            for name in sorted(os.listdir(folder)):
+                if not name.endswith('.jsonl.gz'):
+                    continue
+                with gzip.open(os.path.join(folder, name), 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        row = json.loads(line)
+                        if row.get('id') in seen:
+                            continue
+                        seen.add(row.get('id'))
+                        if where is None or where(row):
+                            yield row
+        day += timedelta(days=1)
+
+
+if __name__ == '__main__':
+    # python -m database.cold_archive run
+    # python -m database.cold_archive query activity_logs 2026-01-01 2026-01-31 [column=value ...]
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:] or ['run']
+    if args[0] == 'query':
+        table, first, last = args[1], date.fromisoformat(args[2]), date.fromisoformat(args[3])
+        filters = dict(arg.split('=', 1) for arg in args[4:])
+        matches = (lambda row: all(str(row.get(k)) == v for k, v in filters.items())) if filters else None
+        for row in read_archive(table, first, last, matches):
+            print(json.dumps(row))
+    else:
+        print(run_cold_archive())
@@ -0,0 +1,326 @@
+"""
+Retention for the append-only log tables (``activity_logs``, ``session_logs``).
+
+On PostgreSQL both tables can be range-partitioned by month on
+``created_at`` (``<table>_pYYYYMM`` plus a ``<table>_default`` catch-all).
+Retention then detaches and drops whole partitions, which frees the space
+at once and never scans or locks the live month. Partitions are created a
+few months ahead by the same job.
+
+Other backends (SQLite in development) and PostgreSQL tables that have not
+been converted yet are purged in small committed chunks, so no single
+statement holds locks for long.
+
+Rows old enough for the cold archive (database/cold_archive.py) are moved
+there before any of this runs; on a partitioned table the archive exports
+and drops whole expired partitions itself, through ``drop_expired_partitions``.
+
+``prepare_log_partitions`` (bot startup) converts a table automatically
+only while it is empty. Existing tables are converted once, in a
+maintenance window, with ``python -m database.log_retention convert``; the
+copy holds an exclusive lock for its duration.
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+
+from .models import ActivityLog, Base, SessionLog
+
+logger = logging.getLogger(__name__)
+
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '90'))
+LOG_RETENTION_INTERVAL = int(os.getenv('LOG_RETENTION_INTERVAL', '86400'))
+PARTITION_MONTHS_AHEAD = 2
+PURGE_CHUNK_SIZE = int(os.getenv('LOG_PURGE_CHUNK_SIZE', '5000'))
+PURGE_CHUNK_PAUSE = 0.05  # Seconds between chunks, so other writers get the table
+
+
+@dataclass
+class LogTable:
+    """A log table under retention."""
+    model: Any
+    time_column: str = 'created_at'
+    keep_sql: Optional[str] = None  # Rows kept regardless of age
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+
+LOG_TABLES: Dict[str, LogTable] = {
+    'activity_logs': LogTable(ActivityLog),
+    # Sessions that are still open are part of the live state, not history
+    'session_logs': LogTable(SessionLog, keep_sql="status IS NULL OR status = 'ACTIVE'"),
+}
+
+_run_lock = threading.Lock()
+
+
+def _engine() -> Engine:
+    from . import engine
+    return engine
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+# =============================================================================
+# POSTGRESQL PARTITIONS
+# =============================================================================
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != 'postgresql':
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"), {'t': table}
+    ).first() is not None
+
+
+def list_partitions(conn: Connection, table: str) -> Dict[date, str]:
+    """Monthly partitions of ``table`` by first day of month (the default partition is excluded)."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t)"
+    ), {'t': table}).scalars()
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+    partitions = {}
+    for name in rows:
+        match = pattern.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _create_partition(conn: Connection, log_table: LogTable, month: date) -> None:
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{_partition_name(log_table.name, month)}" '
+        f'PARTITION OF "{log_table.name}" '
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+    ))
+
+
+def ensure_partitions(engine: Engine, log_table: LogTable, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Create the partitions for this month and the next ``months_ahead``."""
+    created = []
+    with engine.connect() as conn:
+        existing = list_partitions(conn, log_table.name)
+    month = _month_start(datetime.utcnow().date())
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            try:
+                with engine.begin() as conn:
+                    _create_partition(conn, log_table, month)
+                created.append(_partition_name(log_table.name, month))
+            except Exception as e:
+                # Usually rows for that month already sit in the default partition
+                logger.error(f"Could not create partition {_partition_name(log_table.name, month)}: {e}")
+        month = _next_month(month)
+    return created
+
+
+def convert_to_partitioned(engine: Engine, log_table: LogTable) -> int:
+    """
+    Rebuild ``log_table`` as a monthly range-partitioned table, copying its
+    rows, in one transaction. Returns the number of rows copied.
+    """
+    if engine.dialect.name != 'postgresql':
+        logger.warning(f"Partitioning needs PostgreSQL; {log_table.name} stays a plain table")
+        return 0
+    table, column = log_table.name, log_table.time_column
+    legacy = f"{table}_unpartitioned"
+    with engine.begin() as conn:
+        if is_partitioned(conn, table):
+            return 0
+        conn.execute(text(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE'))
+        conn.execute(text(f'UPDATE "{table}" SET "{column}" = now() WHERE "{column}" IS NULL'))
+        first = conn.execute(text(f'SELECT min("{column}") FROM "{table}"')).scalar()
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': table}).scalar()
+        foreign_keys = conn.execute(text(
+            "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(:t) AND contype = 'f'"
+        ), {'t': table}).scalars().all()
+
+        conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+        conn.execute(text(
+            f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE ("{column}")'
+        ))
+        conn.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" SET NOT NULL'))
+        if sequence:
+            conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id'))
+
+        month = _month_start(first.date() if first else datetime.utcnow().date())
+        last = _month_start(datetime.utcnow().date())
+        for _ in range(PARTITION_MONTHS_AHEAD):
+            last = _next_month(last)
+        while month <= last:
+            _create_partition(conn, log_table, month)
+            month = _next_month(month)
+        conn.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+
+        copied = conn.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')).rowcount
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+
+        # Keys and the model's indexes, under their usual names, now on every partition.
+        # Partitioned primary keys must contain the partition key.
+        conn.execute(text(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, "{column}")'))
+        for definition in foreign_keys:
+            conn.execute(text(f'ALTER TABLE "{table}" ADD {definition}'))
+        for index in Base.metadata.tables[table].indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+    logger.info(f"Converted {table} to monthly partitions ({copied} rows copied)")
+    return copied
+
+
+def expired_partitions(conn: Connection, table: str, cutoff: datetime) -> List[Tuple[str, datetime]]:
+    """Monthly partitions of ``table`` that end on or before ``cutoff``, oldest first, with their end."""
+    expired = []
+    for month, name in sorted(list_partitions(conn, table).items()):
+        end = datetime.combine(_next_month(month), datetime.min.time())
+        if end > cutoff:
+            break
+        expired.append((name, end))
+    return expired
+
+
+def drop_expired_partitions(engine: Engine, log_table: LogTable, cutoff: datetime) -> Dict[str, int]:
+    """Drop monthly partitions that end on or before ``cutoff``; kept rows move to the default partition."""
+    dropped = kept = 0
+    with engine.connect() as conn:
+        expired = expired_partitions(conn, log_table.name, cutoff)
+    for name, _ in expired:
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE "{log_table.name}" DETACH PARTITION "{name}"'))
+            if log_table.keep_sql:
+                # The range is now uncovered, so these rows land in the default partition
+                kept += conn.execute(text(
+                    f'INSERT INTO "{log_table.name}" SELECT * FROM "{name}" WHERE {log_table.keep_sql}'
+                )).rowcount
+            conn.execute(text(f'DROP TABLE "{name}"'))
+        dropped += 1
+        logger.info(f"Dropped log partition {name}")
+    return {'dropped_partitions': dropped, 'rows_kept': kept}
+
+
+# =============================================================================
+# CHUNKED PURGE (no partitions)
+# =============================================================================
+
+def purge_in_chunks(engine: Engine, log_table: LogTable, cutoff: datetime,
+                    chunk_size: int = PURGE_CHUNK_SIZE, pause: float = PURGE_CHUNK_PAUSE) -> int:
+    """Delete rows older than ``cutoff`` a chunk at a time, committing each chunk."""
+    table = log_table.model.__table__
+    condition = table.c[log_table.time_column] < cutoff
+    if log_table.keep_sql:
+        condition = condition & text(f"NOT ({log_table.keep_sql})")
+
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(table.c.id).where(condition).order_by(table.c.id).limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(delete(table).where(table.c.id.in_(ids)))
+        deleted += len(ids)
+        if len(ids) < chunk_size:
+            break
+        time.sleep(pause)
+    return deleted
+
+
+# =============================================================================
+# ENTRY POINTS
+# =============================================================================
+
+def prepare_log_partitions(engine: Engine = None) -> None:
+    """At startup: partition empty log tables on PostgreSQL and create upcoming partitions."""
+    engine = engine or _engine()
+    if engine.dialect.name != 'postgresql':
+        return
+    for log_table in LOG_TABLES.values():
+        try:
+            with engine.connect() as conn:
+                partitioned = is_partitioned(conn, log_table.name)
+                empty = partitioned or conn.execute(
+                    select(func.count()).select_from(log_table.model.__table__)
+                ).scalar() == 0
+            if partitioned:
+                ensure_partitions(engine, log_table)
+            elif empty:
+                convert_to_partitioned(engine, log_table)
+            else:
+                logger.info(
+                    f"{log_table.name} is not partitioned; retention uses chunked deletes "
+                    f"(convert with: python -m database.log_retention convert)"
+                )
+        except Exception as e:
+            logger.error(f"Could not prepare partitions for {log_table.name}: {e}")
+
+
+def run_log_retention(retention_days: int = None, engine: Engine = None) -> Dict[str, Any]:
+    """Archive old rows, then apply retention to every log table; concurrent calls are skipped."""
+    if not _run_lock.acquire(blocking=False):
+        return {'skipped': True}
+    try:
+        engine = engine or _engine()
+        retention_days = retention_days or LOG_RETENTION_DAYS
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        results: Dict[str, Any] = {'retention_days': retention_days}
+        
+        # Old rows go to the cold archive first; if that fails nothing is dropped
+        from .cold_archive import run_cold_archive
+        results['archived'] = run_cold_archive(engine)
+        
+        for log_table in LOG_TABLES.values():
+            started = time.monotonic()
+            with engine.connect() as conn:
+                partitioned = is_partitioned(conn, log_table.name)
+            if partitioned:
+                ensure_partitions(engine, log_table)
+                result = dict(drop_expired_partitions(engine, log_table, cutoff), mode='partitions')
+            else:
+                result = {'mode': 'chunked', 'deleted_rows': purge_in_chunks(engine, log_table, cutoff)}
+            result['seconds'] = round(time.monotonic() - started, 2)
+            results[log_table.name] = result
+            logger.info(f"Log retention for {log_table.name}: {result}")
+        return results
+    finally:
+        _run_lock.release()
+
+
+async def arun_log_retention(retention_days: int = None) -> Dict[str, Any]:
+    """``run_log_retention`` off the event loop."""
+    return await asyncio.to_thread(run_log_retention, retention_days)
+
+
+if __name__ == '__main__':
+    # python -m database.log_retention [convert|purge]
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'purge'
+    if command == 'convert':
+        for log_table in LOG_TABLES.values():
+            convert_to_partitioned(_engine(), log_table)
+    else:
+        print(run_log_retention())
@@ -2,10 +2,10 @@
 Database models for the Telegram Account Bot.
 Properly mapped to actual database schema.
 """
-from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Boolean, Text, Float, ForeignKey, Enum, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import enum
 
 Base = declarative_base()
@@ -100,6 +100,15 @@ class User(Base):
 class TelegramAccount(Base):
     """Telegram Account model - maps to 'telegram_accounts' table."""
     __tablename__ = 'telegram_accounts'
+    __table_args__ = (
+        # Frozen list (newest freeze first) and expired-freeze sweep
+        Index('ix_telegram_accounts_status_freeze', 'status', 'freeze_timestamp'),
+        # Expiry scheduler (services/expiry_scheduler.py); only timed freezes/holds carry a deadline
+        Index('ix_telegram_accounts_hold_due', 'status', 'hold_until',
+              postgresql_where=text('hold_until IS NOT NULL'), sqlite_where=text('hold_until IS NOT NULL')),
+        Index('ix_telegram_accounts_freeze_due', 'status', 'freeze_until',
+              postgresql_where=text('freeze_until IS NOT NULL'), sqlite_where=text('freeze_until IS NOT NULL')),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     seller_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
@@ -142,6 +151,7 @@ class TelegramAccount(Base):
     freeze_reason = Column(Text, nullable=True)
     freeze_timestamp = Column(DateTime, nullable=True)
     freeze_duration_hours = Column(Integer, nullable=True)
+    freeze_until = Column(DateTime, nullable=True)  # freeze_timestamp + duration; None = indefinite
     frozen_by_admin_id = Column(Integer, nullable=True)
     can_be_sold = Column(Boolean, default=True)
     
@@ -157,9 +167,28 @@ class TelegramAccount(Base):
         return f"<TelegramAccount(id={self.id}, phone={self.phone_number}, status={self.status})>"
 
 
+# Leader queue order: each unit of amount counts as this many seconds of waiting
+WITHDRAWAL_PRIORITY_SECONDS_PER_UNIT = 60
+
+
+def _withdrawal_priority(context):
+    """Queue position of a new withdrawal: request time, pulled earlier for larger amounts."""
+    amount = context.get_current_parameters().get('amount') or 0
+    return datetime.utcnow() - timedelta(seconds=amount * WITHDRAWAL_PRIORITY_SECONDS_PER_UNIT)
+
+
 class Withdrawal(Base):
     """Withdrawal model - maps to 'withdrawals' table."""
     __tablename__ = 'withdrawals'
+    __table_args__ = (
+        Index('ix_withdrawals_status_priority', 'status', 'priority_at'),
+        Index('ix_withdrawals_reviewed_at', 'reviewed_at'),
+        Index('ix_withdrawals_status_created', 'status', 'created_at'),
+        Index('ix_withdrawals_status_updated', 'status', 'updated_at'),
+        # Leader "completed today" totals filter on when the payout settled
+        Index('ix_withdrawals_status_settled', 'status', text('coalesce(processed_at, updated_at)')),
+        Index('ix_withdrawals_user_created', 'user_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
@@ -175,6 +204,13 @@ class Withdrawal(Base):
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     processed_at = Column(DateTime, nullable=True)
     
+    # Leader work queue (see database/withdrawal_queue.py)
+    priority_at = Column(DateTime, nullable=True, default=_withdrawal_priority)  # Claimed oldest first
+    claimed_by = Column(Integer, nullable=True)  # Leader holding (or last held) the review
+    claimed_at = Column(DateTime, nullable=True)
+    claim_expires_at = Column(DateTime, nullable=True)  # Lease end; NULL once reviewed
+    reviewed_at = Column(DateTime, nullable=True)  # Approved or rejected
+    
     # Relationships
     user = relationship("User", back_populates="withdrawals")
 
@@ -197,6 +233,18 @@ class SystemSettings(Base):
         return f"<SystemSettings(key={self.key}, value={self.value})>"
 
 
+class SettingsVersion(Base):
+    """Single-row change counter for system_settings (see database/settings_feed.py)."""
+    __tablename__ = 'settings_version'
+    
+    id = Column(Integer, primary_key=True)  # Always 1
+    version = Column(BigInteger, nullable=False, default=0)
+    changed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SettingsVersion(version={self.version}, changed_at={self.changed_at})>"
+
+
 class ProxyPool(Base):
     """Proxy pool for managing proxies used in Telegram connections."""
     __tablename__ = 'proxy_pool'
@@ -360,6 +408,11 @@ class ProxyPool(Base):
 class ActivityLog(Base):
     """Activity Log model - maps to 'activity_logs' table."""
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        # Per-user history; system rows (no user) stay out of the index
+        Index('ix_activity_logs_user_created', 'user_id', 'created_at',
+              postgresql_where=text('user_id IS NOT NULL'), sqlite_where=text('user_id IS NOT NULL')),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
@@ -465,6 +518,10 @@ class UserVerification(Base):
 class AccountSale(Base):
     """Account Sale model - maps to 'account_sales' table."""
     __tablename__ = 'account_sales'
+    __table_args__ = (
+        Index('ix_account_sales_status_created', 'status', 'created_at'),
+        Index('ix_account_sales_created_at', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     account_id = Column(Integer, ForeignKey('telegram_accounts.id'), nullable=False, index=True)
@@ -496,6 +553,121 @@ class AccountSale(Base):
         return f"<AccountSale(id={self.id}, account_id={self.account_id}, status={self.status}, price={self.sale_price})>"
 
 
+class BroadcastJob(Base):
+    """Admin broadcast - maps to 'broadcast_jobs' table (see services/broadcast.py)."""
+    __tablename__ = 'broadcast_jobs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_by = Column(BigInteger, nullable=False)  # Admin's telegram user id
+    target = Column(String(20), nullable=False)  # all, active, frozen, leaders
+    message = Column(Text, nullable=False)
+    status = Column(String(12), default='PENDING', index=True)  # PENDING, RUNNING, COMPLETED, CANCELLED, FAILED
+    
+    # Progress - last_user_id is the keyset cursor over users.id
+    total_recipients = Column(Integer, default=0)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    blocked_count = Column(Integer, default=0)
+    last_user_id = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    
+    # The process sending it; another may take over once the lease runs out
+    owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    
+    # Admin message that shows live progress
+    progress_chat_id = Column(BigInteger, nullable=True)
+    progress_message_id = Column(Integer, nullable=True)
+    
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<BroadcastJob(id={self.id}, target={self.target}, status={self.status}, sent={self.sent_count})>"
+
+
+class NotificationOutbox(Base):
+    """Queued user notification - maps to 'notification_outbox' table (see utils/notification_outbox.py)."""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        Index('ix_notification_outbox_due', 'status', 'next_attempt_at'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    parse_mode = Column(String(20), nullable=True)
+    dedup_key = Column(String(128), unique=True, nullable=True)  # Re-enqueueing the same key is a no-op
+    status = Column(String(10), nullable=False, default='PENDING')  # PENDING, SENDING, SENT, FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # Lease start while SENDING
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.id}, chat_id={self.chat_id}, status={self.status}, attempts={self.attempts})>"
+
+
+class DailyStat(Base):
+    """Daily rollup row - maps to 'daily_stats' table (see database/rollups.py)."""
+    __tablename__ = 'daily_stats'
+    
+    day = Column(Date, primary_key=True)
+    metric = Column(String(30), primary_key=True)  # signups, verified_signups, sales, withdrawals, payouts
+    dimension = Column(String(30), primary_key=True, default='')  # Source row's status (leader id for payouts)
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<DailyStat(day={self.day}, metric={self.metric}, dimension={self.dimension}, count={self.count})>"
+
+
+class RollupDirtyDay(Base):
+    """Day whose rollups are stale - maps to 'rollup_dirty_days' table (drained by database/rollups.py)."""
+    __tablename__ = 'rollup_dirty_days'
+
+    day = Column(Date, primary_key=True)
+
+
+class BalanceLedgerEntry(Base):
+    """Append-only balance change - maps to 'balance_ledger' table (see database/balance_ledger.py)."""
+    __tablename__ = 'balance_ledger'
+    __table_args__ = (
+        Index('ix_balance_ledger_user', 'user_id', 'id'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    amount = Column(Float, nullable=False)  # Signed: credits > 0, debits < 0
+    balance_after = Column(Float, nullable=False)  # users.balance right after this entry
+    kind = Column(String(20), nullable=False)  # OPENING, SALE, WITHDRAWAL, WITHDRAWAL_REFUND, ADJUSTMENT
+    reference = Column(String(100), unique=True, nullable=True)  # Business event booked at most once
+    note = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<BalanceLedgerEntry(id={self.id}, user_id={self.user_id}, amount={self.amount}, kind={self.kind})>"
+
+
+class BalanceSnapshot(Base):
+    """Per-user ledger checkpoint - maps to 'balance_snapshots' table."""
+    __tablename__ = 'balance_snapshots'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    last_entry_id = Column(Integer, nullable=False)  # Newest ledger entry included in ``balance``
+    balance = Column(Float, nullable=False)
+    taken_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<BalanceSnapshot(user_id={self.user_id}, last_entry_id={self.last_entry_id}, balance={self.balance})>"
+
+
 # =============================================================================
 # LEGACY COMPATIBILITY - Keep these for backward compatibility with existing code
 # =============================================================================
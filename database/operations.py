@@ -5,9 +5,13 @@ import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, select, update
 from .models import ProxyPool
 from . import get_db_session, close_db_session
+from .user_cache import invalidate_user
+from . import rollups  # noqa: F401 - registers the daily_stats write hooks
+from . import settings_feed  # noqa: F401 - registers the settings change hooks
 
 logger = logging.getLogger(__name__)
 
@@ -256,21 +260,22 @@ class UserService:
                 setattr(user, key, value)
         
         db.commit()
+        invalidate_user(user.telegram_user_id, user_id)
         db.refresh(user)
         logger.info(f"Updated user {user_id}: {kwargs}")
         return True
     
     @staticmethod
     def update_balance(db: Session, user_id: int, amount: float):
-        """Update user balance by database ID."""
-        from database.models import User
+        """Set user balance by database ID (recorded in the balance ledger)."""
+        from database import balance_ledger
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            logger.warning(f"User {user_id} not found for balance update")
+        try:
+            balance_ledger.set_balance(db, user_id, amount)
+        except balance_ledger.BalanceError as e:
+            db.rollback()
+            logger.warning(f"Balance update for user {user_id} failed: {e}")
             return False
-        
-        user.balance = amount
         db.commit()
         logger.info(f"Updated user {user_id} balance to {amount}")
         return True
@@ -383,6 +388,10 @@ class TelegramAccountService:
 
             db.commit()
 
+            if hold_until:
+                from services.expiry_scheduler import expiry_scheduler
+                expiry_scheduler.schedule('hold', account_id, hold_until)
+
             return {
                 'success': True,
                 'account_id': account_id,
@@ -393,6 +402,32 @@ class TelegramAccountService:
             logger.error("Failed to place account %s on hold: %s", account_id, exc)
             db.rollback()
             return {'success': False, 'error': str(exc)}
+
+    @staticmethod
+    def release_expired_holds(db: Session, now: datetime | None = None) -> List[Dict[str, Any]]:
+        """Release every account whose timed hold has ended, in one bulk UPDATE ... RETURNING."""
+        from database.models import TelegramAccount, AccountStatus
+
+        now = now or datetime.utcnow()
+        released = db.execute(
+            update(TelegramAccount)
+            .where(TelegramAccount.status == AccountStatus.TWENTY_FOUR_HOUR_HOLD,
+                   TelegramAccount.hold_until <= now)
+            .values(status=AccountStatus.AVAILABLE, hold_until=None, multi_device_detected=False, updated_at=now)
+            .returning(TelegramAccount.id, TelegramAccount.seller_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        for account_id, seller_id in released:
+            ActivityLogService.log_action(
+                db, seller_id, "ACCOUNT_RELEASED",
+                f"Account {account_id} released from 24-hour hold"
+            )
+        db.commit()
+
+        if released:
+            logger.info(f"Released {len(released)} account(s) from hold: {[row.id for row in released]}")
+        return [{'account_id': account_id, 'seller_id': seller_id} for account_id, seller_id in released]
     
     @staticmethod
     def update_account(db: Session, account_id: int, **kwargs):
@@ -586,6 +621,25 @@ class TelegramAccountService:
             return False
 
 
+def _serialize_setting_value(value) -> str:
+    """Convert a setting value to its stored string form (JSON for complex types)."""
+    import json
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return json.dumps(value)  # Store as "true" or "false"
+    return str(value)
+
+
+def _parse_setting_value(value):
+    """Parse a stored setting string back into a Python value."""
+    import json
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+
+
 class SystemSettingsService:
     """Service for system settings operations."""
     
@@ -601,12 +655,7 @@ class SystemSettingsService:
                 if value is None:
                     return default
                 # Try to parse as JSON first (for complex types)
-                try:
-                    import json
-                    return json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    # Return as string
-                    return value
+                return _parse_setting_value(value)
             return default
         except Exception as e:
             logger.error(f"Error getting setting '{key}': {e}")
@@ -617,15 +666,9 @@ class SystemSettingsService:
         """Set a system setting."""
         try:
             from database.models import SystemSettings
-            import json
             
             # Convert value to string (JSON for complex types)
-            if isinstance(value, (dict, list)):
-                value_str = json.dumps(value)
-            elif isinstance(value, bool):
-                value_str = json.dumps(value)  # Store as "true" or "false"
-            else:
-                value_str = str(value)
+            value_str = _serialize_setting_value(value)
             
             setting = db.query(SystemSettings).filter(SystemSettings.key == key).first()
             if setting:
@@ -659,11 +702,7 @@ class SystemSettingsService:
             settings_dict = {}
             for setting in settings_list:
                 # Parse value from JSON if needed
-                try:
-                    import json
-                    settings_dict[setting.key] = json.loads(setting.value)
-                except (json.JSONDecodeError, TypeError):
-                    settings_dict[setting.key] = setting.value
+                settings_dict[setting.key] = _parse_setting_value(setting.value)
             return settings_dict
         except Exception as e:
             logger.error(f"Error getting all settings: {e}")
@@ -754,31 +793,35 @@ class ActivityLogService:
     """Service for activity logging operations."""
     
     @staticmethod
-    def log_activity(db: Session, user_id: int, action: str, details: str = None, **kwargs):
-        """Log user activity to database."""
-        from database.models import ActivityLog
+    def log_activity(db: Session, user_id: int, action: str = None, details: str = None,
+                     action_type: str = None, description: str = None, extra_data=None, **kwargs):
+        """
+        Queue a user activity row (accepts action/details or action_type/description).
         
+        The row is written in bulk by the activity log writer; ``db`` is left
+        untouched, so callers commit their own work when they are ready.
+        """
+        from utils.activity_log_writer import activity_log_writer
+        
+        action_type = action_type or action
         try:
-            activity = ActivityLog(
+            activity_log_writer.record(
                 user_id=user_id,
-                action=action,
-                details=details,
-                **kwargs
+                action_type=action_type,
+                description=description or details,
+                extra_data=extra_data,
+                ip_address=kwargs.get('ip_address'),
             )
-            db.add(activity)
-            db.commit()
-            logger.debug(f"Logged activity: user={user_id}, action={action}")
+            logger.debug(f"Logged activity: user={user_id}, action={action_type}")
             return True
         except Exception as e:
             logger.error(f"Error logging activity: {e}")
-            db.rollback()
             return False
     
     @staticmethod
-    def log_action(db: Session, user_id: int, action: str, description: str = None, **kwargs):
+    def log_action(db: Session, user_id: int, action: str = None, description: str = None, **kwargs):
         """Alias for log_activity. Accepts description or details."""
-        details = description or kwargs.get('details')
-        return ActivityLogService.log_activity(db, user_id, action, details, **kwargs)
+        return ActivityLogService.log_activity(db, user_id, action, description=description, **kwargs)
     
     @staticmethod
     def get_user_activity(db: Session, user_id: int, limit: int = 50):
@@ -1021,4 +1064,275 @@ class VerificationService:
         return True
 
 
+# =============================================================================
+# ASYNC SERVICES - used with ``async with db_session() as db`` in handlers
+# =============================================================================
+
+class AsyncUserService:
+    """Async counterpart of UserService."""
+
+    @staticmethod
+    async def get_or_create_user(db: AsyncSession, telegram_id: int, username: str = None, first_name: str = None, last_name: str = None):
+        """Get existing user or create new one."""
+        from database.models import User
+
+        result = await db.execute(select(User).where(User.telegram_user_id == telegram_id))
+        user = result.scalars().first()
+
+        if not user:
+            user = User(
+                telegram_user_id=telegram_id,
+                username=username,
+                first_name=first_name,
+                last_name=last_name
+            )
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+            logger.info(f"Created new user {telegram_id}")
+        elif username and user.username != username:
+            user.username = username
+            await db.commit()
+
+        return user
+
+    @staticmethod
+    async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int):
+        """Get user by telegram ID from database."""
+        from database.models import User
+
+        result = await db.execute(select(User).where(User.telegram_user_id == telegram_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_user(db: AsyncSession, user_id: int):
+        """Get user by database ID."""
+        from database.models import User
+
+        return await db.get(User, user_id)
+
+    @staticmethod
+    async def update_user(db: AsyncSession, user_id: int, **kwargs):
+        """Update user fields by database ID."""
+        from database.models import User
+
+        user = await db.get(User, user_id)
+        if not user:
+            logger.warning(f"User {user_id} not found for update")
+            return False
+
+        for key, value in kwargs.items():
+            if hasattr(user, key):
+                setattr(user, key, value)
+
+        await db.commit()
+        invalidate_user(user.telegram_user_id, user_id)
+        logger.info(f"Updated user {user_id}: {kwargs}")
+        return True
+
+    @staticmethod
+    async def update_balance(db: AsyncSession, user_id: int, amount: float):
+        """Set user balance by database ID (recorded in the balance ledger)."""
+        from database import balance_ledger
+
+        try:
+            await balance_ledger.aset_balance(db, user_id, amount)
+        except balance_ledger.BalanceError as e:
+            await db.rollback()
+            logger.warning(f"Balance update for user {user_id} failed: {e}")
+            return False
 
+        await db.commit()
+        logger.info(f"Updated user {user_id} balance to {amount}")
+        return True
+
+
+class AsyncTelegramAccountService:
+    """Async counterpart of TelegramAccountService."""
+
+    @staticmethod
+    async def get_user_accounts(db: AsyncSession, user_id: int):
+        """Get all accounts owned by a user."""
+        from database.models import TelegramAccount
+
+        result = await db.execute(
+            select(TelegramAccount).where(TelegramAccount.seller_id == user_id)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_account(db: AsyncSession, account_id: int):
+        """Get account by ID."""
+        from database.models import TelegramAccount
+
+        return await db.get(TelegramAccount, account_id)
+
+    @staticmethod
+    async def get_account_by_phone(db: AsyncSession, phone: str):
+        """Get account by phone number."""
+        from database.models import TelegramAccount
+
+        result = await db.execute(
+            select(TelegramAccount).where(TelegramAccount.phone_number == phone)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def update_account(db: AsyncSession, account_id: int, **kwargs):
+        """Update account fields."""
+        from database.models import TelegramAccount
+
+        account = await db.get(TelegramAccount, account_id)
+        if not account:
+            logger.warning(f"Account {account_id} not found")
+            return False
+
+        for key, value in kwargs.items():
+            if hasattr(account, key):
+                setattr(account, key, value)
+
+        await db.commit()
+        logger.info(f"Updated account {account_id}")
+        return True
+
+    @staticmethod
+    async def get_available_accounts(db: AsyncSession, limit: int = 10):
+        """Get available accounts for sale."""
+        from database.models import TelegramAccount, AccountStatus
+
+        result = await db.execute(
+            select(TelegramAccount).where(
+                TelegramAccount.status == AccountStatus.AVAILABLE.value,
+                TelegramAccount.can_be_sold == True
+            ).limit(limit)
+        )
+        return result.scalars().all()
+
+
+class AsyncWithdrawalService:
+    """Async counterpart of WithdrawalService."""
+
+    @staticmethod
+    async def create_withdrawal(db: AsyncSession, user_id: int, amount: float, **kwargs):
+        """Create a new withdrawal request."""
+        from database.models import Withdrawal, WithdrawalStatus
+
+        if 'status' not in kwargs:
+            kwargs['status'] = WithdrawalStatus.PENDING
+
+        withdrawal = Withdrawal(user_id=user_id, amount=amount, **kwargs)
+        db.add(withdrawal)
+        await db.commit()
+        await db.refresh(withdrawal)
+        logger.info(f"Created withdrawal {withdrawal.id} for user {user_id}: {amount}")
+        return withdrawal
+
+    @staticmethod
+    async def get_user_withdrawals(db: AsyncSession, user_id: int, limit: int = 50):
+        """Get all withdrawal requests for a user."""
+        from database.models import Withdrawal
+
+        result = await db.execute(
+            select(Withdrawal).where(
+                Withdrawal.user_id == user_id
+            ).order_by(Withdrawal.created_at.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_withdrawal(db: AsyncSession, withdrawal_id: int):
+        """Get withdrawal by ID."""
+        from database.models import Withdrawal
+
+        return await db.get(Withdrawal, withdrawal_id)
+
+    @staticmethod
+    async def update_withdrawal_status(db: AsyncSession, withdrawal_id: int, status, admin_notes: str = None):
+        """Update withdrawal status."""
+        from database.models import Withdrawal
+
+        withdrawal = await db.get(Withdrawal, withdrawal_id)
+        if not withdrawal:
+            logger.warning(f"Withdrawal {withdrawal_id} not found")
+            return False
+
+        withdrawal.status = status
+        if admin_notes:
+            withdrawal.leader_notes = admin_notes
+
+        await db.commit()
+        logger.info(f"Updated withdrawal {withdrawal_id} status to {status}")
+        return True
+
+    @staticmethod
+    async def get_pending_withdrawals(db: AsyncSession, limit: int = 100):
+        """Get all pending withdrawal requests."""
+        from database.models import Withdrawal, WithdrawalStatus
+
+        result = await db.execute(
+            select(Withdrawal).where(
+                Withdrawal.status == WithdrawalStatus.PENDING
+            ).order_by(Withdrawal.created_at.asc()).limit(limit)
+        )
+        return result.scalars().all()
+
+
+class AsyncSystemSettingsService:
+    """Async counterpart of SystemSettingsService."""
+
+    @staticmethod
+    async def get_setting(db: AsyncSession, key: str, default=None):
+        """Get a system setting by key."""
+        try:
+            from database.models import SystemSettings
+            result = await db.execute(
+                select(SystemSettings.value).where(SystemSettings.key == key)
+            )
+            value = result.scalar()
+            if value is None:
+                return default
+            return _parse_setting_value(value)
+        except Exception as e:
+            logger.error(f"Error getting setting '{key}': {e}")
+            return default
+
+    @staticmethod
+    async def set_setting(db: AsyncSession, key: str, value, description: str = None):
+        """Set a system setting."""
+        try:
+            from database.models import SystemSettings
+
+            value_str = _serialize_setting_value(value)
+
+            result = await db.execute(select(SystemSettings).where(SystemSettings.key == key))
+            setting = result.scalars().first()
+            if setting:
+                setting.value = value_str
+                if description:
+                    setting.description = description
+                setting.updated_at = datetime.now(timezone.utc)
+            else:
+                db.add(SystemSettings(
+                    key=key,
+                    value=value_str,
+                    description=description or f"System setting: {key}"
+                ))
+
+            await db.commit()
+            logger.info(f"✅ System setting '{key}' set to: {value}")
+            return True
+        except Exception as e:
+            logger.error(f"Error setting '{key}': {e}")
+            await db.rollback()
+            return False
+
+    @staticmethod
+    async def get_all_settings(db: AsyncSession):
+        """Get all system settings as a dictionary."""
+        try:
+            from database.models import SystemSettings
+            result = await db.execute(select(SystemSettings.key, SystemSettings.value))
+            return {key: _parse_setting_value(value) for key, value in result.all()}
+        except Exception as e:
+            logger.error(f"Error getting all settings: {e}")
+            return {}
@@ -0,0 +1,168 @@
+"""
+Request-scoped database access.
+
+One RequestScope lives for the duration of a single Telegram Update. It opens
+at most one database session and loads the caller's ``User`` row at most once,
+so helpers such as ``load_user_language`` and ``is_leader`` can share it
+instead of each opening their own session.
+
+The scope is attached to the python-telegram-bot ``context`` by the middleware
+in handlers/middleware.py. Helpers fall back to a short-lived session when they
+are called without a scope (jobs, scripts).
+"""
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import get_db_session, close_db_session
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_ATTR = 'request_scope'
+
+_UNSET = object()
+
+# Scope of the update currently being processed; used to attribute queries
+_current_scope: ContextVar[Optional['RequestScope']] = ContextVar('request_scope', default=None)
+
+
+class RequestScope:
+    """Lazily opened DB session plus the cached User row for one update."""
+
+    def __init__(self, telegram_user_id: Optional[int]):
+        self.telegram_user_id = telegram_user_id
+        self.query_count = 0
+        self._db = None
+        self._user = _UNSET
+
+    @property
+    def db(self):
+        """The scope's database session, opened on first access."""
+        if self._db is None:
+            self._db = get_db_session()
+        return self._db
+
+    @property
+    def user(self):
+        """The ``User`` row for the update's sender (``None`` if unknown)."""
+        if self._user is _UNSET:
+            if self.telegram_user_id is None:
+                self._user = None
+            else:
+                from .operations import UserService
+                self._user = UserService.get_user_by_telegram_id(self.db, self.telegram_user_id)
+        return self._user
+
+    def get_user(self, telegram_user_id: int):
+        """Return the cached user if the id matches the scope owner."""
+        if telegram_user_id == self.telegram_user_id:
+            return self.user
+        return None
+
+    def refresh_user(self) -> None:
+        """Forget the cached user so the next access reloads it."""
+        self._user = _UNSET
+
+    def close(self) -> None:
+        """Close the session if one was opened."""
+        if self._db is not None:
+            close_db_session(self._db)
+            self._db = None
+        self._user = _UNSET
+
+
+def open_scope(context, telegram_user_id: Optional[int]) -> RequestScope:
+    """Create a scope, attach it to ``context`` and make it current."""
+    scope = RequestScope(telegram_user_id)
+    setattr(context, CONTEXT_ATTR, scope)
+    _current_scope.set(scope)
+    return scope
+
+
+def close_scope(context) -> Optional[RequestScope]:
+    """Close and detach the scope on ``context``; record its query count."""
+    scope = getattr(context, CONTEXT_ATTR, None)
+    if scope is None:
+        return None
+    scope.close()
+    setattr(context, CONTEXT_ATTR, None)
+    if _current_scope.get() is scope:
+        _current_scope.set(None)
+    query_stats.record(scope.query_count)
+    return scope
+
+
+def get_scope(context) -> Optional[RequestScope]:
+    """Return the active scope for ``context`` (or ``None``)."""
+    if context is None:
+        return None
+    return getattr(context, CONTEXT_ATTR, None)
+
+
+def get_request_user(context, telegram_user_id: int):
+    """
+    Load a user by telegram ID, reusing the request scope when possible.
+
+    Falls back to a one-off session when there is no scope or the id is not
+    the scope owner. Rows from the fallback path are detached from their session.
+    """
+    scope = get_scope(context)
+    if scope is not None and scope.telegram_user_id == telegram_user_id:
+        return scope.user
+
+    from .operations import UserService
+    db = get_db_session()
+    try:
+        user = UserService.get_user_by_telegram_id(db, telegram_user_id)
+        if user is not None:
+            db.expunge(user)
+        return user
+    finally:
+        close_db_session(db)
+
+
+# =============================================================================
+# QUERY ACCOUNTING - measures SQL statements issued per update
+# =============================================================================
+
+class QueryStats:
+    """Thread-safe running totals of queries per processed update."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.queries = 0
+        self.max_queries = 0
+
+    def record(self, query_count: int) -> None:
+        with self._lock:
+            self.updates += 1
+            self.queries += query_count
+            self.max_queries = max(self.max_queries, query_count)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'updates': self.updates,
+                'queries': self.queries,
+                'max_queries_per_update': self.max_queries,
+                'avg_queries_per_update': (self.queries / self.updates) if self.updates else 0.0,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.updates = self.queries = self.max_queries = 0
+
+
+query_stats = QueryStats()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.query_count += 1
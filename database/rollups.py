@@ -0,0 +1,332 @@
+"""
+Daily rollups of signups, sales, withdrawals and leader payouts.
+
+Each source table is summarised into ``daily_stats`` rows keyed by
+(day, metric, dimension) holding a row count and an amount sum, so dashboards
+read O(days) rollup rows instead of scanning the source tables.
+
+Rollups are maintained incrementally:
+  * ORM writes that touch a tracked column record the affected UTC day in
+    ``rollup_dirty_days`` in the same transaction (after_flush hook below);
+    bulk statements do the same through ``mark_dirty_on_commit``. A mark
+    therefore commits or rolls back with the write, in whichever process
+    made it;
+  * ``refresh_rollups`` (scheduled from real_main.py) deletes the marked days
+    and recomputes them plus today and yesterday in one transaction, and
+    backfills history on an empty table. Marks are deleted before the
+    source tables are read, so a write committing meanwhile leaves a fresh
+    mark for the next refresh. Bulk UPDATEs that skip ``mark_dirty_on_commit``
+    only show up when they fall on today or yesterday (or at a rebuild).
+
+Dashboards are therefore at most one refresh interval behind the source tables.
+"""
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, event, exists, func, insert, inspect, literal, select
+from sqlalchemy.orm import Session
+
+from . import get_db_session, close_db_session
+from .models import AccountSale, DailyStat, RollupDirtyDay, User, Withdrawal
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_REFRESH_SECONDS = int(os.getenv('ROLLUP_REFRESH_SECONDS', '60'))
+
+# Calendar days (including today) covered by each named window
+DEFAULT_WINDOWS: Dict[str, int] = {'today': 1, 'week': 7, 'month': 30}
+
+
+@dataclass
+class RollupSource:
+    """How one metric is derived from a source table."""
+    model: Any
+    time_attr: str = 'created_at'
+    dimension_attr: Optional[str] = 'status'
+    amount_attr: Optional[str] = None
+    where: Optional[Callable[[], Any]] = None
+    watch: Tuple[str, ...] = field(default_factory=tuple)
+    time_expr: Optional[Callable[[], Any]] = None  # SQL override for the bucketing timestamp
+
+    def timestamp(self):
+        return self.time_expr() if self.time_expr else getattr(self.model, self.time_attr)
+
+    @property
+    def tracked_attrs(self) -> Tuple[str, ...]:
+        attrs = (self.time_attr, self.dimension_attr, self.amount_attr) + self.watch
+        return tuple(a for a in attrs if a)
+
+
+ROLLUP_SOURCES: Dict[str, RollupSource] = {
+    'signups': RollupSource(User),
+    'verified_signups': RollupSource(
+        User, dimension_attr=None,
+        where=lambda: User.verification_completed == True,
+        watch=('verification_completed',),
+    ),
+    'sales': RollupSource(AccountSale, amount_attr='sale_price'),
+    'withdrawals': RollupSource(Withdrawal, amount_attr='amount'),
+    # Completed payouts per leader, bucketed by completion time. Older rows
+    # completed without processed_at fall back to their last update time.
+    'payouts': RollupSource(
+        Withdrawal, time_attr='processed_at', dimension_attr='assigned_leader_id', amount_attr='amount',
+        where=lambda: Withdrawal.status == 'COMPLETED', watch=('status',),
+        time_expr=lambda: func.coalesce(Withdrawal.processed_at, Withdrawal.updated_at),
+    ),
+}
+
+
+def _as_date(value) -> Optional[date]:
+    """Normalise DATE() results (a ``date`` on PostgreSQL, a string on SQLite)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _utc_today() -> date:
+    return datetime.utcnow().date()
+
+
+# =============================================================================
+# DIRTY-DAY TRACKING
+# =============================================================================
+
+def _mark_statement(conn):
+    """INSERT of dirty days that skips days already marked."""
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(RollupDirtyDay).on_conflict_do_nothing(index_elements=['day'])
+
+
+def _mark_days(conn, days: Set[date]) -> None:
+    stmt = _mark_statement(conn)
+    if stmt is not None:
+        conn.execute(stmt, [{'day': d} for d in sorted(days)])
+        return
+    for d in sorted(days):
+        conn.execute(insert(RollupDirtyDay).from_select(
+            ['day'], select(literal(d)).where(~exists().where(RollupDirtyDay.day == d))
+        ))
+
+
+def mark_dirty(session: Session, *days: date) -> None:
+    """Queue days for recomputation on the next refresh, in ``session``'s transaction."""
+    days = {d for d in days if d is not None}
+    if days:
+        _mark_days(session.connection(), days)
+
+
+def mark_dirty_on_commit(session: Session, *moments) -> None:
+    """Queue the days of rows a bulk statement in ``session`` touched; visible once it commits."""
+    mark_dirty(session, *(_as_date(m) for m in moments if m is not None))
+
+
+def _take_dirty(db: Session) -> Set[date]:
+    """Remove and return the queued days; they come back if ``db`` rolls back."""
+    rows = db.execute(delete(RollupDirtyDay).returning(RollupDirtyDay.day)).scalars().all()
+    return {_as_date(d) for d in rows}
+
+
+def _touched_days(obj, source: RollupSource, is_update: bool) -> Set[date]:
+    """UTC days whose rollup a flushed row affects (old and new timestamps)."""
+    state = inspect(obj)
+    if is_update and not any(state.attrs[a].history.has_changes() for a in source.tracked_attrs):
+        return set()
+    history = state.attrs[source.time_attr].history
+    values = list(history.unchanged or ()) + list(history.added or ()) + list(history.deleted or ())
+    return {_as_date(v) for v in values if v is not None}
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flushed_days(session, flush_context):
+    days = set()
+    for objects, is_update in ((session.new, False), (session.dirty, True), (session.deleted, False)):
+        for obj in objects:
+            for source in ROLLUP_SOURCES.values():
+                if isinstance(obj, source.model):
+                    days.update(_touched_days(obj, source, is_update))
+    if days:
+        _mark_days(session.connection(), days)
+
+
+# =============================================================================
+# RECOMPUTATION
+# =============================================================================
+
+def _day_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Merge days into inclusive runs of consecutive dates."""
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def _recompute_range(db: Session, first: date, last: date) -> int:
+    """Rewrite every metric's rows for ``first``..``last`` from the source tables."""
+    start = datetime.combine(first, time.min)
+    end = datetime.combine(last + timedelta(days=1), time.min)
+    written = 0
+
+    for metric, source in ROLLUP_SOURCES.items():
+        ts = source.timestamp()
+        day_expr = func.date(ts)
+        group_by = [day_expr]
+        if source.dimension_attr:
+            dim_expr = getattr(source.model, source.dimension_attr)
+            group_by.append(dim_expr)
+        else:
+            dim_expr = literal('')
+        amount_expr = func.sum(getattr(source.model, source.amount_attr)) if source.amount_attr else literal(0.0)
+
+        stmt = select(day_expr, dim_expr, func.count(), amount_expr).where(ts >= start, ts < end)
+        if source.where is not None:
+            stmt = stmt.where(source.where())
+        stmt = stmt.group_by(*group_by)
+
+        rows = db.execute(stmt).all()
+        db.execute(delete(DailyStat).where(
+            DailyStat.metric == metric, DailyStat.day >= first, DailyStat.day <= last
+        ))
+        db.add_all([
+            DailyStat(day=_as_date(day), metric=metric, dimension=str(dim or ''),
+                      count=count, amount=total or 0.0)
+            for day, dim, count, total in rows
+        ])
+        written += len(rows)
+
+    return written
+
+
+def recompute_days(db: Session, days: Iterable[date]) -> int:
+    """Recompute the given days and commit; returns rollup rows written."""
+    written = sum(_recompute_range(db, first, last) for first, last in _day_ranges(days))
+    db.commit()
+    return written
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute the full history (used to backfill an empty table)."""
+    earliest = None
+    for source in ROLLUP_SOURCES.values():
+        first = _as_date(db.execute(select(func.min(source.timestamp()))).scalar())
+        if first and (earliest is None or first < earliest):
+            earliest = first
+    today = _utc_today()
+    db.execute(delete(DailyStat))
+    written = _recompute_range(db, earliest, today) if earliest else 0
+    db.commit()
+    logger.info(f"Rebuilt daily rollups from {earliest or today}: {written} rows")
+    return written
+
+
+def refresh_rollups(db: Session = None) -> Dict[str, Any]:
+    """Recompute dirty days plus today/yesterday; backfill if the table is empty."""
+    own_session = db is None
+    if own_session:
+        db = get_db_session()
+    try:
+        days = _take_dirty(db)
+        if db.execute(select(DailyStat.day).limit(1)).first() is None:
+            return {'rebuilt': True, 'days': 0, 'rows': rebuild_rollups(db)}
+        today = _utc_today()
+        days |= {today, today - timedelta(days=1)}
+        rows = recompute_days(db, days)
+        return {'rebuilt': False, 'days': len(days), 'rows': rows}
+    except Exception:
+        db.rollback()  # Puts the drained days back
+        raise
+    finally:
+        if own_session:
+            close_db_session(db)
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+class RollupTotals:
+    """Counts and amounts for one metric, broken down by dimension."""
+
+    def __init__(self):
+        self.by_dimension: Dict[str, List[float]] = {}
+
+    def add(self, dimension: str, count: int, amount: float) -> None:
+        entry = self.by_dimension.setdefault(dimension, [0, 0.0])
+        entry[0] += count or 0
+        entry[1] += amount or 0.0
+
+    def count(self, *dimensions: str) -> int:
+        """Row count, optionally limited to some dimensions (e.g. statuses)."""
+        keys = dimensions or self.by_dimension.keys()
+        return int(sum(self.by_dimension.get(k, (0, 0.0))[0] for k in keys))
+
+    def amount(self, *dimensions: str) -> float:
+        keys = dimensions or self.by_dimension.keys()
+        return sum(self.by_dimension.get(k, (0, 0.0))[1] for k in keys)
+
+    def counts(self) -> Dict[str, int]:
+        return {k: int(v[0]) for k, v in self.by_dimension.items()}
+
+
+class RollupSnapshot:
+    """All-time and windowed totals per metric, read in one query."""
+
+    def __init__(self):
+        self._totals: Dict[Tuple[str, str], RollupTotals] = {}
+
+    def get(self, metric: str, window: str = 'all') -> RollupTotals:
+        return self._totals.get((window, metric)) or RollupTotals()
+
+    def _add(self, window: str, metric: str, dimension: str, count: int, amount: float) -> None:
+        self._totals.setdefault((window, metric), RollupTotals()).add(dimension, count, amount)
+
+
+def _snapshot_stmt(windows: Dict[str, int], metrics: Optional[Iterable[str]]):
+    today = _utc_today()
+    columns = [DailyStat.metric, DailyStat.dimension, func.sum(DailyStat.count), func.sum(DailyStat.amount)]
+    for days in windows.values():
+        in_window = DailyStat.day >= today - timedelta(days=days - 1)
+        columns.append(func.sum(case((in_window, DailyStat.count), else_=0)))
+        columns.append(func.sum(case((in_window, DailyStat.amount), else_=0)))
+    stmt = select(*columns).group_by(DailyStat.metric, DailyStat.dimension)
+    if metrics:
+        stmt = stmt.where(DailyStat.metric.in_(list(metrics)))
+    return stmt
+
+
+def _build_snapshot(rows, windows: Dict[str, int]) -> RollupSnapshot:
+    snapshot = RollupSnapshot()
+    for metric, dimension, count, amount, *windowed in rows:
+        snapshot._add('all', metric, dimension, count, amount)
+        for i, name in enumerate(windows):
+            snapshot._add(name, metric, dimension, windowed[2 * i], windowed[2 * i + 1])
+    return snapshot
+
+
+def load_rollups(db: Session, windows: Dict[str, int] = None,
+                 metrics: Iterable[str] = None) -> RollupSnapshot:
+    """Read all-time plus windowed totals (sync session)."""
+    windows = DEFAULT_WINDOWS if windows is None else windows
+    return _build_snapshot(db.execute(_snapshot_stmt(windows, metrics)).all(), windows)
+
+
+async def aload_rollups(db, windows: Dict[str, int] = None,
+                        metrics: Iterable[str] = None) -> RollupSnapshot:
+    """Read all-time plus windowed totals (async session)."""
+    windows = DEFAULT_WINDOWS if windows is None else windows
+    return _build_snapshot((await db.execute(_snapshot_stmt(windows, metrics))).all(), windows)
@@ -0,0 +1,204 @@
+"""
+Change feed for system_settings.
+
+Every ORM flush that writes a ``SystemSettings`` row also advances the
+single-row ``settings_version`` counter in the same transaction, and on
+PostgreSQL sends ``NOTIFY settings_changed`` (delivered on commit). Readers
+subscribe a callback that drops their cached settings:
+
+  * in the writing process, subscribers run as soon as the transaction
+    commits;
+  * every other process runs ``settings_feed`` (started from real_main.py),
+    which LISTENs on PostgreSQL and re-reads the version on each
+    notification, and otherwise polls the version row every
+    SETTINGS_POLL_SECONDS (the only mechanism on SQLite, and a safety net
+    for notifications missed while reconnecting on PostgreSQL).
+
+Settings caches can therefore keep long TTLs and still pick up changes
+everywhere within moments.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from . import DATABASE_URL, db_session
+from .models import SettingsVersion, SystemSettings
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CHANNEL = 'settings_changed'
+SETTINGS_POLL_SECONDS = float(os.getenv('SETTINGS_POLL_SECONDS', '2'))
+SETTINGS_LISTEN_POLL_SECONDS = float(os.getenv('SETTINGS_LISTEN_POLL_SECONDS', '60'))  # While LISTENing
+
+
+def bump_version(conn, keys: Iterable[str] = ()) -> None:
+    """Advance the settings version in the connection's transaction (and NOTIFY on PostgreSQL)."""
+    now = datetime.utcnow()
+    bumped = conn.execute(
+        update(SettingsVersion).where(SettingsVersion.id == 1)
+        .values(version=SettingsVersion.version + 1, changed_at=now)
+    ).rowcount
+    if not bumped:
+        conn.execute(insert(SettingsVersion).values(id=1, version=1, changed_at=now))
+    if conn.dialect.name == 'postgresql':
+        conn.execute(select(func.pg_notify(SETTINGS_CHANNEL, ','.join(sorted(keys)))))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_settings_write(session, flush_context):
+    keys = {obj.key for objects in (session.new, session.dirty, session.deleted)
+            for obj in objects if isinstance(obj, SystemSettings)}
+    if keys:
+        bump_version(session.connection(), keys)
+        session.info.setdefault('settings_changed', set()).update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_settings(session):
+    if session.info.pop('settings_changed', None):
+        settings_feed.publish()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_settings_changes(session):
+    session.info.pop('settings_changed', None)
+
+
+class SettingsChangeFeed:
+    """Runs subscriber callbacks whenever system_settings change in any process."""
+
+    def __init__(self, poll_interval: float = None):
+        self.poll_interval = SETTINGS_POLL_SECONDS if poll_interval is None else poll_interval
+        self._subscribers: List[Callable[[], None]] = []
+        self._version: Optional[int] = None
+        self._listener = None  # asyncpg connection LISTENing on PostgreSQL
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def subscribe(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` (no arguments) after every settings change."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def publish(self) -> None:
+        """Run every subscriber now."""
+        for callback in list(self._subscribers):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Settings change subscriber {callback!r} failed: {e}")
+
+    async def check(self) -> bool:
+        """Publish if the stored version moved since the last check; returns whether it did."""
+        async with db_session() as db:
+            version = (await db.execute(
+                select(SettingsVersion.version).where(SettingsVersion.id == 1)
+            )).scalar() or 0
+        changed = self._version is not None and version != self._version
+        self._version = version
+        if changed:
+            self.publish()
+        return changed
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> asyncio.Task:
+        """Follow the feed in the background of the current event loop."""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self.run_forever(), name="settings-feed")
+        return self._task
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Settings feed did not stop in time; cancelled")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._close_listener()
+
+    def wake(self) -> None:
+        """Re-check the version now (safe to call from any thread)."""
+        loop, event_ = self._loop, self._wakeup
+        if loop is None or event_ is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event_.set()
+        else:
+            loop.call_soon_threadsafe(event_.set)
+
+    # ------------------------------------------------------------------
+    # PostgreSQL LISTEN
+    # ------------------------------------------------------------------
+
+    async def _ensure_listener(self) -> bool:
+        """(Re)connect the LISTEN connection on PostgreSQL; False when polling only."""
+        if not DATABASE_URL.startswith('postgresql'):
+            return False
+        if self._listener is not None and not self._listener.is_closed():
+            return True
+        try:
+            import asyncpg
+            dsn = make_url(DATABASE_URL).set(drivername='postgresql').render_as_string(hide_password=False)
+            self._listener = await asyncpg.connect(dsn)
+            await self._listener.add_listener(SETTINGS_CHANNEL, lambda *args: self.wake())
+            return True
+        except Exception as e:
+            logger.warning(f"Settings LISTEN unavailable, polling every {self.poll_interval}s: {e}")
+            self._listener = None
+            return False
+
+    async def _close_listener(self) -> None:
+        if self._listener is not None:
+            try:
+                await self._listener.close()
+            except Exception:
+                pass
+            self._listener = None
+
+    async def run_forever(self) -> None:
+        logger.info("Settings change feed started")
+        while not self._stopping:
+            self._wakeup.clear()
+            listening = await self._ensure_listener()
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Settings change feed error: {e}")
+
+            if self._stopping:
+                break
+            timeout = SETTINGS_LISTEN_POLL_SECONDS if listening else self.poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Settings change feed stopped")
+
+
+# Global instance
+settings_feed = SettingsChangeFeed()
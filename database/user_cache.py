@@ -0,0 +1,232 @@
+"""
+In-process cache of User rows keyed by telegram_user_id.
+
+Entries are read-only snapshots of a row's column values, bounded by an LRU
+size limit and a TTL. Any flush that touches a ``User`` through the ORM
+invalidates that user automatically; bulk UPDATE statements must call
+``invalidate_user`` explicitly.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import get_db_session, close_db_session
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLLRUCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0  # Bumped by pop/clear; loads begun earlier are not stored
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    @property
+    def generation(self) -> int:
+        """Take before loading a value; pass to ``set`` so an invalidation during the load wins."""
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: int = None) -> bool:
+        """Store ``value``; skipped (False) if anything was invalidated since ``generation``."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            self._generation += 1
+            entry = self._data.pop(key, None)
+            return entry[1] if entry else None
+
+    def advance_generation(self) -> None:
+        """Invalidate loads in flight without dropping anything (the key is unknown)."""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class UserSnapshot:
+    """Read-only copy of a User row's column values."""
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values: Dict[str, Any]):
+        object.__setattr__(self, '_values', values)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("UserSnapshot is read-only; update the User row instead")
+
+    def __repr__(self):
+        return f"<UserSnapshot(id={self.id}, telegram_id={self.telegram_user_id})>"
+
+
+_USER_COLUMNS = tuple(attr.key for attr in inspect(User).column_attrs)
+
+user_cache = TTLLRUCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '60')),
+)
+
+# users.id -> telegram_user_id, so writers that only know the DB id can invalidate
+_id_index = TTLLRUCache(maxsize=user_cache.maxsize, ttl=user_cache.ttl)
+
+
+def snapshot_user(user) -> UserSnapshot:
+    """Copy the column values of a User instance."""
+    return UserSnapshot({key: getattr(user, key) for key in _USER_COLUMNS})
+
+
+def cache_user(user, generation: int = None) -> Optional[UserSnapshot]:
+    """
+    Store a snapshot of ``user`` and return it.
+
+    Pass the ``user_cache.generation`` taken before ``user`` was loaded: if a
+    user was invalidated since, the (possibly pre-commit) snapshot is
+    returned but not cached.
+    """
+    if user is None:
+        return None
+    snapshot = user if isinstance(user, UserSnapshot) else snapshot_user(user)
+    if user_cache.set(snapshot.telegram_user_id, snapshot, generation):
+        _id_index.set(snapshot.id, snapshot.telegram_user_id)
+    return snapshot
+
+
+def get_cached_user(telegram_id: int, db: Session = None) -> Optional[UserSnapshot]:
+    """Return the cached user, loading it with a sync session on a miss."""
+    snapshot = user_cache.get(telegram_id, _MISSING)
+    if snapshot is not _MISSING:
+        return snapshot
+
+    from .operations import UserService
+    generation = user_cache.generation
+    own_session = db is None
+    if own_session:
+        db = get_db_session()
+    try:
+        return cache_user(UserService.get_user_by_telegram_id(db, telegram_id), generation)
+    finally:
+        if own_session:
+            close_db_session(db)
+
+
+async def aget_cached_user(telegram_id: int) -> Optional[UserSnapshot]:
+    """Return the cached user, loading it with an async session on a miss."""
+    snapshot = user_cache.get(telegram_id, _MISSING)
+    if snapshot is not _MISSING:
+        return snapshot
+
+    from . import db_session
+    from .operations import AsyncUserService
+    generation = user_cache.generation
+    async with db_session() as db:
+        return cache_user(await AsyncUserService.get_user_by_telegram_id(db, telegram_id), generation)
+
+
+def invalidate_user(telegram_id: int = None, user_id: int = None) -> None:
+    """Drop a user from the cache by telegram ID or by database ID."""
+    if user_id is not None:
+        indexed = _id_index.pop(user_id)
+        if telegram_id is None:
+            telegram_id = indexed
+    if telegram_id is not None:
+        user_cache.pop(telegram_id)
+    else:
+        user_cache.advance_generation()
+
+
+def invalidate_on_commit(session: Session, telegram_id: int, user_id: int) -> None:
+    """Invalidate a user changed by a bulk UPDATE in ``session``, now and again once it commits."""
+    session.info.setdefault('user_cache_touched', set()).add((telegram_id, user_id))
+    invalidate_user(telegram_id, user_id)
+
+
+def user_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the admin stats screen."""
+    return user_cache.stats()
+
+
+# =============================================================================
+# AUTOMATIC INVALIDATION - any ORM flush touching a User drops its entry
+# =============================================================================
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_users(session, flush_context):
+    touched = session.info.setdefault('user_cache_touched', set())
+    for obj in list(session.dirty) + list(session.deleted) + list(session.new):
+        if isinstance(obj, User):
+            touched.add((obj.telegram_user_id, obj.id))
+            # Drop now as well as after commit so readers never repopulate
+            # from the pre-flush row while the transaction is open
+            invalidate_user(obj.telegram_user_id, obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    for telegram_id, user_id in session.info.pop('user_cache_touched', ()):
+        invalidate_user(telegram_id, user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_touched_users(session):
+    session.info.pop('user_cache_touched', None)
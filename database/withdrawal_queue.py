@@ -0,0 +1,163 @@
+"""
+Leader work queue for withdrawal reviews.
+
+Instead of every leader browsing the same top of the PENDING list, each
+leader claims a small batch (``claim``) leased for
+WITHDRAWAL_CLAIM_LEASE_SECONDS. Other leaders do not see a claimed
+withdrawal until it is reviewed, released or its lease runs out, so N
+leaders work through N disjoint batches.
+
+A claim is one UPDATE whose subquery picks the batch. On PostgreSQL the
+subquery is ``FOR UPDATE SKIP LOCKED``, so concurrent claimers pass over each
+other's rows instead of queueing behind them. SQLite has neither row nor
+advisory locks; its database write lock serialises the single statement
+instead, which gives claimers the same exclusion. Work comes out in
+``priority_at`` order - the request time pulled earlier by the amount (see
+database/models.py) - so old and large payouts go first.
+
+Reviews stamp ``claimed_by``, ``claimed_at`` and ``reviewed_at`` (see
+database/balance_ledger.py), from which ``leader_throughput`` reports each
+leader's review rate and handling time.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import User, Withdrawal, WithdrawalStatus
+
+logger = logging.getLogger(__name__)
+
+WITHDRAWAL_CLAIM_BATCH = int(os.getenv('WITHDRAWAL_CLAIM_BATCH', '5'))
+WITHDRAWAL_CLAIM_LEASE_SECONDS = int(os.getenv('WITHDRAWAL_CLAIM_LEASE_SECONDS', '900'))
+
+
+def open_to(leader_id: int, now: datetime):
+    """Rows ``leader_id`` may act on: unclaimed, lease expired, or already theirs."""
+    return or_(
+        Withdrawal.claim_expires_at.is_(None),
+        Withdrawal.claim_expires_at <= now,
+        Withdrawal.claimed_by == leader_id,
+    )
+
+
+def claim(db: Session, leader_id: int, limit: int = None, now: datetime = None) -> List[int]:
+    """
+    Lease up to ``limit`` pending withdrawals to a leader, highest priority first.
+
+    The leader's own live claims fill the batch first and have their lease
+    renewed, so work that arrives with a higher priority never pushes a claim
+    out of the batch while it stays hidden from everyone else. Returns the
+    claimed ids in queue order; the caller commits.
+    """
+    now = now or datetime.utcnow()
+    claimable = and_(Withdrawal.status == WithdrawalStatus.PENDING, open_to(leader_id, now))
+    held = case((and_(Withdrawal.claimed_by == leader_id, Withdrawal.claim_expires_at > now), 0), else_=1)
+    batch = (
+        select(Withdrawal.id).where(claimable)
+        .order_by(held, Withdrawal.priority_at, Withdrawal.id)
+        .limit(limit or WITHDRAWAL_CLAIM_BATCH)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(Withdrawal)
+        .where(Withdrawal.id.in_(batch), claimable)
+        .values(
+            claimed_by=leader_id,
+            claimed_at=case((Withdrawal.claimed_by == leader_id, func.coalesce(Withdrawal.claimed_at, now)), else_=now),
+            claim_expires_at=now + timedelta(seconds=WITHDRAWAL_CLAIM_LEASE_SECONDS),
+        )
+        .returning(Withdrawal.id, Withdrawal.priority_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return [withdrawal_id for withdrawal_id, _ in sorted(rows, key=lambda r: (r.priority_at or now, r.id))]
+
+
+def claimed(db: Session, leader_id: int, now: datetime = None) -> List[Tuple[Withdrawal, Optional[User]]]:
+    """The leader's live claims with their requesters, in queue order."""
+    now = now or datetime.utcnow()
+    return db.execute(
+        select(Withdrawal, User)
+        .outerjoin(User, User.id == Withdrawal.user_id)
+        .where(Withdrawal.status == WithdrawalStatus.PENDING, Withdrawal.claimed_by == leader_id,
+               Withdrawal.claim_expires_at > now)
+        .order_by(Withdrawal.priority_at, Withdrawal.id)
+    ).all()
+
+
+def release(db: Session, leader_id: int) -> int:
+    """Hand a leader's unreviewed claims back to the queue; returns how many. The caller commits."""
+    result = db.execute(
+        update(Withdrawal)
+        .where(Withdrawal.status == WithdrawalStatus.PENDING, Withdrawal.claimed_by == leader_id)
+        .values(claimed_by=None, claimed_at=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _seconds_between(db: Session, start, end):
+    """SQL expression for ``end - start`` in seconds."""
+    if db.get_bind().dialect.name == 'postgresql':
+        return func.extract('epoch', end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400.0
+
+
+def leader_throughput(db: Session, since: datetime, now: datetime = None) -> List[Dict[str, Any]]:
+    """
+    Reviews per leader since ``since``, busiest first.
+
+    Each entry has ``leader_id``, ``name``, ``reviewed``, ``amount``,
+    ``per_hour`` and ``avg_handle_seconds`` (claim to decision). Aggregated
+    with one GROUP BY; only a row per leader leaves the database.
+    """
+    now = now or datetime.utcnow()
+    handling = _seconds_between(db, func.coalesce(Withdrawal.claimed_at, Withdrawal.reviewed_at), Withdrawal.reviewed_at)
+    per_leader = (
+        select(
+            Withdrawal.claimed_by.label('leader_id'),
+            func.count().label('reviewed'),
+            func.coalesce(func.sum(Withdrawal.amount), 0.0).label('amount'),
+            func.avg(case((handling > 0, handling), else_=0.0)).label('avg_handle_seconds'),
+        )
+        .where(Withdrawal.reviewed_at >= since, Withdrawal.claimed_by.isnot(None))
+        .group_by(Withdrawal.claimed_by)
+        .subquery()
+    )
+    rows = db.execute(
+        select(per_leader, User.username, User.first_name)
+        .outerjoin(User, User.id == per_leader.c.leader_id)
+        .order_by(per_leader.c.reviewed.desc(), per_leader.c.leader_id)
+    ).all()
+
+    hours = max((now - since).total_seconds() / 3600, 1 / 60)
+    return [{
+        'leader_id': row.leader_id,
+        'name': f"@{row.username}" if row.username else (row.first_name or f"#{row.leader_id}"),
+        'reviewed': row.reviewed,
+        'amount': float(row.amount or 0.0),
+        'per_hour': row.reviewed / hours,
+        'avg_handle_seconds': float(row.avg_handle_seconds or 0.0),
+    } for row in rows]
+
+
+# Async sessions run the same statements on their underlying sync session
+
+async def aclaim(db: AsyncSession, leader_id: int, limit: int = None) -> List[int]:
+    return await db.run_sync(claim, leader_id, limit)
+
+
+async def aclaimed(db: AsyncSession, leader_id: int) -> List[Tuple[Withdrawal, Optional[User]]]:
+    return await db.run_sync(claimed, leader_id)
+
+
+async def arelease(db: AsyncSession, leader_id: int) -> int:
+    return await db.run_sync(release, leader_id)
+
+
+async def aleader_throughput(db: AsyncSession, since: datetime) -> List[Dict[str, Any]]:
+    return await db.run_sync(leader_throughput, since)
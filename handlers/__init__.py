@@ -14,9 +14,13 @@ def setup_all_handlers(application: Application) -> None:
     Handler Registration Order (CRITICAL for proper functioning):
     1. ConversationHandlers (HIGHEST priority - selling flow)
     2. Command Handlers (/start, /admin, etc.)
-    3. CallbackQuery Handlers (button callbacks)
+    3. CallbackQuery Handlers (button callbacks; plain buttons are routes on
+       the callback router, added last so conversations keep precedence)
     4. Message Handlers (text input - LOWEST priority)
     
+    Request middleware (handlers/middleware.py) runs in group -100 before and
+    group 100 after everything else, sharing one DB session per update.
+    
     Modular Architecture:
     - handlers/verification_flow.py: CAPTCHA and channel verification
     - handlers/user_panel.py: Balance, language, account details
@@ -26,15 +30,24 @@ def setup_all_handlers(application: Application) -> None:
     - handlers/leader_handlers.py: Leader panel functionality
     - handlers/analytics_handlers.py: Analytics dashboard
     - handlers/real_handlers.py: Main menu orchestration (slim)
+    - handlers/callback_router.py: Callback data -> handler dispatch
     """
     logger.info("🚀 Initializing modular handler system...")
     
+    # Request-scoped DB session and user cache (wraps every other group)
+    from handlers.middleware import setup_middleware
+    setup_middleware(application)
+    
     # Import the main handler orchestrator
     from handlers.real_handlers import setup_real_handlers
     
     # Setup all handlers through the orchestrator
     setup_real_handlers(application)
     
+    # One dispatcher for every plain button, checked for shadowed routes
+    from handlers.callback_router import install_callback_router
+    install_callback_router(application)
+    
     logger.info("✅ All modular handlers registered successfully")
 
 # Backward compatibility
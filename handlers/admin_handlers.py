@@ -1,15 +1,18 @@
 """Admin command handlers for the Telegram Account Bot."""
 import logging
 import json
-import asyncio
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ConversationHandler
 
-from database import get_db_session, close_db_session
-from database.operations import UserService, SystemSettingsService, ActivityLogService
+from sqlalchemy import select
+
+from database import balance_ledger, get_db_session, close_db_session, db_session
+from database.operations import UserService, SystemSettingsService, ActivityLogService, AsyncUserService
 from database.models import User, Withdrawal, AccountSale, UserStatus, SessionLog
 from services.translation_service import translation_service
+from services.broadcast import broadcast_engine, TARGET_DESCRIPTIONS
+from handlers.callback_router import get_callback_router
 
 logger = logging.getLogger(__name__)
 
@@ -188,108 +191,45 @@ async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE)
         parse_mode='Markdown'
     )
     
-    db = get_db_session()
     try:
-        # Get target users based on broadcast type
-        if broadcast_type == 'all':
-            users = db.query(User).all()
-            target_desc = "all users"
-        elif broadcast_type == 'active':
-            users = db.query(User).filter(User.status == 'ACTIVE').all()
-            target_desc = "active users"
-        elif broadcast_type == 'frozen':
-            users = db.query(User).filter(User.status == 'FROZEN').all()
-            target_desc = "frozen users"
-        elif broadcast_type == 'leaders':
-            users = db.query(User).filter(User.is_leader == True).all()
-            target_desc = "leaders"
-        else:
-            users = []
-            target_desc = "no users"
-        
-        total_users = len(users)
-        sent_count = 0
-        failed_count = 0
-        
-        await processing_msg.edit_text(
-            f"📡 **Broadcasting Message...**\n\n"
-            f"📊 **Target:** {total_users} {target_desc}\n"
-            f"✅ **Sent:** {sent_count}\n"
-            f"❌ **Failed:** {failed_count}\n\n"
-            f"⏳ Sending messages...",
-            parse_mode='Markdown'
+        # Persist the job; the engine streams recipients and reports progress
+        # into processing_msg, so this handler returns immediately
+        broadcast_engine.attach(context.bot)
+        job_id = await broadcast_engine.create_job(
+            created_by=update.effective_user.id,
+            target=broadcast_type,
+            message=broadcast_message,
+            progress_chat_id=processing_msg.chat_id,
+            progress_message_id=processing_msg.message_id,
         )
-        
-        # Send message to all target users
-        for i, user in enumerate(users):
-            try:
-                await context.bot.send_message(
-                    chat_id=user.telegram_user_id,
-                    text=f"📢 **System Announcement**\n\n{broadcast_message}",
-                    parse_mode='Markdown'
-                )
-                sent_count += 1
-                
-                # Update progress every 10 users
-                if i % 10 == 0:
-                    await processing_msg.edit_text(
-                        f"📡 **Broadcasting Message...**\n\n"
-                        f"📊 **Target:** {total_users} {target_desc}\n"
-                        f"✅ **Sent:** {sent_count}\n"
-                        f"❌ **Failed:** {failed_count}\n\n"
-                        f"⏳ Progress: {i+1}/{total_users}",
-                        parse_mode='Markdown'
-                    )
-                
-                # Rate limiting
-                await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"Failed to send broadcast to user {user.telegram_user_id}: {e}")
-                failed_count += 1
-        
-        # Show final results
-        success_text = f"""
-✅ **BROADCAST COMPLETED**
-
-📊 **Results Summary:**
-• **Target Group:** {target_desc.title()}
-• **Total Users:** {total_users}
-• **Successfully Sent:** {sent_count}
-• **Failed Deliveries:** {failed_count}
-• **Success Rate:** {(sent_count/max(total_users,1)*100):.1f}%
-
-**Message Sent:**
-"{broadcast_message[:100]}{'...' if len(broadcast_message) > 100 else ''}"
-
-🕒 **Completed at:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        """
-        
-        keyboard = [
-            [InlineKeyboardButton("📢 Send Another", callback_data="admin_mailing")],
-            [InlineKeyboardButton("🔙 Back to Admin", callback_data="admin_panel")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        broadcast_engine.start(job_id)
         
         await processing_msg.edit_text(
-            success_text,
+            f"📡 **Broadcast #{job_id} Queued**\n\n"
+            f"📊 **Target:** {TARGET_DESCRIPTIONS.get(broadcast_type, broadcast_type)}\n\n"
+            f"⏳ Progress will appear here as messages are sent.",
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("⏹️ Stop Broadcast", callback_data=f"broadcast_stop_{job_id}")
+            ]])
         )
         
         # Log admin activity
-        admin_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-        if admin_user:
-            ActivityLogService.log_action(
-                db, admin_user.id, "ADMIN_BROADCAST",
-                f"Broadcast sent to {sent_count} {target_desc}",
-                extra_data=json.dumps({
-                    "target_type": broadcast_type,
-                    "message": broadcast_message[:200],
-                    "sent_count": sent_count,
-                    "failed_count": failed_count
-                })
-            )
+        db = get_db_session()
+        try:
+            admin_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
+            if admin_user:
+                ActivityLogService.log_action(
+                    db, admin_user.id, "ADMIN_BROADCAST",
+                    f"Broadcast #{job_id} started for {TARGET_DESCRIPTIONS.get(broadcast_type, broadcast_type)}",
+                    extra_data=json.dumps({
+                        "job_id": job_id,
+                        "target_type": broadcast_type,
+                        "message": broadcast_message[:200]
+                    })
+                )
+        finally:
+            close_db_session(db)
         
         context.user_data.clear()
         return ConversationHandler.END
@@ -301,8 +241,19 @@ async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE)
             parse_mode='Markdown'
         )
         return ConversationHandler.END
-    finally:
-        close_db_session(db)
+
+async def handle_stop_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop a running broadcast after its current page."""
+    query = update.callback_query
+    if not is_admin(update.effective_user.id):
+        await query.answer("❌ Access denied.", show_alert=True)
+        return
+    
+    job_id = context.callback_args['job_id']
+    if await broadcast_engine.cancel(job_id):
+        await query.answer(f"⏹️ Broadcast #{job_id} stopping...", show_alert=True)
+    else:
+        await query.answer("Broadcast already finished.", show_alert=True)
 
 async def handle_admin_user_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle manual user balance adjustment."""
@@ -370,9 +321,11 @@ async def process_balance_username(update: Update, context: ContextTypes.DEFAULT
         username = username_input
     
     # Find user in database
-    db = get_db_session()
     try:
-        target_user = db.query(User).filter(User.username == username).first()
+        async with db_session() as db:
+            target_user = (await db.execute(
+                select(User).where(User.username == username)
+            )).scalars().first()
         
         if not target_user:
             await update.message.reply_text(
@@ -417,8 +370,6 @@ async def process_balance_username(update: Update, context: ContextTypes.DEFAULT
             parse_mode='Markdown'
         )
         return BALANCE_USERNAME_INPUT
-    finally:
-        close_db_session(db)
 
 async def process_balance_amount(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Process amount and update balance in database."""
@@ -468,24 +419,24 @@ async def process_balance_amount(update: Update, context: ContextTypes.DEFAULT_T
             )
             return ConversationHandler.END
         
-        # Calculate new balance
-        old_balance = float(target_user.balance)
-        new_balance = old_balance + adjustment
-        
-        # Prevent negative balance
-        if new_balance < 0:
+        # Apply atomically; the ledger refuses to take the balance negative
+        try:
+            new_balance = balance_ledger.apply(
+                db, target_user.id, adjustment, balance_ledger.ADJUSTMENT,
+                note=f"Admin {update.effective_user.id}"
+            )
+        except balance_ledger.InsufficientBalance as e:
+            db.rollback()
             await update.message.reply_text(
                 f"❌ **Invalid Operation**\n\n"
-                f"Cannot subtract \\${abs(adjustment):.2f} from \\${old_balance:.2f}\n"
-                f"This would result in negative balance (\\${new_balance:.2f})\n\n"
+                f"Cannot subtract \\${abs(adjustment):.2f} from \\${e.balance:.2f}\n"
+                f"This would result in negative balance (\\${e.balance + adjustment:.2f})\n\n"
                 f"Please try a different amount.",
                 parse_mode='Markdown'
             )
             return BALANCE_AMOUNT_INPUT
-        
-        # Update balance
-        target_user.balance = new_balance
         db.commit()
+        old_balance = new_balance - adjustment
         
         # Log admin activity
         admin_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
@@ -581,12 +532,14 @@ async def process_user_id(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return USER_ID_INPUT
     
     # Find user in database
-    db = get_db_session()
     try:
-        if user_id:
-            target_user = UserService.get_user_by_telegram_id(db, user_id)
-        else:
-            target_user = db.query(User).filter(User.username == username).first()
+        async with db_session() as db:
+            if user_id:
+                target_user = await AsyncUserService.get_user_by_telegram_id(db, user_id)
+            else:
+                target_user = (await db.execute(
+                    select(User).where(User.username == username)
+                )).scalars().first()
         
         if not target_user:
             await update.message.reply_text(
@@ -642,8 +595,6 @@ async def process_user_id(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             parse_mode='Markdown'
         )
         return USER_ID_INPUT
-    finally:
-        close_db_session(db)
 
 async def handle_field_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle user field selection for editing."""
@@ -757,19 +708,21 @@ async def process_field_value(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         if field == 'balance':
             try:
+                note = f"Admin {update.effective_user.id}"
                 if new_value.startswith('+'):
                     # Add to balance
                     amount = float(new_value[1:])
-                    target_user.balance += amount
+                    balance_ledger.apply(db, target_user.id, amount, balance_ledger.ADJUSTMENT, note=note)
                     action_desc = f"Added ${amount:.2f} to balance"
                 elif new_value.startswith('-'):
                     # Subtract from balance
                     amount = float(new_value[1:])
-                    target_user.balance -= amount
+                    balance_ledger.apply(db, target_user.id, -amount, balance_ledger.ADJUSTMENT,
+                                         note=note, allow_negative=True)
                     action_desc = f"Subtracted ${amount:.2f} from balance"
                 else:
                     # Set balance
-                    target_user.balance = float(new_value)
+                    balance_ledger.set_balance(db, target_user.id, float(new_value), note=note)
                     action_desc = f"Set balance to ${float(new_value):.2f}"
                 
                 db.commit()
@@ -943,13 +896,70 @@ def is_admin(user_id: int) -> bool:
     from utils.helpers import is_admin as check_admin
     return check_admin(user_id)
 
+def build_perf_stats_text() -> str:
+    """Render runtime performance counters for the /perfstats command."""
+    from database.request_scope import query_stats
+    from database.user_cache import user_cache_stats
+    from utils.cache_engine import cache_engine
+    from services.captcha_pool import captcha_pool
+    from services.channel_membership import membership_checker
+    
+    queries = query_stats.snapshot()
+    captchas = captcha_pool.stats()
+    members = membership_checker.stats()
+    users = user_cache_stats()
+    caches = "\n".join(
+        f"• {name.replace('_', ' ')}: {c['size']}/{c['maxsize']}, hit rate {c['hit_rate'] * 100:.1f}% "
+        f"({c['stale_hits']} stale), {c['loads']} loads, {c['coalesced']} coalesced"
+        for name, c in cache_engine.stats().items()
+    ) or "• None in use yet"
+    return f"""
+📈 **PERFORMANCE STATS**
+
+**🗄️ Queries per Update:**
+• Updates processed: {queries['updates']}
+• Total queries: {queries['queries']}
+• Average per update: {queries['avg_queries_per_update']:.2f}
+• Max in one update: {queries['max_queries_per_update']}
+
+**👤 User Cache:**
+• Entries: {users['size']}/{users['maxsize']} (TTL {users['ttl']:.0f}s)
+• Hits: {users['hits']} | Misses: {users['misses']}
+• Hit rate: {users['hit_rate'] * 100:.1f}%
+• Evictions: {users['evictions']}
+
+**🧠 Runtime Caches:**
+{caches}
+
+**🧩 CAPTCHA Pool ({captchas['mode']}):**
+• Buffered: {captchas['buffered']}/{captchas['capacity']} (refill below {captchas['low_water']})
+• Served from buffer: {captchas['hit_rate'] * 100:.1f}% ({captchas['misses']} rendered on demand)
+• Rendered: {captchas['rendered']}, avg {captchas['avg_render_ms']:.1f}ms, {captchas['render_errors']} errors
+
+**📢 Channel Membership Checks:**
+• Cached members: {members['cached']} (TTL {members['ttl']:.0f}s)
+• API checks: {members['checks']} ({members['errors']} errors)
+• Saved: {members['saved_rate'] * 100:.1f}% ({members['hits']} cached, {members['coalesced']} coalesced)
+    """
+
+async def handle_perf_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show runtime performance counters to admins."""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Access denied.")
+        return
+    
+    await update.message.reply_text(build_perf_stats_text(), parse_mode='Markdown')
+
 def setup_admin_handlers(application) -> None:
     """Set up admin handlers."""
+    router = get_callback_router(application)
+    
     # Main admin panel handler
-    application.add_handler(CallbackQueryHandler(handle_admin_panel, pattern='^admin_panel$'))
+    router.add('admin_panel', handle_admin_panel)
+    application.add_handler(CommandHandler('perfstats', handle_perf_stats))
     
     # Admin sub-handlers
-    application.add_handler(CallbackQueryHandler(handle_admin_mailing, pattern='^admin_mailing$'))
+    router.add('admin_mailing', handle_admin_mailing)
     
     # Broadcast conversation handler
     broadcast_conv = ConversationHandler(
@@ -974,6 +984,7 @@ def setup_admin_handlers(application) -> None:
         conversation_timeout=300  # 5 minutes timeout
     )
     application.add_handler(broadcast_conv)
+    router.add('broadcast_stop_{job_id:int}', handle_stop_broadcast)
     
     # User edit conversation handler
     user_edit_conv = ConversationHandler(
@@ -1033,25 +1044,25 @@ def setup_admin_handlers(application) -> None:
     application.add_handler(balance_adjust_conv)
     
     # Account Freeze Management handlers
-    application.add_handler(CallbackQueryHandler(handle_account_freeze_panel, pattern='^admin_freeze_panel$'))
-    application.add_handler(CallbackQueryHandler(handle_view_frozen_accounts, pattern='^view_frozen_accounts$'))
+    router.add('admin_freeze_panel', handle_account_freeze_panel)
+    router.add('view_frozen_accounts', handle_view_frozen_accounts)
     
     # Sale Logs & Approval handlers
-    application.add_handler(CallbackQueryHandler(handle_sale_logs_panel, pattern='^sale_logs_panel$'))
-    application.add_handler(CallbackQueryHandler(handle_approve_sale_list, pattern='^approve_sale_list$'))
-    application.add_handler(CallbackQueryHandler(handle_approve_sale_action, pattern='^approve_sale_\\d+$'))
-    application.add_handler(CallbackQueryHandler(handle_reject_sale_action, pattern='^reject_sale_\\d+$'))
+    router.add('sale_logs_panel', handle_sale_logs_panel)
+    router.add('approve_sale_list', handle_approve_sale_list)
+    router.add('approve_sale_{sale_log_id:int}', handle_approve_sale_action)
+    router.add('reject_sale_{sale_log_id:int}', handle_reject_sale_action)
     
     # Session Management handlers
-    application.add_handler(CallbackQueryHandler(handle_session_management, pattern='^admin_sessions$'))
-    application.add_handler(CallbackQueryHandler(handle_terminate_user_sessions, pattern='^terminate_user_sessions$'))
-    application.add_handler(CallbackQueryHandler(handle_view_user_sessions, pattern='^view_user_sessions_\\d+$'))
-    application.add_handler(CallbackQueryHandler(handle_terminate_specific_session, pattern='^terminate_session_\\d+$'))
-    application.add_handler(CallbackQueryHandler(handle_terminate_all_user_sessions, pattern='^terminate_all_user_sessions_\\d+$'))
-    application.add_handler(CallbackQueryHandler(handle_terminate_sessions_confirm, pattern='^terminate_sessions_\\d+$'))
-    application.add_handler(CallbackQueryHandler(handle_view_session_holds, pattern='^view_session_holds$'))
-    application.add_handler(CallbackQueryHandler(handle_release_all_holds, pattern='^release_all_holds$'))
-    application.add_handler(CallbackQueryHandler(handle_session_activity_logs, pattern='^session_activity_logs$'))
+    router.add('admin_sessions', handle_session_management)
+    router.add('terminate_user_sessions', handle_terminate_user_sessions)
+    router.add('view_user_sessions_{user_id:int}', handle_view_user_sessions)
+    router.add('terminate_session_{session_id:int}', handle_terminate_specific_session)
+    router.add('terminate_all_user_sessions_{user_id:int}', handle_terminate_all_user_sessions)
+    router.add('terminate_sessions_{user_id:int}', handle_terminate_sessions_confirm)
+    router.add('view_session_holds', handle_view_session_holds)
+    router.add('release_all_holds', handle_release_all_holds)
+    router.add('session_activity_logs', handle_session_activity_logs)
     
     # Account Manipulation conversation handler
     account_manip_conv = ConversationHandler(
@@ -1098,12 +1109,12 @@ def setup_admin_handlers(application) -> None:
     application.add_handler(account_manip_conv)
     
     # Proxy/IP Configuration handlers
-    application.add_handler(CallbackQueryHandler(handle_admin_proxy_panel, pattern='^admin_proxy$'))
-    application.add_handler(CallbackQueryHandler(handle_force_proxy_rotation, pattern='^force_proxy_rotation$'))
-    application.add_handler(CallbackQueryHandler(handle_proxy_health_check, pattern='^proxy_health_check$'))
-    application.add_handler(CallbackQueryHandler(handle_view_proxy_pool, pattern='^view_proxy_pool$'))
-    application.add_handler(CallbackQueryHandler(handle_refresh_proxy_sources, pattern='^refresh_proxy_sources$'))
-    application.add_handler(CallbackQueryHandler(handle_clean_free_proxies, pattern='^clean_free_proxies$'))
+    router.add('admin_proxy', handle_admin_proxy_panel)
+    router.add('force_proxy_rotation', handle_force_proxy_rotation)
+    router.add('proxy_health_check', handle_proxy_health_check)
+    router.add('view_proxy_pool', handle_view_proxy_pool)
+    router.add('refresh_proxy_sources', handle_refresh_proxy_sources)
+    router.add('clean_free_proxies', handle_clean_free_proxies)
     
     # Reports & Logs handlers
     from handlers.reports_logs_handlers import (
@@ -1113,11 +1124,11 @@ def setup_admin_handlers(application) -> None:
         handle_view_user_report,
         handle_view_revenue_report
     )
-    application.add_handler(CallbackQueryHandler(handle_admin_reports, pattern='^admin_reports$'))
-    application.add_handler(CallbackQueryHandler(handle_view_activity_logs, pattern='^view_activity_logs$'))
-    application.add_handler(CallbackQueryHandler(handle_view_sales_report, pattern='^view_sales_report$'))
-    application.add_handler(CallbackQueryHandler(handle_view_user_report, pattern='^view_user_report$'))
-    application.add_handler(CallbackQueryHandler(handle_view_revenue_report, pattern='^view_revenue_report$'))
+    router.add('admin_reports', handle_admin_reports)
+    router.add('view_activity_logs', handle_view_activity_logs)
+    router.add('view_sales_report', handle_view_sales_report)
+    router.add('view_user_report', handle_view_user_report)
+    router.add('view_revenue_report', handle_view_revenue_report)
     
     # System Settings handlers
     from handlers.system_settings_handlers import (
@@ -1138,18 +1149,18 @@ def setup_admin_handlers(application) -> None:
         get_add_admin_conversation,
         get_remove_admin_conversation
     )
-    application.add_handler(CallbackQueryHandler(handle_admin_settings, pattern='^admin_settings$'))
-    application.add_handler(CallbackQueryHandler(handle_settings_bot_config, pattern='^settings_bot_config$'))
-    application.add_handler(CallbackQueryHandler(handle_settings_financial, pattern='^settings_financial$'))
-    application.add_handler(CallbackQueryHandler(handle_settings_security, pattern='^settings_security$'))
-    application.add_handler(CallbackQueryHandler(handle_settings_maintenance, pattern='^settings_maintenance$'))
-    application.add_handler(CallbackQueryHandler(handle_toggle_verification, pattern='^toggle_verification$'))
-    application.add_handler(CallbackQueryHandler(handle_toggle_captcha, pattern='^toggle_captcha$'))
-    application.add_handler(CallbackQueryHandler(handle_toggle_channel_verification, pattern='^toggle_channel_verification$'))
-    application.add_handler(CallbackQueryHandler(handle_clear_old_logs, pattern='^clear_old_logs$'))
-    application.add_handler(CallbackQueryHandler(handle_view_db_stats, pattern='^view_db_stats$'))
-    application.add_handler(CallbackQueryHandler(handle_view_all_admins, pattern='^view_all_admins$'))
-    application.add_handler(CallbackQueryHandler(handle_view_all_leaders, pattern='^view_all_leaders$'))
+    router.add('admin_settings', handle_admin_settings)
+    router.add('settings_bot_config', handle_settings_bot_config)
+    router.add('settings_financial', handle_settings_financial)
+    router.add('settings_security', handle_settings_security)
+    router.add('settings_maintenance', handle_settings_maintenance)
+    router.add('toggle_verification', handle_toggle_verification)
+    router.add('toggle_captcha', handle_toggle_captcha)
+    router.add('toggle_channel_verification', handle_toggle_channel_verification)
+    router.add('clear_old_logs', handle_clear_old_logs)
+    router.add('view_db_stats', handle_view_db_stats)
+    router.add('view_all_admins', handle_view_all_admins)
+    router.add('view_all_leaders', handle_view_all_leaders)
     
     # Admin management conversations
     application.add_handler(get_add_admin_conversation())
@@ -1624,7 +1635,7 @@ async def handle_approve_sale_action(update: Update, context: ContextTypes.DEFAU
         return
     
     # Extract sale_log_id from callback data
-    sale_log_id = int(query.data.split('_')[-1])
+    sale_log_id = context.callback_args['sale_log_id']
     
     from database import get_db_session, close_db_session
     from database.sale_log_operations import sale_log_service
@@ -1662,7 +1673,8 @@ async def handle_approve_sale_action(update: Update, context: ContextTypes.DEFAU
                                 user_telegram_id=seller_telegram_id,
                                 phone_number="account",
                                 sale_price=sale_log.sale_price,
-                                admin_notes=result.get('notes')
+                                admin_notes=result.get('notes'),
+                                dedup_key=f"sale_approved:{sale_log_id}"
                             )
             except Exception as e:
                 logger.error(f"Error sending approval notification: {e}")
@@ -1735,7 +1747,7 @@ async def handle_reject_sale_action(update: Update, context: ContextTypes.DEFAUL
         return
     
     # Extract sale_log_id
-    sale_log_id = int(query.data.split('_')[-1])
+    sale_log_id = context.callback_args['sale_log_id']
     
     from database import get_db_session, close_db_session
     from database.sale_log_operations import sale_log_service
@@ -1779,7 +1791,8 @@ async def handle_reject_sale_action(update: Update, context: ContextTypes.DEFAUL
                             user_telegram_id=seller_telegram_id,
                             phone_number="account",
                             rejection_reason='Admin review - does not meet requirements',
-                            admin_notes=rejection_reason
+                            admin_notes=rejection_reason,
+                            dedup_key=f"sale_rejected:{sale_log_id}"
                         )
             except Exception as e:
                 logger.error(f"Error sending rejection notification: {e}")
@@ -1959,7 +1972,7 @@ async def handle_view_user_sessions(update: Update, context: ContextTypes.DEFAUL
         return
     
     # Extract user_id from callback data
-    user_id = int(query.data.split('_')[-1])
+    user_id = context.callback_args['user_id']
     
     db = get_db_session()
     try:
@@ -2050,7 +2063,7 @@ async def handle_terminate_specific_session(update: Update, context: ContextType
         return
     
     # Extract session_id from callback data
-    session_id = int(query.data.split('_')[-1])
+    session_id = context.callback_args['session_id']
     
     db = get_db_session()
     try:
@@ -2074,7 +2087,8 @@ async def handle_terminate_specific_session(update: Update, context: ContextType
             
             await query.answer("✅ Session terminated successfully!", show_alert=True)
             
-            # Refresh the view
+            # Refresh the view of the session owner's sessions
+            context.callback_args = {'user_id': session.user_id}
             await handle_view_user_sessions(update, context)
         else:
             await query.answer("❌ Failed to terminate session.", show_alert=True)
@@ -2094,7 +2108,7 @@ async def handle_terminate_all_user_sessions(update: Update, context: ContextTyp
         return
     
     # Extract user_id from callback data
-    user_id = int(query.data.split('_')[-1])
+    user_id = context.callback_args['user_id']
     
     db = get_db_session()
     try:
@@ -2132,12 +2146,8 @@ async def handle_terminate_sessions_confirm(update: Update, context: ContextType
     query = update.callback_query
     await query.answer()
     
-    # Extract user_id and redirect to new handler
-    user_id = int(query.data.split('_')[-1])
-    context.user_data['redirect_user_id'] = user_id
-    
-    # Modify callback data and call new handler
-    query.data = f"view_user_sessions_{user_id}"
+    # Same user_id argument as view_user_sessions_{user_id}
+    context.user_data['redirect_user_id'] = context.callback_args['user_id']
     await handle_view_user_sessions(update, context)
 
 
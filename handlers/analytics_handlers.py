@@ -3,13 +3,15 @@ Analytics Dashboard for Telegram Account Bot
 Provides comprehensive analytics, reporting, and business intelligence features
 """
 import logging
-from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
+from telegram.ext import ContextTypes, CommandHandler
 
-from database import get_db_session, close_db_session
-from database.models import User, TelegramAccount, Withdrawal, AccountSale, UserStatus, AccountStatus, WithdrawalStatus
+from sqlalchemy import func, select
+
+from database import db_session
+from database.rollups import aload_rollups
+from database.models import User, TelegramAccount, UserStatus, AccountStatus, WithdrawalStatus
 
 logger = logging.getLogger(__name__)
 
@@ -21,174 +23,124 @@ class AnalyticsDashboard:
 
     async def get_user_analytics(self, days: int = 30) -> Dict[str, Any]:
         """Get user registration and activity analytics."""
-        db = get_db_session()
-        try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Total users
-            total_users = db.query(User).count()
-            
-            # New users in period
-            new_users = db.query(User).filter(
-                User.created_at >= start_date
-            ).count()
-            
-            # Active users (users with recent activity)
-            active_users = db.query(User).filter(
-                User.status == UserStatus.ACTIVE
-            ).count()
-            
-            # User status distribution
-            status_distribution = {}
-            for status in UserStatus:
-                count = db.query(User).filter(User.status == status).count()
-                status_distribution[status.value] = count
-            
-            return {
-                'total_users': total_users,
-                'new_users': new_users,
-                'active_users': active_users,
-                'status_distribution': status_distribution,
-                'growth_rate': (new_users / max(total_users - new_users, 1)) * 100 if total_users > new_users else 0
-            }
-        finally:
-            close_db_session(db)
+        # Per-status signups, all-time and for the period, from the daily rollups
+        async with db_session() as db:
+            rollups = await aload_rollups(db, {'period': days}, metrics=['signups'])
+        
+        signups = rollups.get('signups')
+        counts = signups.counts()
+        status_distribution = {status.value: counts.get(status.value, 0) for status in UserStatus}
+        total_users = signups.count()
+        new_users = rollups.get('signups', 'period').count()
+        
+        # Active users (users with recent activity)
+        active_users = status_distribution[UserStatus.ACTIVE.value]
+        
+        return {
+            'total_users': total_users,
+            'new_users': new_users,
+            'active_users': active_users,
+            'status_distribution': status_distribution,
+            'growth_rate': (new_users / max(total_users - new_users, 1)) * 100 if total_users > new_users else 0
+        }
 
     async def get_account_analytics(self, days: int = 30) -> Dict[str, Any]:
         """Get account sales and inventory analytics."""
-        db = get_db_session()
-        try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Total accounts
-            total_accounts = db.query(TelegramAccount).count()
+        async with db_session() as db:
+            rows = (await db.execute(
+                select(TelegramAccount.status, func.count(TelegramAccount.id))
+                .group_by(TelegramAccount.status)
+            )).all()
             
-            # Account status distribution
-            status_distribution = {}
-            for status in AccountStatus:
-                count = db.query(TelegramAccount).filter(TelegramAccount.status == status).count()
-                status_distribution[status.value] = count
-            
-            # Sales in period (if AccountSale table exists)
-            recent_sales = 0
-            try:
-                recent_sales = db.query(AccountSale).filter(
-                    AccountSale.created_at >= start_date
-                ).count()
-            except:
-                pass  # Table might not exist
-            
-            # Available vs sold accounts
-            available_accounts = status_distribution.get('AVAILABLE', 0)
-            sold_accounts = status_distribution.get('SOLD', 0)
-            
-            return {
-                'total_accounts': total_accounts,
-                'status_distribution': status_distribution,
-                'recent_sales': recent_sales,
-                'available_accounts': available_accounts,
-                'sold_accounts': sold_accounts,
-                'inventory_turnover': (sold_accounts / max(total_accounts, 1)) * 100
-            }
-        finally:
-            close_db_session(db)
+            # Sales in period
+            rollups = await aload_rollups(db, {'period': days}, metrics=['sales'])
+            recent_sales = rollups.get('sales', 'period').count()
+        
+        status_distribution = {status.value: 0 for status in AccountStatus}
+        total_accounts = 0
+        for status, count in rows:
+            total_accounts += count
+            if status in status_distribution:
+                status_distribution[status] = count
+        
+        # Available vs sold accounts
+        available_accounts = status_distribution.get('AVAILABLE', 0)
+        sold_accounts = status_distribution.get('SOLD', 0)
+        
+        return {
+            'total_accounts': total_accounts,
+            'status_distribution': status_distribution,
+            'recent_sales': recent_sales,
+            'available_accounts': available_accounts,
+            'sold_accounts': sold_accounts,
+            'inventory_turnover': (sold_accounts / max(total_accounts, 1)) * 100
+        }
 
     async def get_withdrawal_analytics(self, days: int = 30) -> Dict[str, Any]:
         """Get withdrawal and payment analytics."""
-        db = get_db_session()
-        try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Total withdrawals
-            total_withdrawals = db.query(Withdrawal).count()
-            
-            # Recent withdrawals
-            recent_withdrawals = db.query(Withdrawal).filter(
-                Withdrawal.created_at >= start_date
-            ).all()
-            
-            # Withdrawal status distribution
-            status_distribution = {}
-            for status in WithdrawalStatus:
-                count = db.query(Withdrawal).filter(Withdrawal.status == status).count()
-                status_distribution[status.value] = count
-            
-            # Financial metrics
-            total_amount = sum(w.amount for w in db.query(Withdrawal).all())
-            recent_amount = sum(w.amount for w in recent_withdrawals)
-            
-            completed_withdrawals = db.query(Withdrawal).filter(
-                Withdrawal.status == WithdrawalStatus.COMPLETED
-            ).all()
-            completed_amount = sum(w.amount for w in completed_withdrawals)
-            
-            # Processing efficiency
-            processing_time_avg = 0  # Would need to calculate based on timestamps
-            success_rate = (len(completed_withdrawals) / max(total_withdrawals, 1)) * 100
-            
-            return {
-                'total_withdrawals': total_withdrawals,
-                'recent_withdrawals': len(recent_withdrawals),
-                'status_distribution': status_distribution,
-                'total_amount': total_amount,
-                'recent_amount': recent_amount,
-                'completed_amount': completed_amount,
-                'success_rate': success_rate,
-                'processing_time_avg': processing_time_avg
-            }
-        finally:
-            close_db_session(db)
+        # Counts and amounts per status, overall and for the period, from the daily rollups
+        async with db_session() as db:
+            rollups = await aload_rollups(db, {'period': days}, metrics=['withdrawals'])
+        
+        withdrawals = rollups.get('withdrawals')
+        recent = rollups.get('withdrawals', 'period')
+        counts = withdrawals.counts()
+        status_distribution = {status.value: counts.get(status.value, 0) for status in WithdrawalStatus}
+        total_withdrawals = withdrawals.count()
+        completed = WithdrawalStatus.COMPLETED.value
+        
+        # Processing efficiency
+        processing_time_avg = 0  # Would need to calculate based on timestamps
+        success_rate = (withdrawals.count(completed) / max(total_withdrawals, 1)) * 100
+        
+        return {
+            'total_withdrawals': total_withdrawals,
+            'recent_withdrawals': recent.count(),
+            'status_distribution': status_distribution,
+            'total_amount': withdrawals.amount(),
+            'recent_amount': recent.amount(),
+            'completed_amount': withdrawals.amount(completed),
+            'success_rate': success_rate,
+            'processing_time_avg': processing_time_avg
+        }
 
     async def get_financial_metrics(self, days: int = 30) -> Dict[str, Any]:
         """Get comprehensive financial analytics."""
-        db = get_db_session()
-        try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Total user balances
-            total_user_balance = db.query(User).with_entities(
-                db.func.sum(User.balance)
-            ).scalar() or 0
-            
-            # Total earnings
-            total_earnings = db.query(User).with_entities(
-                db.func.sum(User.total_earnings)
-            ).scalar() or 0
-            
-            # Withdrawal amounts
-            total_withdrawals = db.query(Withdrawal).with_entities(
-                db.func.sum(Withdrawal.amount)
-            ).scalar() or 0
-            
-            pending_withdrawals = db.query(Withdrawal).filter(
-                Withdrawal.status.in_([WithdrawalStatus.PENDING, WithdrawalStatus.LEADER_APPROVED])
-            ).with_entities(db.func.sum(Withdrawal.amount)).scalar() or 0
-            
-            # Revenue calculations
-            platform_revenue = total_earnings - total_withdrawals
-            liquidity_ratio = total_user_balance / max(pending_withdrawals, 1)
-            
-            return {
-                'total_user_balance': total_user_balance,
-                'total_earnings': total_earnings,
-                'total_withdrawals': total_withdrawals,
-                'pending_withdrawals': pending_withdrawals,
-                'platform_revenue': platform_revenue,
-                'liquidity_ratio': liquidity_ratio
-            }
-        finally:
-            close_db_session(db)
+        open_statuses = [WithdrawalStatus.PENDING.value, WithdrawalStatus.APPROVED.value]
+        
+        async with db_session() as db:
+            # Balances and earnings are current state; withdrawals come from the rollups
+            total_user_balance, total_earnings = (await db.execute(
+                select(
+                    func.coalesce(func.sum(User.balance), 0),
+                    func.coalesce(func.sum(User.total_earnings), 0),
+                )
+            )).one()
+            rollups = await aload_rollups(db, {}, metrics=['withdrawals'])
+        
+        withdrawals = rollups.get('withdrawals')
+        total_withdrawals = withdrawals.amount()
+        pending_withdrawals = withdrawals.amount(*open_statuses)
+        
+        # Revenue calculations
+        platform_revenue = total_earnings - total_withdrawals
+        liquidity_ratio = total_user_balance / max(pending_withdrawals, 1)
+        
+        return {
+            'total_user_balance': total_user_balance,
+            'total_earnings': total_earnings,
+            'total_withdrawals': total_withdrawals,
+            'pending_withdrawals': pending_withdrawals,
+            'platform_revenue': platform_revenue,
+            'liquidity_ratio': liquidity_ratio
+        }
 
 async def analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /analytics command - show analytics dashboard."""
     user = update.effective_user
     
     # Check if user has analytics access (admin or leader)
-    if not (is_admin(user.id) or is_leader(user.id)):
+    if not (is_admin(user.id) or is_leader(user.id, context)):
         await update.message.reply_text(
             "❌ **Access Denied**\n\nAnalytics access requires admin or leader privileges.",
             parse_mode='Markdown'
@@ -367,16 +319,10 @@ def is_admin(user_id: int) -> bool:
     # Simple admin check - replace with proper implementation
     return user_id in [6733908384]  # Your actual admin ID
 
-def is_leader(user_id: int) -> bool:
+def is_leader(user_id: int, context=None) -> bool:
     """Check if user is leader."""
-    db = get_db_session()
-    try:
-        user = db.query(User).filter(User.telegram_user_id == user_id).first()
-        return user and user.is_leader
-    except Exception:
-        return False
-    finally:
-        close_db_session(db)
+    from utils.helpers import is_leader as _is_leader
+    return _is_leader(user_id, context)
 
 async def analytics_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle all analytics callback queries."""
@@ -384,7 +330,7 @@ async def analytics_callback_handler(update: Update, context: ContextTypes.DEFAU
     callback_data = query.data
     
     # Check analytics access
-    if not (is_admin(update.effective_user.id) or is_leader(update.effective_user.id)):
+    if not (is_admin(update.effective_user.id) or is_leader(update.effective_user.id, context)):
         await query.answer("❌ Access denied. Analytics privileges required.", show_alert=True)
         return
     
@@ -408,7 +354,8 @@ def setup_analytics_handlers(application) -> None:
     # Add analytics command handler
     application.add_handler(CommandHandler("analytics", analytics_command))
     
-    # Add analytics callback handlers
-    application.add_handler(CallbackQueryHandler(analytics_callback_handler, pattern="^analytics_"))
+    # Add analytics callback route
+    from handlers.callback_router import get_callback_router
+    get_callback_router(application).add('analytics_{view:rest}', analytics_callback_handler)
     
     logger.info("Analytics handlers set up successfully")
@@ -0,0 +1,339 @@
+"""
+Central callback query router.
+
+Plain button presses are dispatched by one handler instead of a chain of
+regex ``CallbackQueryHandler``s that python-telegram-bot tests one by one:
+
+- exact ``callback_data`` values are a dict lookup;
+- parameterized routes such as ``approve_withdrawal_{withdrawal_id:int}``
+  are found through a trie of their static prefixes (longest first), and the
+  rest of the data is parsed into typed ``context.callback_args``.
+
+Handler modules register routes in their setup functions with
+``get_callback_router(application).add(spec, callback)``; setup_all_handlers
+installs the router after every ConversationHandler so conversation states
+and fallbacks keep precedence. ConversationHandlers keep their own
+``CallbackQueryHandler``s.
+
+``check_callback_routes`` runs at startup and reports callback handlers that
+can never fire because an earlier handler in the same group always claims
+their data, and routes that overlap partially.
+"""
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from telegram import Update
+from telegram.ext import Application, BaseHandler, CallbackQueryHandler, ConversationHandler, ContextTypes
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+RouteCallback = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Any]]
+
+# Converter name -> (regex for the value, parser, sample value for route checks)
+CONVERTERS = {
+    'int': (r'-?\d+', int, '1'),
+    'str': (r'[^_]+', str, 'x'),
+    'rest': (r'.+', str, 'x'),
+}
+
+_PARAM = re.compile(r'\{(\w+)(?::(\w+))?\}')
+
+
+class Route:
+    """One registered callback spec, e.g. ``view_user_{telegram_id:int}``."""
+
+    __slots__ = ('spec', 'callback', 'prefix', 'params', 'regex', 'sample')
+
+    def __init__(self, spec: str, callback: RouteCallback):
+        self.spec = spec
+        self.callback = callback
+        self.params: List[Tuple[str, Callable]] = []
+
+        pieces = []
+        sample = []
+        position = 0
+        for match in _PARAM.finditer(spec):
+            converter = match.group(2) or 'str'
+            if converter not in CONVERTERS:
+                raise ValueError(f"Unknown converter '{converter}' in callback route '{spec}'")
+            pattern, parse, example = CONVERTERS[converter]
+            literal = spec[position:match.start()]
+            pieces.append(re.escape(literal) + f'({pattern})')
+            sample.append(literal + example)
+            self.params.append((match.group(1), parse))
+            position = match.end()
+        pieces.append(re.escape(spec[position:]))
+        sample.append(spec[position:])
+
+        first = _PARAM.search(spec)
+        self.prefix = spec[:first.start()] if first else spec
+        # Anchored at the end of the static prefix; matched against the remainder
+        self.regex = re.compile(''.join(pieces)[len(re.escape(self.prefix)):] + r'\Z') if first else None
+        self.sample = ''.join(sample)
+
+    def parse(self, remainder: str) -> Optional[Dict[str, Any]]:
+        match = self.regex.match(remainder)
+        if match is None:
+            return None
+        return {name: parse(value) for (name, parse), value in zip(self.params, match.groups())}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'routes')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.routes: List[Route] = []
+
+
+class CallbackRouter(BaseHandler):
+    """Dispatches callback queries through an exact-match dict and a prefix trie."""
+
+    def __init__(self, fallback: Optional[RouteCallback] = None):
+        super().__init__(self._dispatch)
+        self._exact: Dict[str, Route] = {}
+        self._trie = _TrieNode()
+        self._specs: Dict[str, Route] = {}
+        self.fallback = fallback
+
+    def add(self, spec: str, callback: RouteCallback) -> Route:
+        """Register a route; registering the same data twice is an error."""
+        if spec in self._specs:
+            existing = self._specs[spec].callback
+            raise ValueError(
+                f"Callback route '{spec}' registered twice "
+                f"({_callback_name(existing)} and {_callback_name(callback)})"
+            )
+        route = Route(spec, callback)
+        self._specs[spec] = route
+        if route.regex is None:
+            self._exact[spec] = route
+        else:
+            node = self._trie
+            for char in route.prefix:
+                node = node.children.setdefault(char, _TrieNode())
+            node.routes.append(route)
+        return route
+
+    @property
+    def routes(self) -> List[Route]:
+        return list(self._specs.values())
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, Dict[str, Any]]]:
+        """Route and parsed arguments for ``data``, or ``None``."""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, {}
+
+        # Walk the trie; prefixes that end deeper are more specific and win
+        candidates: List[Tuple[int, _TrieNode]] = []
+        node = self._trie
+        for depth, char in enumerate(data):
+            if node.routes:
+                candidates.append((depth, node))
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            if node.routes:
+                candidates.append((len(data), node))
+
+        for depth, node in reversed(candidates):
+            remainder = data[depth:]
+            for route in node.routes:
+                args = route.parse(remainder)
+                if args is not None:
+                    return route, args
+        return None
+
+    # --- python-telegram-bot handler interface ---------------------------
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        resolved = self.resolve(data)
+        if resolved is None and self.fallback is not None:
+            return (None, {})
+        return resolved
+
+    def collect_additional_context(self, context, update, application, check_result) -> None:
+        route, args = check_result
+        context.callback_args = args
+        context.callback_route = route.spec if route else None
+
+    async def _dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Any:
+        route = self._specs.get(context.callback_route)
+        if route is None:
+            return await self.fallback(update, context)
+        return await route.callback(update, context)
+
+
+async def answer_unknown_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop the button spinner for data no route claims (stale keyboards)."""
+    logger.debug(f"Unrouted callback data {update.callback_query.data!r} from user {update.effective_user.id}")
+    await update.callback_query.answer()
+
+
+_routers: "WeakKeyDictionary[Application, CallbackRouter]" = WeakKeyDictionary()
+
+
+def get_callback_router(application: Application) -> CallbackRouter:
+    """The application's router (created on first use, installed by setup_all_handlers)."""
+    router = _routers.get(application)
+    if router is None:
+        router = _routers[application] = CallbackRouter(fallback=answer_unknown_callback)
+    return router
+
+
+def install_callback_router(application: Application, group: int = 0) -> CallbackRouter:
+    """Add the router after all handlers registered so far and check for conflicts."""
+    router = get_callback_router(application)
+    application.add_handler(router, group=group)
+    for problem in check_callback_routes(application):
+        logger.warning(f"Callback routing: {problem}")
+    logger.info(f"✅ Callback router installed with {len(router.routes)} routes")
+    return router
+
+
+# =============================================================================
+# STARTUP CHECK
+# =============================================================================
+
+def _callback_name(callback: Callable) -> str:
+    return f"{getattr(callback, '__module__', '?')}.{getattr(callback, '__qualname__', repr(callback))}"
+
+
+def _regex_samples(pattern: str, limit: int = 16) -> List[str]:
+    """A few strings the regex matches (one per alternation branch)."""
+
+    def expand(items) -> List[str]:
+        results = ['']
+        for op, value in items:
+            options = one(op, value)
+            results = [prefix + option for prefix in results for option in options][:limit]
+        return results
+
+    def one(op, value) -> List[str]:
+        name = str(op)
+        if name == 'LITERAL':
+            return [chr(value)]
+        if name in ('AT', 'ASSERT', 'ASSERT_NOT'):
+            return ['']
+        if name == 'ANY':
+            return ['x']
+        if name == 'IN':
+            for item_op, item_value in value:
+                item = str(item_op)
+                if item == 'LITERAL':
+                    return [chr(item_value)]
+                if item == 'RANGE':
+                    return [chr(item_value[0])]
+                if item == 'CATEGORY':
+                    return ['1' if 'DIGIT' in str(item_value) else 'a']
+            return ['x']
+        if name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+            low, _, sub = value
+            return [s * max(low, 1) for s in expand(sub)]
+        if name == 'SUBPATTERN':
+            return expand(value[-1])
+        if name == 'BRANCH':
+            return [s for branch in value[1] for s in expand(branch)][:limit]
+        return ['x']
+
+    try:
+        return expand(sre_parse.parse(pattern))
+    except Exception:
+        return []
+
+
+class _Claimer:
+    """An always-active callback handler and how it matches data."""
+
+    def __init__(self, label: str, matches: Callable[[str], bool], samples: List[str], catch_all: bool = False):
+        self.label = label
+        self.matches = matches
+        self.samples = samples
+        self.catch_all = catch_all
+
+
+def _pattern_claimer(handler: CallbackQueryHandler, label: str) -> Optional[_Claimer]:
+    pattern = handler.pattern
+    if pattern is None:
+        return _Claimer(label, lambda data: True, ['x'], catch_all=True)
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
+    if isinstance(pattern, re.Pattern):
+        return _Claimer(label, lambda data: bool(pattern.match(data)), _regex_samples(pattern.pattern))
+    if callable(pattern) and not isinstance(pattern, type):
+        # Opaque predicate: it can shadow others, but we cannot sample it
+        return _Claimer(label, lambda data: bool(pattern(data)), [])
+    return None
+
+
+def _claimers(handler: BaseHandler, index: int) -> List[_Claimer]:
+    if isinstance(handler, CallbackRouter):
+        return [
+            _Claimer(f"route '{route.spec}' -> {_callback_name(route.callback)}",
+                     lambda data, route=route: handler.resolve(data) is not None and handler.resolve(data)[0] is route,
+                     [route.sample])
+            for route in handler.routes
+        ] + ([_Claimer("callback router fallback", lambda data: True, [], catch_all=True)]
+             if handler.fallback else [])
+    if isinstance(handler, ConversationHandler):
+        # Only entry points are always active; states and fallbacks depend on the conversation
+        return [
+            claimer for entry in handler.entry_points if isinstance(entry, CallbackQueryHandler)
+            for claimer in [_pattern_claimer(
+                entry, f"{handler.name or 'conversation'} entry point {_describe(entry)} (#{index})")]
+            if claimer
+        ]
+    if isinstance(handler, CallbackQueryHandler):
+        claimer = _pattern_claimer(handler, f"{_describe(handler)} (#{index})")
+        return [claimer] if claimer else []
+    return []
+
+
+def _describe(handler: CallbackQueryHandler) -> str:
+    pattern = handler.pattern
+    source = pattern.pattern if isinstance(pattern, re.Pattern) else pattern
+    return f"{source!r} -> {_callback_name(handler.callback)}"
+
+
+def check_callback_routes(application: Application) -> List[str]:
+    """
+    Describe callback handlers that can never fire (an earlier handler in the
+    same group claims every sample of their data) or that overlap partially.
+    """
+    problems = []
+    for group, handlers in sorted(application.handlers.items()):
+        earlier: List[_Claimer] = []
+        for index, handler in enumerate(handlers):
+            for claimer in _claimers(handler, index):
+                if claimer.catch_all and not claimer.samples:
+                    # A fallback only shadows what comes after it
+                    earlier.append(claimer)
+                    continue
+                samples = claimer.samples
+                shadowing = [other for other in earlier if any(other.matches(s) for s in samples)]
+                if samples and shadowing and all(any(o.matches(s) for o in shadowing) for s in samples):
+                    problems.append(
+                        f"group {group}: {claimer.label} is unreachable, shadowed by "
+                        + ', '.join(other.label for other in shadowing)
+                    )
+                elif shadowing and not claimer.catch_all:
+                    problems.append(
+                        f"group {group}: {claimer.label} partly overlaps "
+                        + ', '.join(other.label for other in shadowing)
+                    )
+                earlier.append(claimer)
+    return problems
@@ -2,38 +2,98 @@
 Leader Panel System for Telegram Account Bot
 Handles withdrawal requests, payment processing, and leader dashboard functionality
 """
+import functools
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
+from telegram.ext import ContextTypes, CommandHandler
+from telegram.helpers import escape_markdown
 
-from database import get_db_session, close_db_session
+from sqlalchemy import and_, func, or_, select
+
+from database import balance_ledger, db_session, withdrawal_queue
 from database.models import User, Withdrawal, WithdrawalStatus
+from database.rollups import aload_rollups
+from database.withdrawal_queue import WITHDRAWAL_CLAIM_LEASE_SECONDS
+from handlers.callback_router import get_callback_router
 
 logger = logging.getLogger(__name__)
 
+# Reporting windows (calendar days including today) and leaders listed on the stats screen
+LEADER_STATS_WINDOWS = {'today': 1, 'week': 7, 'month': 30}
+LEADER_STATS_TOP = 5
+LEADER_THROUGHPUT_HOURS = 24
+
 class LeaderPanelService:
     """Leader panel service for withdrawal management and statistics."""
     
     @staticmethod
-    def is_leader(user_id: int) -> bool:
+    async def is_leader(user_id: int) -> bool:
         """Check if user has leader privileges."""
-        db = get_db_session()
         try:
-            user = db.query(User).filter(User.telegram_user_id == user_id).first()
-            return user and user.is_leader
+            async with db_session() as db:
+                result = await db.execute(
+                    select(User.is_leader).where(User.telegram_user_id == user_id)
+                )
+                return bool(result.scalar())
         except Exception as e:
             logger.error(f"Error checking leader status: {e}")
             return False
-        finally:
-            close_db_session(db)
+    
+    @staticmethod
+    async def get_leader_db_id(db, telegram_user_id: int) -> Optional[int]:
+        """Database id of the leader acting on a withdrawal."""
+        result = await db.execute(select(User.id).where(User.telegram_user_id == telegram_user_id))
+        return result.scalar()
+    
+    @staticmethod
+    async def get_payout_stats(db, windows: Dict[str, int] = None) -> Dict[str, Any]:
+        """
+        Completed payouts per period and per leader, read from the daily rollups.
+        
+        Returns ``periods`` (window name -> count/amount/average, plus 'all') and
+        ``leaders`` (one entry per ``assigned_leader_id``, busiest first).
+        """
+        windows = LEADER_STATS_WINDOWS if windows is None else windows
+        rollups = await aload_rollups(db, windows, metrics=['payouts'])
+        
+        def summary(count: int, amount: float) -> Dict[str, Any]:
+            return {'count': count, 'amount': amount, 'average': amount / count if count else 0.0}
+        
+        names = list(windows) + ['all']
+        periods = {}
+        leaders: Dict[Optional[int], Dict[str, Any]] = {}
+        for name in names:
+            totals = rollups.get('payouts', name)
+            periods[name] = summary(totals.count(), totals.amount())
+            for leader_id, (count, amount) in totals.by_dimension.items():
+                key = int(leader_id) if leader_id else None
+                leaders.setdefault(key, {'leader_id': key})[name] = summary(int(count), amount)
+        
+        ids = [leader_id for leader_id in leaders if leader_id is not None]
+        if ids:
+            rows = await db.execute(
+                select(User.id, User.username, User.first_name).where(User.id.in_(ids))
+            )
+            for user_id, username, first_name in rows:
+                leaders[user_id]['name'] = f"@{username}" if username else (first_name or f"#{user_id}")
+        
+        for entry in leaders.values():
+            entry.setdefault('name', f"#{entry['leader_id']}" if entry['leader_id'] else 'Unassigned')
+            for name in names:
+                entry.setdefault(name, summary(0, 0.0))
+        
+        return {
+            'periods': periods,
+            'leaders': sorted(leaders.values(), key=lambda e: e['all']['amount'], reverse=True),
+        }
 
 async def leader_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /leader command - show leader panel."""
     user = update.effective_user
     
-    if not LeaderPanelService.is_leader(user.id):
+    if not await LeaderPanelService.is_leader(user.id):
         await update.message.reply_text(
             "❌ **Access Denied**\n\nLeader privileges required.",
             parse_mode='Markdown'
@@ -46,47 +106,51 @@ async def show_leader_panel(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Display the main leader panel with all options."""
     user = update.effective_user
     
-    if not LeaderPanelService.is_leader(user.id):
+    if not await LeaderPanelService.is_leader(user.id):
         if update.callback_query:
             await update.callback_query.answer("❌ Access denied. Leader privileges required.", show_alert=True)
         return
 
     # Get withdrawal statistics
-    db = get_db_session()
     try:
-        pending_withdrawals = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.PENDING
-        ).all()
-        
-        leader_approved = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.LEADER_APPROVED
-        ).all()
-        
-        completed_today = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.COMPLETED,
-            Withdrawal.updated_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        ).all()
-        
-        total_pending_amount = sum(w.amount for w in pending_withdrawals)
-        total_approved_amount = sum(w.amount for w in leader_approved)
-        total_completed_today = sum(w.amount for w in completed_today)
+        async with db_session() as db:
+            # Live counts for the work queue in one aggregate pass
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            completed_today = and_(
+                Withdrawal.status == WithdrawalStatus.COMPLETED,
+                func.coalesce(Withdrawal.processed_at, Withdrawal.updated_at) >= today,
+            )
+            row = (await db.execute(
+                select(
+                    func.count().filter(Withdrawal.status == WithdrawalStatus.PENDING),
+                    func.sum(Withdrawal.amount).filter(Withdrawal.status == WithdrawalStatus.PENDING),
+                    func.count().filter(Withdrawal.status == WithdrawalStatus.APPROVED),
+                    func.sum(Withdrawal.amount).filter(Withdrawal.status == WithdrawalStatus.APPROVED),
+                    func.count().filter(completed_today),
+                    func.sum(Withdrawal.amount).filter(completed_today),
+                ).where(or_(
+                    Withdrawal.status.in_([WithdrawalStatus.PENDING, WithdrawalStatus.APPROVED]),
+                    completed_today,
+                ))
+            )).one()
+        
+        (pending_count, total_pending_amount, approved_count,
+         total_approved_amount, completed_today_count, total_completed_today) = (v or 0 for v in row)
         
     except Exception as e:
         logger.error(f"Error getting leader stats: {e}")
-        pending_withdrawals = leader_approved = completed_today = []
+        pending_count = approved_count = completed_today_count = 0
         total_pending_amount = total_approved_amount = total_completed_today = 0.0
-    finally:
-        close_db_session(db)
 
     leader_text = f"""
 👑 **Leader Dashboard**
 
 **📊 Withdrawal Statistics:**
-• 📋 Pending Reviews: {len(pending_withdrawals)}
+• 📋 Pending Reviews: {pending_count}
 • 💰 Pending Amount: ${total_pending_amount:.2f}
-• ✅ Approved (Awaiting Payment): {len(leader_approved)}
+• ✅ Approved (Awaiting Payment): {approved_count}
 • 💸 Approved Amount: ${total_approved_amount:.2f}
-• ✨ Completed Today: {len(completed_today)}
+• ✨ Completed Today: {completed_today_count}
 • 🏆 Completed Amount: ${total_completed_today:.2f}
 
 **🔧 Quick Actions:**
@@ -118,54 +182,64 @@ async def show_leader_panel(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text(leader_text, parse_mode='Markdown', reply_markup=reply_markup)
 
 async def leader_review_withdrawals(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle withdrawal review management."""
+    """Claim a batch from the withdrawal queue and show this leader's claimed reviews."""
     query = update.callback_query
     await query.answer()
     
-    db = get_db_session()
+    # Claimed from the leader channel: answer privately, leave the channel post alone
+    if query.message and query.message.chat.type != 'private':
+        reply = functools.partial(context.bot.send_message, update.effective_user.id)
+    else:
+        reply = query.edit_message_text
+    
     try:
-        pending_withdrawals = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.PENDING
-        ).order_by(Withdrawal.created_at.desc()).limit(10).all()
+        async with db_session() as db:
+            leader_id = await LeaderPanelService.get_leader_db_id(db, update.effective_user.id)
+            # Each leader works on their own leased batch, highest priority first
+            await withdrawal_queue.aclaim(db, leader_id)
+            await db.commit()
+            pending_withdrawals = await withdrawal_queue.aclaimed(db, leader_id)
         
         if not pending_withdrawals:
-            await query.edit_message_text(
-                "📋 **Withdrawal Reviews**\n\n✅ No pending withdrawals to review.\n\nAll requests have been processed!",
+            await reply(
+                "📋 **Withdrawal Reviews**\n\n✅ No pending withdrawals to review.\n\nAll requests have been processed or claimed by other leaders!",
                 parse_mode='Markdown',
                 reply_markup=InlineKeyboardMarkup([[
                     InlineKeyboardButton("🔙 Back to Dashboard", callback_data="leader_refresh")
                 ]])
             )
             return
-            
-        review_text = f"📋 **Pending Withdrawal Reviews ({len(pending_withdrawals)})**\n\n"
         
-        for i, withdrawal in enumerate(pending_withdrawals, 1):
-            user = db.query(User).filter(User.id == withdrawal.user_id).first()
+        lease_minutes = WITHDRAWAL_CLAIM_LEASE_SECONDS // 60
+        review_text = (
+            f"📋 **Your Withdrawal Reviews ({len(pending_withdrawals)})**\n"
+            f"🔒 Reserved for you for {lease_minutes} min\n\n"
+        )
+        
+        for i, (withdrawal, user) in enumerate(pending_withdrawals, 1):
             username = f"@{user.username}" if user and user.username else f"User {user.telegram_user_id}" if user else "Unknown"
             
             review_text += f"""
 **#{i} - {username}**
 💰 Amount: ${withdrawal.amount:.2f}
-🏦 Method: {withdrawal.method}
-📱 Address: `{withdrawal.address}`
+🏦 Method: {withdrawal.withdrawal_method}
+📱 Address: `{withdrawal.withdrawal_address}`
 🕒 Requested: {withdrawal.created_at.strftime('%Y-%m-%d %H:%M')}
-📝 Note: {withdrawal.note or 'No note provided'}
+📝 Note: {withdrawal.leader_notes or 'No note provided'}
 
 """
         
-        keyboard = []
-        if pending_withdrawals:
-            first_withdrawal = pending_withdrawals[0]
-            keyboard.extend([
-                [InlineKeyboardButton(f"✅ Approve #{1}", callback_data=f"approve_withdrawal_{first_withdrawal.id}")],
-                [InlineKeyboardButton(f"❌ Reject #{1}", callback_data=f"reject_withdrawal_{first_withdrawal.id}")],
-                [InlineKeyboardButton("📋 View Details", callback_data=f"withdrawal_details_{first_withdrawal.id}")],
-            ])
-        
+        keyboard = [
+            [
+                InlineKeyboardButton(f"✅ Approve #{i}", callback_data=f"approve_withdrawal_{withdrawal.id}"),
+                InlineKeyboardButton(f"❌ Reject #{i}", callback_data=f"reject_withdrawal_{withdrawal.id}"),
+            ]
+            for i, (withdrawal, _) in enumerate(pending_withdrawals, 1)
+        ]
+        keyboard.append([InlineKeyboardButton("↩️ Release to Queue", callback_data="leader_release")])
         keyboard.append([InlineKeyboardButton("🔙 Back", callback_data="leader_refresh")])
         
-        await query.edit_message_text(
+        await reply(
             review_text,
             parse_mode='Markdown',
             reply_markup=InlineKeyboardMarkup(keyboard)
@@ -173,25 +247,45 @@ async def leader_review_withdrawals(update: Update, context: ContextTypes.DEFAUL
         
     except Exception as e:
         logger.error(f"Error in leader review: {e}")
-        await query.edit_message_text(
+        await reply(
             f"❌ Error loading withdrawals: {str(e)}",
             reply_markup=InlineKeyboardMarkup([[
                 InlineKeyboardButton("🔙 Back", callback_data="leader_refresh")
             ]])
         )
-    finally:
-        close_db_session(db)
+
+async def leader_release_claims(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Hand this leader's unreviewed withdrawals back to the queue."""
+    query = update.callback_query
+    
+    try:
+        async with db_session() as db:
+            leader_id = await LeaderPanelService.get_leader_db_id(db, update.effective_user.id)
+            released = await withdrawal_queue.arelease(db, leader_id)
+            await db.commit()
+        
+        await query.answer(f"↩️ {released} withdrawal(s) returned to the queue", show_alert=True)
+        await show_leader_panel(update, context)
+        
+    except Exception as e:
+        logger.error(f"Error releasing withdrawal claims: {e}")
+        await query.answer(f"❌ Error: {str(e)}", show_alert=True)
 
 async def leader_process_payments(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle payment processing management."""
     query = update.callback_query
     await query.answer()
     
-    db = get_db_session()
     try:
-        approved_withdrawals = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.LEADER_APPROVED
-        ).order_by(Withdrawal.updated_at.desc()).limit(10).all()
+        async with db_session() as db:
+            result = await db.execute(
+                select(Withdrawal, User)
+                .outerjoin(User, User.id == Withdrawal.user_id)
+                .where(Withdrawal.status == WithdrawalStatus.APPROVED)
+                .order_by(Withdrawal.updated_at.desc())
+                .limit(10)
+            )
+            approved_withdrawals = result.all()
         
         if not approved_withdrawals:
             await query.edit_message_text(
@@ -205,22 +299,21 @@ async def leader_process_payments(update: Update, context: ContextTypes.DEFAULT_
             
         payment_text = f"💸 **Approved Withdrawals - Awaiting Payment ({len(approved_withdrawals)})**\n\n"
         
-        for i, withdrawal in enumerate(approved_withdrawals, 1):
-            user = db.query(User).filter(User.id == withdrawal.user_id).first()
+        for i, (withdrawal, user) in enumerate(approved_withdrawals, 1):
             username = f"@{user.username}" if user and user.username else f"User {user.telegram_user_id}" if user else "Unknown"
             
             payment_text += f"""
 **#{i} - {username}**
 💰 Amount: ${withdrawal.amount:.2f}
-🏦 Method: {withdrawal.method}
-📱 Address: `{withdrawal.address}`
+🏦 Method: {withdrawal.withdrawal_method}
+📱 Address: `{withdrawal.withdrawal_address}`
 ✅ Approved: {withdrawal.updated_at.strftime('%Y-%m-%d %H:%M')}
 
 """
         
         keyboard = []
         if approved_withdrawals:
-            first_withdrawal = approved_withdrawals[0]
+            first_withdrawal = approved_withdrawals[0][0]
             keyboard.extend([
                 [InlineKeyboardButton(f"✅ Mark as Paid #{1}", callback_data=f"mark_paid_{first_withdrawal.id}")],
                 [InlineKeyboardButton(f"❌ Mark as Failed #{1}", callback_data=f"mark_failed_{first_withdrawal.id}")],
@@ -243,67 +336,61 @@ async def leader_process_payments(update: Update, context: ContextTypes.DEFAULT_
                 InlineKeyboardButton("🔙 Back", callback_data="leader_refresh")
             ]])
         )
-    finally:
-        close_db_session(db)
 
 async def leader_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle leader statistics display."""
     query = update.callback_query
     await query.answer()
     
-    db = get_db_session()
     try:
-        # Get comprehensive statistics
-        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        # Today's stats
-        today_completed = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.COMPLETED,
-            Withdrawal.updated_at >= today
-        ).all()
-        
-        # Week's stats
-        week_completed = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.COMPLETED,
-            Withdrawal.updated_at >= week_ago
-        ).all()
-        
-        # Month's stats
-        month_completed = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.COMPLETED,
-            Withdrawal.updated_at >= month_ago
-        ).all()
-        
-        # All time stats
-        all_completed = db.query(Withdrawal).filter(
-            Withdrawal.status == WithdrawalStatus.COMPLETED
-        ).all()
+        # Counts, totals and averages per period come from the payout rollups
+        async with db_session() as db:
+            stats = await LeaderPanelService.get_payout_stats(db)
+            throughput = await withdrawal_queue.aleader_throughput(
+                db, datetime.utcnow() - timedelta(hours=LEADER_THROUGHPUT_HOURS)
+            )
+        
+        today, week, month, all_time = (stats['periods'][name] for name in ('today', 'week', 'month', 'all'))
         
         stats_text = f"""
 📊 **Leader Statistics Dashboard**
 
 **📈 Daily Performance:**
-• ✅ Completed Today: {len(today_completed)}
-• 💰 Amount Today: ${sum(w.amount for w in today_completed):.2f}
-• 📊 Average per Transaction: ${(sum(w.amount for w in today_completed) / max(len(today_completed), 1)):.2f}
+• ✅ Completed Today: {today['count']}
+• 💰 Amount Today: ${today['amount']:.2f}
+• 📊 Average per Transaction: ${today['average']:.2f}
 
 **📅 Weekly Overview:**
-• ✅ Completed This Week: {len(week_completed)}
-• 💰 Total Amount: ${sum(w.amount for w in week_completed):.2f}
-• 📊 Daily Average: {len(week_completed) / 7:.1f} transactions
+• ✅ Completed This Week: {week['count']}
+• 💰 Total Amount: ${week['amount']:.2f}
+• 📊 Daily Average: {week['count'] / 7:.1f} transactions
 
 **📆 Monthly Summary:**
-• ✅ Completed This Month: {len(month_completed)}
-• 💰 Total Amount: ${sum(w.amount for w in month_completed):.2f}
+• ✅ Completed This Month: {month['count']}
+• 💰 Total Amount: ${month['amount']:.2f}
 • 📊 Success Rate: 100% (All approved payments completed)
 
 **🏆 All-Time Records:**
-• ✅ Total Withdrawals: {len(all_completed)}
-• 💰 Total Paid: ${sum(w.amount for w in all_completed):.2f}
-• 📊 Average Transaction: ${(sum(w.amount for w in all_completed) / max(len(all_completed), 1)):.2f}
-        """
+• ✅ Total Withdrawals: {all_time['count']}
+• 💰 Total Paid: ${all_time['amount']:.2f}
+• 📊 Average Transaction: ${all_time['average']:.2f}
+"""
+        
+        if stats['leaders']:
+            stats_text += "\n**👥 By Leader (month / all-time):**\n"
+            for entry in stats['leaders'][:LEADER_STATS_TOP]:
+                stats_text += (
+                    f"• {escape_markdown(entry['name'], version=1)}: {entry['month']['count']} / {entry['all']['count']} "
+                    f"(${entry['month']['amount']:.2f} / ${entry['all']['amount']:.2f})\n"
+                )
+        
+        if throughput:
+            stats_text += f"\n**⚡ Reviews, last {LEADER_THROUGHPUT_HOURS}h (count, per hour, avg time):**\n"
+            for entry in throughput[:LEADER_STATS_TOP]:
+                stats_text += (
+                    f"• {escape_markdown(entry['name'], version=1)}: {entry['reviewed']}, {entry['per_hour']:.1f}/h, "
+                    f"{entry['avg_handle_seconds'] / 60:.1f} min\n"
+                )
         
         keyboard = [
             [InlineKeyboardButton("📈 Export Report", callback_data="export_stats")],
@@ -326,27 +413,32 @@ async def leader_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 InlineKeyboardButton("🔙 Back", callback_data="leader_refresh")
             ]])
         )
-    finally:
-        close_db_session(db)
 
 async def approve_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Approve a withdrawal request."""
     query = update.callback_query
-    withdrawal_id = int(query.data.split('_')[-1])
+    withdrawal_id = context.callback_args['withdrawal_id']
     
-    db = get_db_session()
     try:
-        withdrawal = db.query(Withdrawal).filter(Withdrawal.id == withdrawal_id).first()
-        if not withdrawal:
-            await query.answer("❌ Withdrawal not found", show_alert=True)
-            return
-        
-        withdrawal.status = WithdrawalStatus.LEADER_APPROVED
-        withdrawal.updated_at = datetime.utcnow()
-        db.commit()
+        async with db_session() as db:
+            leader_id = await LeaderPanelService.get_leader_db_id(db, update.effective_user.id)
+            # Status change and balance debit are one guarded transaction
+            try:
+                await balance_ledger.aapprove_withdrawal(db, withdrawal_id, leader_id)
+            except balance_ledger.InsufficientBalance as e:
+                await db.rollback()
+                await query.answer(f"❌ Balance too low: ${e.balance:.2f}", show_alert=True)
+                return
+            except balance_ledger.WithdrawalConflict:
+                await db.rollback()
+                await query.answer("❌ Withdrawal already processed or claimed by another leader", show_alert=True)
+                return
+            await db.commit()
+            
+            withdrawal = await db.get(Withdrawal, withdrawal_id)
+            user = await db.get(User, withdrawal.user_id)
         
         # Notify user
-        user = db.query(User).filter(User.id == withdrawal.user_id).first()
         if user:
             try:
                 await context.bot.send_message(
@@ -354,8 +446,8 @@ async def approve_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE)
                     text=f"✅ **Withdrawal Approved**\n\n"
                          f"Your withdrawal request for ${withdrawal.amount:.2f} has been approved by our leader!\n"
                          f"Payment will be processed within 24 hours.\n\n"
-                         f"**Method:** {withdrawal.method}\n"
-                         f"**Address:** `{withdrawal.address}`",
+                         f"**Method:** {withdrawal.withdrawal_method}\n"
+                         f"**Address:** `{withdrawal.withdrawal_address}`",
                     parse_mode='Markdown'
                 )
             except Exception as e:
@@ -367,29 +459,26 @@ async def approve_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE)
     except Exception as e:
         logger.error(f"Error approving withdrawal: {e}")
         await query.answer(f"❌ Error: {str(e)}", show_alert=True)
-    finally:
-        close_db_session(db)
 
 async def reject_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Reject a withdrawal request."""
     query = update.callback_query
-    withdrawal_id = int(query.data.split('_')[-1])
+    withdrawal_id = context.callback_args['withdrawal_id']
     
-    db = get_db_session()
     try:
-        withdrawal = db.query(Withdrawal).filter(Withdrawal.id == withdrawal_id).first()
-        if not withdrawal:
-            await query.answer("❌ Withdrawal not found", show_alert=True)
-            return
-        
-        # Return balance to user
-        user = db.query(User).filter(User.id == withdrawal.user_id).first()
-        if user:
-            user.balance += withdrawal.amount
-        
-        withdrawal.status = WithdrawalStatus.REJECTED
-        withdrawal.updated_at = datetime.utcnow()
-        db.commit()
+        async with db_session() as db:
+            leader_id = await LeaderPanelService.get_leader_db_id(db, update.effective_user.id)
+            # Refunds only what approval debited
+            try:
+                await balance_ledger.areject_withdrawal(db, withdrawal_id, leader_id)
+            except balance_ledger.WithdrawalConflict:
+                await db.rollback()
+                await query.answer("❌ Withdrawal already processed or claimed by another leader", show_alert=True)
+                return
+            await db.commit()
+            
+            withdrawal = await db.get(Withdrawal, withdrawal_id)
+            user = await db.get(User, withdrawal.user_id)
         
         # Notify user
         if user:
@@ -398,7 +487,7 @@ async def reject_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE)
                     chat_id=user.telegram_user_id,
                     text=f"❌ **Withdrawal Rejected**\n\n"
                          f"Your withdrawal request for ${withdrawal.amount:.2f} has been rejected.\n"
-                         f"The amount has been returned to your balance.\n\n"
+                         f"Any amount held for it is back in your balance.\n\n"
                          f"**Current Balance:** ${user.balance:.2f}\n"
                          f"Please ensure your withdrawal details are correct before submitting again.",
                     parse_mode='Markdown'
@@ -406,41 +495,42 @@ async def reject_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE)
             except Exception as e:
                 logger.warning(f"Failed to notify user {user.telegram_user_id}: {e}")
         
-        await query.answer("❌ Withdrawal rejected and balance returned", show_alert=True)
+        await query.answer("❌ Withdrawal rejected", show_alert=True)
         await leader_review_withdrawals(update, context)
         
     except Exception as e:
         logger.error(f"Error rejecting withdrawal: {e}")
         await query.answer(f"❌ Error: {str(e)}", show_alert=True)
-    finally:
-        close_db_session(db)
 
 async def mark_payment_completed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Mark a payment as completed."""
     query = update.callback_query
-    withdrawal_id = int(query.data.split('_')[-1])
+    withdrawal_id = context.callback_args['withdrawal_id']
     
-    db = get_db_session()
     try:
-        withdrawal = db.query(Withdrawal).filter(Withdrawal.id == withdrawal_id).first()
-        if not withdrawal:
-            await query.answer("❌ Withdrawal not found", show_alert=True)
-            return
-        
-        withdrawal.status = WithdrawalStatus.COMPLETED
-        withdrawal.updated_at = datetime.utcnow()
-        db.commit()
+        async with db_session() as db:
+            leader_id = await LeaderPanelService.get_leader_db_id(db, update.effective_user.id)
+            # Only an approved (debited, not refunded) withdrawal can be paid out
+            try:
+                await balance_ledger.acomplete_withdrawal(db, withdrawal_id, leader_id)
+            except balance_ledger.WithdrawalConflict:
+                await db.rollback()
+                await query.answer("❌ Withdrawal is not approved or already processed", show_alert=True)
+                return
+            await db.commit()
+            
+            withdrawal = await db.get(Withdrawal, withdrawal_id)
+            user = await db.get(User, withdrawal.user_id)
         
         # Notify user
-        user = db.query(User).filter(User.id == withdrawal.user_id).first()
         if user:
             try:
                 await context.bot.send_message(
                     chat_id=user.telegram_user_id,
                     text=f"🎉 **Payment Completed**\n\n"
                          f"Your withdrawal of ${withdrawal.amount:.2f} has been successfully paid!\n\n"
-                         f"**Method:** {withdrawal.method}\n"
-                         f"**Address:** `{withdrawal.address}`\n"
+                         f"**Method:** {withdrawal.withdrawal_method}\n"
+                         f"**Address:** `{withdrawal.withdrawal_address}`\n"
                          f"**Transaction ID:** Processing...\n\n"
                          f"Thank you for using our service!",
                     parse_mode='Markdown'
@@ -454,40 +544,44 @@ async def mark_payment_completed(update: Update, context: ContextTypes.DEFAULT_T
     except Exception as e:
         logger.error(f"Error marking payment completed: {e}")
         await query.answer(f"❌ Error: {str(e)}", show_alert=True)
-    finally:
-        close_db_session(db)
 
-async def leader_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle all leader callback queries."""
-    query = update.callback_query
-    callback_data = query.data
-    
-    # Check leader access
-    if not LeaderPanelService.is_leader(update.effective_user.id):
-        await query.answer("❌ Access denied. Leader privileges required.", show_alert=True)
-        return
-    
-    try:
-        if callback_data == "leader_refresh":
-            await show_leader_panel(update, context)
-        elif callback_data == "leader_review":
-            await leader_review_withdrawals(update, context)
-        elif callback_data == "leader_payments":
-            await leader_process_payments(update, context)
-        elif callback_data == "leader_stats":
-            await leader_statistics(update, context)
-        elif callback_data.startswith("approve_withdrawal_"):
-            await approve_withdrawal(update, context)
-        elif callback_data.startswith("reject_withdrawal_"):
-            await reject_withdrawal(update, context)
-        elif callback_data.startswith("mark_paid_"):
-            await mark_payment_completed(update, context)
-        else:
-            await query.answer("Feature under development", show_alert=True)
+async def leader_feature_pending(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Leader buttons without a handler yet (reports, settings)."""
+    await update.callback_query.answer("Feature under development", show_alert=True)
+
+
+# Callback data -> handler; every route requires leader privileges
+LEADER_ROUTES = {
+    'leader_refresh': show_leader_panel,
+    'leader_review': leader_review_withdrawals,
+    'leader_payments': leader_process_payments,
+    'leader_stats': leader_statistics,
+    'leader_release': leader_release_claims,
+    'approve_withdrawal_{withdrawal_id:int}': approve_withdrawal,
+    'reject_withdrawal_{withdrawal_id:int}': reject_withdrawal,
+    'mark_paid_{withdrawal_id:int}': mark_payment_completed,
+    'leader_{action:rest}': leader_feature_pending,
+}
+
+
+def leader_route(handler):
+    """Wrap a leader handler with the access check and error alert."""
+    @functools.wraps(handler)
+    async def route(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        
+        # Check leader access
+        if not await LeaderPanelService.is_leader(update.effective_user.id):
+            await query.answer("❌ Access denied. Leader privileges required.", show_alert=True)
+            return
+        
+        try:
+            await handler(update, context)
+        except Exception as e:
+            logger.error(f"Error in leader callback handler: {e}")
+            await query.answer(f"Error: {str(e)}", show_alert=True)
     
-    except Exception as e:
-        logger.error(f"Error in leader callback handler: {e}")
-        await query.answer(f"Error: {str(e)}", show_alert=True)
+    return route
 
 def setup_leader_handlers(application) -> None:
     """Set up all leader handlers."""
@@ -495,10 +589,9 @@ def setup_leader_handlers(application) -> None:
     # Add leader command handler
     application.add_handler(CommandHandler("leader", leader_command))
     
-    # Add leader callback handlers
-    application.add_handler(CallbackQueryHandler(leader_callback_handler, pattern="^leader_"))
-    application.add_handler(CallbackQueryHandler(leader_callback_handler, pattern="^approve_withdrawal_"))
-    application.add_handler(CallbackQueryHandler(leader_callback_handler, pattern="^reject_withdrawal_"))
-    application.add_handler(CallbackQueryHandler(leader_callback_handler, pattern="^mark_paid_"))
+    # Add leader callback routes
+    router = get_callback_router(application)
+    for spec, handler in LEADER_ROUTES.items():
+        router.add(spec, leader_route(handler))
     
     logger.info("Leader handlers set up successfully")
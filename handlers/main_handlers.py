@@ -8,7 +8,7 @@ import os
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler, ConversationHandler, MessageHandler, filters
-from database import get_db_session, close_db_session
+from database import get_db_session, close_db_session, db_session
 from database.models import User, Withdrawal, WithdrawalStatus
 from database.operations import (
     UserService,
@@ -17,13 +17,16 @@ from database.operations import (
     VerificationService,
     ActivityLogService,
     WithdrawalService,
+    AsyncUserService,
+    AsyncTelegramAccountService,
 )
+from database.user_cache import aget_cached_user
 from services.captcha import CaptchaService
 # from services.translator import TranslatorService  # Will implement later
 from utils.helpers import MessageUtils
 from handlers.real_handlers import get_real_selling_handler
 from utils.runtime_settings import (
-    get_support_settings,
+    get_settings_snapshot,
     get_sale_stats,
     get_user_sales_metrics,
 )
@@ -151,7 +154,7 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, db_
 📊 **Your Status:** {get_status_emoji(db_user.status.value)} {db_user.status.value}
         """
         
-        support = get_support_settings()
+        support = get_settings_snapshot().support
         support_label = support.get("main_button_label") or "🆘 Support"
         support_url = support.get("main_button_url")
 
@@ -425,11 +428,11 @@ async def handle_lfg_sell(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def handle_account_details(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show user's account details and statistics."""
     user = update.effective_user
-    db = get_db_session()
     
     try:
-        db_user = UserService.get_user_by_telegram_id(db, user.id)
-        accounts = TelegramAccountService.get_user_accounts(db, db_user.id)
+        db_user = await aget_cached_user(user.id)
+        async with db_session() as db:
+            accounts = await AsyncTelegramAccountService.get_user_accounts(db, db_user.id)
         
         details_text = f"""
 📄 **Account Details**
@@ -475,16 +478,14 @@ async def handle_account_details(update: Update, context: ContextTypes.DEFAULT_T
         await update.callback_query.edit_message_text(
             "❌ Error loading account details. Please try again."
         )
-    finally:
-        close_db_session(db)
 
 async def handle_check_balance(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show user's current balance and recent transactions."""
     user = update.effective_user
-    db = get_db_session()
     
     try:
-        db_user = UserService.get_user_by_telegram_id(db, user.id)
+        # Served from the user cache; writers invalidate it on every balance change
+        db_user = await aget_cached_user(user.id)
         
         balance_text = f"""
 💰 **Your Balance**
@@ -523,8 +524,6 @@ async def handle_check_balance(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.callback_query.edit_message_text(
             "❌ Error loading balance. Please try again."
         )
-    finally:
-        close_db_session(db)
 
 async def handle_withdraw_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle withdraw menu."""
@@ -658,7 +657,7 @@ async def handle_user_status(update: Update, context: ContextTypes.DEFAULT_TYPE)
         db_user = UserService.get_user_by_telegram_id(db, user.id)
         accounts_count = TelegramAccountService.get_user_accounts_count(db, db_user.id)
         sales_metrics = get_user_sales_metrics(db_user.id)
-        support = get_support_settings()
+        support = get_settings_snapshot().support
 
         completion_rate = sales_metrics.get("completion_rate")
         if completion_rate is not None:
@@ -725,7 +724,7 @@ async def handle_user_status(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def handle_contact_support(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle support contact."""
-    support = get_support_settings()
+    support = get_settings_snapshot().support
 
     live_chat_label = support.get("live_chat_label") or "Live Chat"
     live_chat_url = support.get("live_chat_url")
@@ -2121,19 +2120,21 @@ async def handle_withdrawal_history(update: Update, context: ContextTypes.DEFAUL
     await query.answer()
     
     user = update.effective_user
-    db = get_db_session()
     
     try:
-        # Import WithdrawalService
-        from database.operations import WithdrawalService
+        from database.operations import AsyncWithdrawalService
+        
+        async with db_session() as db:
+            db_user = await AsyncUserService.get_user_by_telegram_id(db, user.id)
+            # Get user's withdrawals
+            withdrawals = (
+                await AsyncWithdrawalService.get_user_withdrawals(db, db_user.id)
+                if db_user else []
+            )
         
-        db_user = UserService.get_user_by_telegram_id(db, user.id)
         if not db_user:
             await query.edit_message_text("❌ User not found. Please restart the bot.")
             return
-            
-        # Get user's withdrawals
-        withdrawals = WithdrawalService.get_user_withdrawals(db, db_user.id)
         
         if not withdrawals:
             text = (
@@ -2191,8 +2192,6 @@ async def handle_withdrawal_history(update: Update, context: ContextTypes.DEFAUL
                 InlineKeyboardButton("🔙 Back", callback_data="withdraw_menu")
             ]])
         )
-    finally:
-        close_db_session(db)
 
 async def handle_delete_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle deletion of withdrawal record."""
@@ -3031,14 +3030,12 @@ async def send_withdrawal_to_leaders(bot, withdrawal, user):
         notification_text += (
             f"\n🕒 Requested: {withdrawal.created_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
             f"📊 Status: *PENDING APPROVAL*\n\n"
-            "⚡ Please review and process this withdrawal request."
+            "⚡ Claim your next reviews from the queue to process it."
         )
         
+        # Leaders pull work from the claim queue rather than all opening this request
         keyboard = [
-            [
-                InlineKeyboardButton("✅ Approve", callback_data=f"approve_withdrawal_{withdrawal.id}"),
-                InlineKeyboardButton("❌ Reject", callback_data=f"reject_withdrawal_{withdrawal.id}")
-            ],
+            [InlineKeyboardButton("📥 Claim Reviews", callback_data="leader_review")],
             [InlineKeyboardButton("👤 View User", callback_data=f"view_user_{user.telegram_user_id}")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -0,0 +1,36 @@
+"""
+Update middleware - runs before and after the regular handler groups.
+
+python-telegram-bot builds one ``context`` per Update and runs every handler
+group in ascending order, so a TypeHandler in the lowest group can prepare
+per-update state and one in the highest group can tear it down.
+"""
+import logging
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from database.request_scope import open_scope, close_scope
+
+logger = logging.getLogger(__name__)
+
+MIDDLEWARE_OPEN_GROUP = -100
+MIDDLEWARE_CLOSE_GROUP = 100
+
+
+async def open_request_scope(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Attach a request scope (one DB session, one User load) to the context."""
+    user = update.effective_user
+    open_scope(context, user.id if user else None)
+
+
+async def close_request_scope(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Close the request scope's session once all handlers have run."""
+    scope = close_scope(context)
+    if scope is not None:
+        logger.debug(f"Update {update.update_id} issued {scope.query_count} queries")
+
+
+def setup_middleware(application: Application) -> None:
+    """Register the request scope middleware around all other handlers."""
+    application.add_handler(TypeHandler(Update, open_request_scope), group=MIDDLEWARE_OPEN_GROUP)
+    application.add_handler(TypeHandler(Update, close_request_scope), group=MIDDLEWARE_CLOSE_GROUP)
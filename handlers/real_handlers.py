@@ -2,12 +2,14 @@
 Real Telegram Account Selling Handlers - Streamlined Core Module
 Imports handlers from modular architecture: verification_flow, user_panel, selling_flow, withdrawal_flow
 """
+import functools
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters, CommandHandler
 from keyboard_layout_fix import get_main_menu_keyboard
 from database import get_db_session, close_db_session
 from database.operations import UserService
+from database.request_scope import get_request_user
 import os
 
 logger = logging.getLogger(__name__)
@@ -33,12 +35,8 @@ from handlers.selling_flow import (
     get_real_selling_handler,
     cancel_sale
 )
-from handlers.withdrawal_flow import (
-    handle_approve_withdrawal,
-    handle_reject_withdrawal,
-    handle_mark_paid,
-    handle_view_user_details
-)
+from handlers.withdrawal_flow import handle_view_user_details
+from handlers.callback_router import get_callback_router
 
 
 async def show_real_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -47,17 +45,14 @@ async def show_real_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE
     if update.callback_query:
         await update.callback_query.answer()
     
-    db = None
     try:
-        db = get_db_session()
-        
         from utils.helpers import load_user_language
         try:
             load_user_language(context, user.id)
         except Exception as lang_error:
             logger.warning(f"Could not load user language: {lang_error}")
         
-        db_user = UserService.get_user_by_telegram_id(db, user.id)
+        db_user = get_request_user(context, user.id)
         
         if not db_user:
             logger.error(f"User {user.id} not found in database during main menu display")
@@ -150,91 +145,38 @@ Something went wrong. Please try restarting the bot.
                 )
         except Exception as fallback_error:
             logger.error(f"Failed to show error message: {fallback_error}")
-    finally:
-        if db:
-            close_db_session(db)
 
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Central router for button callbacks."""
-    query = update.callback_query
-    await query.answer()
-    
-    # Load user's language from database FIRST - ensures language persists everywhere
-    from utils.helpers import load_user_language
-    load_user_language(context, update.effective_user.id)
-    
-    # Check user verification status first
-    db = get_db_session()
-    try:
-        db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-        user_verified = bool(
-            getattr(db_user, 'verification_completed', False)
-            or getattr(db_user, 'is_verified', False)
-        ) if db_user else False
-    finally:
-        close_db_session(db)
-    
-    # If user is not verified, force them through verification
-    if not user_verified and not context.user_data.get('verified'):
-        if query.data in ["balance", "sales_history", "how_it_works", "2fa_help", "cancel_sale", "withdraw_menu", "language_menu", "status", "start_real_selling", "check_balance", "withdrawal_history"]:
-            logger.info(f"User {update.effective_user.id} not verified, routing to verification")
-            db = get_db_session()
-            try:
-                db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-                await start_verification_process(update, context, db_user)
-            finally:
-                close_db_session(db)
-            return
-    
-    # Main menu handling (optimized - no file cleanup needed)
-    if query.data == "main_menu":
-        context.user_data.pop('captcha_answer', None)
-        context.user_data.pop('captcha_type', None)
-        context.user_data.pop('verification_step', None)
+def menu_button(handler, verified_only: bool = True):
+    """
+    Wrap a main-menu handler for the callback router: answer the query,
+    load the user's language and, for ``verified_only`` buttons, send
+    unverified users through verification first.
+    """
+    @functools.wraps(handler)
+    async def route(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        await query.answer()
         
-        captcha_photo_message_id = context.user_data.pop('captcha_photo_message_id', None)
-        captcha_chat_id = context.user_data.pop('captcha_chat_id', None)
+        # Load user's language from database FIRST - ensures language persists everywhere
+        from utils.helpers import load_user_language
+        load_user_language(context, update.effective_user.id)
         
-        if captcha_photo_message_id and captcha_chat_id:
-            try:
-                await context.bot.delete_message(
-                    chat_id=captcha_chat_id,
-                    message_id=captcha_photo_message_id
-                )
-                logger.info(f"✅ Deleted CAPTCHA photo message")
-            except Exception as e:
-                logger.error(f"Could not delete CAPTCHA photo: {e}")
+        if verified_only:
+            db_user = get_request_user(context, update.effective_user.id)
+            user_verified = bool(
+                getattr(db_user, 'verification_completed', False)
+                or getattr(db_user, 'is_verified', False)
+            ) if db_user else False
+            
+            if not user_verified and not context.user_data.get('verified'):
+                logger.info(f"User {update.effective_user.id} not verified, routing to verification")
+                await start_verification_process(update, context, db_user)
+                return
         
-        db = get_db_session()
-        try:
-            db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-            await start_verification_process(update, context, db_user)
-        finally:
-            close_db_session(db)
+        await handler(update, context)
     
-    # Route to modular handlers
-    elif query.data == "balance":
-        await handle_balance(update, context)
-    elif query.data == "sales_history":
-        await handle_sales_history(update, context)
-    elif query.data == "how_it_works":
-        await show_how_it_works(update, context)
-    elif query.data == "2fa_help":
-        await show_2fa_help(update, context)
-    elif query.data == "cancel_sale":
-        await cancel_sale(update, context)
-    elif query.data == "start_real_selling":
-        # This should be handled by the selling conversation handler
-        pass
-    elif query.data.startswith("approve_withdrawal_"):
-        await handle_approve_withdrawal(update, context)
-    elif query.data.startswith("reject_withdrawal_"):
-        await handle_reject_withdrawal(update, context)
-    elif query.data.startswith("view_user_"):
-        await handle_view_user_details(update, context)
-    elif query.data.startswith("mark_paid_"):
-        await handle_mark_paid(update, context)
+    return route
 
 
 def setup_real_handlers(application) -> None:
@@ -376,6 +318,9 @@ def setup_real_handlers(application) -> None:
     application.add_handler(get_real_selling_handler())
     logger.info("✅ Selling ConversationHandler registered")
     
+    # Plain buttons go through the callback router (installed by setup_all_handlers)
+    router = get_callback_router(application)
+    
     # ========================================
     # ADMIN HANDLERS
     # ========================================
@@ -410,18 +355,11 @@ def setup_real_handlers(application) -> None:
         context.user_data.pop('captcha_type', None)
         context.user_data.pop('verification_step', None)
     
-        db_user = None
-        user_verified = False
-        db = get_db_session()
-        try:
-            db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-            if db_user:
-                user_verified = bool(
-                    getattr(db_user, 'verification_completed', False)
-                    or getattr(db_user, 'is_verified', False)
-                )
-        finally:
-            close_db_session(db)
+        db_user = get_request_user(context, update.effective_user.id)
+        user_verified = bool(
+            getattr(db_user, 'verification_completed', False)
+            or getattr(db_user, 'is_verified', False)
+        ) if db_user else False
 
         if user_verified or context.user_data.get('verified'):
             logger.info("Routing user %s to real main menu", update.effective_user.id)
@@ -430,7 +368,7 @@ def setup_real_handlers(application) -> None:
             logger.info("Routing user %s to verification start", update.effective_user.id)
             await start_verification_process(update, context, db_user)
     
-    application.add_handler(CallbackQueryHandler(handle_main_menu_callback, pattern='^main_menu$'))
+    router.add('main_menu', handle_main_menu_callback)
     
     # Channel verification handlers
     async def handle_show_channels_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -438,31 +376,22 @@ def setup_real_handlers(application) -> None:
             await update.callback_query.answer()
         await show_channel_verification(update, context)
 
-    application.add_handler(CallbackQueryHandler(handle_show_channels_callback, pattern='^show_channels$'))
-    application.add_handler(CallbackQueryHandler(handle_verify_channels, pattern='^verify_channels$'))
+    router.add('show_channels', handle_show_channels_callback)
+    router.add('verify_channels', handle_verify_channels)
     
     # Other callback handlers
     async def handle_check_balance_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle balance check with verification enforcement."""
         # Check verification first
-        db = get_db_session()
-        try:
-            db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-            user_verified = bool(
-                getattr(db_user, 'verification_completed', False)
-                or getattr(db_user, 'is_verified', False)
-            ) if db_user else False
-        finally:
-            close_db_session(db)
+        db_user = get_request_user(context, update.effective_user.id)
+        user_verified = bool(
+            getattr(db_user, 'verification_completed', False)
+            or getattr(db_user, 'is_verified', False)
+        ) if db_user else False
         
         if not user_verified and not context.user_data.get('verified'):
             logger.info(f"User {update.effective_user.id} not verified, routing to verification for balance check")
-            db = get_db_session()
-            try:
-                db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-                await start_verification_process(update, context, db_user)
-            finally:
-                close_db_session(db)
+            await start_verification_process(update, context, db_user)
             return
         
         await handle_check_balance(update, context)
@@ -470,24 +399,15 @@ def setup_real_handlers(application) -> None:
     async def handle_withdraw_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle withdrawal menu with verification enforcement."""
         # Check verification first
-        db = get_db_session()
-        try:
-            db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-            user_verified = bool(
-                getattr(db_user, 'verification_completed', False)
-                or getattr(db_user, 'is_verified', False)
-            ) if db_user else False
-        finally:
-            close_db_session(db)
+        db_user = get_request_user(context, update.effective_user.id)
+        user_verified = bool(
+            getattr(db_user, 'verification_completed', False)
+            or getattr(db_user, 'is_verified', False)
+        ) if db_user else False
         
         if not user_verified and not context.user_data.get('verified'):
             logger.info(f"User {update.effective_user.id} not verified, routing to verification for withdrawal")
-            db = get_db_session()
-            try:
-                db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-                await start_verification_process(update, context, db_user)
-            finally:
-                close_db_session(db)
+            await start_verification_process(update, context, db_user)
             return
         
         await handle_withdraw_menu(update, context)
@@ -495,24 +415,15 @@ def setup_real_handlers(application) -> None:
     async def handle_withdrawal_history_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle withdrawal history with verification enforcement."""
         # Check verification first
-        db = get_db_session()
-        try:
-            db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-            user_verified = bool(
-                getattr(db_user, 'verification_completed', False)
-                or getattr(db_user, 'is_verified', False)
-            ) if db_user else False
-        finally:
-            close_db_session(db)
+        db_user = get_request_user(context, update.effective_user.id)
+        user_verified = bool(
+            getattr(db_user, 'verification_completed', False)
+            or getattr(db_user, 'is_verified', False)
+        ) if db_user else False
         
         if not user_verified and not context.user_data.get('verified'):
             logger.info(f"User {update.effective_user.id} not verified, routing to verification for withdrawal history")
-            db = get_db_session()
-            try:
-                db_user = UserService.get_user_by_telegram_id(db, update.effective_user.id)
-                await start_verification_process(update, context, db_user)
-            finally:
-                close_db_session(db)
+            await start_verification_process(update, context, db_user)
             return
         
         await handle_withdrawal_history(update, context)
@@ -525,29 +436,25 @@ def setup_real_handlers(application) -> None:
         """Handle language selection - allow without verification."""
         await handle_language_selection(update, context)
     
-    application.add_handler(CallbackQueryHandler(handle_check_balance_callback, pattern='^check_balance$'))
-    application.add_handler(CallbackQueryHandler(handle_withdraw_menu_callback, pattern='^withdraw_menu$'))
-    application.add_handler(CallbackQueryHandler(handle_withdrawal_history_callback, pattern='^withdrawal_history$'))
-    application.add_handler(CallbackQueryHandler(handle_language_menu_callback, pattern='^language_menu$'))
-    application.add_handler(CallbackQueryHandler(handle_language_selection_callback, pattern='^lang_(en|es|fr|de|ru|zh|hi|ar)$'))
-    
-    # Admin panel callback
-    async def handle_admin_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Route admin panel clicks to admin handlers."""
-        try:
-            from handlers.admin_handlers import handle_admin_panel
-            await handle_admin_panel(update, context)
-        except Exception as e:
-            logger.error(f"Error in admin panel: {e}")
-            if update.callback_query:
-                await update.callback_query.answer("❌ Error loading admin panel", show_alert=True)
-    
-    application.add_handler(CallbackQueryHandler(handle_admin_panel_callback, pattern='^admin_panel$'))
+    router.add('check_balance', handle_check_balance_callback)
+    router.add('withdraw_menu', handle_withdraw_menu_callback)
+    router.add('withdrawal_history', handle_withdrawal_history_callback)
+    router.add('language_menu', handle_language_menu_callback)
+    for language_code in ('en', 'es', 'fr', 'de', 'ru', 'zh', 'hi', 'ar'):
+        router.add(f'lang_{language_code}', handle_language_selection_callback)
     
     # Verification handlers
-    application.add_handler(CallbackQueryHandler(handle_start_verification, pattern='^start_verification$'))
-    application.add_handler(CallbackQueryHandler(handle_start_verification, pattern='^new_captcha$'))
-    application.add_handler(CallbackQueryHandler(show_real_main_menu, pattern='^real_main_menu$'))
+    router.add('start_verification', handle_start_verification)
+    router.add('new_captcha', handle_start_verification)
+    router.add('real_main_menu', show_real_main_menu)
+    
+    # Main menu buttons
+    router.add('balance', menu_button(handle_balance))
+    router.add('sales_history', menu_button(handle_sales_history))
+    router.add('how_it_works', menu_button(show_how_it_works))
+    router.add('2fa_help', menu_button(show_2fa_help))
+    router.add('cancel_sale', menu_button(cancel_sale))
+    router.add('view_user_{telegram_id:int}', menu_button(handle_view_user_details, verified_only=False))
     
     # ========================================
     # MESSAGE HANDLERS
@@ -560,12 +467,8 @@ def setup_real_handlers(application) -> None:
         text = update.message.text if update.message else ""
         
         # Check database for verification state
-        db = get_db_session()
-        try:
-            db_user = UserService.get_user_by_telegram_id(db, user.id)
-            user_in_verification = db_user and getattr(db_user, 'verification_step', 0) == 1 and db_user.captcha_answer
-        finally:
-            close_db_session(db)
+        db_user = get_request_user(context, user.id)
+        user_in_verification = db_user and getattr(db_user, 'verification_step', 0) == 1 and db_user.captcha_answer
         
         # Also check context as fallback
         context_verification = context.user_data.get('captcha_answer') and context.user_data.get('verification_step') == 1
@@ -577,11 +480,6 @@ def setup_real_handlers(application) -> None:
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, isolated_captcha_handler))
     logger.info("✅ CAPTCHA answer handler registered")
     
-    # ========================================
-    # GENERAL BUTTON CALLBACK (LAST)
-    # ========================================
-    application.add_handler(CallbackQueryHandler(button_callback))
-    
     # ========================================
     # LEADER AND ANALYTICS HANDLERS
     # ========================================
@@ -1,12 +1,13 @@
 """Reports and Logs handlers for comprehensive system monitoring."""
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database import get_db_session, close_db_session
 from database.operations import ActivityLogService, UserService
-from database.models import AccountSale, Withdrawal, TelegramAccount, User
-from sqlalchemy import func, and_
+from database.models import AccountSale, TelegramAccount, User
+from sqlalchemy import func, and_, case
+from database.rollups import load_rollups
 from utils.helpers import is_admin
 
 logger = logging.getLogger(__name__)
@@ -24,67 +25,47 @@ async def handle_admin_reports(update: Update, context: ContextTypes.DEFAULT_TYP
     
     db = get_db_session()
     try:
-        # Get real-time statistics from database
         now = datetime.now(timezone.utc)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = now - timedelta(days=7)
-        month_start = now - timedelta(days=30)
+        
+        # Signups, sales and withdrawals come from the daily rollups (O(days))
+        rollups = load_rollups(db)
+        signups = rollups.get('signups')
+        sales = rollups.get('sales')
+        withdrawals = rollups.get('withdrawals')
         
         # User statistics
-        total_users = db.query(func.count(User.id)).scalar() or 0
-        verified_users = db.query(func.count(User.id)).filter(User.verification_completed == True).scalar() or 0
-        today_users = db.query(func.count(User.id)).filter(User.created_at >= today_start).scalar() or 0
-        
-        # Account statistics
-        total_accounts = db.query(func.count(TelegramAccount.id)).scalar() or 0
-        available_accounts = db.query(func.count(TelegramAccount.id)).filter(
-            TelegramAccount.status == 'available'
-        ).scalar() or 0
-        sold_accounts = db.query(func.count(TelegramAccount.id)).filter(
-            TelegramAccount.status == 'sold'
-        ).scalar() or 0
-        frozen_accounts = db.query(func.count(TelegramAccount.id)).filter(
-            TelegramAccount.is_frozen == True
-        ).scalar() or 0
+        total_users = signups.count()
+        verified_users = rollups.get('verified_signups').count()
+        today_users = rollups.get('signups', 'today').count()
+        
+        # Account statistics - current inventory state in one pass
+        account_status = func.upper(TelegramAccount.status)
+        total_accounts, available_accounts, sold_accounts, frozen_accounts = db.query(
+            func.count(TelegramAccount.id),
+            func.sum(case((account_status == 'AVAILABLE', 1), else_=0)),
+            func.sum(case((account_status == 'SOLD', 1), else_=0)),
+            func.sum(case((TelegramAccount.is_frozen == True, 1), else_=0)),
+        ).one()
+        total_accounts = total_accounts or 0
+        available_accounts = available_accounts or 0
+        sold_accounts = sold_accounts or 0
+        frozen_accounts = frozen_accounts or 0
         
         # Sales statistics
-        total_sales = db.query(func.count(AccountSale.id)).scalar() or 0
-        today_sales = db.query(func.count(AccountSale.id)).filter(
-            AccountSale.created_at >= today_start
-        ).scalar() or 0
-        week_sales = db.query(func.count(AccountSale.id)).filter(
-            AccountSale.created_at >= week_start
-        ).scalar() or 0
-        month_sales = db.query(func.count(AccountSale.id)).filter(
-            AccountSale.created_at >= month_start
-        ).scalar() or 0
+        total_sales = sales.count()
+        today_sales = rollups.get('sales', 'today').count()
+        week_sales = rollups.get('sales', 'week').count()
+        month_sales = rollups.get('sales', 'month').count()
         
         # Revenue statistics
-        total_revenue = db.query(func.sum(AccountSale.sale_price)).scalar() or 0
-        today_revenue = db.query(func.sum(AccountSale.sale_price)).filter(
-            AccountSale.created_at >= today_start
-        ).scalar() or 0
-        week_revenue = db.query(func.sum(AccountSale.sale_price)).filter(
-            AccountSale.created_at >= week_start
-        ).scalar() or 0
-        month_revenue = db.query(func.sum(AccountSale.sale_price)).filter(
-            AccountSale.created_at >= month_start
-        ).scalar() or 0
+        total_revenue = sales.amount()
+        today_revenue = rollups.get('sales', 'today').amount()
+        week_revenue = rollups.get('sales', 'week').amount()
+        month_revenue = rollups.get('sales', 'month').amount()
         
         # Withdrawal statistics
-        pending_withdrawals = db.query(func.count(Withdrawal.id)).filter(
-            Withdrawal.status == 'PENDING'
-        ).scalar() or 0
-        total_withdrawn = db.query(func.sum(Withdrawal.amount)).filter(
-            Withdrawal.status == 'COMPLETED'
-        ).scalar() or 0
-        
-        # Recent activity count (last 24h)
-        activity_24h = db.query(func.count('*')).select_from(
-            db.query(1).select_from(db.query(1).table_class).filter(
-                db.query(1).table_class.created_at >= now - timedelta(hours=24)
-            ).subquery()
-        ).scalar() if hasattr(db.query(1), 'table_class') else 0
+        pending_withdrawals = withdrawals.count('PENDING')
+        total_withdrawn = withdrawals.amount('COMPLETED')
         
         text = f"""
 📊 **REPORTS & LOGS DASHBOARD**
@@ -320,32 +301,26 @@ async def handle_view_revenue_report(update: Update, context: ContextTypes.DEFAU
     
     db = get_db_session()
     try:
-        now = datetime.now(timezone.utc)
-        
-        # Get revenue by time periods
+        # Get revenue by time periods from the daily rollups
         periods = {
-            'Today': now.replace(hour=0, minute=0, second=0, microsecond=0),
-            'This Week': now - timedelta(days=7),
-            'This Month': now - timedelta(days=30),
-            'Last 3 Months': now - timedelta(days=90)
+            'Today': 1,
+            'This Week': 7,
+            'This Month': 30,
+            'Last 3 Months': 90
         }
+        rollups = load_rollups(db, periods, metrics=['sales'])
         
         revenue_data = {}
-        for period_name, start_date in periods.items():
-            revenue = db.query(func.sum(AccountSale.sale_price)).filter(
-                AccountSale.created_at >= start_date
-            ).scalar() or 0
-            sales_count = db.query(func.count(AccountSale.id)).filter(
-                AccountSale.created_at >= start_date
-            ).scalar() or 0
-            revenue_data[period_name] = {'revenue': revenue, 'count': sales_count}
-        
-        # Get average sale price
-        avg_price = db.query(func.avg(AccountSale.sale_price)).scalar() or 0
+        for period_name in periods:
+            period_sales = rollups.get('sales', period_name)
+            revenue_data[period_name] = {'revenue': period_sales.amount(), 'count': period_sales.count()}
         
         # Total revenue and sales
-        total_revenue = db.query(func.sum(AccountSale.sale_price)).scalar() or 0
-        total_sales = db.query(func.count(AccountSale.id)).scalar() or 0
+        total_revenue = rollups.get('sales').amount()
+        total_sales = rollups.get('sales').count()
+        
+        # Get average sale price
+        avg_price = total_revenue / total_sales if total_sales else 0
         
         text = f"""
 💵 **REVENUE REPORT**
@@ -17,7 +17,7 @@ from services.session_management import session_manager
 from services.telegram_logger import TelegramChannelLogger
 from services.session_distribution import session_distribution
 from utils.helpers import PhoneUtils
-from database import get_db_session, close_db_session
+from database import balance_ledger, get_db_session, close_db_session
 from database.operations import (
     UserService,
     TelegramAccountService,
@@ -507,8 +507,8 @@ async def start_real_processing(update, context) -> int:
         bonus_twofa = 5.0 if new_2fa_password else 0.0
         sale_price = round(base_price + change_count * bonus_per_change + bonus_twofa, 2)
 
-        # Update user balance and stats (handle None values)
-        db_user.balance = (db_user.balance or 0) + sale_price
+        # Credit the sale through the ledger, then update stats (handle None values)
+        balance_ledger.apply(db, db_user.id, sale_price, balance_ledger.SALE, note=f"Account {account.id}")
         db_user.total_accounts_sold = (db_user.total_accounts_sold or 0) + 1
         db_user.total_earnings = (db_user.total_earnings or 0) + sale_price
 
@@ -355,32 +355,44 @@ async def handle_toggle_channel_verification(update: Update, context: ContextTyp
 
 
 async def handle_clear_old_logs(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Clear activity logs older than 90 days."""
+    """Start a log retention run in the background and report when it finishes."""
     query = update.callback_query
-    await query.answer()
     
     user = update.effective_user
     if not is_admin(user.id):
+        await query.answer()
         return
     
-    db = get_db_session()
-    try:
-        from datetime import datetime, timedelta, timezone
-        from database.models import ActivityLog
-        
-        # Delete logs older than 90 days
-        cutoff_date = datetime.now(timezone.utc) - timedelta(days=90)
-        deleted = db.query(ActivityLog).filter(ActivityLog.created_at < cutoff_date).delete()
-        db.commit()
-        
-        await query.answer(f"✅ Deleted {deleted} old activity logs!", show_alert=True)
-        await handle_settings_maintenance(update, context)
-        
-    except Exception as e:
-        logger.error(f"Error clearing logs: {e}")
-        await query.answer(f"❌ Error: {str(e)}", show_alert=True)
-    finally:
-        close_db_session(db)
+    from database.log_retention import arun_log_retention, LOG_RETENTION_DAYS
+    
+    async def run_and_report():
+        try:
+            result = await arun_log_retention()
+        except Exception as e:
+            logger.error(f"Error clearing logs: {e}")
+            await context.bot.send_message(user.id, f"❌ Log cleanup failed: {e}")
+            return
+        if result.get('skipped'):
+            await context.bot.send_message(user.id, "ℹ️ A log cleanup is already running.")
+            return
+        
+        lines = [f"🧹 **Log cleanup finished** (older than {result['retention_days']} days)", ""]
+        archived = result['archived']
+        lines.append(f"• Archived: {archived['activity_logs']:,} activity logs")
+        for table, label in (('activity_logs', 'Activity logs'), ('session_logs', 'Session logs')):
+            stats = result[table]
+            if stats['mode'] == 'partitions':
+                lines.append(f"• {label}: {stats['dropped_partitions']} monthly partitions dropped")
+            else:
+                lines.append(f"• {label}: {stats['deleted_rows']:,} rows deleted")
+        await context.bot.send_message(user.id, "\n".join(lines), parse_mode='Markdown')
+    
+    # Large purges outlive a callback query, so the result arrives as a message
+    context.application.create_task(run_and_report())
+    await query.answer(
+        f"🧹 Cleaning logs older than {LOG_RETENTION_DAYS} days in the background. You'll get a message when it's done.",
+        show_alert=True
+    )
 
 
 async def handle_view_db_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
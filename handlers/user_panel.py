@@ -8,6 +8,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database import get_db_session, close_db_session
 from database.operations import UserService, TelegramAccountService
+from database.user_cache import get_cached_user
 from database.models import Withdrawal, WithdrawalStatus, User
 from services.translation_service import translation_service
 
@@ -31,7 +32,7 @@ async def handle_balance(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     db = get_db_session()
     
     try:
-        db_user = UserService.get_user_by_telegram_id(db, user.id)
+        db_user = get_cached_user(user.id, db)
         
         if not db_user:
             keyboard = [[InlineKeyboardButton("🔄 Restart Bot", callback_data="main_menu")]]
@@ -373,48 +373,23 @@ Now please join ALL required channels below:
 
 async def handle_verify_channels(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Verify user has joined all required channels."""
-    from services.captcha import VerificationTaskService
+    from services.channel_membership import membership_checker
+    from utils.runtime_settings import get_verification_channels
     
     query = update.callback_query
     await query.answer()
     
     user = update.effective_user
-    task_service = VerificationTaskService()
-    channels = task_service.get_required_channels()
+    channels = get_verification_channels()
     enforce_membership = os.getenv('ENFORCE_CHANNEL_MEMBERSHIP', 'false').lower() == 'true'
     
-    # Check membership in all channels
-    not_joined = []
-    for channel in channels:
-        channel_name = channel.get('name', 'Unnamed Channel')
-
-        # Determine the best identifier for the channel
-        chat_identifier = channel.get('id')
-        channel_username = channel.get('username')
-
-        if not chat_identifier and channel_username:
-            chat_identifier = f"@{channel_username.lstrip('@')}"
-
-        if not chat_identifier and channel.get('link'):
-            extracted_username = channel['link'].rstrip('/').split('/')[-1]
-            if extracted_username:
-                chat_identifier = f"@{extracted_username.lstrip('@')}"
-
-        if not chat_identifier:
-            logger.error(
-                "Channel configuration missing identifier for membership check: %s",
-                channel
-            )
-            not_joined.append(channel_name)
-            continue
-
-        try:
-            member = await context.bot.get_chat_member(chat_identifier, user.id)
-            if getattr(member, 'status', None) in ['left', 'kicked']:
-                not_joined.append(channel_name)
-        except Exception as e:
-            logger.error(f"Error checking membership in {channel_name}: {e}")
-            not_joined.append(channel_name)
+    # Check membership in all channels at once (cached and coalesced across taps)
+    memberships = await membership_checker.check_all(context.bot, user.id, channels)
+    not_joined = [
+        channel.get('name', 'Unnamed Channel')
+        for channel, joined in zip(channels, memberships)
+        if not joined
+    ]
     
     if not_joined and enforce_membership:
         # User hasn't joined all channels
@@ -6,7 +6,7 @@ import logging
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import get_db_session, close_db_session
+from database import balance_ledger, get_db_session, close_db_session
 from database.operations import UserService, ActivityLogService, WithdrawalService
 from database.models import Withdrawal, WithdrawalStatus, User
 from services.translation_service import translation_service
@@ -14,6 +14,14 @@ from services.translation_service import translation_service
 logger = logging.getLogger(__name__)
 
 
+def _conflict_text(db, withdrawal, open_statuses) -> str:
+    """Why a guarded transition was refused, from the row as it is now (after the rollback)."""
+    db.refresh(withdrawal)
+    if withdrawal.status in open_statuses:
+        return "❌ Another leader is reviewing this withdrawal."
+    return f"❌ Withdrawal already {withdrawal.status.lower()}."
+
+
 async def handle_approve_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle withdrawal approval by leaders."""
     query = update.callback_query
@@ -36,29 +44,18 @@ async def handle_approve_withdrawal(update: Update, context: ContextTypes.DEFAUL
             await query.edit_message_text("❌ Withdrawal not found.")
             return
         
-        if withdrawal.status != WithdrawalStatus.PENDING:
-            await query.edit_message_text(f"❌ Withdrawal already {withdrawal.status.value.lower()}.")
-            return
-        
-        # Get withdrawal user
-        withdrawal_user = UserService.get_user(db, withdrawal.user_id)
-        if not withdrawal_user:
-            await query.edit_message_text("❌ User not found.")
-            return
-        
-        # Check balance
-        if withdrawal_user.balance < withdrawal.amount:
+        # Approve and deduct in one guarded transaction
+        try:
+            balance_ledger.approve_withdrawal(db, withdrawal_id, db_user.id)
+        except balance_ledger.InsufficientBalance:
+            db.rollback()
             await query.edit_message_text("❌ Error: User has insufficient balance for this withdrawal.")
             return
-        
-        # Update withdrawal status
-        WithdrawalService.update_withdrawal_status(
-            db, withdrawal_id, WithdrawalStatus.LEADER_APPROVED,
-            admin_notes=f"Approved by {db_user.first_name}"
-        )
-        
-        # Deduct the amount from user's balance
-        UserService.update_balance(db, withdrawal_user.id, withdrawal_user.balance - withdrawal.amount)
+        except balance_ledger.WithdrawalConflict:
+            db.rollback()
+            await query.edit_message_text(_conflict_text(db, withdrawal, [WithdrawalStatus.PENDING]))
+            return
+        db.commit()
         
         # Refresh withdrawal object
         withdrawal = WithdrawalService.get_withdrawal(db, withdrawal_id)
@@ -142,15 +139,15 @@ async def handle_reject_withdrawal(update: Update, context: ContextTypes.DEFAULT
             await query.edit_message_text("❌ Withdrawal not found.")
             return
         
-        if withdrawal.status != WithdrawalStatus.PENDING:
-            await query.edit_message_text(f"❌ Withdrawal already {withdrawal.status.value.lower()}.")
+        try:
+            balance_ledger.reject_withdrawal(db, withdrawal_id, db_user.id)
+        except balance_ledger.WithdrawalConflict:
+            db.rollback()
+            await query.edit_message_text(
+                _conflict_text(db, withdrawal, [WithdrawalStatus.PENDING, WithdrawalStatus.APPROVED])
+            )
             return
-        
-        # Update withdrawal status
-        WithdrawalService.update_withdrawal_status(
-            db, withdrawal_id, WithdrawalStatus.REJECTED,
-            admin_notes=f"Rejected by {db_user.first_name}"
-        )
+        db.commit()
         
         # Get user who made the withdrawal
         withdrawal_user = UserService.get_user(db, withdrawal.user_id)
@@ -224,15 +221,19 @@ async def handle_mark_paid(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             await query.edit_message_text("❌ Withdrawal not found.")
             return
         
-        if withdrawal.status != WithdrawalStatus.LEADER_APPROVED:
-            await query.edit_message_text(f"❌ Withdrawal must be approved first. Current status: {withdrawal.status.value}")
+        # Refuses anything not approved, including a rejected (refunded) one
+        try:
+            balance_ledger.complete_withdrawal(db, withdrawal_id, db_user.id)
+        except balance_ledger.WithdrawalConflict:
+            db.rollback()
+            db.refresh(withdrawal)
+            if withdrawal.status == WithdrawalStatus.APPROVED:
+                await query.edit_message_text("❌ Another leader is reviewing this withdrawal.")
+            else:
+                await query.edit_message_text(f"❌ Withdrawal must be approved first. Current status: {withdrawal.status}")
             return
-        
-        # Update withdrawal status
-        WithdrawalService.update_withdrawal_status(
-            db, withdrawal_id, WithdrawalStatus.COMPLETED,
-            admin_notes=f"Payment completed by {db_user.first_name}"
-        )
+        withdrawal.admin_notes = f"Payment completed by {db_user.first_name}"
+        db.commit()
         
         # Get user who made the withdrawal
         withdrawal_user = UserService.get_user(db, withdrawal.user_id)
@@ -296,8 +297,8 @@ async def handle_view_user_details(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     user = update.effective_user
     
-    # Extract user telegram ID from callback data
-    user_telegram_id = int(query.data.split("_")[-1])
+    # From the view_user_{telegram_id} route
+    user_telegram_id = context.callback_args['telegram_id']
     
     db = get_db_session()
     try:
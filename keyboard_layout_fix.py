@@ -4,7 +4,7 @@ Provides main menu keyboard in the correct 2x2 grid format.
 """
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from utils.runtime_settings import get_support_settings
+from utils.runtime_settings import get_settings_snapshot
 
 
 def get_main_menu_keyboard(*, is_admin: bool = False) -> InlineKeyboardMarkup:
@@ -24,7 +24,7 @@ def get_main_menu_keyboard(*, is_admin: bool = False) -> InlineKeyboardMarkup:
     if is_admin:
         keyboard.append([InlineKeyboardButton("🔧 Admin Panel", callback_data="admin_panel")])
 
-    support = get_support_settings()
+    support = get_settings_snapshot().support
     support_label = support.get("main_button_label") or "💬 Support"
     support_url = support.get("main_button_url")
     if support_url:
@@ -1,12 +1,12 @@
 """
 Internationalization (i18n) utilities for the Telegram Account Bot.
 """
-import json
-import os
 import logging
 from typing import Dict, Any, Optional
 from database import get_db_session, close_db_session
 from database.operations import UserService
+from database.user_cache import get_cached_user, invalidate_user
+from locales.catalog import MessageCatalog, get_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -14,36 +14,25 @@ class LocaleManager:
     """Manages localization and translations."""
     
     def __init__(self):
-        self.messages = {}
         self.default_locale = 'en'
         self.supported_locales = ['en', 'es', 'ru']
+        self.catalog: MessageCatalog = None
         self._load_messages()
     
     def _load_messages(self):
-        """Load messages from JSON files."""
-        try:
-            messages_file = os.path.join(os.path.dirname(__file__), 'messages.json')
-            with open(messages_file, 'r', encoding='utf-8') as f:
-                self.messages = json.load(f)
-            logger.info(f"Loaded messages for locales: {list(self.messages.keys())}")
-        except Exception as e:
-            logger.error(f"Error loading messages: {e}")
-            # Fallback to empty dict
-            self.messages = {self.default_locale: {}}
+        """Compile messages from the JSON sources into the shared catalog."""
+        self.catalog = get_catalog()
+        logger.info(f"Loaded messages for locales: {self.catalog.locales}")
     
     def get_user_locale(self, telegram_user_id: int) -> str:
-        """Get user's preferred locale from database."""
+        """Get user's preferred locale (served from the user cache)."""
         try:
-            db = get_db_session()
-            try:
-                user = UserService.get_user_by_telegram_id(db, telegram_user_id)
-                if user and user.language_code:
-                    # Extract base language (e.g., 'en' from 'en-US')
-                    base_lang = user.language_code.split('-')[0].lower()
-                    if base_lang in self.supported_locales:
-                        return base_lang
-            finally:
-                close_db_session(db)
+            user = get_cached_user(telegram_user_id)
+            if user and user.language_code:
+                # Extract base language (e.g., 'en' from 'en-US')
+                base_lang = user.language_code.split('-')[0].lower()
+                if base_lang in self.supported_locales:
+                    return base_lang
         except Exception as e:
             logger.warning(f"Error getting user locale: {e}")
         
@@ -51,38 +40,18 @@ class LocaleManager:
     
     def get_message(self, key: str, locale: str = None, **kwargs) -> str:
         """Get localized message."""
-        if locale is None:
-            locale = self.default_locale
-        
-        if locale not in self.messages:
-            locale = self.default_locale
-        
-        # Support nested keys like 'buttons.lfg'
-        keys = key.split('.')
-        message = self.messages.get(locale, {})
-        
-        for k in keys:
-            if isinstance(message, dict) and k in message:
-                message = message[k]
-            else:
-                # Fallback to English if key not found
-                message = self.messages.get(self.default_locale, {})
-                for k in keys:
-                    if isinstance(message, dict) and k in message:
-                        message = message[k]
-                    else:
-                        return f"Missing translation: {key}"
-                break
-        
-        if not isinstance(message, str):
-            return f"Invalid translation: {key}"
+        # Templates were flattened, pre-parsed and backfilled with English at load time
+        template = self.catalog.get(key, locale)
+        if template is None:
+            if self.catalog.is_section(key):
+                return f"Invalid translation: {key}"
+            return f"Missing translation: {key}"
         
-        # Format with kwargs if provided
         try:
-            return message.format(**kwargs)
+            return template.render(kwargs)
         except KeyError as e:
             logger.warning(f"Missing format parameter {e} for key {key}")
-            return message
+            return template.source
     
     def get_user_message(self, telegram_user_id: int, key: str, **kwargs) -> str:
         """Get localized message for specific user."""
@@ -104,6 +73,7 @@ class LocaleManager:
                         {'language_code': locale}
                     )
                     db.commit()
+                    invalidate_user(telegram_user_id)
                     logger.info(f"Set locale {locale} for user {telegram_user_id}")
                     return True
             finally:
@@ -0,0 +1,48 @@
+"""
+Micro-benchmark: compiled catalog lookups vs. walking the nested JSON and
+calling ``str.format`` on every render.
+
+Run with ``python -m locales.benchmark [iterations]``.
+"""
+import json
+import os
+import sys
+import timeit
+
+from locales.catalog import LOCALES_DIR, MessageCatalog
+
+
+def _legacy_get(messages, key, locale, **kwargs):
+    """The pre-catalog lookup: nested walk, English fallback, format each time."""
+    node = messages.get(locale, messages['en'])
+    for part in key.split('.'):
+        node = node.get(part) if isinstance(node, dict) else None
+        if node is None:
+            break
+    if node is None:
+        node = messages['en']
+        for part in key.split('.'):
+            node = node.get(part, {})
+    return node.format(**kwargs)
+
+
+def main(iterations: int = 200000) -> None:
+    with open(os.path.join(LOCALES_DIR, 'messages.json'), 'r', encoding='utf-8') as f:
+        messages = json.load(f)
+    catalog = MessageCatalog.load()
+
+    cases = [
+        ('nested', 'buttons.lfg', 'ru', {}),
+        ('placeholder', 'welcome_message', 'es', {'name': 'Ana'}),
+        ('count', 'accounts_title', 'en', {'count': 3}),
+    ]
+
+    print(f"{'case':<12} {'legacy/s':>12} {'catalog/s':>12} {'speedup':>8}")
+    for label, key, locale, kwargs in cases:
+        legacy = timeit.timeit(lambda: _legacy_get(messages, key, locale, **kwargs), number=iterations)
+        compiled = timeit.timeit(lambda: catalog.get(key, locale).render(kwargs), number=iterations)
+        print(f"{label:<12} {iterations / legacy:>12,.0f} {iterations / compiled:>12,.0f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
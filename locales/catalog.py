@@ -0,0 +1,206 @@
+"""
+Compiled translation catalog shared by LocaleManager and TranslationService.
+
+At load time every source file is flattened into dotted keys, each string is
+pre-parsed into a template, and every locale table is filled with the default
+locale's templates for keys it lacks. Lookups at runtime are a single dict
+probe per locale; consistency problems (missing keys, placeholder mismatches,
+malformed templates) are collected and logged once when the catalog loads.
+"""
+import json
+import logging
+import os
+from string import Formatter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCALES_DIR = os.path.dirname(__file__)
+
+# (file name, key namespace) - 'ui' holds the button/menu strings used by TranslationService
+CATALOG_SOURCES: List[Tuple[str, str]] = [
+    ('messages.json', ''),
+    ('interface.json', 'ui'),
+]
+
+_formatter = Formatter()
+
+
+class CompiledTemplate:
+    """A message string parsed once into literal and placeholder parts."""
+
+    __slots__ = ('source', 'fields', '_parts', '_static', '_simple')
+
+    def __init__(self, source: str):
+        self.source = source
+        parts: List[Any] = []
+        fields = set()
+        simple = True
+        for literal, field_name, format_spec, conversion in _formatter.parse(source):
+            if literal:
+                parts.append(literal)
+            if field_name is None:
+                continue
+            fields.add(field_name)
+            if not field_name.isidentifier() or conversion or '{' in (format_spec or ''):
+                simple = False
+            parts.append((field_name, format_spec or ''))
+
+        self.fields: FrozenSet[str] = frozenset(fields)
+        self._parts = tuple(parts)
+        self._simple = simple
+        # Templates without placeholders render to a constant
+        self._static = ''.join(parts) if not fields else None
+
+    def render(self, kwargs: Dict[str, Any]) -> str:
+        """Substitute ``kwargs``; raises KeyError like ``str.format``."""
+        if self._static is not None:
+            return self._static
+        if not self._simple:
+            return self.source.format(**kwargs)
+        out = []
+        for part in self._parts:
+            if part.__class__ is str:
+                out.append(part)
+            else:
+                name, spec = part
+                out.append(format(kwargs[name], spec))
+        return ''.join(out)
+
+
+class MessageCatalog:
+    """Flat per-locale tables of compiled templates."""
+
+    def __init__(self, default_locale: str = 'en'):
+        self.default_locale = default_locale
+        self.tables: Dict[str, Dict[str, CompiledTemplate]] = {}
+        self.sections: FrozenSet[str] = frozenset()
+        self.problems: List[str] = []
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, sources: List[Tuple[str, str]] = None, default_locale: str = 'en') -> 'MessageCatalog':
+        """Read the JSON sources from the locales directory and compile them."""
+        trees: List[Tuple[Dict[str, Any], str]] = []
+        for file_name, namespace in sources or CATALOG_SOURCES:
+            path = os.path.join(LOCALES_DIR, file_name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    trees.append((json.load(f), namespace))
+            except Exception as e:
+                logger.error(f"Error loading translation source {file_name}: {e}")
+        return cls.compile(trees, default_locale)
+
+    @classmethod
+    def compile(cls, trees: List[Tuple[Dict[str, Any], str]], default_locale: str = 'en') -> 'MessageCatalog':
+        """Build a catalog from ``(locale -> nested dict, namespace)`` pairs."""
+        catalog = cls(default_locale)
+        raw: Dict[str, Dict[str, str]] = {}
+        sections = set()
+
+        for tree, namespace in trees:
+            prefix = f"{namespace}." if namespace else ''
+            if namespace:
+                sections.add(namespace)
+            for locale, messages in tree.items():
+                flat = raw.setdefault(locale, {})
+                cls._flatten(messages, prefix, flat, sections)
+
+        raw.setdefault(default_locale, {})
+        for locale, flat in raw.items():
+            table = {}
+            for key, text in flat.items():
+                try:
+                    table[key] = CompiledTemplate(text)
+                except ValueError as e:
+                    catalog.problems.append(f"{locale}:{key}: malformed template ({e})")
+                    table[key] = CompiledTemplate(text.replace('{', '{{').replace('}', '}}'))
+            catalog.tables[locale] = table
+
+        catalog.sections = frozenset(sections)
+        catalog._validate()
+        catalog._fill_fallbacks()
+        return catalog
+
+    @staticmethod
+    def _flatten(tree: Dict[str, Any], prefix: str, out: Dict[str, str], sections: set) -> None:
+        for key, value in tree.items():
+            dotted = f"{prefix}{key}"
+            if isinstance(value, dict):
+                sections.add(dotted)
+                MessageCatalog._flatten(value, f"{dotted}.", out, sections)
+            else:
+                out[dotted] = value
+
+    def _validate(self) -> None:
+        """Record keys missing per locale and placeholder mismatches."""
+        reference = self.tables[self.default_locale]
+        for locale, table in self.tables.items():
+            if locale == self.default_locale:
+                continue
+            missing = sorted(set(reference) - set(table))
+            if missing:
+                self.problems.append(
+                    f"{locale}: {len(missing)} keys fall back to '{self.default_locale}' "
+                    f"(e.g. {', '.join(missing[:5])})"
+                )
+            for key in sorted(set(table) - set(reference)):
+                self.problems.append(f"{locale}:{key}: not defined for '{self.default_locale}'")
+            for key, template in table.items():
+                expected = reference.get(key)
+                if expected is not None and template.fields != expected.fields:
+                    self.problems.append(
+                        f"{locale}:{key}: placeholders {sorted(template.fields)} "
+                        f"!= {sorted(expected.fields)} in '{self.default_locale}'"
+                    )
+
+    def _fill_fallbacks(self) -> None:
+        """Copy default-locale templates into locales that lack them."""
+        reference = self.tables[self.default_locale]
+        for locale, table in self.tables.items():
+            if locale != self.default_locale:
+                for key, template in reference.items():
+                    table.setdefault(key, template)
+
+    def report(self) -> None:
+        """Log load-time consistency problems once."""
+        if self.problems:
+            logger.warning(f"Translation catalog has {len(self.problems)} issue(s):")
+            for problem in self.problems:
+                logger.warning(f"  {problem}")
+        logger.info(
+            f"Translation catalog compiled: {len(self.tables)} locales, "
+            f"{len(self.tables[self.default_locale])} keys"
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, locale: Optional[str] = None) -> Optional[CompiledTemplate]:
+        """Return the compiled template (with default-locale fallback) or ``None``."""
+        table = self.tables.get(locale) or self.tables[self.default_locale]
+        return table.get(key)
+
+    def is_section(self, key: str) -> bool:
+        """True when ``key`` names a group of messages rather than a string."""
+        return key in self.sections
+
+    @property
+    def locales(self) -> List[str]:
+        return list(self.tables)
+
+
+_catalog: Optional[MessageCatalog] = None
+
+
+def get_catalog() -> MessageCatalog:
+    """Shared catalog, compiled (and validated) on first use."""
+    global _catalog
+    if _catalog is None:
+        _catalog = MessageCatalog.load()
+        _catalog.report()
+    return _catalog
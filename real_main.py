@@ -5,6 +5,7 @@ Uses actual Telethon integration for real account operations
 import asyncio
 import logging
 import os
+import signal
 from telegram import Update
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 from handlers import setup_all_handlers  # Unified handler entry point
@@ -20,6 +21,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def serve_webhook(application: Application, webhook_url: str, secret_token: str) -> None:
+    """Run the bot on webhook updates until SIGINT/SIGTERM (same lifecycle as run_polling)."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C cancels the run instead
+    
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=webhook_url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+        )
+        await application.start()
+        await stop.wait()
+    finally:
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
 def main():
     """Main function to run the real account selling bot."""
     # Get bot token
@@ -57,26 +86,84 @@ def main():
             logger.error(".env file not found! API credentials required!")
             return
     
-    # Start WebApp server for embedded forms
-    from webapp.server import start_webapp_server
-    if start_webapp_server():
-        logger.info("WebApp server started for embedded forms")
-    else:
-        logger.error("Failed to start WebApp server")
-        return
+    # One aiohttp server on the bot's event loop serves the WebApp forms and,
+    # in webhook mode (WEBHOOK_URL set), receives Telegram updates
+    from webapp.async_server import AsyncWebServer, create_web_app, derive_secret_token, WEBHOOK_PATH
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    webhook_secret = os.getenv('WEBHOOK_SECRET') or derive_secret_token(BOT_TOKEN)
+    web_server = AsyncWebServer()
     
     # Create application with job queue enabled
     from telegram.ext import JobQueue
-    application = (
+    from database import dispose_async_engine
+    
+    async def shutdown_database(app):
+        """Release pooled async database connections on shutdown."""
+        await dispose_async_engine()
+    
+    async def resume_broadcasts(app):
+        """Continue admin broadcasts interrupted by the last shutdown (or held by a dead process)."""
+        from services.broadcast import broadcast_engine
+        broadcast_engine.attach(app.bot)
+        resumed = await broadcast_engine.resume_unfinished()
+        if resumed:
+            logger.info(f"Resumed {len(resumed)} interrupted broadcast(s): {resumed}")
+    
+    async def start_background_workers(app):
+        """Start the HTTP server, log partitions, activity log writer, outbox worker, expiry scheduler, settings feed and CAPTCHA pool, then resume broadcasts."""
+        await web_server.start(create_web_app(app if WEBHOOK_URL else None, webhook_secret))
+        from database.log_retention import prepare_log_partitions
+        await asyncio.to_thread(prepare_log_partitions)
+        from utils.activity_log_writer import activity_log_writer
+        activity_log_writer.start()
+        from utils.notification_outbox import outbox_worker
+        outbox_worker.attach(app.bot)
+        outbox_worker.start()
+        # Timed freezes and holds end at their deadline
+        from services.expiry_scheduler import expiry_scheduler
+        expiry_scheduler.start()
+        # Settings written by other processes drop this process's cached copies
+        from database.settings_feed import settings_feed
+        settings_feed.start()
+        # Pre-render CAPTCHAs in worker processes before the first /start arrives
+        from services.captcha_pool import captcha_pool
+        captcha_pool.start()
+        await resume_broadcasts(app)
+    
+    async def stop_background_workers(app):
+        """Stop taking updates, then let the outbox worker finish while the bot can still send."""
+        await web_server.stop()
+        from services.captcha_pool import captcha_pool
+        await captcha_pool.stop()
+        from database.settings_feed import settings_feed
+        await settings_feed.stop()
+        from services.expiry_scheduler import expiry_scheduler
+        await expiry_scheduler.stop()
+        from utils.notification_outbox import outbox_worker
+        await outbox_worker.stop()
+        from utils.activity_log_writer import activity_log_writer
+        await activity_log_writer.stop()
+    
+    # Updates from different users run in parallel; each user's stay in order
+    from utils.update_processor import OrderedUpdateProcessor
+    update_processor = OrderedUpdateProcessor()
+    
+    builder = (
         Application.builder()
         .token(BOT_TOKEN)
         .job_queue(JobQueue())  # Explicitly enable job queue
-        .build()
+        .concurrent_updates(update_processor)
+        .post_init(start_background_workers)
+        .post_stop(stop_background_workers)
+        .post_shutdown(shutdown_database)
     )
+    if WEBHOOK_URL:
+        builder = builder.updater(None)  # Updates arrive through the HTTP server
+    application = builder.build()
     
     # Initialize notification service
     from utils.notification_service import initialize_notification_service
-    notification_service = initialize_notification_service(application.bot)
+    initialize_notification_service(application.bot)
     logger.info("Notification service initialized")
     
     # Initialize proxy refresh scheduler
@@ -87,43 +174,77 @@ def main():
     except Exception as e:
         logger.warning(f"Failed to start proxy scheduler: {e}")
     
-    # Add scheduled job for freeze expiry checks (runs every hour)
-    from services.account_management import account_manager
-    from database import get_db_session, close_db_session
+    job_queue = application.job_queue
+    
+    # Keep daily_stats rollups current for the reports/analytics dashboards
+    from database.rollups import refresh_rollups, ROLLUP_REFRESH_SECONDS
     
-    async def check_expired_freezes_job(context):
-        """Background job to check and release expired account freezes"""
+    async def refresh_rollups_job(context):
+        """Background job to recompute dirty days of the daily rollups"""
         try:
-            db = get_db_session()
-            try:
-                result = account_manager.check_and_release_expired_freezes(db)
-                if result['released_count'] > 0:
-                    logger.info(f"Auto-released {result['released_count']} expired frozen accounts")
-                    
-                    # Send notifications for unfrozen accounts
-                    for account_info in result.get('released_accounts', []):
-                        try:
-                            # Get account owner's telegram ID
-                            from database.operations import TelegramAccountService
-                            account = TelegramAccountService.get_account_by_id(db, account_info['account_id'])
-                            if account and account.user:
-                                await notification_service.notify_account_unfrozen(
-                                    user_telegram_id=account.user.telegram_user_id,
-                                    phone_number=account.phone_number,
-                                    unfreeze_reason="Freeze period expired - automatic release"
-                                )
-                        except Exception as e:
-                            logger.error(f"Error sending unfreeze notification: {e}")
-            finally:
-                close_db_session(db)
+            # Backfill on an empty table can scan history; keep it off the event loop
+            result = await asyncio.to_thread(refresh_rollups)
+            if result['rebuilt']:
+                logger.info(f"Backfilled daily rollups: {result['rows']} rows")
         except Exception as e:
-            logger.error(f"Error in freeze expiry check job: {e}")
+            logger.error(f"Error in rollup refresh job: {e}")
     
-    # Schedule the job to run every hour
-    job_queue = application.job_queue
-    job_queue.run_repeating(check_expired_freezes_job, interval=3600, first=10)
-    logger.info("Scheduled hourly freeze expiry check job")
+    job_queue.run_repeating(refresh_rollups_job, interval=ROLLUP_REFRESH_SECONDS, first=5)
+    logger.info(f"Scheduled rollup refresh job every {ROLLUP_REFRESH_SECONDS}s")
+    
+    async def log_update_processor_stats(context):
+        """Background job to report update queue depth and wait times"""
+        stats = update_processor.stats()
+        if stats['processed']:
+            logger.info(
+                f"Updates: {stats['running']} running, {stats['queued']} queued, "
+                f"{stats['processed']} processed; wait p50 {stats['wait_p50_ms']}ms, "
+                f"p95 {stats['wait_p95_ms']}ms, max {stats['wait_max_ms']}ms"
+            )
     
+    job_queue.run_repeating(log_update_processor_stats, interval=300, first=300)
+    
+    # Drop (or purge in chunks) log rows past their retention
+    from database.log_retention import arun_log_retention, LOG_RETENTION_INTERVAL
+    
+    async def log_retention_job(context):
+        """Background job to enforce activity/session log retention"""
+        try:
+            await arun_log_retention()
+        except Exception as e:
+            logger.error(f"Error in log retention job: {e}")
+    
+    job_queue.run_repeating(log_retention_job, interval=LOG_RETENTION_INTERVAL, first=600)
+    logger.info(f"Scheduled log retention job every {LOG_RETENTION_INTERVAL}s")
+
+    # Checkpoint the balance ledger so rebuilding a balance stays cheap
+    from database.balance_ledger import take_snapshots, BALANCE_SNAPSHOT_INTERVAL
+
+    async def balance_snapshot_job(context):
+        """Background job to snapshot users whose ledger moved"""
+        try:
+            taken = await asyncio.to_thread(take_snapshots)
+            if taken:
+                logger.info(f"Balance snapshots taken for {taken} users")
+        except Exception as e:
+            logger.error(f"Error in balance snapshot job: {e}")
+
+    job_queue.run_repeating(balance_snapshot_job, interval=BALANCE_SNAPSHOT_INTERVAL, first=900)
+    logger.info(f"Scheduled balance snapshot job every {BALANCE_SNAPSHOT_INTERVAL}s")
+
+    # Take over broadcasts whose sending process died once their lease runs out
+    from services.broadcast import BROADCAST_LEASE_SECONDS
+
+    async def broadcast_takeover_job(context):
+        """Background job to resume broadcasts abandoned by another process"""
+        try:
+            await resume_broadcasts(context.application)
+        except Exception as e:
+            logger.error(f"Error in broadcast takeover job: {e}")
+
+    job_queue.run_repeating(broadcast_takeover_job, interval=BROADCAST_LEASE_SECONDS, first=BROADCAST_LEASE_SECONDS)
+    logger.info(f"Scheduled broadcast takeover job every {BROADCAST_LEASE_SECONDS}s")
+
     # Register all bot handlers through unified entry point
     setup_all_handlers(application)
     
@@ -135,7 +256,12 @@ def main():
     
     # Run the bot
     try:
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if WEBHOOK_URL:
+            webhook_url = WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH
+            logger.info(f"Receiving updates via webhook at {webhook_url}")
+            asyncio.run(serve_webhook(application, webhook_url, webhook_secret))
+        else:
+            application.run_polling(allowed_updates=Update.ALL_TYPES)
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
     finally:
@@ -5,11 +5,14 @@ Handles freezing/unfreezing accounts, checking freeze status, and logging action
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from database.models import TelegramAccount, User, AccountStatus, ActivityLog
 from database import get_db_session, close_db_session
 from database.operations import ActivityLogService
+from utils.notification_outbox import enqueue_many
+from utils.notification_service import format_account_unfrozen
 import json
 
 logger = logging.getLogger(__name__)
@@ -62,6 +65,7 @@ class AccountManagementService:
             account.frozen_by_admin_id = admin_id
             account.freeze_timestamp = datetime.utcnow()
             account.freeze_duration_hours = duration_hours
+            account.freeze_until = account.freeze_timestamp + timedelta(hours=duration_hours) if duration_hours else None
             account.updated_at = datetime.utcnow()
             
             # Get admin info for logging
@@ -86,6 +90,10 @@ class AccountManagementService:
             
             db.commit()
             
+            if account.freeze_until:
+                from services.expiry_scheduler import expiry_scheduler
+                expiry_scheduler.schedule('freeze', account_id, account.freeze_until)
+            
             logger.info(f"Account {account_id} ({account.phone_number}) frozen by admin {admin_id}")
             
             expiry_text = f"{duration_hours} hours" if duration_hours else "indefinite"
@@ -161,6 +169,7 @@ class AccountManagementService:
             account.frozen_by_admin_id = None
             account.freeze_timestamp = None
             account.freeze_duration_hours = None
+            account.freeze_until = None
             account.updated_at = datetime.utcnow()
             
             # Get admin info for logging
@@ -239,9 +248,8 @@ class AccountManagementService:
             if is_frozen:
                 # Calculate remaining freeze time
                 remaining_hours = None
-                if account.freeze_duration_hours and account.freeze_timestamp:
-                    freeze_end = account.freeze_timestamp + timedelta(hours=account.freeze_duration_hours)
-                    remaining = freeze_end - datetime.utcnow()
+                if account.freeze_until:
+                    remaining = account.freeze_until - datetime.utcnow()
                     remaining_hours = max(0, remaining.total_seconds() / 3600)
                 
                 result.update({
@@ -287,68 +295,87 @@ class AccountManagementService:
             return []
     
     @staticmethod
-    def check_and_release_expired_freezes(db: Session) -> Dict[str, Any]:
+    def check_and_release_expired_freezes(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
         """
-        Check for accounts with expired freeze durations and automatically release them.
+        Release every account whose timed freeze has expired.
         
         Args:
             db: Database session
+            now: Release freezes that ended at or before this time (default: now)
         
         Returns:
-            Dict with count of released accounts
-        """
-        released_count = 0
-        errors = []
+            Dict with count and details of released accounts
         
+        Due accounts (and their owners) are read in one indexed query and
+        released with one bulk UPDATE; the releases and their owner notices
+        (queued in the outbox) commit together. Each notice carries a
+        per-freeze dedup key so a re-run never queues it twice.
+        """
+        now = now or datetime.utcnow()
         try:
-            # Find accounts that are frozen with a duration that has expired
-            frozen_accounts = db.query(TelegramAccount).filter(
-                TelegramAccount.status == AccountStatus.FROZEN,
-                TelegramAccount.freeze_duration_hours.isnot(None),
-                TelegramAccount.freeze_timestamp.isnot(None)
+            due = db.execute(
+                select(
+                    TelegramAccount.id, TelegramAccount.phone_number, TelegramAccount.seller_id,
+                    TelegramAccount.freeze_timestamp, TelegramAccount.freeze_reason, User.telegram_user_id,
+                )
+                .outerjoin(User, User.id == TelegramAccount.seller_id)
+                .where(TelegramAccount.status == AccountStatus.FROZEN, TelegramAccount.freeze_until <= now)
+                .with_for_update(of=TelegramAccount, skip_locked=True)
             ).all()
+            if not due:
+                db.rollback()
+                return {'success': True, 'released_count': 0, 'released_accounts': [], 'errors': []}
             
-            for account in frozen_accounts:
-                try:
-                    freeze_end = account.freeze_timestamp + timedelta(hours=account.freeze_duration_hours)
-                    
-                    if datetime.utcnow() >= freeze_end:
-                        # Freeze period expired, release account
-                        account.status = AccountStatus.AVAILABLE
-                        account.can_be_sold = True
-                        old_reason = account.freeze_reason
-                        account.freeze_reason = None
-                        account.frozen_by_admin_id = None
-                        account.freeze_timestamp = None
-                        account.freeze_duration_hours = None
-                        account.updated_at = datetime.utcnow()
-                        
-                        # Log auto-release
-                        ActivityLogService.log_action(
-                            db=db,
-                            user_id=account.seller_id,
-                            action_type="ACCOUNT_AUTO_UNFROZEN",
-                            description=f"Account {account.phone_number} automatically unfrozen after freeze period expired",
-                            extra_data=json.dumps({
-                                'account_id': account.id,
-                                'account_phone': account.phone_number,
-                                'previous_freeze_reason': old_reason
-                            })
-                        )
-                        
-                        released_count += 1
-                        logger.info(f"Auto-released account {account.id} ({account.phone_number}) after freeze expiry")
-                        
-                except Exception as e:
-                    errors.append(f"Error releasing account {account.id}: {str(e)}")
-                    logger.error(f"Error releasing account {account.id}: {e}")
+            # RETURNING skips rows an admin unfroze since the read
+            released_ids = set(db.execute(
+                update(TelegramAccount)
+                .where(TelegramAccount.id.in_([row.id for row in due]),
+                       TelegramAccount.status == AccountStatus.FROZEN)
+                .values(
+                    status=AccountStatus.AVAILABLE, can_be_sold=True, freeze_reason=None,
+                    frozen_by_admin_id=None, freeze_timestamp=None, freeze_duration_hours=None,
+                    freeze_until=None, updated_at=now,
+                )
+                .returning(TelegramAccount.id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+            
+            released_accounts = []
+            for row in due:
+                if row.id not in released_ids:
+                    continue
+                released_accounts.append({
+                    'account_id': row.id,
+                    'phone_number': row.phone_number,
+                    'seller_id': row.seller_id,
+                    'owner_telegram_id': row.telegram_user_id,
+                    'freeze_timestamp': row.freeze_timestamp,
+                })
+                ActivityLogService.log_action(
+                    db=db,
+                    user_id=row.seller_id,
+                    action_type="ACCOUNT_AUTO_UNFROZEN",
+                    description=f"Account {row.phone_number} automatically unfrozen after freeze period expired",
+                    extra_data=json.dumps({
+                        'account_id': row.id,
+                        'account_phone': row.phone_number,
+                        'previous_freeze_reason': row.freeze_reason
+                    })
+                )
+            
+            if released_accounts:
+                AccountManagementService._queue_unfreeze_notifications(db, released_accounts)
             
             db.commit()
             
+            if released_accounts:
+                logger.info(f"Auto-released {len(released_accounts)} account(s) after freeze expiry: "
+                            f"{[info['account_id'] for info in released_accounts]}")
             return {
                 'success': True,
-                'released_count': released_count,
-                'errors': errors
+                'released_count': len(released_accounts),
+                'released_accounts': released_accounts,
+                'errors': []
             }
             
         except Exception as e:
@@ -361,6 +388,23 @@ class AccountManagementService:
                 'errors': [str(e)]
             }
 
+    @staticmethod
+    def _queue_unfreeze_notifications(db: Session, released_accounts: List[Dict[str, Any]]) -> int:
+        """Queue one unfreeze notice per released account (owner ids come with the release)."""
+        messages = []
+        for info in released_accounts:
+            chat_id = info['owner_telegram_id']
+            if not chat_id:
+                continue
+            frozen_at = info['freeze_timestamp']
+            messages.append({
+                'chat_id': chat_id,
+                'text': format_account_unfrozen(info['phone_number'], "Freeze period expired - automatic release"),
+                # One notice per freeze, even if the job re-runs after a crash
+                'dedup_key': f"account_unfrozen:{info['account_id']}:{frozen_at:%Y%m%d%H%M%S}",
+            })
+        return enqueue_many(db, messages)
+
 # Global instance
 account_manager = AccountManagementService()
 
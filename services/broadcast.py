@@ -0,0 +1,404 @@
+"""
+Broadcast Engine
+Sends admin announcements to large audiences without holding a DB session.
+
+Every broadcast is a persistent ``BroadcastJob`` row. Recipients are streamed
+from ``users`` in keyset pages (``id > cursor ORDER BY id``), each page is sent
+by a pool of concurrent senders behind the shared Telegram rate limiter, and
+the cursor plus counters are checkpointed after every page. Jobs left RUNNING
+by a restart are resumed from their cursor, so at most one page is re-sent.
+
+A process sends a job only after claiming it with a conditional UPDATE that
+records it as ``owner`` with a lease (``lease_expires_at``), renewed while it
+sends. Other processes skip the job until the lease runs out, so a second
+bot or a rolling deploy never sends the remaining recipients twice; a job
+whose process died is taken over by the next ``resume_unfinished`` sweep.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, update
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from database import db_session
+from database.models import BroadcastJob, User
+from utils.rate_limiter import TelegramRateLimiter, retry_after_seconds, telegram_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', '200'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
+BROADCAST_MAX_ATTEMPTS = 5
+BROADCAST_LEASE_SECONDS = int(os.getenv('BROADCAST_LEASE_SECONDS', '120'))
+
+TARGET_DESCRIPTIONS = {
+    'all': 'all users',
+    'active': 'active users',
+    'frozen': 'frozen users',
+    'leaders': 'leaders',
+}
+
+FINISHED_STATUSES = ('COMPLETED', 'CANCELLED', 'FAILED')
+UNFINISHED_STATUSES = ('PENDING', 'RUNNING')
+
+
+def recipient_filter(target: str):
+    """WHERE clause selecting the users a broadcast target addresses."""
+    if target == 'all':
+        return User.telegram_user_id.isnot(None)
+    if target == 'active':
+        return User.status == 'ACTIVE'
+    if target == 'frozen':
+        return User.status == 'FROZEN'
+    if target == 'leaders':
+        return User.is_leader == True
+    raise ValueError(f"Unknown broadcast target: {target}")
+
+
+def format_announcement(message: str) -> str:
+    return f"📢 **System Announcement**\n\n{message}"
+
+
+class BroadcastEngine:
+    """Runs BroadcastJob rows to completion, one asyncio task per job."""
+
+    def __init__(self, bot: Bot = None, limiter: TelegramRateLimiter = None,
+                 concurrency: int = None, page_size: int = None, progress_interval: float = None,
+                 lease_seconds: float = None):
+        self.bot = bot
+        self.limiter = limiter or telegram_rate_limiter
+        self.concurrency = concurrency or BROADCAST_CONCURRENCY
+        self.page_size = page_size or BROADCAST_PAGE_SIZE
+        self.progress_interval = BROADCAST_PROGRESS_INTERVAL if progress_interval is None else progress_interval
+        self.lease_seconds = BROADCAST_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.owner = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def attach(self, bot: Bot) -> None:
+        """Set the bot used for sending (first caller wins)."""
+        if self.bot is None:
+            self.bot = bot
+
+    # ------------------------------------------------------------------
+    # Job lifecycle
+    # ------------------------------------------------------------------
+
+    async def create_job(self, created_by: int, target: str, message: str,
+                         progress_chat_id: int = None, progress_message_id: int = None) -> int:
+        """Persist a new broadcast and return its id."""
+        recipient_filter(target)  # Validate before storing
+        async with db_session() as db:
+            job = BroadcastJob(
+                created_by=created_by, target=target, message=message, status='PENDING',
+                progress_chat_id=progress_chat_id, progress_message_id=progress_message_id,
+            )
+            db.add(job)
+            await db.commit()
+            return job.id
+
+    def start(self, job_id: int) -> asyncio.Task:
+        """Run a job in the background (no-op if it is already running here)."""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self.run(job_id), name=f"broadcast-{job_id}")
+            self._tasks[job_id] = task
+            task.add_done_callback(lambda t: self._tasks.pop(job_id, None))
+        return task
+
+    async def cancel(self, job_id: int) -> bool:
+        """Mark a job cancelled; the sender stops after its current page."""
+        async with db_session() as db:
+            job = await db.get(BroadcastJob, job_id)
+            if not job or job.status in FINISHED_STATUSES:
+                return False
+            job.status = 'CANCELLED'
+            job.finished_at = datetime.now(timezone.utc)
+            await db.commit()
+        logger.info(f"Broadcast {job_id} cancelled")
+        return True
+
+    async def resume_unfinished(self) -> List[int]:
+        """
+        Start PENDING or RUNNING jobs that no live process holds: left by a
+        restart, or by a process whose lease ran out. Run at startup and then
+        periodically; ``run`` claims each job before sending.
+        """
+        now = datetime.utcnow()
+        async with db_session() as db:
+            result = await db.execute(
+                select(BroadcastJob.id).where(BroadcastJob.status.in_(UNFINISHED_STATUSES), self._claimable(now))
+                .order_by(BroadcastJob.id)
+            )
+            job_ids = [job_id for job_id in result.scalars() if job_id not in self._tasks]
+        for job_id in job_ids:
+            logger.info(f"Resuming broadcast {job_id}")
+            self.start(job_id)
+        return job_ids
+
+    async def run(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Send a job's remaining messages; returns its final counters (None if another process has it)."""
+        if not await self._claim(job_id):
+            logger.info(f"Broadcast {job_id} is finished or held by another process; not sending")
+            return None
+        async with db_session() as db:
+            job = await db.get(BroadcastJob, job_id)
+            if not job or job.status in FINISHED_STATUSES:
+                return None
+            if job.status == 'PENDING':
+                job.total_recipients = (await db.execute(
+                    select(func.count(User.id)).where(recipient_filter(job.target))
+                )).scalar() or 0
+                job.started_at = datetime.now(timezone.utc)
+            job.status = 'RUNNING'
+            await db.commit()
+            state = self._state(job)
+
+        text = format_announcement(state['message'])
+        last_progress = 0.0
+        heartbeat = asyncio.create_task(self._keep_lease(job_id), name=f"broadcast-{job_id}-lease")
+        try:
+            while True:
+                page = await self._next_page(state['target'], state['last_user_id'])
+                if not page:
+                    break
+
+                outcomes = await self._send_page([chat_id for _, chat_id in page], text)
+                for outcome in outcomes:
+                    state[f"{outcome}_count"] += 1
+                state['last_user_id'] = page[-1][0]
+
+                stored = await self._checkpoint(job_id, state)
+                if stored == 'CANCELLED':
+                    state['status'] = 'CANCELLED'
+                    break
+                if stored is None:
+                    # Lease lost (we stalled past it): the new owner continues from our cursor
+                    logger.warning(f"Broadcast {job_id} taken over by another process; stopping here")
+                    return None
+
+                if time.monotonic() - last_progress >= self.progress_interval:
+                    await self._show_progress(state)
+                    last_progress = time.monotonic()
+
+            if state['status'] != 'CANCELLED':
+                state['status'] = 'COMPLETED'
+            await self._checkpoint(job_id, state, finished=True)
+        except asyncio.CancelledError:
+            # Process shutting down: leave the job RUNNING so it resumes from the cursor
+            logger.info(f"Broadcast {job_id} interrupted at user id {state['last_user_id']}")
+            await self._release(job_id)
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} failed: {e}")
+            state['status'] = 'FAILED'
+            state['error'] = str(e)
+            await self._checkpoint(job_id, state, finished=True)
+        finally:
+            heartbeat.cancel()
+
+        await self._show_progress(state, final=True)
+        logger.info(
+            f"Broadcast {job_id} {state['status'].lower()}: sent {state['sent_count']}, "
+            f"failed {state['failed_count']}, blocked {state['blocked_count']}"
+        )
+        return state
+
+    # ------------------------------------------------------------------
+    # Lease
+    # ------------------------------------------------------------------
+
+    def _claimable(self, now: datetime):
+        """Jobs nobody holds, whose holder's lease ran out, or that are already ours."""
+        return or_(BroadcastJob.owner.is_(None), BroadcastJob.owner == self.owner,
+                   BroadcastJob.lease_expires_at.is_(None), BroadcastJob.lease_expires_at < now)
+
+    async def _claim(self, job_id: int) -> bool:
+        """Take (or renew) the job's lease with one conditional UPDATE; False if someone else holds it."""
+        now = datetime.utcnow()
+        async with db_session() as db:
+            result = await db.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job_id, BroadcastJob.status.in_(UNFINISHED_STATUSES), self._claimable(now))
+                .values(owner=self.owner, lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _renew(self, job_id: int) -> bool:
+        """Extend our lease; False if the job is no longer ours."""
+        now = datetime.utcnow()
+        async with db_session() as db:
+            result = await db.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job_id, BroadcastJob.owner == self.owner)
+                .values(lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _keep_lease(self, job_id: int) -> None:
+        """Renew the lease a few times per period while pages are sending (flood pauses can be long)."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self._renew(job_id):
+                    return
+            except Exception as e:
+                logger.warning(f"Broadcast {job_id} lease renewal failed: {e}")
+
+    async def _release(self, job_id: int) -> None:
+        """Drop our lease so the next process resumes the job without waiting for it to expire."""
+        try:
+            async with db_session() as db:
+                await db.execute(
+                    update(BroadcastJob)
+                    .where(BroadcastJob.id == job_id, BroadcastJob.owner == self.owner)
+                    .values(owner=None, lease_expires_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Broadcast {job_id} lease not released: {e}")
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _state(job: BroadcastJob) -> Dict[str, Any]:
+        return {
+            'id': job.id, 'target': job.target, 'message': job.message, 'status': job.status,
+            'total_recipients': job.total_recipients or 0, 'sent_count': job.sent_count or 0,
+            'failed_count': job.failed_count or 0, 'blocked_count': job.blocked_count or 0,
+            'last_user_id': job.last_user_id or 0, 'error': job.error,
+            'progress_chat_id': job.progress_chat_id, 'progress_message_id': job.progress_message_id,
+        }
+
+    async def _next_page(self, target: str, after_id: int) -> List[Tuple[int, int]]:
+        """Next ``(users.id, telegram_user_id)`` page after the cursor."""
+        async with db_session() as db:
+            result = await db.execute(
+                select(User.id, User.telegram_user_id)
+                .where(recipient_filter(target), User.id > after_id)
+                .order_by(User.id)
+                .limit(self.page_size)
+            )
+            return [tuple(row) for row in result.all()]
+
+    async def _send_page(self, chat_ids: List[int], text: str) -> List[str]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(chat_id: int) -> str:
+            async with semaphore:
+                return await self._send_one(chat_id, text)
+
+        return await asyncio.gather(*(bounded(chat_id) for chat_id in chat_ids))
+
+    async def _send_one(self, chat_id: int, text: str) -> str:
+        """Deliver one message; returns 'sent', 'blocked' or 'failed'."""
+        attempt = 0
+        while attempt < BROADCAST_MAX_ATTEMPTS:
+            await self.limiter.acquire(chat_id)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
+                return 'sent'
+            except RetryAfter as e:
+                # Flood control applies to the whole bot: pause every sender, don't count an attempt
+                self.limiter.pause(retry_after_seconds(e))
+                continue
+            except Forbidden:
+                return 'blocked'
+            except BadRequest as e:
+                logger.warning(f"Broadcast to {chat_id} rejected: {e}")
+                return 'failed'
+            except NetworkError as e:
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10))
+                logger.debug(f"Broadcast to {chat_id} retrying after network error: {e}")
+                attempt += 1
+            except TelegramError as e:
+                logger.warning(f"Broadcast to {chat_id} failed: {e}")
+                return 'failed'
+        return 'failed'
+
+    async def _checkpoint(self, job_id: int, state: Dict[str, Any], finished: bool = False) -> Optional[str]:
+        """
+        Persist cursor and counters and renew the lease; returns the stored
+        status (detects cancellation), or None if the job is gone or no
+        longer ours.
+        """
+        async with db_session() as db:
+            job = await db.get(BroadcastJob, job_id, with_for_update=True)
+            if job is None or job.owner != self.owner:
+                return None
+            for key in ('sent_count', 'failed_count', 'blocked_count', 'last_user_id'):
+                setattr(job, key, state[key])
+            if finished:
+                if job.status != 'CANCELLED':
+                    job.status = state['status']
+                job.error = state.get('error')
+                job.finished_at = job.finished_at or datetime.now(timezone.utc)
+                job.lease_expires_at = None
+            else:
+                job.lease_expires_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            await db.commit()
+            return job.status
+
+    async def _show_progress(self, state: Dict[str, Any], final: bool = False) -> None:
+        """Edit the admin's progress message (throttled by the caller)."""
+        if not state.get('progress_chat_id') or not state.get('progress_message_id'):
+            return
+
+        total = state['total_recipients']
+        done = state['sent_count'] + state['failed_count'] + state['blocked_count']
+        target_desc = TARGET_DESCRIPTIONS.get(state['target'], state['target'])
+
+        if final:
+            text = (
+                f"{'✅' if state['status'] == 'COMPLETED' else '⏹️' if state['status'] == 'CANCELLED' else '❌'} "
+                f"**BROADCAST {state['status']}**\n\n"
+                f"📊 **Results Summary:**\n"
+                f"• **Target Group:** {target_desc.title()}\n"
+                f"• **Total Users:** {total}\n"
+                f"• **Successfully Sent:** {state['sent_count']}\n"
+                f"• **Blocked Bot:** {state['blocked_count']}\n"
+                f"• **Failed Deliveries:** {state['failed_count']}\n"
+                f"• **Success Rate:** {(state['sent_count'] / max(total, 1) * 100):.1f}%\n\n"
+                f"🕒 **Finished at:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            )
+            keyboard = [
+                [InlineKeyboardButton("📢 Send Another", callback_data="admin_mailing")],
+                [InlineKeyboardButton("🔙 Back to Admin", callback_data="admin_panel")]
+            ]
+        else:
+            text = (
+                f"📡 **Broadcasting Message...**\n\n"
+                f"📊 **Target:** {total} {target_desc}\n"
+                f"✅ **Sent:** {state['sent_count']}\n"
+                f"🚫 **Blocked:** {state['blocked_count']}\n"
+                f"❌ **Failed:** {state['failed_count']}\n\n"
+                f"⏳ Progress: {done}/{total}"
+            )
+            keyboard = [[InlineKeyboardButton("⏹️ Stop Broadcast", callback_data=f"broadcast_stop_{state['id']}")]]
+
+        try:
+            await self.limiter.acquire(state['progress_chat_id'])
+            await self.bot.edit_message_text(
+                text, chat_id=state['progress_chat_id'], message_id=state['progress_message_id'],
+                parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+        except TelegramError as e:
+            logger.debug(f"Broadcast {state['id']} progress update skipped: {e}")
+
+
+# Global broadcast engine; the bot is attached on first use or at startup
+broadcast_engine = BroadcastEngine()
@@ -8,29 +8,23 @@ import os
 import io
 from typing import Dict, Any, List
 import json
-from captcha.image import ImageCaptcha
 from captcha.audio import AudioCaptcha
 from PIL import Image, ImageDraw, ImageFont
 from utils.runtime_settings import (
     DEFAULT_VERIFICATION_CHANNELS,
     get_verification_channels,
 )
+from services.captcha_pool import captcha_pool
+from services.channel_membership import membership_checker
 
 logger = logging.getLogger(__name__)
 
 class CaptchaService:
     """Service for generating and managing CAPTCHA challenges with visual and text options."""
     
-    def __init__(self):
-        # Create captcha directory if not exists
-        self.captcha_dir = "temp_captchas"
-        os.makedirs(self.captcha_dir, exist_ok=True)
-        
-        # Initialize image captcha generator - OPTIMIZED for speed
-        # Smaller dimensions = faster generation and faster for users to type
-        self.image_captcha = ImageCaptcha(width=200, height=70, fonts=None)
-        
-        # Removed math_questions and text_questions - only using visual captchas now
+    # Images come pre-rendered from the shared captcha_pool (services/captcha_pool.py),
+    # so constructing the service is free and nothing renders on the event loop.
+    # Removed math_questions and text_questions - only using visual captchas now
     
     async def generate_captcha(self) -> Dict[str, Any]:
         """Generate only visual image CAPTCHA challenges."""
@@ -58,20 +52,17 @@ class CaptchaService:
     async def generate_visual_captcha(self) -> Dict[str, Any]:
         """Generate a visual image captcha - optimized for speed."""
         try:
-            # Generate random text for captcha (4 chars = faster to type, still secure)
-            captcha_text = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-            
-            # Generate captcha image (in memory - no disk I/O)
-            image = self.image_captcha.generate(captcha_text)
+            # Pre-rendered 4-char challenge (in memory - no disk I/O)
+            challenge = await captcha_pool.take()
             
             # Return image bytes directly - NO file saving!
             return {
                 "type": "visual",
                 "question": f"Enter the text shown in the image:",
-                "answer": captcha_text.lower(),
-                "image_bytes": image.getvalue(),  # Direct bytes, no file
+                "answer": challenge.answer,
+                "image_bytes": challenge.image_bytes,  # Direct bytes, no file
                 "image_path": None,  # No file path needed
-                "captcha_text": captcha_text
+                "captcha_text": challenge.text
             }
             
         except Exception as e:
@@ -145,14 +136,8 @@ class VerificationTaskService:
     
     async def check_channel_membership(self, bot, user_id: int, channel_username: str) -> bool:
         """Check if user is a member of the required channel."""
-        try:
-            # Try to get chat member status
-            member = await bot.get_chat_member(chat_id=f"@{channel_username}", user_id=user_id)
-            return member.status in ['member', 'administrator', 'creator']
-        except Exception as e:
-            logger.error(f"Error checking channel membership for {channel_username}: {e}")
-            # If we can't check, assume they're not a member
-            return False
+        # Cached and coalesced; if we can't check, assume they're not a member
+        return await membership_checker.is_member(bot, user_id, f"@{channel_username.lstrip('@')}")
     
     async def verify_profile_picture(self, bot, user_id: int) -> bool:
         """Check if user has a profile picture."""
@@ -285,13 +270,10 @@ After joining all channels, click the button below:
         verification_results = []
         all_joined = True
         
-        task_service = VerificationTaskService()
+        # All channels at once; channels that already passed come from the cache
+        memberships = await membership_checker.check_all(bot, user_id, required_channels)
         
-        for channel in required_channels:
-            is_member = await task_service.check_channel_membership(
-                bot, user_id, channel['username']
-            )
-            
+        for channel, is_member in zip(required_channels, memberships):
             verification_results.append({
                 'channel': channel['name'],
                 'username': channel['username'],
@@ -0,0 +1,85 @@
+"""
+Burst benchmark: CAPTCHAs rendered inline on the event loop (the old
+``CaptchaService`` path) vs. taken from the pre-rendered ``CaptchaPool``.
+
+``burst`` verification presses arrive at once. For each one we report the
+latency until the user's challenge is ready, and we report the worst stall of
+a heartbeat task that stands in for every other update the bot is handling.
+
+Run with ``python -m services.captcha_benchmark [burst]``.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from services.captcha_pool import CAPTCHA_HEIGHT, CAPTCHA_WIDTH, CaptchaPool, new_captcha_text
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _legacy_press() -> bytes:
+    """What every press used to do: a new service (makedirs + ImageCaptcha), rendered inline."""
+    from captcha.image import ImageCaptcha
+    os.makedirs("temp_captchas", exist_ok=True)
+    image_captcha = ImageCaptcha(width=CAPTCHA_WIDTH, height=CAPTCHA_HEIGHT, fonts=None)
+    return image_captcha.generate(new_captcha_text()).getvalue()
+
+
+async def _run_burst(press: Callable[[], Awaitable], burst: int) -> Dict[str, float]:
+    stop = asyncio.Event()
+    stalls: List[float] = []
+
+    async def heartbeat():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - started - 0.005)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.05)
+    arrived = time.perf_counter()
+
+    async def timed():
+        await press()
+        return time.perf_counter() - arrived
+
+    latencies = await asyncio.gather(*(timed() for _ in range(burst)))
+    stop.set()
+    await beat
+    return {
+        'p50': statistics.median(latencies) * 1000,
+        'p99': _percentile(latencies, 0.99) * 1000,
+        'max_stall': max(stalls) * 1000,
+    }
+
+
+async def _main(burst: int) -> None:
+    results = {'inline': await _run_burst(_legacy_press, burst)}
+
+    pool = CaptchaPool(size=burst)
+    pool.start()
+    while pool.stats()['buffered'] < burst:
+        await asyncio.sleep(0.05)
+    results['pool'] = await _run_burst(pool.take, burst)
+    # Twice the buffer: the second half is rendered on demand in the worker processes
+    results['pool (2x)'] = await _run_burst(pool.take, burst * 2)
+    await pool.stop()
+
+    print(f"burst of {burst} presses")
+    print(f"{'path':<10} {'p50 ms':>9} {'p99 ms':>9} {'loop stall ms':>14}")
+    for label, r in results.items():
+        print(f"{label:<10} {r['p50']:>9.1f} {r['p99']:>9.1f} {r['max_stall']:>14.1f}")
+
+
+def main(burst: int = 200) -> None:
+    asyncio.run(_main(burst))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,224 @@
+"""
+CAPTCHA Pool
+Pre-rendered CAPTCHA challenges, produced off the event loop
+
+Rendering a CAPTCHA image is CPU-bound Pillow work (tens of milliseconds).
+Done inline it stalls every other update, so a wave of new users freezes the
+bot. ``captcha_pool`` keeps a bounded buffer of ready challenges (image bytes
+plus answer) that handlers take in O(1). A background task refills the buffer
+through a process pool once it drops below ``low_water``. When the buffer is
+empty, callers render one challenge in the pool and do not block the loop.
+
+Answers are drawn with ``secrets`` in the bot process, and only the drawing
+happens in the worker processes.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import secrets
+import string
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CAPTCHA_POOL_SIZE = int(os.getenv('CAPTCHA_POOL_SIZE', '64'))
+CAPTCHA_POOL_LOW_WATER = int(os.getenv('CAPTCHA_POOL_LOW_WATER', str(CAPTCHA_POOL_SIZE // 2)))
+CAPTCHA_POOL_WORKERS = int(os.getenv('CAPTCHA_POOL_WORKERS', '2'))
+CAPTCHA_POOL_RETRY_SECONDS = 5.0  # Refill pause after a failed render
+
+CAPTCHA_ALPHABET = string.ascii_uppercase + string.digits
+CAPTCHA_LENGTH = 4  # Short enough to type quickly, still hard to guess
+CAPTCHA_WIDTH, CAPTCHA_HEIGHT = 200, 70
+
+_renderer = None  # Per-process ImageCaptcha, built on first use
+
+
+def render_captcha(text: str) -> bytes:
+    """Render ``text`` as a PNG CAPTCHA image (runs in the pool's worker processes)."""
+    global _renderer
+    if _renderer is None:
+        from captcha.image import ImageCaptcha
+        _renderer = ImageCaptcha(width=CAPTCHA_WIDTH, height=CAPTCHA_HEIGHT)
+    return _renderer.generate(text).getvalue()
+
+
+def new_captcha_text() -> str:
+    return ''.join(secrets.choice(CAPTCHA_ALPHABET) for _ in range(CAPTCHA_LENGTH))
+
+
+@dataclass(frozen=True)
+class CaptchaChallenge:
+    text: str
+    image_bytes: bytes
+
+    @property
+    def answer(self) -> str:
+        return self.text.lower()
+
+
+class CaptchaPool:
+    """Bounded buffer of pre-rendered challenges with a background refill."""
+
+    def __init__(self, size: int = None, low_water: int = None, workers: int = None,
+                 use_processes: bool = True):
+        self.size = size or CAPTCHA_POOL_SIZE
+        self.low_water = min(self.size, CAPTCHA_POOL_LOW_WATER if low_water is None else low_water)
+        self.workers = workers or CAPTCHA_POOL_WORKERS
+        self.use_processes = use_processes
+        self._buffer: Deque[CaptchaChallenge] = deque(maxlen=self.size)
+        self._executor: Optional[Executor] = None  # None: render in the loop's default thread pool
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0
+        self.render_errors = 0
+        self._render_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Consumers
+    # ------------------------------------------------------------------
+
+    async def take(self) -> CaptchaChallenge:
+        """A fresh challenge: from the buffer when possible, else rendered off the loop."""
+        if self._buffer:
+            challenge = self._buffer.popleft()
+            self.hits += 1
+        else:
+            self.misses += 1
+            challenge = await self._render_one()
+        if len(self._buffer) < self.low_water:
+            self.wake()
+        return challenge
+
+    async def _render_one(self) -> CaptchaChallenge:
+        text = new_captcha_text()
+        started = time.perf_counter()
+        try:
+            image_bytes = await asyncio.get_running_loop().run_in_executor(self._executor, render_captcha, text)
+        except Exception:
+            self.render_errors += 1
+            raise
+        self._render_seconds += time.perf_counter() - started
+        self.rendered += 1
+        return CaptchaChallenge(text, image_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer level and counters for the admin stats screen."""
+        taken = self.hits + self.misses
+        if self._task is None:
+            mode = 'stopped'
+        else:
+            mode = 'processes' if isinstance(self._executor, ProcessPoolExecutor) else 'threads'
+        return {
+            'buffered': len(self._buffer),
+            'capacity': self.size,
+            'low_water': self.low_water,
+            'workers': self.workers,
+            'mode': mode,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / taken) if taken else 0.0,
+            'rendered': self.rendered,
+            'render_errors': self.render_errors,
+            'avg_render_ms': (self._render_seconds / self.rendered * 1000) if self.rendered else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def _make_executor(self) -> Executor:
+        if self.use_processes:
+            try:
+                # spawn: forking a process that runs an event loop and DB pools is unsafe
+                return ProcessPoolExecutor(max_workers=self.workers,
+                                           mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError, ValueError) as e:
+                logger.warning(f"CAPTCHA process pool unavailable, rendering in threads: {e}")
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='captcha')
+
+    def start(self) -> asyncio.Task:
+        """Fill the buffer and keep it filled in the background of the current event loop."""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._executor = self._make_executor()
+            self._task = asyncio.create_task(self.run_forever(), name="captcha-pool")
+        return self._task
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("CAPTCHA pool did not stop in time; cancelled")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+    def wake(self) -> None:
+        """Top the buffer up now (safe to call from any thread)."""
+        loop, event_ = self._loop, self._wakeup
+        if loop is None or event_ is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event_.set()
+        else:
+            loop.call_soon_threadsafe(event_.set)
+
+    async def run_forever(self) -> None:
+        logger.info(f"CAPTCHA pool started ({self.size} challenges, {self.workers} workers)")
+        while not self._stopping:
+            self._wakeup.clear()
+            missing = self.size - len(self._buffer)
+            if missing <= 0:
+                await self._wakeup.wait()
+                continue
+
+            # A few renders per worker at a time, so takes never wait behind a long batch
+            batch = min(missing, self.workers * 2)
+            results = await asyncio.gather(*(self._render_one() for _ in range(batch)), return_exceptions=True)
+            failed = False
+            for result in results:
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, BaseException):
+                    failed = True
+                    logger.error(f"CAPTCHA render failed: {result!r}")
+                else:
+                    self._buffer.append(result)
+            if any(isinstance(result, BrokenProcessPool) for result in results):
+                # A worker died (e.g. killed for memory): replace the whole pool
+                broken, self._executor = self._executor, self._make_executor()
+                broken.shutdown(wait=False)
+
+            if failed and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=CAPTCHA_POOL_RETRY_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("CAPTCHA pool stopped")
+
+
+# Global instance
+captcha_pool = CaptchaPool()
@@ -0,0 +1,124 @@
+"""
+Channel Membership
+Concurrent, cached and coalesced ``get_chat_member`` checks
+
+The verification step checks that a user is in every required channel. This
+module sends the checks for all channels at once. A positive answer is
+remembered per (user, channel) for CHANNEL_MEMBERSHIP_TTL seconds, so
+repeated "Verify" taps only re-check the channels that were missing. A tap
+that arrives while the same check is still running waits on that request
+instead of sending its own.
+
+Negative answers and errors are never cached: a user who just joined must be
+able to pass on the very next tap.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cache_engine import CacheNamespace
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_MEMBERSHIP_TTL = int(os.getenv('CHANNEL_MEMBERSHIP_TTL', '300'))
+CHANNEL_MEMBERSHIP_CACHE_SIZE = int(os.getenv('CHANNEL_MEMBERSHIP_CACHE_SIZE', '20000'))
+
+MEMBER_STATUSES = ('member', 'administrator', 'creator')
+
+
+def channel_chat_id(channel: Dict[str, Any]) -> Optional[str]:
+    """The chat id to query for a configured channel: its id, @username, or the username in its link."""
+    if channel.get('id'):
+        return str(channel['id'])
+    username = channel.get('username')
+    if not username and channel.get('link'):
+        username = channel['link'].rstrip('/').split('/')[-1]
+    if username:
+        return f"@{username.lstrip('@')}"
+    return None
+
+
+def is_joined(member) -> bool:
+    """Whether a ChatMember counts as having joined (restricted users count while still in the chat)."""
+    status = getattr(member, 'status', None)
+    if status == 'restricted':
+        return bool(getattr(member, 'is_member', False))
+    return status in MEMBER_STATUSES
+
+
+class MembershipChecker:
+    """Channel membership lookups shared by every verification handler."""
+
+    def __init__(self, ttl: float = None, maxsize: int = None):
+        # Private namespace: only positives are stored, and the counters below track the rest
+        self._members = CacheNamespace(
+            'channel_membership', CHANNEL_MEMBERSHIP_TTL if ttl is None else ttl,
+            maxsize or CHANNEL_MEMBERSHIP_CACHE_SIZE,
+        )
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.hits = 0
+        self.checks = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def is_member(self, bot, user_id: int, chat_id: str) -> bool:
+        """Whether ``user_id`` is in ``chat_id``; errors count as not joined."""
+        key = (user_id, chat_id.lower())
+        if self._members.get(key):
+            self.hits += 1
+            return True
+
+        check = self._inflight.get(key)
+        if check is None or check.get_loop() is not asyncio.get_running_loop():
+            check = asyncio.ensure_future(self._check(bot, user_id, chat_id, key))
+            self._inflight[key] = check
+            check.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        # Shielded: one impatient caller must not cancel the check others wait on
+        return await asyncio.shield(check)
+
+    async def _check(self, bot, user_id: int, chat_id: str, key: Tuple[int, str]) -> bool:
+        self.checks += 1
+        try:
+            member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error checking membership of {user_id} in {chat_id}: {e}")
+            return False
+        joined = is_joined(member)
+        if joined:
+            self._members.set(key, True)
+        return joined
+
+    async def check_all(self, bot, user_id: int, channels: List[Dict[str, Any]]) -> List[bool]:
+        """Membership in each of ``channels`` (same order), checked concurrently."""
+        async def check(channel):
+            chat_id = channel_chat_id(channel)
+            if not chat_id:
+                logger.error(f"Channel configuration missing identifier for membership check: {channel}")
+                return False
+            return await self.is_member(bot, user_id, chat_id)
+
+        return list(await asyncio.gather(*(check(channel) for channel in channels)))
+
+    def forget(self, user_id: int, chat_id: str) -> None:
+        """Drop a cached positive (e.g. after the user left the channel)."""
+        self._members.invalidate((user_id, chat_id.lower()))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.checks + self.coalesced
+        return {
+            'cached': self._members.stats()['size'],
+            'ttl': self._members.ttl,
+            'hits': self.hits,
+            'checks': self.checks,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'saved_rate': ((self.hits + self.coalesced) / lookups) if lookups else 0.0,
+        }
+
+
+# Global instance
+membership_checker = MembershipChecker()
@@ -0,0 +1,279 @@
+"""
+Expiry Scheduler
+Releases timed account freezes and holds at their deadline
+
+Deadlines live on the account rows (``freeze_until`` / ``hold_until``, both
+indexed). The ones due within the next EXPIRY_HORIZON_SECONDS are mirrored
+into an in-memory timing wheel; the scheduler sleeps until the wheel's next
+deadline and then releases everything that is due with one bulk UPDATE per
+kind.
+
+The database stays the source of truth: the wheel is reloaded from it every
+half horizon (which also picks up deadlines written by other processes), and
+a release covers every due row, not only those the wheel knew about.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Hashable, List, Optional, Set
+
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_HORIZON_SECONDS = int(os.getenv('EXPIRY_HORIZON_SECONDS', '3600'))
+EXPIRY_TICK_SECONDS = 1.0
+EXPIRY_RETRY_SECONDS = 30  # Reload delay after a failed release
+
+KINDS = ('freeze', 'hold')
+
+
+def _epoch(moment: datetime) -> float:
+    """Unix time of a naive-UTC (as stored) or aware datetime."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: ``slots`` buckets of ``tick`` seconds each.
+
+    Adding, replacing and removing a timer is O(1). Timers are accepted only
+    within one turn of the wheel (``span`` seconds), so every timer in a
+    bucket belongs to the same tick; later deadlines are left to the caller.
+    Not thread-safe on its own.
+    """
+
+    def __init__(self, tick: float = EXPIRY_TICK_SECONDS, slots: int = 3600, now: float = None):
+        self.tick = tick
+        self.slots = slots
+        self._buckets: List[Dict[Hashable, float]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[Hashable, int] = {}
+        # First tick that has not been fully expired yet
+        self._current = int((time.time() if now is None else now) // tick)
+
+    @property
+    def span(self) -> float:
+        return self.tick * self.slots
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._slot_of
+
+    def add(self, key: Hashable, deadline: float) -> bool:
+        """Set ``key`` to fire at ``deadline``; False if it is beyond the wheel's turn."""
+        tick = int(deadline // self.tick)
+        if tick >= self._current + self.slots:
+            return False
+        self.discard(key)
+        slot = max(tick, self._current) % self.slots  # Overdue timers fire on the next advance
+        self._buckets[slot][key] = deadline
+        self._slot_of[key] = slot
+        return True
+
+    def discard(self, key: Hashable) -> None:
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            del self._buckets[slot][key]
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """Remove and return every timer whose deadline is at or before ``now``."""
+        now_tick = int(now // self.tick)
+        due = []
+        # Buckets of ticks that have fully passed (the whole wheel after a long sleep)
+        for tick in range(self._current, min(now_tick, self._current + self.slots)):
+            bucket = self._buckets[tick % self.slots]
+            if bucket:
+                due.extend(bucket)
+                for key in bucket:
+                    del self._slot_of[key]
+                bucket.clear()
+        self._current = max(self._current, now_tick)
+        # The current tick's bucket holds timers on either side of ``now``
+        bucket = self._buckets[self._current % self.slots]
+        for key in [key for key, deadline in bucket.items() if deadline <= now]:
+            due.append(key)
+            self.discard(key)
+        return due
+
+    def next_deadline(self) -> Optional[float]:
+        """Earliest pending deadline, or None when the wheel is empty."""
+        if not self._slot_of:
+            return None
+        for tick in range(self._current, self._current + self.slots):
+            bucket = self._buckets[tick % self.slots]
+            if bucket:
+                return min(bucket.values())
+        return None
+
+
+class ExpiryScheduler:
+    """Wakes at the next freeze/hold deadline and releases the due accounts in bulk."""
+
+    def __init__(self, horizon: int = None, tick: float = EXPIRY_TICK_SECONDS):
+        self.horizon = horizon or EXPIRY_HORIZON_SECONDS
+        self.wheel = TimerWheel(tick, max(1, int(self.horizon / tick)))
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._reload_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> asyncio.Task:
+        """Run the scheduler in the background of the current event loop."""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._reload_at = 0.0
+            self._task = asyncio.create_task(self.run_forever(), name="expiry-scheduler")
+        return self._task
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Finish the release in flight, then stop."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Expiry scheduler did not stop in time; cancelled")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Re-check the next deadline now (safe to call from any thread)."""
+        loop, event = self._loop, self._wakeup
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    # ------------------------------------------------------------------
+    # Deadlines
+    # ------------------------------------------------------------------
+
+    def schedule(self, kind: str, account_id: int, deadline: Optional[datetime]) -> None:
+        """Track a deadline just written to the database (thread-safe)."""
+        if deadline is None:
+            return
+        with self._lock:
+            added = self.wheel.add((kind, account_id), _epoch(deadline))
+        if added:
+            self.wake()
+
+    def load(self, now: datetime = None) -> int:
+        """Put every deadline up to one horizon ahead (overdue ones included) on the wheel."""
+        from database import get_db_session, close_db_session
+        from database.models import TelegramAccount, AccountStatus
+
+        until = (now or datetime.utcnow()) + timedelta(seconds=self.horizon)
+        columns = {
+            'freeze': (AccountStatus.FROZEN, TelegramAccount.freeze_until),
+            'hold': (AccountStatus.TWENTY_FOUR_HOUR_HOLD, TelegramAccount.hold_until),
+        }
+        db = get_db_session()
+        try:
+            loaded = 0
+            for kind, (status, column) in columns.items():
+                rows = db.execute(
+                    select(TelegramAccount.id, column)
+                    .where(TelegramAccount.status == status, column <= until)
+                ).all()
+                with self._lock:
+                    for account_id, deadline in rows:
+                        loaded += self.wheel.add((kind, account_id), _epoch(deadline))
+            return loaded
+        finally:
+            close_db_session(db)
+
+    def release(self, kinds: Set[str]) -> Dict[str, int]:
+        """Release all due accounts of the given kinds; returns released counts per kind."""
+        from database import get_db_session, close_db_session
+        from database.operations import TelegramAccountService
+        from services.account_management import AccountManagementService
+
+        released = {}
+        db = get_db_session()
+        try:
+            if 'freeze' in kinds:
+                result = AccountManagementService.check_and_release_expired_freezes(db)
+                if not result['success']:
+                    raise RuntimeError(result['error'])
+                released['freeze'] = result['released_count']
+            if 'hold' in kinds:
+                released['hold'] = len(TelegramAccountService.release_expired_holds(db))
+        finally:
+            close_db_session(db)
+        return released
+
+    async def run_once(self) -> Dict[str, int]:
+        """Reload the wheel when due, then release whatever has expired."""
+        with self._lock:
+            due = self.wheel.pop_due(time.time())
+        if time.monotonic() >= self._reload_at:
+            # After advancing, so the wheel's turn starts now
+            await asyncio.to_thread(self.load)
+            self._reload_at = time.monotonic() + self.horizon / 2
+            with self._lock:
+                due += self.wheel.pop_due(time.time())
+        if not due:
+            return {}
+        try:
+            released = await asyncio.to_thread(self.release, {kind for kind, _ in due})
+        except Exception:
+            # The due rows are still in the database; pick them up again shortly
+            self._reload_at = min(self._reload_at, time.monotonic() + EXPIRY_RETRY_SECONDS)
+            raise
+        if released.get('freeze'):
+            from utils.notification_outbox import outbox_worker
+            outbox_worker.wake()  # Owners' unfreeze notices are queued
+        return released
+
+    async def run_forever(self) -> None:
+        logger.info("Expiry scheduler started")
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Expiry scheduler error: {e}")
+                self._reload_at = min(self._reload_at, time.monotonic() + EXPIRY_RETRY_SECONDS)
+
+            if self._stopping:
+                break
+            timeout = max(0.0, self._reload_at - time.monotonic())
+            with self._lock:
+                next_deadline = self.wheel.next_deadline()
+            if next_deadline is not None:
+                timeout = min(timeout, max(0.0, next_deadline - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Expiry scheduler stopped")
+
+
+# Global instance
+expiry_scheduler = ExpiryScheduler()
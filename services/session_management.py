@@ -272,49 +272,20 @@ class SessionManagementService:
             }
     
     async def check_and_release_holds(self) -> Dict[str, Any]:
-        """Check for accounts ready to be released from hold"""
-        released_count = 0
-        errors = []
-        
-        try:
+        """Release accounts whose hold has ended (the expiry scheduler does this on time; admins can force it)"""
+        def release():
             db = get_db_session()
             try:
-                # Find accounts that are on hold and ready to be released
-                held_accounts = db.query(TelegramAccount).filter(
-                    TelegramAccount.status == AccountStatus.TWENTY_FOUR_HOUR_HOLD,
-                    TelegramAccount.hold_until <= datetime.utcnow()
-                ).all()
-                
-                for account in held_accounts:
-                    try:
-                        # Release from hold
-                        account.status = AccountStatus.AVAILABLE
-                        account.hold_until = None
-                        account.multi_device_detected = False
-                        account.updated_at = datetime.utcnow()
-                        
-                        # Log release
-                        ActivityLogService.log_action(
-                            db, account.seller_id, "ACCOUNT_RELEASED",
-                            f"Account {account.id} released from 24-hour hold"
-                        )
-                        
-                        released_count += 1
-                        logger.info(f"Released account {account.id} from hold")
-                        
-                    except Exception as e:
-                        errors.append(f"Error releasing account {account.id}: {str(e)}")
-                        logger.error(f"Error releasing account {account.id}: {e}")
-                
-                db.commit()
-                
+                return TelegramAccountService.release_expired_holds(db)
             finally:
                 close_db_session(db)
-            
+        
+        try:
+            released = await asyncio.to_thread(release)
             return {
                 'success': True,
-                'released_count': released_count,
-                'errors': errors
+                'released_count': len(released),
+                'errors': []
             }
             
         except Exception as e:
@@ -404,17 +375,3 @@ class SessionManagementService:
 
 # Global instance
 session_manager = SessionManagementService()
-
-# Background task to periodically check and release holds
-async def session_hold_cleanup_task():
-    """Background task to check and release expired holds"""
-    while True:
-        try:
-            result = await session_manager.check_and_release_holds()
-            if result['released_count'] > 0:
-                logger.info(f"Released {result['released_count']} accounts from hold")
-        except Exception as e:
-            logger.error(f"Error in session cleanup task: {e}")
-        
-        # Check every hour
-        await asyncio.sleep(3600)
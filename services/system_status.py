@@ -9,6 +9,7 @@ from typing import Dict, Any, Optional
 from database import get_db_session, close_db_session
 from database.operations import UserService, SystemSettingsService, ActivityLogService
 from database.models import User, UserStatus
+from database.rollups import load_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -78,18 +79,20 @@ class SystemStatusService:
         try:
             # Time boundaries
             now = datetime.now()
-            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
             last_24h = now - timedelta(hours=24)
             
+            # Signups, sales and withdrawals from the daily rollups
+            rollups = load_rollups(db, {'today': 1}, metrics=['signups', 'sales', 'withdrawals'])
+            
             # User metrics
-            total_users = db.query(User).count()
+            total_users = rollups.get('signups').count()
             active_users_24h = db.query(User).filter(
                 User.last_activity >= last_24h
             ).count() if hasattr(User, 'last_activity') else 0
             
-            # Account sales metrics (would need TelegramAccount model)
-            sales_today = 0  # Would calculate from actual sales
-            pending_withdrawals = 0  # Would calculate from withdrawal requests
+            # Account sales metrics
+            sales_today = rollups.get('sales', 'today').count()
+            pending_withdrawals = rollups.get('withdrawals').count('PENDING')
             
             # Calculate capacity percentage based on various factors
             base_capacity = max(total_users * 0.1, 10)  # Base load from total users
@@ -0,0 +1,10 @@
+"""Shared pytest configuration: point the database layer at a throwaway SQLite file."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+if not os.getenv('DATABASE_URL'):
+    os.environ.setdefault('DB_USER', 'sqlite')
+    os.environ.setdefault('DB_NAME', os.path.join(tempfile.mkdtemp(prefix='teleaccount_test_'), 'test.db'))
@@ -0,0 +1,103 @@
+import json
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+import utils.activity_log_writer as activity_log_writer_module
+from database import SessionLocal, close_db_session, create_tables, get_db_session
+from database.models import ActivityLog, User
+from database.operations import ActivityLogService
+from utils.activity_log_writer import ActivityLogWriter, activity_log_writer
+
+
+def count_rows(action_type):
+    db = get_db_session()
+    try:
+        return db.query(func.count(ActivityLog.id)).filter(ActivityLog.action_type == action_type).scalar()
+    finally:
+        close_db_session(db)
+
+
+def test_log_activity_leaves_caller_transaction_alone(tmp_path, monkeypatch):
+    create_tables()
+    monkeypatch.setattr(activity_log_writer, 'spill_path', str(tmp_path / 'activity.spill'))
+
+    db = get_db_session()
+    try:
+        db.add(User(telegram_user_id=970001, first_name='Uncommitted'))
+        db.flush()
+        assert ActivityLogService.log_action(db, None, action_type='TEST_NO_COMMIT', description='inside a transaction')
+        db.rollback()
+        assert db.query(User).filter(User.telegram_user_id == 970001).first() is None
+    finally:
+        close_db_session(db)
+
+    assert count_rows('TEST_NO_COMMIT') == 0
+    assert activity_log_writer.flush() >= 1
+    assert count_rows('TEST_NO_COMMIT') == 1
+
+
+def test_batches_and_recovers_spilled_events(tmp_path):
+    create_tables()
+    spill = str(tmp_path / 'activity.spill')
+
+    writer = ActivityLogWriter(batch_size=3, spill_path=spill)
+    for i in range(3):
+        writer.record(None, 'TEST_BATCH', f'event {i}')  # Third event reaches batch_size
+    assert count_rows('TEST_BATCH') == 3 and writer.pending == 0
+    writer.close()
+
+    # A process dies with one batch mid-flush and more events still buffered
+    crashed = ActivityLogWriter(batch_size=100, spill_path=spill)
+    crashed.record(None, 'TEST_SPILL', 'rotated for a flush')
+    crashed._take()
+    crashed.record(None, 'TEST_SPILL', 'still buffered', extra_data={'n': 1})
+    crashed.record(None, 'TEST_SPILL', 'still buffered')
+    assert count_rows('TEST_SPILL') == 0
+
+    # Another live process sharing the spill directory keeps its files
+    alive = ActivityLogWriter(batch_size=100, spill_path=spill)
+    alive.record(None, 'TEST_SPILL_ALIVE', 'still mine')
+    restarted = ActivityLogWriter(batch_size=100, spill_path=spill)
+    assert restarted.recover() == 0
+    assert crashed.pending == 2 and alive.pending == 1
+
+    crashed._owner_lock.close()  # The process dies; the OS releases its lock
+    assert restarted.recover() == 3
+    assert restarted.flush() == 3
+    assert count_rows('TEST_SPILL') == 3
+
+    assert alive.flush() == 1
+    alive.close()
+    restarted.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_flushes_keep_buffer_and_spill_in_step(tmp_path, monkeypatch):
+    create_tables()
+    spill = str(tmp_path / 'activity.spill')
+
+    def spilled():
+        return sorted(json.loads(line)['description'] for path in tmp_path.iterdir()
+                      if not path.name.endswith('.lock') for line in path.read_text().splitlines())
+
+    def database_down():
+        raise OperationalError('INSERT', {}, Exception('database is down'))
+
+    writer = ActivityLogWriter(batch_size=100, spill_path=spill, session_factory=database_down)
+    writer.record(None, 'TEST_RETRY', 'a')
+    writer.record(None, 'TEST_RETRY', 'b')
+    assert writer.flush() == 0
+    writer.record(None, 'TEST_RETRY', 'c')
+    assert writer.flush() == 0
+    assert writer.pending == 3 and spilled() == ['a', 'b', 'c']  # Nothing spilled twice
+
+    # At the cap new events are refused, in memory and on disk alike
+    monkeypatch.setattr(activity_log_writer_module, 'MAX_BUFFERED_EVENTS', 3)
+    writer.record(None, 'TEST_RETRY', 'd')
+    assert writer.pending == 3 and writer.dropped == 1 and spilled() == ['a', 'b', 'c']
+
+    writer._session_factory = SessionLocal
+    assert writer.flush() == 3
+    assert count_rows('TEST_RETRY') == 3 and spilled() == []
+    writer.close()
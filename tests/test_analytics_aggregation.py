@@ -0,0 +1,84 @@
+"""
+Dashboards read aggregates (SQL or daily rollups): memory stays flat however
+many rows exist.
+
+The seeded row count defaults to a size that keeps the suite quick; set
+ANALYTICS_BENCH_ROWS=1000000 to run the full-size benchmark.
+"""
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert
+
+from database import create_tables, dispose_async_engine, engine, get_db_session, close_db_session
+from database.models import User, Withdrawal
+from database.rollups import rebuild_rollups
+from handlers.analytics_handlers import AnalyticsDashboard
+
+BENCH_ROWS = int(os.getenv('ANALYTICS_BENCH_ROWS', '20000'))
+BATCH = 10000
+TELEGRAM_ID_BASE = 7_000_000_000
+
+
+@pytest.fixture(scope='module')
+def seeded_rows():
+    """Bulk-insert BENCH_ROWS users, each with one withdrawal."""
+    create_tables()
+    db = get_db_session()
+    try:
+        if db.query(func.count(User.id)).filter(User.telegram_user_id >= TELEGRAM_ID_BASE).scalar() < BENCH_ROWS:
+            old = datetime.utcnow() - timedelta(days=90)
+            with engine.begin() as conn:
+                for start in range(0, BENCH_ROWS, BATCH):
+                    ids = range(start, min(start + BATCH, BENCH_ROWS))
+                    conn.execute(insert(User), [
+                        {'telegram_user_id': TELEGRAM_ID_BASE + i, 'balance': 1.0, 'total_earnings': 2.0,
+                         'status': 'ACTIVE', 'created_at': old}
+                        for i in ids
+                    ])
+            user_ids = [row[0] for row in db.query(User.id).filter(User.telegram_user_id >= TELEGRAM_ID_BASE)]
+            with engine.begin() as conn:
+                for start in range(0, len(user_ids), BATCH):
+                    conn.execute(insert(Withdrawal), [
+                        {'user_id': uid, 'amount': 1.0, 'currency': 'USDT', 'withdrawal_address': 'x',
+                         'withdrawal_method': 'TRC20', 'status': 'COMPLETED' if uid % 2 else 'PENDING',
+                         'created_at': old}
+                        for uid in user_ids[start:start + BATCH]
+                    ])
+        # Bulk core inserts bypass the ORM write hooks; rebuild the rollups once
+        rebuild_rollups(db)
+        expected = (
+            db.query(func.count(User.id)).scalar(),
+            db.query(func.count(Withdrawal.id)).scalar(),
+            db.query(func.sum(Withdrawal.amount)).scalar(),
+        )
+    finally:
+        close_db_session(db)
+    return expected
+
+
+@pytest.mark.asyncio
+async def test_dashboard_memory_is_flat(seeded_rows):
+    total_users, total_withdrawals, total_amount = seeded_rows
+    dashboard = AnalyticsDashboard()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    users = await dashboard.get_user_analytics(30)
+    withdrawals = await dashboard.get_withdrawal_analytics(30)
+    financial = await dashboard.get_financial_metrics(30)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await dispose_async_engine()
+
+    assert users['total_users'] == total_users
+    assert withdrawals['total_withdrawals'] == total_withdrawals
+    assert withdrawals['total_amount'] == pytest.approx(total_amount)
+    assert sum(withdrawals['status_distribution'].values()) <= total_withdrawals
+    assert financial['total_withdrawals'] == pytest.approx(total_amount)
+    # Loading rows would cost hundreds of bytes each; aggregates cost a constant
+    assert peak < 2 * 1024 * 1024, f"{BENCH_ROWS:,} rows: dashboard in {elapsed:.2f}s, peak {peak / 1024:.0f} KiB"
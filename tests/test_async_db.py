@@ -0,0 +1,38 @@
+import pytest
+
+from database import db_session, dispose_async_engine, create_tables
+from database.operations import AsyncUserService, AsyncSystemSettingsService
+
+
+@pytest.fixture(autouse=True)
+def _tables():
+    create_tables()
+
+
+@pytest.mark.asyncio
+async def test_async_user_roundtrip():
+    """Users created through the async service are visible to later sessions."""
+    async with db_session() as db:
+        user = await AsyncUserService.get_or_create_user(db, 900001, username='async_user')
+        assert user.id is not None
+
+    async with db_session() as db:
+        loaded = await AsyncUserService.get_user_by_telegram_id(db, 900001)
+        assert loaded.username == 'async_user'
+        assert await AsyncUserService.update_balance(db, loaded.id, 12.5)
+
+    async with db_session() as db:
+        assert (await AsyncUserService.get_user(db, loaded.id)).balance == 12.5
+
+    await dispose_async_engine()
+
+
+@pytest.mark.asyncio
+async def test_async_settings_parse_json():
+    """Settings written asynchronously are stored as JSON and parsed back."""
+    async with db_session() as db:
+        assert await AsyncSystemSettingsService.set_setting(db, 'async_flag', {'on': True})
+        assert await AsyncSystemSettingsService.get_setting(db, 'async_flag') == {'on': True}
+        assert await AsyncSystemSettingsService.get_setting(db, 'missing', 'dflt') == 'dflt'
+
+    await dispose_async_engine()
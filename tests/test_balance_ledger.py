@@ -0,0 +1,173 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, func, select
+
+from database import balance_ledger, create_tables, get_db_session, close_db_session
+from database.models import Base, BalanceLedgerEntry, BalanceSnapshot, User, Withdrawal, WithdrawalStatus
+from database.user_cache import get_cached_user, user_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER, OTHER = 962000, 962001
+
+
+def seed_user(telegram_id, opening=0.0, withdrawals=()):
+    """A user with an opening credit and pending withdrawals; returns (user id, withdrawal ids)."""
+    create_tables()
+    db = get_db_session()
+    try:
+        user = User(telegram_user_id=telegram_id, balance=0.0)
+        db.add(user)
+        db.flush()
+        if opening:
+            balance_ledger.apply(db, user.id, opening, balance_ledger.OPENING)
+        rows = [Withdrawal(user_id=user.id, amount=amount, currency='USDT', withdrawal_address='T' * 34,
+                           withdrawal_method='TRX', status=WithdrawalStatus.PENDING) for amount in withdrawals]
+        db.add_all(rows)
+        db.commit()
+        return user.id, [w.id for w in rows]
+    finally:
+        close_db_session(db)
+
+
+def in_session(fn, *args, **kwargs):
+    """Run ``fn(db, ...)`` in its own transaction; the result, or the exception it raised."""
+    db = get_db_session()
+    try:
+        result = fn(db, *args, **kwargs)
+        db.commit()
+        return result
+    except Exception as e:
+        db.rollback()
+        return e
+    finally:
+        close_db_session(db)
+
+
+def balances(user_id):
+    db = get_db_session()
+    try:
+        return db.get(User, user_id).balance, balance_ledger.ledger_balance(db, user_id)
+    finally:
+        close_db_session(db)
+
+
+def test_debits_never_overdraw_and_refunds_follow_debits():
+    user_id, (first, second, third) = seed_user(USER, opening=10.0, withdrawals=(6.0, 6.0, 2.0))
+    user_cache.clear()
+    assert get_cached_user(USER).balance == 10.0
+
+    assert in_session(balance_ledger.approve_withdrawal, first)['balance'] == 4.0
+    assert get_cached_user(USER).balance == 4.0  # The bulk UPDATE invalidated the cache
+    assert isinstance(in_session(balance_ledger.approve_withdrawal, first), balance_ledger.WithdrawalConflict)
+    short = in_session(balance_ledger.approve_withdrawal, second)
+    assert isinstance(short, balance_ledger.InsufficientBalance) and short.balance == 4.0
+
+    # The failed approval rolled back with its debit: still pending
+    assert in_session(lambda db: db.get(Withdrawal, second).status) == WithdrawalStatus.PENDING
+    rejected = in_session(balance_ledger.reject_withdrawal, second)
+    assert not rejected['refunded'] and rejected['balance'] == 4.0
+    refunded = in_session(balance_ledger.reject_withdrawal, first)
+    assert refunded['refunded'] and refunded['balance'] == 10.0
+    assert isinstance(in_session(balance_ledger.reject_withdrawal, first), balance_ledger.WithdrawalConflict)
+    # A stale "Mark as Paid" cannot pay out a refunded or never-debited withdrawal
+    for rejected_id in (first, second):
+        assert isinstance(in_session(balance_ledger.complete_withdrawal, rejected_id), balance_ledger.WithdrawalConflict)
+        assert in_session(lambda db: db.get(Withdrawal, rejected_id).status) == WithdrawalStatus.REJECTED
+
+    assert in_session(balance_ledger.set_balance, user_id, 3.5) == 3.5
+    assert in_session(balance_ledger.approve_withdrawal, third)['balance'] == 1.5
+    assert in_session(balance_ledger.complete_withdrawal, third)['amount'] == 2.0
+    assert isinstance(in_session(balance_ledger.complete_withdrawal, third), balance_ledger.WithdrawalConflict)
+    assert isinstance(in_session(balance_ledger.reject_withdrawal, third), balance_ledger.WithdrawalConflict)
+    assert balances(user_id) == (1.5, 1.5)
+    kinds = in_session(lambda db: db.execute(
+        select(BalanceLedgerEntry.kind).where(BalanceLedgerEntry.user_id == user_id).order_by(BalanceLedgerEntry.id)
+    ).scalars().all())
+    assert kinds == ['OPENING', 'WITHDRAWAL', 'WITHDRAWAL_REFUND', 'ADJUSTMENT', 'WITHDRAWAL']
+
+
+def test_parallel_approvals_and_credits_lose_no_updates():
+    """Two leaders race on every withdrawal while sales credit the same user."""
+    amounts = [5.0] * 40
+    user_id, withdrawal_ids = seed_user(OTHER, opening=100.0, withdrawals=amounts)
+    sellers, credits_each = 4, 8
+    credits = sellers * credits_each
+    start = threading.Barrier(8)
+
+    def leader(ids):
+        start.wait()
+        return [in_session(balance_ledger.approve_withdrawal, wid) for wid in ids]
+
+    def seller(count):
+        start.wait()
+        return [in_session(balance_ledger.apply, user_id, 1.0, balance_ledger.SALE) for _ in range(count)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        jobs = [pool.submit(leader, withdrawal_ids[i::2]) for i in range(2)]
+        jobs += [pool.submit(leader, list(reversed(withdrawal_ids[i::2]))) for i in range(2)]
+        jobs += [pool.submit(seller, credits_each) for _ in range(sellers)]
+        results = [result for job in jobs for result in job.result()]
+
+    unexpected = [r for r in results if isinstance(r, Exception)
+                  and not isinstance(r, (balance_ledger.WithdrawalConflict, balance_ledger.InsufficientBalance))]
+    assert not unexpected, unexpected
+
+    db = get_db_session()
+    try:
+        approved = db.execute(select(func.count()).select_from(Withdrawal).where(
+            Withdrawal.user_id == user_id, Withdrawal.status == WithdrawalStatus.APPROVED)).scalar()
+        debits = db.execute(select(func.count()).select_from(BalanceLedgerEntry).where(
+            BalanceLedgerEntry.user_id == user_id, BalanceLedgerEntry.kind == balance_ledger.WITHDRAWAL)).scalar()
+        sales = db.execute(select(func.count()).select_from(BalanceLedgerEntry).where(
+            BalanceLedgerEntry.user_id == user_id, BalanceLedgerEntry.kind == balance_ledger.SALE)).scalar()
+    finally:
+        close_db_session(db)
+
+    assert approved == debits  # Every approval debited exactly once
+    assert sales == credits
+    balance, rebuilt = balances(user_id)
+    assert balance == pytest.approx(100.0 + credits - 5.0 * approved) == pytest.approx(rebuilt)
+    assert balance >= 0
+
+
+def test_snapshots_keep_the_rebuilt_balance():
+    user_id, _ = seed_user(USER + 10, opening=7.0)
+    assert balance_ledger.take_snapshots() >= 1
+    assert balance_ledger.take_snapshots() == 0  # Nothing moved since
+    in_session(balance_ledger.apply, user_id, -2.0, balance_ledger.ADJUSTMENT)
+
+    db = get_db_session()
+    try:
+        snapshot = db.get(BalanceSnapshot, user_id)
+        assert snapshot.balance == 7.0
+        assert balance_ledger.ledger_balance(db, user_id) == 5.0
+    finally:
+        close_db_session(db)
+    assert balance_ledger.take_snapshots() == 1
+    assert balances(user_id) == (5.0, 5.0)
+
+
+def test_migration_opens_existing_balances(tmp_path, monkeypatch):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    legacy = create_engine(url)
+    Base.metadata.create_all(legacy)
+    with legacy.begin() as conn:
+        conn.exec_driver_sql('DROP TABLE balance_snapshots')
+        conn.exec_driver_sql('DROP TABLE balance_ledger')
+        conn.exec_driver_sql("INSERT INTO users (telegram_user_id, balance) VALUES (1, 12.5), (2, 0)")
+
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'alembic'))
+    config.set_main_option('sqlalchemy.url', url)
+    command.upgrade(config, 'head')
+
+    with legacy.connect() as conn:
+        rows = conn.exec_driver_sql('SELECT user_id, amount, balance_after, kind FROM balance_ledger').all()
+    assert rows == [(1, 12.5, 12.5, 'OPENING')]
+    legacy.dispose()
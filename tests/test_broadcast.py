@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from telegram.error import Forbidden, RetryAfter
+
+from database import create_tables, db_session, dispose_async_engine, get_db_session, close_db_session
+from database.models import BroadcastJob, User
+from services.broadcast import BROADCAST_MAX_ATTEMPTS, BroadcastEngine
+from utils.rate_limiter import TelegramRateLimiter
+
+LEADER_IDS = [940001, 940002, 940003, 940004, 940005]
+
+
+class FakeBot:
+    """Records deliveries; scripted chats raise once or always."""
+
+    def __init__(self, flood_once=(), blocked=()):
+        self.flood_once = set(flood_once)
+        self.blocked = set(blocked)
+        self.delivered = []
+        self.edits = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.flood_once:
+            self.flood_once.discard(chat_id)
+            raise RetryAfter(0.01)
+        if chat_id in self.blocked:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        self.delivered.append(chat_id)
+
+    async def edit_message_text(self, *args, **kwargs):
+        self.edits += 1
+
+
+@pytest.fixture
+def leaders():
+    create_tables()
+    db = get_db_session()
+    try:
+        for tg_id in LEADER_IDS:
+            if not db.query(User).filter(User.telegram_user_id == tg_id).first():
+                db.add(User(telegram_user_id=tg_id, is_leader=True))
+        db.commit()
+        return [tg for (tg,) in db.query(User.telegram_user_id).filter(User.is_leader == True).order_by(User.id)]
+    finally:
+        close_db_session(db)
+
+
+def make_engine(bot):
+    return BroadcastEngine(bot, limiter=TelegramRateLimiter(rate=1000, per_chat_interval=0),
+                           concurrency=3, page_size=2, progress_interval=0)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_pages_retries_and_checkpoints(leaders):
+    bot = FakeBot(flood_once={LEADER_IDS[0]}, blocked={LEADER_IDS[1]})
+    engine = make_engine(bot)
+
+    job_id = await engine.create_job(1, 'leaders', 'hello', progress_chat_id=1, progress_message_id=2)
+    state = await engine.run(job_id)
+
+    assert state['status'] == 'COMPLETED'
+    assert sorted(bot.delivered) == sorted(tg for tg in leaders if tg != LEADER_IDS[1])
+    assert (state['sent_count'], state['blocked_count'], state['failed_count']) == (len(leaders) - 1, 1, 0)
+    assert bot.edits >= 2  # progress plus the final summary
+
+    async with db_session() as db:
+        job = await db.get(BroadcastJob, job_id)
+        max_id = (await db.execute(select(User.id).where(User.is_leader == True).order_by(User.id.desc()))).scalar()
+        assert (job.status, job.total_recipients, job.last_user_id) == ('COMPLETED', len(leaders), max_id)
+    await dispose_async_engine()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_broadcast_resumes_from_cursor(leaders):
+    bot = FakeBot()
+    engine = make_engine(bot)
+
+    job_id = await engine.create_job(1, 'leaders', 'resume me')
+    async with db_session() as db:
+        ids = (await db.execute(select(User.id).where(User.is_leader == True).order_by(User.id))).scalars().all()
+        job = await db.get(BroadcastJob, job_id)
+        job.status, job.total_recipients, job.last_user_id, job.sent_count = 'RUNNING', len(ids), ids[1], 2
+        await db.commit()
+
+    assert job_id in await engine.resume_unfinished()
+    state = await engine._tasks[job_id]
+
+    assert bot.delivered == leaders[2:]
+    assert state['sent_count'] == len(leaders)
+    await dispose_async_engine()
+
+
+@pytest.mark.asyncio
+async def test_second_process_skips_a_leased_broadcast(leaders):
+    first_bot, second_bot = FakeBot(), FakeBot()
+    first, second = make_engine(first_bot), make_engine(second_bot)
+
+    job_id = await first.create_job(1, 'leaders', 'only once')
+    assert await first._claim(job_id)  # First process is mid-send
+
+    assert job_id not in await second.resume_unfinished()
+    assert await second.run(job_id) is None
+    assert second_bot.delivered == []
+
+    # The first process dies: once its lease runs out the job is taken over
+    async with db_session() as db:
+        job = await db.get(BroadcastJob, job_id)
+        job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        await db.commit()
+
+    assert job_id in await second.resume_unfinished()
+    state = await second._tasks[job_id]
+    assert state['status'] == 'COMPLETED' and sorted(second_bot.delivered) == sorted(leaders)
+    assert await first.run(job_id) is None and first_bot.delivered == []
+    await dispose_async_engine()
+
+
+@pytest.mark.asyncio
+async def test_flood_waits_do_not_use_up_attempts():
+    class FloodingBot(FakeBot):
+        """Flood control on the first sends, more times than there are attempts."""
+
+        def __init__(self, floods):
+            super().__init__()
+            self.floods = floods
+
+        async def send_message(self, chat_id, text, **kwargs):
+            if self.floods:
+                self.floods -= 1
+                raise RetryAfter(0.001)
+            await super().send_message(chat_id, text, **kwargs)
+
+    bot = FloodingBot(floods=BROADCAST_MAX_ATTEMPTS * 2)
+    assert await make_engine(bot)._send_one(LEADER_IDS[0], 'hello') == 'sent'
+    assert bot.delivered == [LEADER_IDS[0]]
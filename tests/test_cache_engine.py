@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database import create_tables, get_db_session, close_db_session
+from database.operations import SystemSettingsService
+from utils.cache_engine import CacheEngine
+
+
+def test_lru_bound_negative_caching_and_stats():
+    engine = CacheEngine()
+    cache = engine.namespace('test', ttl=60, maxsize=2, negative_ttl=0.05)
+    calls = []
+
+    def loader(key):
+        def load():
+            calls.append(key)
+            return None if key == 'missing' else key.upper()
+        return load
+
+    assert cache.get_or_load('a', loader('a')) == 'A'
+    assert cache.get_or_load('missing', loader('missing')) is None
+    assert cache.get_or_load('missing', loader('missing')) is None  # Cached miss
+    assert cache.get_or_load('a', loader('a')) == 'A'
+    cache.get_or_load('b', loader('b'))  # Evicts 'missing', the least recently used
+    assert calls == ['a', 'missing', 'b']
+    time.sleep(0.06)
+    cache.get_or_load('missing', loader('missing'))
+    assert calls == ['a', 'missing', 'b', 'missing']
+
+    stats = engine.stats()['test']
+    assert stats['hits'] == 2 and stats['misses'] == 4 and stats['evictions'] == 2
+    assert stats['hit_rate'] == pytest.approx(2 / 6)
+    assert engine.namespace('test', ttl=1) is cache  # Existing namespaces keep their settings
+
+
+def test_concurrent_misses_share_one_load():
+    cache = CacheEngine().namespace('flight', ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        first = pool.submit(cache.get_or_load, 'hot', slow_load)
+        assert started.wait(5)
+        waiters = [pool.submit(cache.get_or_load, 'hot', slow_load) for _ in range(7)]
+        time.sleep(0.05)
+        release.set()
+        assert [f.result() for f in [first] + waiters] == [42] * 8
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_loader_errors_reach_waiters_and_are_not_cached():
+    cache = CacheEngine().namespace('errors', ttl=60)
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('k', lambda: (_ for _ in ()).throw(RuntimeError('db down')))
+    assert cache.get_or_load('k', lambda: 'ok') == 'ok'
+    assert cache.stats()['load_errors'] == 1
+
+
+def test_stale_values_are_served_while_one_refresh_runs():
+    cache = CacheEngine().namespace('swr', ttl=0.05, stale_ttl=60)
+    refreshed, release = threading.Event(), threading.Event()
+    versions = iter(['v1', 'v2'])
+
+    def load():
+        value = next(versions)
+        if value == 'v2':
+            release.wait(5)
+            refreshed.set()
+        return value
+
+    assert cache.get_or_load('k', load) == 'v1'
+    time.sleep(0.06)
+    # Expired: every caller gets the old value at once, and only one refresh starts
+    assert [cache.get_or_load('k', load) for _ in range(5)] == ['v1'] * 5
+    release.set()
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if cache.get('k') == 'v2':
+            break
+        time.sleep(0.01)
+    assert cache.get_or_load('k', load) == 'v2'
+    assert cache.stats()['stale_hits'] == 5 and cache.stats()['loads'] == 2
+
+
+def test_invalidate_discards_loads_in_flight():
+    cache = CacheEngine().namespace('inval', ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def old_load():
+        started.set()
+        release.wait(5)
+        return 'old'
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(cache.get_or_load, 'k', old_load)
+        assert started.wait(5)
+        cache.invalidate('k')
+        release.set()
+        assert pending.result() == 'old'  # Its caller still gets what it loaded
+    assert cache.get_or_load('k', lambda: 'new') == 'new'
+
+
+def test_runtime_settings_snapshot_loads_all_settings_at_once():
+    from utils import runtime_settings
+
+    create_tables()
+    runtime_settings._drop_settings_caches()
+    misses = runtime_settings._snapshot_cache.stats()['misses']
+    for _ in range(3):
+        assert runtime_settings.get_config_value(setting_key='no_such_setting_xyz', default='dflt') == 'dflt'
+        runtime_settings.get_support_settings()
+        runtime_settings.get_verification_channels()
+    assert runtime_settings._snapshot_cache.stats()['misses'] == misses + 1
+
+    db = get_db_session()
+    try:
+        SystemSettingsService.set_setting(db, 'cache_test_setting', 'on')
+        SystemSettingsService.set_setting(db, 'support_email', 'help@example.com')
+        SystemSettingsService.set_setting(db, 'sale_price_defaults', {'avg': 30})
+    finally:
+        close_db_session(db)
+    snapshot = runtime_settings.get_settings_snapshot()
+    assert snapshot.get('cache_test_setting') == 'on'
+    assert snapshot.support['email'] == 'help@example.com'
+    assert snapshot.support['response_time'] == runtime_settings.DEFAULT_SUPPORT_CONFIG['response_time']
+    assert dict(snapshot.sale_price_defaults) == {'min': 15.0, 'max': 35.0, 'avg': 30}
+    assert [c['username'] for c in snapshot.verification_channels] == [
+        c['username'] for c in runtime_settings.DEFAULT_VERIFICATION_CHANNELS]
+    with pytest.raises(TypeError):
+        snapshot.support['email'] = 'x'  # Shared between readers, so read-only
+
+    db = get_db_session()
+    try:
+        SystemSettingsService.delete_setting(db, 'support_email')
+        SystemSettingsService.delete_setting(db, 'sale_price_defaults')
+    finally:
+        close_db_session(db)
+    assert runtime_settings.get_support_settings()['email'] == runtime_settings.DEFAULT_SUPPORT_CONFIG['email']
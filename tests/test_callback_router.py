@@ -0,0 +1,81 @@
+import pytest
+from telegram import CallbackQuery, Update, User
+from telegram.ext import Application, CallbackContext, CallbackQueryHandler, ConversationHandler
+
+from handlers.callback_router import CallbackRouter, check_callback_routes, get_callback_router
+
+
+def make_update(data):
+    user = User(id=7, first_name='Test', is_bot=False)
+    return Update(update_id=1, callback_query=CallbackQuery(id='q', from_user=user, chat_instance='c', data=data))
+
+
+async def noop(update, context):
+    return None
+
+
+@pytest.mark.asyncio
+async def test_routes_exact_and_parameterized_data():
+    application = Application.builder().token('123:TEST').build()
+    router = CallbackRouter()
+    calls = []
+
+    async def record(update, context):
+        calls.append((update.callback_query.data, context.callback_args))
+
+    router.add('admin_panel', record)
+    router.add('approve_sale_{sale_log_id:int}', record)
+    router.add('approve_sale_list', record)
+    router.add('leader_{action:rest}', record)
+    router.add('leader_stats_{period}', record)
+
+    for data in ['admin_panel', 'approve_sale_42', 'approve_sale_list', 'leader_reports', 'leader_stats_week']:
+        update = make_update(data)
+        check = router.check_update(update)
+        await router.handle_update(update, application, check, CallbackContext.from_update(update, application))
+
+    assert calls == [
+        ('admin_panel', {}),
+        ('approve_sale_42', {'sale_log_id': 42}),
+        ('approve_sale_list', {}),
+        ('leader_reports', {'action': 'reports'}),
+        ('leader_stats_week', {'period': 'week'}),
+    ]
+    assert router.check_update(make_update('approve_sale_x')) is None
+    assert router.check_update(make_update('unknown')) is None
+
+    with pytest.raises(ValueError):
+        router.add('approve_sale_{sale_log_id:int}', noop)
+
+
+def test_startup_check_reports_shadowed_handlers():
+    application = Application.builder().token('123:TEST').build()
+    application.add_handler(ConversationHandler(
+        entry_points=[CallbackQueryHandler(noop, pattern='^start_real_selling$')], states={}, fallbacks=[]))
+    application.add_handler(CallbackQueryHandler(noop, pattern='^withdraw_'))
+    router = get_callback_router(application)
+    router.add('start_real_selling', noop)
+    router.add('withdraw_menu', noop)
+    router.add('balance', noop)
+    application.add_handler(router)
+    application.add_handler(CallbackQueryHandler(noop, pattern='^analytics_'))
+
+    problems = check_callback_routes(application)
+    assert len(problems) == 3
+    assert "route 'start_real_selling'" in problems[0] and 'unreachable' in problems[0]
+    assert "route 'withdraw_menu'" in problems[1] and 'unreachable' in problems[1]
+    assert "'^analytics_'" in problems[2] and 'callback router fallback' in problems[2]
+
+
+def test_bot_handlers_have_no_shadowed_callbacks(monkeypatch):
+    monkeypatch.setenv('API_ID', '1')
+    monkeypatch.setenv('API_HASH', 'test')
+    from handlers import setup_all_handlers
+
+    application = Application.builder().token('123:TEST').build()
+    setup_all_handlers(application)
+
+    assert check_callback_routes(application) == []
+    router = get_callback_router(application)
+    assert router.resolve('approve_withdrawal_5')[1] == {'withdrawal_id': 5}
+    assert router.resolve('mark_paid_5')[0].callback.__module__ == 'handlers.leader_handlers'
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from services.captcha_pool import CAPTCHA_ALPHABET, CAPTCHA_LENGTH, CaptchaPool
+
+PNG = b'\x89PNG'
+
+
+async def wait_for_level(pool, level, timeout=30.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while pool.stats()['buffered'] < level:
+        assert asyncio.get_running_loop().time() < deadline, pool.stats()
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_pool_fills_serves_and_refills_below_low_water():
+    pool = CaptchaPool(size=6, low_water=3, workers=2)
+    pool.start()
+    try:
+        await wait_for_level(pool, 6)
+        assert pool.stats()['mode'] == 'processes'
+
+        challenges = [await pool.take() for _ in range(4)]
+        for challenge in challenges:
+            assert challenge.image_bytes.startswith(PNG)
+            assert len(challenge.text) == CAPTCHA_LENGTH and set(challenge.text) <= set(CAPTCHA_ALPHABET)
+            assert challenge.answer == challenge.text.lower()
+        assert len({c.text for c in challenges}) > 1
+
+        await wait_for_level(pool, 6)  # Dropped below the low-water mark, so it refilled
+        stats = pool.stats()
+        assert stats['hits'] == 4 and stats['misses'] == 0 and stats['hit_rate'] == 1.0
+        assert stats['rendered'] == 10 and stats['render_errors'] == 0 and stats['avg_render_ms'] > 0
+    finally:
+        await pool.stop()
+    assert pool.stats()['mode'] == 'stopped'
+
+
+@pytest.mark.asyncio
+async def test_empty_pool_renders_on_demand_without_blocking_the_loop():
+    pool = CaptchaPool(size=2, use_processes=False)  # Not started: renders in the default executor
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    beat = asyncio.create_task(ticker())
+    challenges = await asyncio.gather(*(pool.take() for _ in range(4)))
+    beat.cancel()
+    assert all(c.image_bytes.startswith(PNG) for c in challenges)
+    assert pool.stats()['misses'] == 4 and pool.stats()['hits'] == 0
+    assert ticks > 4  # The loop kept running while the images rendered
+
+
+@pytest.mark.asyncio
+async def test_captcha_service_draws_from_the_pool():
+    from services.captcha import CaptchaService
+
+    data = await CaptchaService().generate_captcha()
+    assert data['type'] == 'visual' and data['image_bytes'].startswith(PNG)
+    assert data['answer'] == data['captcha_text'].lower()
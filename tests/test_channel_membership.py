@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.channel_membership import MembershipChecker, channel_chat_id
+
+CHANNELS = [
+    {'name': 'Updates', 'username': 'updates'},
+    {'name': 'Community', 'link': 'https://t.me/community/'},
+    {'name': 'Private', 'id': -1001},
+    {'name': 'Broken'},
+]
+
+
+class FakeBot:
+    """Answers get_chat_member after ``delay``, from ``statuses[chat_id]``."""
+
+    def __init__(self, statuses, delay=0.05):
+        self.statuses = statuses
+        self.delay = delay
+        self.calls = []
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls.append(chat_id)
+        await asyncio.sleep(self.delay)
+        status = self.statuses[chat_id]
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(status=status, is_member=False)
+
+
+def test_channel_chat_ids():
+    assert [channel_chat_id(c) for c in CHANNELS] == ['@updates', '@community', '-1001', None]
+
+
+@pytest.mark.asyncio
+async def test_channels_are_checked_concurrently_and_positives_cached():
+    bot = FakeBot({'@updates': 'member', '@community': 'left', '-1001': 'administrator'}, delay=0.1)
+    checker = MembershipChecker(ttl=60)
+
+    started = asyncio.get_running_loop().time()
+    assert await checker.check_all(bot, 1, CHANNELS) == [True, False, True, False]
+    assert asyncio.get_running_loop().time() - started < 0.25  # Not 3 x 0.1s in a row
+
+    # Only the channel the user was missing is asked again, and joining shows up at once
+    bot.statuses['@community'] = 'member'
+    assert await checker.check_all(bot, 1, CHANNELS) == [True, True, True, False]
+    assert sorted(bot.calls) == sorted(['@updates', '@community', '-1001', '@community'])
+    assert await checker.check_all(bot, 2, CHANNELS[:1]) == [True]  # Other users are not affected
+
+    stats = checker.stats()
+    assert stats['checks'] == 5 and stats['hits'] == 2 and stats['cached'] == 4
+
+    checker.forget(1, '@UPDATES')
+    bot.statuses['@updates'] = 'kicked'
+    assert await checker.check_all(bot, 1, CHANNELS[:1]) == [False]
+
+
+@pytest.mark.asyncio
+async def test_double_taps_share_one_check_and_errors_are_not_cached():
+    bot = FakeBot({'@updates': RuntimeError('flood wait'), '@community': 'restricted'})
+    checker = MembershipChecker(ttl=60)
+
+    first, second = await asyncio.gather(
+        checker.check_all(bot, 7, CHANNELS[:2]), checker.check_all(bot, 7, CHANNELS[:2])
+    )
+    assert first == second == [False, False]
+    assert len(bot.calls) == 2 and checker.stats()['coalesced'] == 2
+    assert checker.stats()['errors'] == 1
+
+    bot.statuses['@updates'] = 'creator'
+    assert await checker.check_all(bot, 7, CHANNELS[:1]) == [True]  # The failure was retried
+
+
+@pytest.mark.asyncio
+async def test_verifier_reports_missing_channels():
+    from services.captcha import ChannelJoinVerifier
+
+    bot = FakeBot({'@updates': 'member', '@community': 'left'}, delay=0)
+    channels = [dict(c, username=c.get('username') or 'community', description='') for c in CHANNELS[:2]]
+    result = await ChannelJoinVerifier().verify_all_channels(bot, 99, channels)
+    assert result['all_joined'] is False
+    assert [r['channel'] for r in result['missing_channels']] == ['Community']
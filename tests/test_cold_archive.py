@@ -0,0 +1,51 @@
+import shutil
+from datetime import datetime, timedelta
+
+from database import close_db_session, create_tables, engine, get_db_session
+from database.cold_archive import ARCHIVE_SOURCES, archive_table, archived_days, read_archive
+from database.models import AccountSale, ActivityLog
+
+
+def test_old_rows_move_to_daily_archive_files(tmp_path):
+    create_tables()
+    now = datetime.utcnow()
+    day_one = (now - timedelta(days=170)).replace(hour=8, minute=0, second=0, microsecond=0)
+    day_two = day_one + timedelta(days=1, hours=1, minutes=30)
+
+    db = get_db_session()
+    try:
+        db.add_all([ActivityLog(action_type='TEST_ARCHIVE', description=f'old {i}', created_at=day_one) for i in range(3)])
+        db.add(ActivityLog(action_type='TEST_ARCHIVE', description='old other day', extra_data='{"n": 1}', created_at=day_two))
+        db.add(ActivityLog(action_type='TEST_ARCHIVE', description='recent', created_at=now - timedelta(days=1)))
+        db.add_all([
+            AccountSale(account_id=1, seller_id=1, sale_price=1.5, status='COMPLETED', created_at=day_one - timedelta(days=400)),
+            AccountSale(account_id=2, seller_id=1, sale_price=2.5, status='PENDING', created_at=day_one - timedelta(days=400)),
+        ])
+        db.commit()
+    finally:
+        close_db_session(db)
+
+    root = str(tmp_path)
+    activity = ARCHIVE_SOURCES['activity_logs']
+    assert archive_table(activity, engine, root, batch_size=2, pause=0, now=now) >= 4
+    assert 'account_sales' not in ARCHIVE_SOURCES  # All-time sale figures still read the hot table
+
+    db = get_db_session()
+    try:
+        hot = [a.description for a in db.query(ActivityLog).filter(ActivityLog.action_type == 'TEST_ARCHIVE')]
+        assert hot == ['recent']
+        assert sorted(s.status for s in db.query(AccountSale).filter(AccountSale.seller_id == 1)) == ['COMPLETED', 'PENDING']
+    finally:
+        close_db_session(db)
+
+    assert {day_one.date(), day_two.date()} <= set(archived_days('activity_logs', root))
+
+    # A batch archived twice (crash before its delete) is read back once
+    folder = tmp_path / 'activity_logs' / f'{day_one:%Y}' / f'{day_one:%m}' / f'{day_one:%d}'
+    part = sorted(folder.iterdir())[0]
+    shutil.copy(part, folder / 'part-0.jsonl.gz')
+
+    rows = list(read_archive('activity_logs', day_one.date() - timedelta(days=1), day_two.date(),
+                             where=lambda row: row['action_type'] == 'TEST_ARCHIVE', root=root))
+    assert sorted(row['description'] for row in rows) == ['old 0', 'old 1', 'old 2', 'old other day']
+    assert rows[-1]['created_at'] == day_two.isoformat() and rows[-1]['extra_data'] == '{"n": 1}'
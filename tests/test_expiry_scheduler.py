@@ -0,0 +1,96 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import close_db_session, create_tables, get_db_session
+from database.models import AccountStatus, NotificationOutbox, TelegramAccount, User
+from database.operations import TelegramAccountService
+from services.account_management import AccountManagementService
+from services.expiry_scheduler import ExpiryScheduler, TimerWheel
+
+ADMIN, OWNER = 961000, 961001
+
+
+def test_timer_wheel_fires_in_deadline_order():
+    wheel = TimerWheel(tick=1.0, slots=60, now=1000.0)
+    assert wheel.add('a', 1010.5) and wheel.add('b', 1003.2) and wheel.add('late', 995.0)
+    assert not wheel.add('beyond', 1060.0)  # Past one turn: left to the next reload
+    assert wheel.next_deadline() == 995.0
+
+    assert wheel.pop_due(1003.1) == ['late']
+    assert wheel.next_deadline() == 1003.2
+    wheel.add('b', 1020.0)  # Re-scheduling replaces the old deadline
+    assert wheel.pop_due(1010.5) == ['a'] and len(wheel) == 1
+    assert wheel.add('wrapped', 1065.0)  # The turn moved on with the cursor
+    assert wheel.pop_due(2000.0) == ['b', 'wrapped'] and wheel.next_deadline() is None
+
+
+def seed_accounts():
+    """An admin, an owner and three of the owner's accounts; returns (admin id, account ids)."""
+    create_tables()
+    db = get_db_session()
+    try:
+        admin, owner = User(telegram_user_id=ADMIN, first_name='Admin'), User(telegram_user_id=OWNER)
+        db.add_all([admin, owner])
+        db.flush()
+        accounts = [TelegramAccount(seller_id=owner.id, phone_number=f'+1000{OWNER}{i}', status=AccountStatus.AVAILABLE)
+                    for i in range(3)]
+        db.add_all(accounts)
+        db.commit()
+        return admin.id, [account.id for account in accounts]
+    finally:
+        close_db_session(db)
+
+
+def account_states(account_ids):
+    db = get_db_session()
+    try:
+        rows = db.query(TelegramAccount).filter(TelegramAccount.id.in_(account_ids)).order_by(TelegramAccount.id)
+        return [(a.status, a.freeze_until, a.hold_until) for a in rows]
+    finally:
+        close_db_session(db)
+
+
+@pytest.mark.asyncio
+async def test_freezes_and_holds_release_at_their_deadline():
+    admin_id, (timed, indefinite, held) = seed_accounts()
+    scheduler = ExpiryScheduler(horizon=3600)
+    scheduler.start()
+    try:
+        db = get_db_session()
+        try:
+            assert AccountManagementService.freeze_account(db, timed, 'test', admin_id, duration_hours=1)['success']
+            assert AccountManagementService.freeze_account(db, indefinite, 'test', admin_id)['success']
+            assert TelegramAccountService.set_account_hold(db, held, hold_hours=1)['success']
+            # Bring the deadlines forward to just after now
+            deadline = datetime.utcnow() + timedelta(seconds=0.3)
+            db.query(TelegramAccount).filter(TelegramAccount.id == timed).update({'freeze_until': deadline})
+            db.query(TelegramAccount).filter(TelegramAccount.id == held).update({'hold_until': deadline})
+            db.commit()
+        finally:
+            close_db_session(db)
+        scheduler.schedule('freeze', timed, deadline)
+        scheduler.schedule('hold', held, deadline)
+
+        started = time.monotonic()
+        while account_states([timed, held])[0][0] == 'FROZEN' or account_states([held])[0][0] != 'AVAILABLE':
+            assert time.monotonic() - started < 5, account_states([timed, held])
+            await asyncio.sleep(0.05)
+    finally:
+        await scheduler.stop()
+
+    assert account_states([timed, indefinite, held]) == [
+        ('AVAILABLE', None, None),
+        ('FROZEN', None, None),  # No duration, no deadline
+        ('AVAILABLE', None, None),
+    ]
+    db = get_db_session()
+    try:
+        notices = db.query(NotificationOutbox).filter(NotificationOutbox.chat_id == OWNER).all()
+        assert [n.dedup_key.split(':')[:2] for n in notices] == [['account_unfrozen', str(timed)]]
+        db.query(NotificationOutbox).filter(NotificationOutbox.chat_id == OWNER).delete()  # Not for other tests' workers
+        db.commit()
+    finally:
+        close_db_session(db)
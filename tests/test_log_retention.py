@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from database import close_db_session, cold_archive, create_tables, engine, get_db_session
+from database.log_retention import LOG_TABLES, purge_in_chunks, run_log_retention
+from database.models import ActivityLog, SessionLog
+
+
+def test_chunked_purge_keeps_recent_rows_and_open_sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(cold_archive, 'ARCHIVE_DIR', str(tmp_path))
+    create_tables()
+    now = datetime.utcnow()
+    old = now - timedelta(days=200)
+
+    db = get_db_session()
+    try:
+        db.add_all([ActivityLog(action_type='TEST_RETENTION', description=f'old {i}', created_at=old) for i in range(5)])
+        db.add(ActivityLog(action_type='TEST_RETENTION', description='recent', created_at=now))
+        db.add_all([
+            SessionLog(session_hash='test-retention-open', status='ACTIVE', created_at=old),
+            SessionLog(session_hash='test-retention-closed', status='TERMINATED', created_at=old),
+            SessionLog(session_hash='test-retention-recent', status='TERMINATED', created_at=now),
+        ])
+        db.commit()
+    finally:
+        close_db_session(db)
+
+    cutoff = now - timedelta(days=90)
+    assert purge_in_chunks(engine, LOG_TABLES['activity_logs'], cutoff, chunk_size=2, pause=0) == 5
+
+    result = run_log_retention(retention_days=90)
+    assert result['activity_logs'] == {'mode': 'chunked', 'deleted_rows': 0, 'seconds': result['activity_logs']['seconds']}
+    assert result['session_logs']['deleted_rows'] == 1
+
+    db = get_db_session()
+    try:
+        assert [a.description for a in db.query(ActivityLog).filter(ActivityLog.action_type == 'TEST_RETENTION')] == ['recent']
+        remaining = {s.session_hash for s in db.query(SessionLog).filter(SessionLog.session_hash.like('test-retention-%'))}
+        assert remaining == {'test-retention-open', 'test-retention-recent'}
+    finally:
+        close_db_session(db)
@@ -0,0 +1,28 @@
+from locales import locale_manager
+from locales.catalog import MessageCatalog
+from services.translation_service import translation_service
+
+
+def test_compiled_catalog_matches_legacy_lookups():
+    """Fallback, sections, formatting and missing keys behave as before."""
+    assert locale_manager.get_message('buttons.lfg', 'ru') != 'Missing translation: buttons.lfg'
+    assert locale_manager.get_message('buttons', 'en') == 'Invalid translation: buttons'
+    assert locale_manager.get_message('no.such.key') == 'Missing translation: no.such.key'
+
+    # Interface strings: unknown language and missing key fall back to English
+    assert translation_service.get_text('already_sold', 'de') == translation_service.get_text('already_sold', 'en')
+    assert translation_service.get_text('check_balance', 'xx') == translation_service.get_text('check_balance')
+    assert translation_service.get_text('nope') == '[Missing: nope]'
+
+
+def test_validation_reports_placeholder_mismatch():
+    catalog = MessageCatalog.compile([
+        ({
+            'en': {'greet': 'Hi {name}, {count} new', 'only_en': 'x'},
+            'es': {'greet': 'Hola {nombre}'},
+        }, ''),
+    ])
+    assert catalog.get('greet', 'en').render({'name': 'Bo', 'count': 2}) == 'Hi Bo, 2 new'
+    assert catalog.get('only_en', 'es').source == 'x'
+    assert any('es:greet: placeholders' in p for p in catalog.problems)
+    assert any('es: 1 keys fall back' in p for p in catalog.problems)
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from database import create_tables, db_session, dispose_async_engine, get_db_session, close_db_session
+from database.models import AccountStatus, NotificationOutbox, TelegramAccount, User
+from services.account_management import AccountManagementService
+from utils.notification_outbox import OutboxWorker, aenqueue
+from utils.rate_limiter import TelegramRateLimiter
+
+OK, FLOOD, BLOCKED, FLAKY = 960001, 960002, 960003, 960004
+
+
+class FakeBot:
+    """Records deliveries; scripted chats raise once or always."""
+
+    def __init__(self, flood_once=(), blocked=(), flaky_once=()):
+        self.flood_once = set(flood_once)
+        self.blocked = set(blocked)
+        self.flaky_once = set(flaky_once)
+        self.delivered = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.flood_once:
+            self.flood_once.discard(chat_id)
+            raise RetryAfter(0.01)
+        if chat_id in self.flaky_once:
+            self.flaky_once.discard(chat_id)
+            raise TimedOut()
+        if chat_id in self.blocked:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        self.delivered.append((chat_id, text))
+
+
+async def outbox_rows(chat_ids):
+    async with db_session() as db:
+        result = await db.execute(
+            select(NotificationOutbox.chat_id, NotificationOutbox.status, NotificationOutbox.attempts)
+            .where(NotificationOutbox.chat_id.in_(chat_ids))
+            .order_by(NotificationOutbox.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+@pytest.mark.asyncio
+async def test_outbox_dedups_retries_and_records_outcomes():
+    create_tables()
+    bot = FakeBot(flood_once={FLOOD}, blocked={BLOCKED}, flaky_once={FLAKY})
+    worker = OutboxWorker(bot, limiter=TelegramRateLimiter(rate=1000, per_chat_interval=0), concurrency=3)
+
+    await aenqueue(OK, 'sale approved', dedup_key='test:sale_approved:1')
+    await aenqueue(OK, 'sale approved', dedup_key='test:sale_approved:1')
+    for chat_id in (FLOOD, BLOCKED, FLAKY):
+        await aenqueue(chat_id, f'hello {chat_id}')
+
+    assert await worker.run_once() == 4
+    assert bot.delivered == [(OK, 'sale approved')]
+    assert await outbox_rows([OK, FLOOD, BLOCKED, FLAKY]) == [
+        (OK, 'SENT', 1),
+        (FLOOD, 'PENDING', 0),  # Flood waits are not failed attempts
+        (BLOCKED, 'FAILED', 1),
+        (FLAKY, 'PENDING', 1),
+    ]
+
+    # The flood row is due after retry_after; the flaky one only after its backoff
+    async with db_session() as db:
+        await db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.chat_id == FLOOD)
+            .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+    assert await worker.run_once() == 1
+    assert await worker.run_once() == 0
+
+    async with db_session() as db:
+        await db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.chat_id == FLAKY)
+            .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+    assert await worker.run_once() == 1
+
+    assert sorted(chat_id for chat_id, _ in bot.delivered) == [OK, FLOOD, FLAKY]
+    assert [status for _, status, _ in await outbox_rows([FLOOD, FLAKY])] == ['SENT', 'SENT']
+    await dispose_async_engine()
+
+
+@pytest.mark.asyncio
+async def test_expired_freeze_release_queues_one_notice():
+    create_tables()
+    db = get_db_session()
+    try:
+        owner = User(telegram_user_id=960100)
+        db.add(owner)
+        db.flush()
+        db.add(TelegramAccount(
+            seller_id=owner.id, phone_number='+10000960100', status=AccountStatus.FROZEN,
+            freeze_reason='test', freeze_duration_hours=1,
+            freeze_timestamp=datetime.utcnow() - timedelta(hours=2),
+            freeze_until=datetime.utcnow() - timedelta(hours=1),
+        ))
+        db.commit()
+
+        result = AccountManagementService.check_and_release_expired_freezes(db)
+        assert result['released_count'] == 1
+        # A re-run after a crash must not queue the notice twice
+        AccountManagementService._queue_unfreeze_notifications(db, result['released_accounts'])
+        db.commit()
+    finally:
+        close_db_session(db)
+
+    assert await outbox_rows([960100]) == [(960100, 'PENDING', 0)]
+    await dispose_async_engine()
@@ -0,0 +1,192 @@
+"""
+Query-plan regression suite: every hot filter in the catalogue below must be
+served by an index, never by a full table scan (or, on SQLite, a temporary
+sort for its ORDER BY).
+
+Runs against a seeded SQLite file by default, or the configured PostgreSQL when
+DATABASE_URL points at one (sequential scans are disabled there, so any
+``Seq Scan`` means no usable index exists). When a hot query changes shape,
+update its entry here together with the index in database/models.py and an
+alembic revision.
+"""
+import importlib.util
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import and_, create_engine, func, insert, or_, select
+
+from database import create_tables, engine
+from database.models import (
+    AccountSale, AccountStatus, ActivityLog, Base, TelegramAccount, User, Withdrawal, WithdrawalStatus,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATION = os.path.join(ROOT, 'alembic', 'versions', '3c9e1f0a7b21_hot_query_indexes.py')
+SEED_ROWS = 500
+TELEGRAM_ID_BASE = 6_100_000_000
+
+
+def hot_queries():
+    """name -> statement, mirroring the queries in the modules named in each comment."""
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    completed_today = and_(
+        Withdrawal.status == WithdrawalStatus.COMPLETED,
+        func.coalesce(Withdrawal.processed_at, Withdrawal.updated_at) >= today,
+    )
+    return {
+        # services/account_management.py
+        'frozen_accounts': select(TelegramAccount).where(TelegramAccount.status == AccountStatus.FROZEN)
+            .order_by(TelegramAccount.freeze_timestamp.desc()).limit(50),
+        'expired_freezes': select(TelegramAccount.id, User.telegram_user_id)
+            .outerjoin(User, User.id == TelegramAccount.seller_id)
+            .where(TelegramAccount.status == AccountStatus.FROZEN, TelegramAccount.freeze_until <= now),
+        # database/operations.py, services/expiry_scheduler.py
+        'hold_release': select(TelegramAccount.id).where(
+            TelegramAccount.status == AccountStatus.TWENTY_FOUR_HOUR_HOLD,
+            TelegramAccount.hold_until <= now),
+        # database/operations.py
+        'available_accounts': select(TelegramAccount).where(
+            TelegramAccount.status == AccountStatus.AVAILABLE.value,
+            TelegramAccount.can_be_sold == True).limit(10),
+        'pending_withdrawals': select(Withdrawal).where(Withdrawal.status == WithdrawalStatus.PENDING)
+            .order_by(Withdrawal.created_at.asc()).limit(100),
+        'user_withdrawals': select(Withdrawal).where(Withdrawal.user_id == 1)
+            .order_by(Withdrawal.created_at.desc()).limit(50),
+        'user_activity': select(ActivityLog).where(ActivityLog.user_id == 1)
+            .order_by(ActivityLog.created_at.desc()).limit(50),
+        # database/sale_log_operations.py
+        'pending_sales': select(AccountSale).where(AccountSale.status == 'PENDING')
+            .order_by(AccountSale.created_at.desc()).limit(50),
+        'sale_status_count': select(func.count()).select_from(AccountSale).where(AccountSale.status == 'COMPLETED'),
+        'frozen_sale_search': select(AccountSale)
+            .join(TelegramAccount, AccountSale.account_id == TelegramAccount.id)
+            .where(TelegramAccount.is_frozen == True)
+            .order_by(AccountSale.created_at.desc()).limit(50),
+        # handlers/reports_logs_handlers.py
+        'recent_sales': select(AccountSale).order_by(AccountSale.created_at.desc()).limit(20),
+        # handlers/leader_handlers.py
+        'leader_pending': select(Withdrawal, User).outerjoin(User, User.id == Withdrawal.user_id)
+            .where(Withdrawal.status == WithdrawalStatus.PENDING)
+            .order_by(Withdrawal.created_at.desc()).limit(10),
+        'leader_approved': select(Withdrawal, User).outerjoin(User, User.id == Withdrawal.user_id)
+            .where(Withdrawal.status == WithdrawalStatus.APPROVED)
+            .order_by(Withdrawal.updated_at.desc()).limit(10),
+        # database/withdrawal_queue.py
+        'withdrawal_claim': select(Withdrawal.id).where(
+            Withdrawal.status == WithdrawalStatus.PENDING,
+            or_(Withdrawal.claim_expires_at.is_(None), Withdrawal.claim_expires_at <= now,
+                Withdrawal.claimed_by == 1))
+            .order_by(Withdrawal.priority_at, Withdrawal.id).limit(5),
+        'leader_throughput': select(Withdrawal.claimed_by, Withdrawal.amount)
+            .where(Withdrawal.reviewed_at >= now - timedelta(hours=24), Withdrawal.claimed_by.isnot(None)),
+        'leader_queue_totals': select(func.count(), func.sum(Withdrawal.amount)).where(or_(
+            Withdrawal.status.in_([WithdrawalStatus.PENDING, WithdrawalStatus.APPROVED]),
+            completed_today,
+        )),
+    }
+
+
+def explain(conn, stmt):
+    """Plan lines for ``stmt`` on this connection's backend."""
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        return [row[0] for row in conn.exec_driver_sql(f'EXPLAIN {sql}')]
+    return [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+def full_scans(plan):
+    if any('Seq Scan on' in line for line in plan):
+        return [line for line in plan if 'Seq Scan on' in line]
+    return [line for line in plan
+            if (line.startswith('SCAN ') and 'INDEX' not in line) or line.startswith('USE TEMP B-TREE')]
+
+
+@pytest.fixture(scope='module')
+def seeded_db(tmp_path_factory):
+    """
+    A few hundred rows per hot table, with statistics gathered. SQLite gets
+    its own file so other tests' rows cannot skew the planner's statistics.
+    """
+    if engine.dialect.name == 'postgresql':
+        create_tables()
+        plan_engine = engine
+    else:
+        plan_engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+        Base.metadata.create_all(plan_engine)
+    now = datetime.utcnow()
+    statuses = ['AVAILABLE', 'SOLD', 'FROZEN', 'TWENTY_FOUR_HOUR_HOLD']
+    with plan_engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(User)
+                        .where(User.telegram_user_id >= TELEGRAM_ID_BASE)).scalar() == 0:
+            user_ids = conn.execute(insert(User).returning(User.id), [
+                {'telegram_user_id': TELEGRAM_ID_BASE + i, 'status': 'ACTIVE'} for i in range(SEED_ROWS)
+            ]).scalars().all()
+            account_ids = conn.execute(insert(TelegramAccount).returning(TelegramAccount.id), [
+                {'seller_id': user_ids[i], 'phone_number': f'+9990{TELEGRAM_ID_BASE + i}', 'status': statuses[i % 4],
+                 'is_frozen': i % 4 == 2, 'freeze_timestamp': now - timedelta(hours=i) if i % 4 == 2 else None,
+                 'freeze_until': now + timedelta(hours=i - 250) if i % 8 == 2 else None,
+                 'hold_until': now + timedelta(hours=i - 250) if i % 4 == 3 else None}
+                for i in range(SEED_ROWS)
+            ]).scalars().all()
+            conn.execute(insert(AccountSale), [
+                {'account_id': account_ids[i], 'seller_id': user_ids[i], 'sale_price': 1.0,
+                 'status': ['PENDING', 'IN_PROGRESS', 'COMPLETED', 'FAILED'][i % 4],
+                 'created_at': now - timedelta(hours=i)}
+                for i in range(SEED_ROWS)
+            ])
+            conn.execute(insert(Withdrawal), [
+                {'user_id': user_ids[i], 'amount': 1.0, 'currency': 'USDT', 'withdrawal_address': 'T' * 34,
+                 'withdrawal_method': 'TRX', 'status': {0: 'PENDING', 1: 'APPROVED', 2: 'REJECTED'}.get(i % 20, 'COMPLETED'),
+                 'created_at': now - timedelta(hours=i), 'updated_at': now - timedelta(hours=i),
+                 'reviewed_at': now - timedelta(hours=i) if i % 20 else None, 'claimed_by': user_ids[i % 5]}
+                for i in range(SEED_ROWS)
+            ])
+            conn.execute(insert(ActivityLog), [
+                {'user_id': user_ids[i % 50] if i % 3 else None, 'action_type': 'TEST_PLAN',
+                 'description': 'seed', 'created_at': now - timedelta(minutes=i)}
+                for i in range(SEED_ROWS * 4)
+            ])
+        conn.exec_driver_sql('ANALYZE')
+    yield plan_engine
+    if plan_engine is not engine:
+        plan_engine.dispose()
+
+
+@pytest.mark.parametrize('name', sorted(hot_queries()))
+def test_hot_query_uses_an_index(seeded_db, name):
+    with seeded_db.connect() as conn:
+        plan = explain(conn, hot_queries()[name])
+        conn.rollback()
+    assert not full_scans(plan), f"{name} falls back to a full scan:\n" + '\n'.join(plan)
+
+
+def test_migration_adds_the_model_indexes(tmp_path, monkeypatch):
+    """An existing database (tables without the new indexes) catches up via alembic."""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    legacy = create_engine(url)
+    Base.metadata.create_all(legacy)
+    spec = importlib.util.spec_from_file_location('hot_query_indexes', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    names = [name for name, *_ in migration.INDEXES]
+    with legacy.begin() as conn:
+        for name in names:
+            conn.exec_driver_sql(f'DROP INDEX {name}')
+
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'alembic'))
+    config.set_main_option('sqlalchemy.url', url)
+    command.upgrade(config, 'head')
+
+    with legacy.connect() as conn:
+        created = set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+    assert set(names) <= created
+    model_indexes = {index.name for table in Base.metadata.sorted_tables for index in table.indexes}
+    assert set(names) <= model_indexes
+    legacy.dispose()
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from database import create_tables, get_db_session, close_db_session
+from database.models import User
+from database.request_scope import open_scope, close_scope, query_stats
+from utils.helpers import is_leader, load_user_language
+
+
+def _make_user(telegram_id: int, **fields):
+    db = get_db_session()
+    try:
+        if not db.query(User).filter(User.telegram_user_id == telegram_id).first():
+            db.add(User(telegram_user_id=telegram_id, **fields))
+            db.commit()
+    finally:
+        close_db_session(db)
+
+
+def test_scope_loads_user_once_per_update():
+    """Language and leader lookups in one update share a single user query."""
+    create_tables()
+    _make_user(910001, language_code='es', is_leader=True)
+    context = SimpleNamespace(user_data={})
+    query_stats.reset()
+
+    scope = open_scope(context, 910001)
+    assert load_user_language(context, 910001) == 'es'
+    assert is_leader(910001, context)
+    assert is_leader(910001, context)
+    close_scope(context)
+
+    assert scope.query_count == 1
+    assert query_stats.snapshot()['updates'] == 1
+    assert context.request_scope is None
+
+
+def test_helpers_work_without_scope():
+    """Jobs and scripts without a scope still get a fresh lookup."""
+    create_tables()
+    _make_user(910002, language_code='ru')
+    assert load_user_language(SimpleNamespace(user_data={}), 910002) == 'ru'
+    assert not is_leader(910002)
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from database import create_tables, db_session, dispose_async_engine, get_db_session, close_db_session
+from database.models import DailyStat, RollupDirtyDay, User, Withdrawal
+from database.rollups import _take_dirty, load_rollups, rebuild_rollups, refresh_rollups
+from handlers.leader_handlers import LeaderPanelService
+
+
+def test_orm_writes_mark_days_and_refresh_updates_rollups():
+    """Writes mark their creation day in their transaction; a refresh drains the marks into daily_stats."""
+    create_tables()
+    db = get_db_session()
+    try:
+        rebuild_rollups(db)
+        _take_dirty(db)
+        db.commit()
+        before = load_rollups(db)
+
+        old_day = datetime.utcnow() - timedelta(days=40)
+        user = User(telegram_user_id=930001, status='ACTIVE', created_at=old_day)
+        db.add(user)
+        db.commit()
+        withdrawal = Withdrawal(user_id=user.id, amount=7.5, currency='USDT', withdrawal_address='a',
+                                withdrawal_method='TRC20', status='PENDING', created_at=old_day)
+        db.add(withdrawal)
+        db.commit()
+
+        # Status change on the withdrawal re-marks its creation day only
+        _take_dirty(db)
+        db.commit()
+        withdrawal.status = 'COMPLETED'
+        db.commit()
+        assert db.query(RollupDirtyDay.day).all() == [(old_day.date(),)]
+
+        # A rolled-back write leaves no mark behind
+        db.add(User(telegram_user_id=930002, created_at=old_day - timedelta(days=3)))
+        db.flush()
+        db.rollback()
+        assert db.query(RollupDirtyDay.day).all() == [(old_day.date(),)]
+
+        # A failed refresh keeps the marks for the next one
+        with pytest.raises(RuntimeError):
+            with patch('database.rollups._recompute_range', side_effect=RuntimeError):
+                refresh_rollups(db)
+        assert db.query(RollupDirtyDay.day).all() == [(old_day.date(),)]
+
+        refresh_rollups(db)
+        assert db.query(RollupDirtyDay).count() == 0
+        after = load_rollups(db)
+        assert after.get('signups').count() == before.get('signups').count() + 1
+        assert after.get('signups', 'month').count() == before.get('signups', 'month').count()
+        assert after.get('withdrawals').amount('COMPLETED') == before.get('withdrawals').amount('COMPLETED') + 7.5
+        assert after.get('withdrawals').count('PENDING') == before.get('withdrawals').count('PENDING')
+
+        # A full rebuild agrees with the incrementally maintained rows
+        rebuild_rollups(db)
+        rebuilt = load_rollups(db)
+        assert rebuilt.get('withdrawals').counts() == after.get('withdrawals').counts()
+        assert db.query(DailyStat).filter(DailyStat.day == old_day.date()).count() >= 2
+    finally:
+        close_db_session(db)
+
+
+@pytest.mark.asyncio
+async def test_leader_payout_stats_per_period_and_leader():
+    """Payouts are bucketed by completion time and broken down per leader."""
+    create_tables()
+    db = get_db_session()
+    try:
+        leader = User(telegram_user_id=930101, username='payout_leader', is_leader=True)
+        seller = User(telegram_user_id=930102)
+        db.add_all([leader, seller])
+        db.commit()
+        now = datetime.utcnow()
+        for amount, completed_at, status in ((10.0, now, 'COMPLETED'), (30.0, now - timedelta(days=20), 'COMPLETED'),
+                                              (99.0, now, 'PENDING')):
+            db.add(Withdrawal(user_id=seller.id, amount=amount, currency='USDT', withdrawal_address='a',
+                              withdrawal_method='TRC20', status=status, assigned_leader_id=leader.id,
+                              created_at=now - timedelta(days=60), processed_at=completed_at))
+        db.commit()
+        rebuild_rollups(db)
+        leader_id = leader.id
+    finally:
+        close_db_session(db)
+
+    async with db_session() as adb:
+        stats = await LeaderPanelService.get_payout_stats(adb)
+    await dispose_async_engine()
+
+    mine = next(e for e in stats['leaders'] if e['leader_id'] == leader_id)
+    assert mine['name'] == '@payout_leader'
+    assert (mine['today']['count'], mine['today']['amount']) == (1, 10.0)
+    assert (mine['month']['count'], mine['month']['amount']) == (2, 40.0)
+    assert mine['all']['average'] == 20.0
+    assert stats['periods']['all']['count'] >= 2
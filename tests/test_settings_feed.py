@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from database import DATABASE_URL, create_tables, get_db_session, close_db_session
+from database.models import SettingsVersion, SystemSettings
+from database.operations import SystemSettingsService
+from database.settings_feed import SettingsChangeFeed
+
+
+def current_version():
+    db = get_db_session()
+    try:
+        return db.execute(select(SettingsVersion.version).where(SettingsVersion.id == 1)).scalar() or 0
+    finally:
+        close_db_session(db)
+
+
+def write_setting(key, value):
+    db = get_db_session()
+    try:
+        assert SystemSettingsService.set_setting(db, key, value)
+    finally:
+        close_db_session(db)
+
+
+def test_setting_writes_bump_the_version_and_refresh_local_caches():
+    from utils import runtime_settings
+
+    create_tables()
+    write_setting('feed_test_setting', 'one')
+    assert runtime_settings.get_config_value(setting_key='feed_test_setting') == 'one'
+
+    before = current_version()
+    write_setting('feed_test_setting', 'two')
+    assert current_version() == before + 1
+    # Without waiting for any TTL
+    assert runtime_settings.get_config_value(setting_key='feed_test_setting') == 'two'
+
+    db = get_db_session()
+    try:
+        # A rolled-back write takes its version bump with it
+        setting = db.query(SystemSettings).filter(SystemSettings.key == 'feed_test_setting').one()
+        setting.value = 'rolled back'
+        db.flush()
+        db.rollback()
+    finally:
+        close_db_session(db)
+    assert current_version() == before + 1
+    assert runtime_settings.get_config_value(setting_key='feed_test_setting') == 'two'
+
+
+@pytest.mark.asyncio
+async def test_feed_picks_up_writes_from_other_processes():
+    from utils import runtime_settings
+
+    create_tables()
+    write_setting('feed_remote_setting', 'old')
+    feed = SettingsChangeFeed(poll_interval=0.01)
+    feed.subscribe(runtime_settings._drop_settings_caches)
+    assert await feed.check() is False  # First read only sets the baseline
+    assert runtime_settings.get_config_value(setting_key='feed_remote_setting') == 'old'
+
+    # Another process: its own engine, no ORM hooks, same table protocol
+    other = create_engine(DATABASE_URL)
+    try:
+        with other.begin() as conn:
+            conn.execute(text("UPDATE system_settings SET value = 'new' WHERE key = 'feed_remote_setting'"))
+            conn.execute(text("UPDATE settings_version SET version = version + 1 WHERE id = 1"))
+    finally:
+        other.dispose()
+
+    assert runtime_settings.get_config_value(setting_key='feed_remote_setting') == 'old'  # Still cached
+    assert await feed.check() is True
+    assert runtime_settings.get_config_value(setting_key='feed_remote_setting') == 'new'
+    assert await feed.check() is False
+
+
+@pytest.mark.asyncio
+async def test_feed_lifecycle_and_failing_subscribers():
+    calls = []
+    feed = SettingsChangeFeed(poll_interval=0.01)
+    feed.subscribe(lambda: (_ for _ in ()).throw(RuntimeError('boom')))
+    feed.subscribe(lambda: calls.append(1))
+    feed.publish()
+    assert calls == [1]  # One broken subscriber does not starve the rest
+
+    create_tables()
+    feed.start()
+    feed.wake()
+    await feed.stop()
+    assert feed._task is None
@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.update_processor import OrderedUpdateProcessor
+
+
+def make_update(update_id, user_id):
+    return SimpleNamespace(update_id=update_id, effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+
+@pytest.mark.asyncio
+async def test_users_run_in_parallel_but_each_in_order():
+    processor = OrderedUpdateProcessor(max_concurrent_updates=2)
+    events = []
+    running = 0
+    peak = 0
+
+    async def handle(update, delay):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        events.append(('start', update.effective_user.id, update.update_id))
+        await asyncio.sleep(delay)
+        events.append(('end', update.effective_user.id, update.update_id))
+        running -= 1
+
+    updates = [(make_update(1, 'a'), 0.03), (make_update(2, 'a'), 0.0), (make_update(3, 'b'), 0.0),
+               (make_update(4, 'a'), 0.0), (make_update(5, 'c'), 0.0)]
+    # Same pattern as Application: one task per update, created in arrival order
+    tasks = [asyncio.create_task(processor.process_update(update, handle(update, delay)))
+             for update, delay in updates]
+    await asyncio.sleep(0)
+    assert processor.stats()['queued'] >= 2
+    await asyncio.gather(*tasks)
+
+    a_events = [e for e in events if e[1] == 'a']
+    assert a_events == [('start', 'a', 1), ('end', 'a', 1), ('start', 'a', 2), ('end', 'a', 2),
+                        ('start', 'a', 4), ('end', 'a', 4)]
+    # b and c were not held up behind a's slow first update
+    assert events.index(('end', 'b', 3)) < events.index(('end', 'a', 1))
+    assert peak <= 2
+
+    stats = processor.stats()
+    assert (stats['processed'], stats['queued'], stats['running'], stats['active_lanes']) == (5, 0, 0, 0)
+    assert stats['wait_max_ms'] >= stats['wait_p95_ms'] >= stats['wait_p50_ms'] >= 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_update_releases_its_lane():
+    processor = OrderedUpdateProcessor(max_concurrent_updates=1)
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    async def never_runs():
+        raise AssertionError("cancelled update must not run")
+
+    first = asyncio.create_task(processor.process_update(make_update(1, 'a'), blocker()))
+    second = asyncio.create_task(processor.process_update(make_update(2, 'a'), never_runs()))
+    await asyncio.sleep(0)
+    second.cancel()
+    gate.set()
+    await first
+    with pytest.raises(asyncio.CancelledError):
+        await second
+
+    stats = processor.stats()
+    assert (stats['processed'], stats['queued'], stats['active_lanes']) == (1, 0, 0)
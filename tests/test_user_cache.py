@@ -0,0 +1,83 @@
+import time
+
+from database import create_tables, get_db_session, close_db_session
+from database.models import User
+from database.operations import UserService
+from database.user_cache import TTLLRUCache, get_cached_user, invalidate_user, user_cache
+
+
+def test_lru_bound_and_ttl():
+    cache = TTLLRUCache(maxsize=2, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)  # evicts least recently used 'b'
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_writes_invalidate_cached_user():
+    """Balance writes through the service or the ORM drop the cached snapshot."""
+    create_tables()
+    db = get_db_session()
+    try:
+        user = db.query(User).filter(User.telegram_user_id == 920001).first()
+        if not user:
+            user = User(telegram_user_id=920001, balance=5.0)
+            db.add(user)
+            db.commit()
+        user_id = user.id
+    finally:
+        close_db_session(db)
+
+    user_cache.clear()
+    assert get_cached_user(920001).balance == 5.0
+    hits = user_cache.hits
+    assert get_cached_user(920001).balance == 5.0
+    assert user_cache.hits == hits + 1
+
+    db = get_db_session()
+    try:
+        UserService.update_balance(db, user_id, 7.5)
+    finally:
+        close_db_session(db)
+    assert get_cached_user(920001).balance == 7.5
+
+    db = get_db_session()
+    try:
+        row = db.query(User).filter(User.id == user_id).first()
+        row.balance = 9.0
+        db.commit()
+    finally:
+        close_db_session(db)
+    assert get_cached_user(920001).balance == 9.0
+
+
+def test_invalidation_during_load_is_not_overwritten(monkeypatch):
+    """A reader that loaded the pre-commit row does not re-cache it after the writer's invalidation."""
+    create_tables()
+    db = get_db_session()
+    try:
+        if not db.query(User).filter(User.telegram_user_id == 920002).first():
+            db.add(User(telegram_user_id=920002, balance=1.0))
+            db.commit()
+    finally:
+        close_db_session(db)
+    user_cache.clear()
+
+    load = UserService.get_user_by_telegram_id
+
+    def load_then_concurrent_write(db, telegram_id):
+        user = load(db, telegram_id)
+        invalidate_user(telegram_id)  # A writer commits between our read and our store
+        return user
+
+    monkeypatch.setattr(UserService, 'get_user_by_telegram_id', staticmethod(load_then_concurrent_write))
+    assert get_cached_user(920002).balance == 1.0
+    assert user_cache.get(920002) is None
+    monkeypatch.undo()
+    assert get_cached_user(920002).balance == 1.0
+    assert user_cache.get(920002) is not None
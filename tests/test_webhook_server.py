@@ -0,0 +1,69 @@
+import asyncio
+import gzip
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from aiohttp.test_utils import TestClient, TestServer
+from telegram import Bot, Update
+
+from webapp.async_server import SECRET_HEADER, create_web_app
+
+SECRET = 'test-secret'
+
+RECORDED_UPDATE = {
+    'update_id': 424242,
+    'message': {
+        'message_id': 7,
+        'date': 1700000000,
+        'chat': {'id': 5550001, 'type': 'private', 'first_name': 'Test'},
+        'from': {'id': 5550001, 'is_bot': False, 'first_name': 'Test'},
+        'text': '/start',
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+    },
+}
+
+
+@pytest_asyncio.fixture
+async def client():
+    application = SimpleNamespace(bot=Bot('123456:TEST'), update_queue=asyncio.Queue())
+    test_client = TestClient(TestServer(create_web_app(application, SECRET)))
+    await test_client.start_server()
+    test_client.application = application
+    yield test_client
+    await test_client.close()
+
+
+@pytest.mark.asyncio
+async def test_webhook_queues_recorded_update(client):
+    response = await client.post('/telegram/webhook', json=RECORDED_UPDATE, headers={SECRET_HEADER: SECRET})
+    assert response.status == 200
+
+    update = client.application.update_queue.get_nowait()
+    assert isinstance(update, Update)
+    assert (update.update_id, update.effective_user.id, update.message.text) == (424242, 5550001, '/start')
+
+    assert (await client.post('/telegram/webhook', json=RECORDED_UPDATE)).status == 403
+    assert (await client.post('/telegram/webhook', data=b'not json', headers={SECRET_HEADER: SECRET})).status == 400
+    assert client.application.update_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_forms_served_with_gzip_and_etag(client):
+    plain = await client.get('/phone_input.html', headers={'Accept-Encoding': 'identity'})
+    body = await plain.read()
+    assert plain.status == 200 and b'<html' in body.lower()
+    assert plain.headers['Access-Control-Allow-Origin'] == '*'
+
+    zipped = await client.get('/phone_input.html', headers={'Accept-Encoding': 'gzip'}, auto_decompress=False)
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(await zipped.read()) == body
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+
+    revalidated = await client.get('/phone_input.html', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag'],
+    })
+    assert revalidated.status == 304
+
+    assert (await client.get('/server.py')).status == 404
+    assert (await client.get('/missing.html')).status == 404
@@ -0,0 +1,141 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from database import balance_ledger, create_tables, get_db_session, close_db_session, withdrawal_queue
+from database.models import User, Withdrawal, WithdrawalStatus
+
+REQUESTER, LEADERS = 963000, [963001, 963002, 963003, 963004]
+
+
+def seed(amounts, balance=10_000.0):
+    """A requester with pending withdrawals (oldest first) and four leaders; returns (leader ids, withdrawal ids)."""
+    create_tables()
+    db = get_db_session()
+    try:
+        requester = User(telegram_user_id=REQUESTER + len(amounts) * 10, balance=0.0)
+        leaders = [User(telegram_user_id=tid + len(amounts) * 10, username=f'leader{i}', is_leader=True)
+                   for i, tid in enumerate(LEADERS)]
+        db.add_all([requester] + leaders)
+        db.flush()
+        balance_ledger.apply(db, requester.id, balance, balance_ledger.OPENING)
+        rows = [Withdrawal(user_id=requester.id, amount=amount, currency='USDT', withdrawal_address='T' * 34,
+                           withdrawal_method='TRX', status=WithdrawalStatus.PENDING) for amount in amounts]
+        db.add_all(rows)
+        db.flush()
+        # Ahead of pending rows other tests left behind, keeping the amount ordering
+        for row in rows:
+            row.priority_at -= timedelta(days=365)
+        db.commit()
+        return [leader.id for leader in leaders], [w.id for w in rows]
+    finally:
+        close_db_session(db)
+
+
+def in_session(fn, *args, **kwargs):
+    db = get_db_session()
+    try:
+        result = fn(db, *args, **kwargs)
+        db.commit()
+        return result
+    except Exception as e:
+        db.rollback()
+        return e
+    finally:
+        close_db_session(db)
+
+
+def test_parallel_leaders_claim_disjoint_batches_by_priority():
+    leaders, ids = seed([1.0] * 40)
+    # Move the newest one to the front of the queue
+    in_session(lambda db: db.execute(update(Withdrawal).where(Withdrawal.id == ids[-1]).values(
+        priority_at=datetime.utcnow() - timedelta(days=400))))
+
+    start = threading.Barrier(len(leaders))
+
+    def leader(leader_id):
+        start.wait()
+        batches = []
+        while True:
+            batch = in_session(withdrawal_queue.claim, leader_id, 3)
+            assert not isinstance(batch, Exception), batch
+            batch = [wid for wid in batch if wid in ids]
+            if not batch:
+                in_session(withdrawal_queue.release, leader_id)
+                return batches
+            batches.append(batch)
+            for wid in batch:
+                assert not isinstance(in_session(balance_ledger.approve_withdrawal, wid, leader_id), Exception)
+
+    with ThreadPoolExecutor(max_workers=len(leaders)) as pool:
+        results = dict(zip(leaders, pool.map(leader, leaders)))
+
+    claimed = [wid for batches in results.values() for batch in batches for wid in batch]
+    assert sorted(claimed) == sorted(ids)  # Every withdrawal reviewed exactly once
+    assert sum(1 for batches in results.values() if batches) > 1  # The work was shared
+    first_batches = [batches[0] for batches in results.values() if batches]
+    assert any(batch[0] == ids[-1] for batch in first_batches)  # Highest priority went out first
+
+    since = datetime.utcnow() - timedelta(hours=1)
+    stats = in_session(withdrawal_queue.leader_throughput, since)
+    mine = {entry['leader_id']: entry for entry in stats if entry['leader_id'] in leaders}
+    assert sum(entry['reviewed'] for entry in mine.values()) == len(ids)
+    for leader_id, entry in mine.items():
+        assert entry['reviewed'] == sum(len(batch) for batch in results[leader_id])
+        assert entry['name'].startswith('@leader') and entry['per_hour'] > 0
+        assert entry['amount'] == entry['reviewed'] * 1.0 and entry['avg_handle_seconds'] >= 0
+
+
+def test_claims_are_exclusive_until_their_lease_ends():
+    (alice, bob, *_), ids = seed([5.0, 50.0])
+
+    def claim(leader_id, **kwargs):
+        """Claimed ids among this test's withdrawals (other tests may leave pending rows)."""
+        return [wid for wid in in_session(withdrawal_queue.claim, leader_id, 50, **kwargs) if wid in ids]
+
+    assert claim(alice) == [ids[1], ids[0]]  # Larger amount first
+    assert claim(bob) == []
+    conflict = in_session(balance_ledger.approve_withdrawal, ids[0], bob)
+    assert isinstance(conflict, balance_ledger.WithdrawalConflict)
+
+    # Alice walks away: once the lease runs out Bob gets the work
+    later = datetime.utcnow() + timedelta(seconds=withdrawal_queue.WITHDRAWAL_CLAIM_LEASE_SECONDS + 1)
+    assert claim(bob, now=later) == [ids[1], ids[0]]
+    queue = in_session(lambda db: [w.id for w, _ in withdrawal_queue.claimed(db, bob, now=later) if w.id in ids])
+    assert queue == [ids[1], ids[0]]
+
+    assert in_session(withdrawal_queue.release, bob) >= 2
+    assert claim(alice) == [ids[1], ids[0]]
+    assert in_session(balance_ledger.approve_withdrawal, ids[1], alice)['amount'] == 50.0
+    in_session(withdrawal_queue.release, alice)
+
+
+def test_new_high_priority_work_does_not_strand_a_held_batch():
+    (alice, bob, *_), ids = seed([1.0, 1.0, 1.0])
+    # Ahead of whatever earlier tests left pending
+    ahead = datetime.utcnow() - timedelta(days=1000)
+    for position, wid in enumerate(ids):
+        in_session(lambda db: db.execute(update(Withdrawal).where(Withdrawal.id == wid).values(
+            priority_at=ahead + timedelta(seconds=position))))
+
+    def claim(leader_id, limit=3):
+        return [wid for wid in in_session(withdrawal_queue.claim, leader_id, limit) if wid in ids + urgent]
+
+    urgent = []
+    assert claim(alice) == ids  # A full batch
+
+    # More urgent work arrives while Alice holds her batch
+    _, urgent = seed([500.0])
+    in_session(lambda db: db.execute(update(Withdrawal).where(Withdrawal.id == urgent[0]).values(
+        priority_at=datetime.utcnow() - timedelta(days=2000))))
+
+    # Alice keeps (and renews) what she holds; the urgent row goes to a free leader
+    assert claim(alice) == ids
+    held = in_session(lambda db: [w.id for w, _ in withdrawal_queue.claimed(db, alice) if w.id in ids + urgent])
+    assert held == ids
+    assert claim(bob, 1) == urgent
+
+    in_session(withdrawal_queue.release, alice)
+    in_session(withdrawal_queue.release, bob)
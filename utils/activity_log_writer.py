@@ -0,0 +1,357 @@
+"""
+Activity Log Writer
+Buffers ``activity_logs`` rows in memory and writes them in bulk.
+
+``ActivityLogService.log_activity`` only calls ``record``: it never touches
+the caller's session, so logging inside a larger transaction neither commits
+it early nor adds a round trip. Events are flushed with one multi-row INSERT
+(in the writer's own session) when ``batch_size`` are waiting or every
+``flush_interval`` seconds.
+
+Each event is also appended to a small local spill file before it is
+buffered. A flush rotates that file aside and deletes it once the INSERT
+commits, so after a crash ``recover`` replays whatever never reached the
+database. Delivery is at-least-once: a crash between the commit and the
+delete writes that batch twice.
+
+Every writer spills to its own files (``<spill path>.<pid>-<token>``) and
+holds an exclusive lock on ``<spill path>.<pid>-<token>.lock`` while it
+lives. The OS releases the lock when the process dies, so ``recover`` only
+replays files whose lock it can take; other bots and workers sharing the
+directory keep theirs.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from sqlalchemy import insert
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', '200'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', '2'))
+ACTIVITY_LOG_SPILL_PATH = os.getenv(
+    'ACTIVITY_LOG_SPILL_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'activity_log.spill'),
+)
+MAX_BUFFERED_EVENTS = 50000  # Beyond this (database down for long) new events are dropped
+
+
+def _try_lock(f) -> bool:
+    """Take an exclusive lock on an open file without waiting; False if someone else holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _hold_lock(path: str):
+    """Create ``path`` already locked, so no other process ever sees it unlocked (where the OS allows)."""
+    if fcntl is None:
+        f = open(path, 'a')
+        _try_lock(f)
+        return f
+    staging = f"{path}.tmp"
+    f = open(staging, 'a')
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    os.replace(staging, path)
+    return f
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ActivityLogWriter:
+    """Thread-safe buffer of activity events with a write-ahead spill file."""
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None, spill_path: Optional[str] = None,
+                 session_factory=None):
+        self.batch_size = batch_size or ACTIVITY_LOG_BATCH_SIZE
+        self.flush_interval = ACTIVITY_LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.spill_path = ACTIVITY_LOG_SPILL_PATH if spill_path is None else spill_path
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._session_factory = session_factory
+        self._lock = threading.Lock()          # Guards the buffer and spill file
+        self._flush_lock = threading.Lock()    # One INSERT at a time, in record order
+        self._buffer: List[Dict[str, Any]] = []
+        self._spill = None
+        self._retry_paths: List[str] = []      # Spill files of failed flushes, still in the buffer
+        self._rotations = 0
+        self._owner_lock = None                # Held while this writer has spill files
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.flushed = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, user_id: Optional[int], action_type: str, description: Optional[str] = None,
+               extra_data: Any = None, ip_address: Optional[str] = None) -> None:
+        """Queue one event; returns without any database work."""
+        event = {
+            'user_id': user_id,
+            'action_type': action_type,
+            'description': description or action_type,
+            'extra_data': extra_data if extra_data is None or isinstance(extra_data, str)
+            else json.dumps(extra_data, default=str),
+            'ip_address': ip_address,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self._append(event)
+            full = len(self._buffer) >= self.batch_size
+
+        if full:
+            if self._task is not None and not self._task.done():
+                self.wake()
+            else:
+                # No background writer (scripts, shutdown): write the batch here
+                self.flush()
+
+    @property
+    def own_spill_path(self) -> Optional[str]:
+        """This writer's spill file (its flushes rotate it to ``<path>.<thread>.<n>.flushing``)."""
+        return f"{self.spill_path}.{self.owner}" if self.spill_path else None
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        if len(self._buffer) >= MAX_BUFFERED_EVENTS:
+            # Refuse the new event rather than evict a spilled one, so buffer and spill agree
+            self.dropped += 1
+            return
+        self._buffer.append(event)
+        if self.spill_path:
+            try:
+                if self._spill is None:
+                    os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+                    if self._owner_lock is None:
+                        self._owner_lock = _hold_lock(f"{self.own_spill_path}.lock")
+                    self._spill = open(self.own_spill_path, 'a', encoding='utf-8')
+                self._spill.write(json.dumps(event) + '\n')
+                self._spill.flush()
+            except OSError as e:
+                logger.warning(f"Activity log spill file unavailable: {e}")
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def _take(self):
+        """Swap out the buffer and move its spill file aside for this flush."""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            flushing_path = None
+            if events and self.spill_path and os.path.exists(self.own_spill_path):
+                self._rotations += 1
+                flushing_path = f"{self.own_spill_path}.{threading.get_ident()}.{self._rotations}.flushing"
+                os.replace(self.own_spill_path, flushing_path)
+            return events, flushing_path
+
+    def _insert(self, events: List[Dict[str, Any]]) -> None:
+        from database.models import ActivityLog
+
+        rows = [dict(event, created_at=datetime.fromisoformat(event['created_at'])) for event in events]
+        if self._session_factory is None:
+            from database import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            db.execute(insert(ActivityLog), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """Write everything buffered in one INSERT; returns the number of rows."""
+        with self._flush_lock:
+            events, flushing_path = self._take()
+            if not events:
+                return 0
+            try:
+                self._insert(events)
+            except Exception as e:
+                logger.error(f"Activity log flush of {len(events)} events failed, will retry: {e}")
+                # Back ahead of newer events; their spill file stays as it is until a flush succeeds
+                with self._lock:
+                    self._buffer[:0] = events
+                if flushing_path:
+                    self._retry_paths.append(flushing_path)
+                return 0
+            for path in self._retry_paths + [flushing_path]:
+                self._discard(path)
+            self._retry_paths = []
+            self.flushed += len(events)
+            logger.debug(f"Flushed {len(events)} activity log events")
+            return len(events)
+
+    @staticmethod
+    def _discard(path: Optional[str]) -> None:
+        if path:
+            _remove(path)
+
+    def recover(self) -> int:
+        """Re-buffer events left in spill files by writers whose process died before flushing."""
+        if not self.spill_path:
+            return 0
+        directory = os.path.dirname(self.spill_path) or '.'
+        base = os.path.basename(self.spill_path)
+        if not os.path.isdir(directory):
+            return 0
+
+        # Spill and in-flight files by owner. The bare spill path and owners without
+        # a token are from versions before per-process files, and never had a lock.
+        owners: Dict[str, List[str]] = {}
+        for name in os.listdir(directory):
+            if name == base:
+                owners.setdefault('', []).append(os.path.join(directory, name))
+            elif name.startswith(base + '.'):
+                owner, _, rest = name[len(base) + 1:].partition('.')
+                if owner != self.owner and owner != 'lock' and (rest == '' or rest.endswith('.flushing')):
+                    owners.setdefault(owner, []).append(os.path.join(directory, name))
+
+        recovered = 0
+        for owner, paths in sorted(owners.items()):
+            lock_path = f"{self.spill_path}.{owner}.lock" if owner else f"{self.spill_path}.lock"
+            legacy = '-' not in owner
+            try:
+                lock = open(lock_path, 'a' if legacy else 'r')
+            except FileNotFoundError:
+                continue  # Already recovered by another process
+            with lock:
+                if not _try_lock(lock):
+                    continue  # Its process is alive and owns these files
+                events = []
+                for path in sorted(paths):
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            for line in f:
+                                try:
+                                    events.append(json.loads(line))
+                                except json.JSONDecodeError:
+                                    pass  # Torn last line from the crash
+                    except FileNotFoundError:
+                        pass  # Another process recovered it first
+                # Into our own spill file before the dead owner's files go
+                with self._lock:
+                    for event in events:
+                        self._append(event)
+                for path in paths:
+                    _remove(path)
+                _remove(lock_path)
+            recovered += len(events)
+
+        if recovered:
+            logger.warning(f"Recovered {recovered} activity log events from {self.spill_path}")
+        return recovered
+
+    def close(self) -> None:
+        """Give up this writer's spill files after a final flush (nothing is left in them)."""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            if self._owner_lock is not None:
+                if not self._buffer:
+                    _remove(self.own_spill_path)
+                    _remove(f"{self.own_spill_path}.lock")
+                self._owner_lock.close()
+                self._owner_lock = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> asyncio.Task:
+        """Recover spilled events and flush in the background of the current event loop."""
+        if self._task is None or self._task.done():
+            self.recover()
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self.run_forever(), name="activity-log-writer")
+        return self._task
+
+    async def stop(self) -> None:
+        """Stop the background task and write what is still buffered."""
+        if self._task is not None:
+            self._stopping = True
+            self.wake()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    def wake(self) -> None:
+        """Flush now instead of at the next interval (safe to call from any thread)."""
+        loop, event = self._loop, self._wakeup
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    async def run_forever(self) -> None:
+        logger.info("Activity log writer started")
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._buffer:
+                await asyncio.to_thread(self.flush)
+        logger.info("Activity log writer stopped")
+
+
+activity_log_writer = ActivityLogWriter()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    # Scripts never start the background task; anything left is also in the spill file
+    if activity_log_writer.pending:
+        try:
+            activity_log_writer.flush()
+        except Exception as e:
+            logger.error(f"Activity log flush at exit failed: {e}")
+    activity_log_writer.close()
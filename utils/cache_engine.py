@@ -0,0 +1,211 @@
+"""
+Cache Engine
+Shared in-process cache with per-namespace bounds, TTLs and statistics
+
+Each namespace (``cache_engine.namespace('settings', ttl=120)``) is an LRU map
+bounded by ``maxsize``. Values are read through ``get_or_load(key, loader)``:
+
+  * fresh entries are returned as they are;
+  * once an entry is older than ``ttl`` but younger than ``ttl + stale_ttl``
+    it is still returned, and one background refresh reloads it
+    (stale-while-revalidate), so hot keys never make callers wait on the
+    database when they expire;
+  * ``None`` results are cached too, for ``negative_ttl``, so lookups of
+    missing rows do not reach the database every time;
+  * concurrent misses for the same key share one loader call (single-flight)
+    instead of stampeding the database.
+
+A loader that raises caches nothing: a caller waiting on a miss gets the
+exception, and a failed background refresh keeps serving the stale value
+until it ages out.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+CACHE_DEFAULT_MAXSIZE = int(os.getenv('CACHE_DEFAULT_MAXSIZE', '1000'))
+CACHE_REFRESH_WORKERS = int(os.getenv('CACHE_REFRESH_WORKERS', '2'))
+CACHE_LOAD_TIMEOUT = 30.0  # Longest a caller waits on another caller's load
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ('value', 'fresh_until', 'stale_until')
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class CacheNamespace:
+    """One bounded LRU namespace of the cache engine (thread-safe)."""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = None, negative_ttl: float = None,
+                 stale_ttl: float = 0.0, refresher: ThreadPoolExecutor = None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize or CACHE_DEFAULT_MAXSIZE
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.stale_ttl = stale_ttl
+        self._refresher = refresher
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._generation = 0  # Bumped by invalidate; loads begun earlier are not stored
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value (fresh or stale) without loading; ``default`` when absent."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.stale_until <= time.monotonic():
+                return default
+            self._data.move_to_end(key)
+            return entry.value
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` at most once per miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now < entry.stale_until:
+                self._data.move_to_end(key)
+                if now < entry.fresh_until:
+                    self.hits += 1
+                    return entry.value
+                # Stale: serve it and let one background refresh replace it
+                self.stale_hits += 1
+                if key not in self._inflight and self._refresher is not None:
+                    self._inflight[key] = future = Future()
+                    self._refresher.submit(self._load, key, loader, future, self._generation)
+                return entry.value
+
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self._inflight[key] = future = Future()
+                generation = self._generation
+            else:
+                self.coalesced += 1
+
+        if owner:
+            self._load(key, loader, future, generation)
+        return future.result(timeout=CACHE_LOAD_TIMEOUT)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], future: Future, generation: int) -> None:
+        """Run ``loader`` for ``key`` and publish the outcome to everyone waiting on ``future``."""
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self.load_errors += 1
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            logger.warning(f"Cache {self.name} failed to load {key!r}: {e}")
+            future.set_exception(e)
+            return
+        with self._lock:
+            self.loads += 1
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if generation == self._generation:
+                self._store(key, value)
+        future.set_result(value)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        ttl = self.negative_ttl if value is None else self.ttl
+        now = time.monotonic()
+        self._data[key] = _Entry(value, now + ttl, now + ttl + self.stale_ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        """Drop one key, or the whole namespace when no key is given; loads in flight are not stored."""
+        with self._lock:
+            self._generation += 1
+            if key is _MISSING:
+                self._data.clear()
+                self._inflight.clear()
+            else:
+                self._data.pop(key, None)
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'load_errors': self.load_errors,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': ((self.hits + self.stale_hits) / lookups) if lookups else 0.0,
+            }
+
+
+class CacheEngine:
+    """Registry of cache namespaces sharing one background refresh pool."""
+
+    def __init__(self, refresh_workers: int = None):
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=refresh_workers or CACHE_REFRESH_WORKERS, thread_name_prefix='cache-refresh'
+        )
+
+    def namespace(self, name: str, ttl: float, maxsize: int = None, negative_ttl: float = None,
+                  stale_ttl: float = 0.0) -> CacheNamespace:
+        """Create a namespace, or return the existing one of that name (its settings are kept)."""
+        with self._lock:
+            namespace = self._namespaces.get(name)
+            if namespace is None:
+                namespace = CacheNamespace(name, ttl, maxsize, negative_ttl, stale_ttl, self._refresher)
+                self._namespaces[name] = namespace
+            return namespace
+
+    def invalidate(self, name: str, key: Hashable = _MISSING) -> None:
+        namespace = self._namespaces.get(name)
+        if namespace is not None:
+            namespace.invalidate(key)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-namespace counters for the admin stats screen."""
+        return {name: namespace.stats() for name, namespace in sorted(self._namespaces.items())}
+
+
+# Global instance
+cache_engine = CacheEngine()
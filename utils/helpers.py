@@ -257,31 +257,25 @@ def is_admin(user_id: int) -> bool:
         return False
 
 
-def is_leader(user_id: int) -> bool:
-    """Check if user is a leader."""
-    from database import get_db_session, close_db_session
-    from database.operations import UserService
+def is_leader(user_id: int, context=None) -> bool:
+    """Check if user is a leader (reuses the request scope when ``context`` is given)."""
+    from database.request_scope import get_request_user
     
-    db = get_db_session()
     try:
-        user = UserService.get_user_by_telegram_id(db, user_id)
-        return user and user.is_leader
+        user = get_request_user(context, user_id)
+        return bool(user and user.is_leader)
     except Exception as e:
         logger.error(f"Error checking leader status: {e}")
         return False
-    finally:
-        close_db_session(db)
 
 
 def load_user_language(context, user_id: int) -> str:
     """Load user's language from database and set in context. Returns the language code."""
-    from database import get_db_session, close_db_session
-    from database.operations import UserService
+    from database.request_scope import get_request_user
     from services.translation_service import translation_service
     
-    db = get_db_session()
     try:
-        user = UserService.get_user_by_telegram_id(db, user_id)
+        user = get_request_user(context, user_id)
         if user and user.language_code:
             # Set language in context for this session
             translation_service.set_user_language(context, user.language_code)
@@ -295,5 +289,3 @@ def load_user_language(context, user_id: int) -> str:
         logger.error(f"Error loading user language: {e}")
         translation_service.set_user_language(context, 'en')
         return 'en'
-    finally:
-        close_db_session(db)
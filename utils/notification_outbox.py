@@ -0,0 +1,297 @@
+"""
+Notification Outbox
+Durable queue for user notifications, drained by a rate-aware worker.
+
+Callers never talk to Telegram: they insert ``notification_outbox`` rows -
+inside their own transaction with ``enqueue``/``enqueue_many`` or standalone
+with ``aenqueue`` - and return immediately. ``OutboxWorker`` claims due rows
+in batches (``FOR UPDATE SKIP LOCKED`` on PostgreSQL, so several processes can
+share the queue), sends them through the shared Telegram rate limiter and
+records the outcome. Flood errors pause every sender and reschedule the row,
+transient failures back off exponentially, and rows claimed by a process that
+died are picked up again once their lease expires. A ``dedup_key`` makes
+re-enqueueing the same event a no-op.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from database import db_session
+from database.models import NotificationOutbox
+from utils.rate_limiter import TelegramRateLimiter, retry_after_seconds, telegram_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CONCURRENCY = int(os.getenv('NOTIFICATION_OUTBOX_CONCURRENCY', '10'))
+OUTBOX_BATCH_SIZE = int(os.getenv('NOTIFICATION_OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('NOTIFICATION_OUTBOX_POLL_INTERVAL', '2'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETENTION_DAYS = int(os.getenv('NOTIFICATION_OUTBOX_RETENTION_DAYS', '7'))
+OUTBOX_LEASE_SECONDS = 300  # A SENDING row older than this belongs to a dead worker
+OUTBOX_PURGE_INTERVAL = 3600
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 3600
+
+DEFAULT_PARSE_MODE = 'Markdown'
+
+
+def _utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+def _insert_statement(db):
+    """INSERT that silently skips rows whose dedup_key already exists."""
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        logger.warning(f"Notification dedup keys are not enforced on {dialect}")
+        return insert(NotificationOutbox)
+    return dialect_insert(NotificationOutbox).on_conflict_do_nothing(index_elements=['dedup_key'])
+
+
+def _rows(messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    now = _utcnow()
+    return [
+        {
+            'chat_id': message['chat_id'],
+            'text': message['text'],
+            'parse_mode': message.get('parse_mode', DEFAULT_PARSE_MODE),
+            'dedup_key': message.get('dedup_key'),
+            'status': 'PENDING',
+            'attempts': 0,
+            'next_attempt_at': now + timedelta(seconds=message.get('delay_seconds', 0)),
+            'created_at': now,
+        }
+        for message in messages
+    ]
+
+
+def enqueue_many(db: Session, messages: Iterable[Dict[str, Any]]) -> int:
+    """
+    Queue several notifications in the caller's transaction (one INSERT).
+
+    Each message is a dict with ``chat_id`` and ``text`` and optionally
+    ``parse_mode``, ``dedup_key`` and ``delay_seconds``. Nothing is sent until
+    the caller commits; call ``outbox_worker.wake()`` afterwards to skip the
+    poll delay. Returns the number of messages submitted.
+    """
+    rows = _rows(messages)
+    if rows:
+        db.execute(_insert_statement(db), rows)
+    return len(rows)
+
+
+def enqueue(db: Session, chat_id: int, text: str, parse_mode: Optional[str] = DEFAULT_PARSE_MODE,
+            dedup_key: Optional[str] = None, delay_seconds: float = 0) -> None:
+    """Queue one notification in the caller's transaction."""
+    enqueue_many(db, [{
+        'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode,
+        'dedup_key': dedup_key, 'delay_seconds': delay_seconds,
+    }])
+
+
+async def aenqueue(chat_id: int, text: str, parse_mode: Optional[str] = DEFAULT_PARSE_MODE,
+                   dedup_key: Optional[str] = None, delay_seconds: float = 0) -> None:
+    """Queue one notification in its own transaction and wake the worker."""
+    async with db_session() as db:
+        await db.execute(_insert_statement(db), _rows([{
+            'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode,
+            'dedup_key': dedup_key, 'delay_seconds': delay_seconds,
+        }]))
+        await db.commit()
+    outbox_worker.wake()
+
+
+class OutboxWorker:
+    """Drains ``notification_outbox`` with a bounded pool of concurrent senders."""
+
+    def __init__(self, bot: Bot = None, limiter: TelegramRateLimiter = None, concurrency: int = None,
+                 batch_size: int = None, poll_interval: float = None, max_attempts: int = None):
+        self.bot = bot
+        self.limiter = limiter or telegram_rate_limiter
+        self.concurrency = concurrency or OUTBOX_CONCURRENCY
+        self.batch_size = batch_size or OUTBOX_BATCH_SIZE
+        self.poll_interval = OUTBOX_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.max_attempts = max_attempts or OUTBOX_MAX_ATTEMPTS
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_purge = 0.0
+
+    def attach(self, bot: Bot) -> None:
+        """Set the bot used for sending (first caller wins)."""
+        if self.bot is None:
+            self.bot = bot
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> asyncio.Task:
+        """Run the worker in the background of the current event loop."""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self.run_forever(), name="notification-outbox")
+        return self._task
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Finish the batch in flight, then stop; unsent rows stay queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Notification outbox worker did not stop in time; cancelled")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Skip the poll delay (safe to call from any thread)."""
+        loop, event = self._loop, self._wakeup
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    async def run_forever(self) -> None:
+        logger.info("Notification outbox worker started")
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                handled = await self.run_once()
+                if time.monotonic() - self._last_purge >= OUTBOX_PURGE_INTERVAL:
+                    await self.purge_sent()
+                    self._last_purge = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification outbox worker error: {e}")
+                handled = 0
+
+            if not handled and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Notification outbox worker stopped")
+
+    # ------------------------------------------------------------------
+    # Delivery
+    # ------------------------------------------------------------------
+
+    async def run_once(self) -> int:
+        """Claim, send and record one batch of due rows; returns its size."""
+        batch = await self._claim()
+        if not batch:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(row: Tuple) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._deliver(*row)
+
+        updates = await asyncio.gather(*(bounded(row) for row in batch))
+        async with db_session() as db:
+            await db.execute(update(NotificationOutbox), updates)
+            await db.commit()
+        return len(batch)
+
+    async def _claim(self) -> List[Tuple[int, int, str, Optional[str], int]]:
+        """Lease due rows (and rows abandoned by a dead worker) to this worker."""
+        now = _utcnow()
+        async with db_session() as db:
+            result = await db.execute(
+                select(
+                    NotificationOutbox.id, NotificationOutbox.chat_id, NotificationOutbox.text,
+                    NotificationOutbox.parse_mode, NotificationOutbox.attempts,
+                )
+                .where(or_(
+                    and_(NotificationOutbox.status == 'PENDING', NotificationOutbox.next_attempt_at <= now),
+                    and_(NotificationOutbox.status == 'SENDING',
+                         NotificationOutbox.claimed_at < now - timedelta(seconds=OUTBOX_LEASE_SECONDS)),
+                ))
+                .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            batch = [tuple(row) for row in result.all()]
+            if batch:
+                await db.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_([row[0] for row in batch]))
+                    .values(status='SENDING', claimed_at=now)
+                )
+                await db.commit()
+        return batch
+
+    async def _deliver(self, row_id: int, chat_id: int, text: str, parse_mode: Optional[str],
+                       attempts: int) -> Dict[str, Any]:
+        """Send one row; returns the column values recording the outcome."""
+        await self.limiter.acquire(chat_id)
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            return {'id': row_id, 'status': 'SENT', 'sent_at': _utcnow(), 'claimed_at': None,
+                    'attempts': attempts + 1, 'last_error': None}
+        except RetryAfter as e:
+            # Flood control applies to the whole bot: pause every sender, don't count an attempt
+            seconds = retry_after_seconds(e)
+            self.limiter.pause(seconds)
+            return {'id': row_id, 'status': 'PENDING', 'claimed_at': None, 'last_error': str(e),
+                    'next_attempt_at': _utcnow() + timedelta(seconds=seconds)}
+        except (Forbidden, BadRequest) as e:
+            # Blocked bot, deleted chat or malformed message: retrying cannot help
+            logger.warning(f"Notification {row_id} to {chat_id} dropped: {e}")
+            return {'id': row_id, 'status': 'FAILED', 'claimed_at': None,
+                    'attempts': attempts + 1, 'last_error': str(e)}
+        except Exception as e:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Notification {row_id} to {chat_id} failed after {attempts} attempts: {e}")
+                return {'id': row_id, 'status': 'FAILED', 'claimed_at': None,
+                        'attempts': attempts, 'last_error': str(e)}
+            delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+            logger.debug(f"Notification {row_id} to {chat_id} retrying in {delay}s: {e}")
+            return {'id': row_id, 'status': 'PENDING', 'claimed_at': None, 'attempts': attempts,
+                    'last_error': str(e), 'next_attempt_at': _utcnow() + timedelta(seconds=delay)}
+
+    @staticmethod
+    async def purge_sent(retention_days: int = OUTBOX_RETENTION_DAYS) -> int:
+        """Delete delivered rows older than the retention window."""
+        cutoff = _utcnow() - timedelta(days=retention_days)
+        async with db_session() as db:
+            result = await db.execute(
+                delete(NotificationOutbox)
+                .where(NotificationOutbox.status == 'SENT', NotificationOutbox.sent_at < cutoff)
+            )
+            await db.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} delivered notifications")
+        return result.rowcount or 0
+
+
+# Global outbox worker; the bot is attached when the notification service initializes
+outbox_worker = OutboxWorker()
@@ -1,16 +1,43 @@
 """
 Notification Service
 Handles sending notifications to users for various events
+
+Notifications are queued in the durable outbox (utils/notification_outbox.py)
+and delivered by its worker, so callers never wait on Telegram.
 """
 import logging
 from datetime import datetime
 from typing import Optional
 from telegram import Bot
-from telegram.error import TelegramError
+
+from utils.notification_outbox import aenqueue, outbox_worker
 
 logger = logging.getLogger(__name__)
 
 
+def format_account_unfrozen(phone_number: str, unfreeze_reason: Optional[str] = None) -> str:
+    """Unfreeze notice text (also queued in bulk by the freeze expiry job)."""
+    message = f"""
+🔥 **Account Unfrozen!**
+
+📱 **Account:** `{phone_number}`
+✅ **Status:** Available for Sale
+
+Good news! Your account freeze has been lifted.
+
+**You can now:**
+• ✅ Sell this account again
+• 💰 List it on the marketplace
+• 🚀 Start earning immediately
+"""
+    
+    if unfreeze_reason:
+        message += f"\n📝 **Unfreeze Note:** {unfreeze_reason}\n"
+    
+    message += "\n🎉 **Happy selling!**"
+    return message
+
+
 class NotificationService:
     """Service for sending notifications to users"""
     
@@ -28,7 +55,8 @@ class NotificationService:
         user_telegram_id: int,
         phone_number: str,
         sale_price: float,
-        admin_notes: Optional[str] = None
+        admin_notes: Optional[str] = None,
+        dedup_key: Optional[str] = None
     ) -> bool:
         """
         Notify user when their sale is approved
@@ -38,9 +66,10 @@ class NotificationService:
             phone_number: Phone number of sold account
             sale_price: Sale price
             admin_notes: Optional admin notes
+            dedup_key: Optional key; a notification with the same key is only queued once
             
         Returns:
-            bool: True if notification sent successfully
+            bool: True if notification was queued
         """
         message = f"""
 ✅ **Sale Approved!**
@@ -65,14 +94,15 @@ class NotificationService:
         
         message += "\n💡 **Tip:** Keep selling accounts to maximize your earnings!"
         
-        return await self._send_notification(user_telegram_id, message)
+        return await self._send_notification(user_telegram_id, message, dedup_key)
     
     async def notify_sale_rejected(
         self,
         user_telegram_id: int,
         phone_number: str,
         rejection_reason: str,
-        admin_notes: Optional[str] = None
+        admin_notes: Optional[str] = None,
+        dedup_key: Optional[str] = None
     ) -> bool:
         """
         Notify user when their sale is rejected
@@ -82,9 +112,10 @@ class NotificationService:
             phone_number: Phone number of account
             rejection_reason: Reason for rejection
             admin_notes: Optional admin notes
+            dedup_key: Optional key; a notification with the same key is only queued once
             
         Returns:
-            bool: True if notification sent successfully
+            bool: True if notification was queued
         """
         message = f"""
 ❌ **Sale Rejected**
@@ -112,7 +143,7 @@ Your account sale has been reviewed and rejected by an administrator.
 • Contact support if you have questions
 """
         
-        return await self._send_notification(user_telegram_id, message)
+        return await self._send_notification(user_telegram_id, message, dedup_key)
     
     async def notify_account_frozen(
         self,
@@ -120,7 +151,8 @@ Your account sale has been reviewed and rejected by an administrator.
         phone_number: str,
         freeze_reason: str,
         freeze_duration_hours: Optional[int] = None,
-        freeze_until: Optional[datetime] = None
+        freeze_until: Optional[datetime] = None,
+        dedup_key: Optional[str] = None
     ) -> bool:
         """
         Notify user when their account is frozen
@@ -131,9 +163,10 @@ Your account sale has been reviewed and rejected by an administrator.
             freeze_reason: Reason for freeze
             freeze_duration_hours: Optional duration in hours
             freeze_until: Optional freeze end datetime
+            dedup_key: Optional key; a notification with the same key is only queued once
             
         Returns:
-            bool: True if notification sent successfully
+            bool: True if notification was queued
         """
         message = f"""
 ❄️ **Account Frozen**
@@ -171,13 +204,14 @@ Your account has been placed under a temporary security hold.
 Contact support if you believe this freeze was made in error.
 """
         
-        return await self._send_notification(user_telegram_id, message)
+        return await self._send_notification(user_telegram_id, message, dedup_key)
     
     async def notify_account_unfrozen(
         self,
         user_telegram_id: int,
         phone_number: str,
-        unfreeze_reason: Optional[str] = None
+        unfreeze_reason: Optional[str] = None,
+        dedup_key: Optional[str] = None
     ) -> bool:
         """
         Notify user when their account is unfrozen
@@ -186,37 +220,21 @@ Contact support if you believe this freeze was made in error.
             user_telegram_id: Telegram user ID to notify
             phone_number: Phone number of unfrozen account
             unfreeze_reason: Optional reason for unfreeze
+            dedup_key: Optional key; a notification with the same key is only queued once
             
         Returns:
-            bool: True if notification sent successfully
+            bool: True if notification was queued
         """
-        message = f"""
-🔥 **Account Unfrozen!**
-
-📱 **Account:** `{phone_number}`
-✅ **Status:** Available for Sale
-
-Good news! Your account freeze has been lifted.
-
-**You can now:**
-• ✅ Sell this account again
-• 💰 List it on the marketplace
-• 🚀 Start earning immediately
-"""
-        
-        if unfreeze_reason:
-            message += f"\n📝 **Unfreeze Note:** {unfreeze_reason}\n"
-        
-        message += "\n🎉 **Happy selling!**"
-        
-        return await self._send_notification(user_telegram_id, message)
+        message = format_account_unfrozen(phone_number, unfreeze_reason)
+        return await self._send_notification(user_telegram_id, message, dedup_key)
     
     async def notify_multi_device_detected(
         self,
         user_telegram_id: int,
         phone_number: str,
         device_count: int,
-        auto_freeze: bool = True
+        auto_freeze: bool = True,
+        dedup_key: Optional[str] = None
     ) -> bool:
         """
         Notify user when multi-device usage is detected
@@ -226,9 +244,10 @@ Good news! Your account freeze has been lifted.
             phone_number: Phone number of account
             device_count: Number of devices detected
             auto_freeze: Whether account was auto-frozen
+            dedup_key: Optional key; a notification with the same key is only queued once
             
         Returns:
-            bool: True if notification sent successfully
+            bool: True if notification was queued
         """
         message = f"""
 ⚠️ **Security Alert: Multi-Device Usage Detected**
@@ -270,32 +289,27 @@ We detected your Telegram account is active on multiple devices simultaneously.
 Contact support if you need this freeze lifted urgently.
 """
         
-        return await self._send_notification(user_telegram_id, message)
+        return await self._send_notification(user_telegram_id, message, dedup_key)
     
-    async def _send_notification(self, user_telegram_id: int, message: str) -> bool:
+    async def _send_notification(self, user_telegram_id: int, message: str,
+                                 dedup_key: Optional[str] = None) -> bool:
         """
-        Internal method to send notification
+        Internal method to queue a notification for the outbox worker
         
         Args:
             user_telegram_id: Telegram user ID
             message: Message to send
+            dedup_key: Optional deduplication key
             
         Returns:
-            bool: True if sent successfully
+            bool: True if queued successfully
         """
         try:
-            await self.bot.send_message(
-                chat_id=user_telegram_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"Notification sent to user {user_telegram_id}")
+            await aenqueue(user_telegram_id, message, parse_mode='Markdown', dedup_key=dedup_key)
+            logger.info(f"Notification queued for user {user_telegram_id}")
             return True
-        except TelegramError as e:
-            logger.error(f"Failed to send notification to user {user_telegram_id}: {e}")
-            return False
         except Exception as e:
-            logger.error(f"Unexpected error sending notification to user {user_telegram_id}: {e}")
+            logger.error(f"Failed to queue notification for user {user_telegram_id}: {e}")
             return False
 
 
@@ -315,6 +329,7 @@ def initialize_notification_service(bot: Bot) -> NotificationService:
     """
     global _notification_service
     _notification_service = NotificationService(bot)
+    outbox_worker.attach(bot)
     return _notification_service
 
 
@@ -0,0 +1,74 @@
+"""
+Rate limiting for outgoing Telegram Bot API calls.
+
+Telegram allows roughly 30 messages per second across all chats and about one
+message per second to the same chat, and answers floods with ``RetryAfter``.
+``TelegramRateLimiter`` enforces both limits for concurrent senders and lets
+any sender pause everyone when Telegram asks to back off.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TelegramRateLimiter:
+    """Global token bucket plus a minimum interval per chat."""
+
+    def __init__(self, rate: float = 25.0, burst: int = None, per_chat_interval: float = 1.0,
+                 max_tracked_chats: int = 10000):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.per_chat_interval = per_chat_interval
+        self.max_tracked_chats = max_tracked_chats
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._chat_next: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Stop all sending for ``seconds`` (e.g. after a RetryAfter)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, chat_id: Optional[int] = None) -> None:
+        """Wait until one message may be sent to ``chat_id``."""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+
+                if wait <= 0 and chat_id is not None:
+                    wait = self._chat_next.get(chat_id, 0.0) - now
+
+                if wait <= 0:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        if chat_id is not None:
+                            self._reserve_chat(chat_id, now)
+                        return
+                    wait = (1 - self._tokens) / self.rate
+
+            await asyncio.sleep(wait)
+
+    def _reserve_chat(self, chat_id: int, now: float) -> None:
+        self._chat_next[chat_id] = now + self.per_chat_interval
+        self._chat_next.move_to_end(chat_id)
+        while len(self._chat_next) > self.max_tracked_chats:
+            self._chat_next.popitem(last=False)
+
+
+def retry_after_seconds(error) -> float:
+    """Seconds a ``RetryAfter`` asks us to wait (int or timedelta depending on PTB version)."""
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+
+# Shared by every bulk sender so their combined traffic stays under the limits
+telegram_rate_limiter = TelegramRateLimiter(
+    rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '25')),
+    per_chat_interval=float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1.0')),
+)
@@ -1,19 +1,46 @@
-"""Utility helpers for retrieving runtime configuration and cached metrics."""
+"""Utility helpers for retrieving runtime configuration and cached metrics.
+
+All ``system_settings`` rows are read with one query into an immutable
+``SettingsSnapshot`` (values parsed once, env overrides and defaults applied,
+the support/channel/price views resolved). The snapshot lives in a single
+cache entry that a refresh replaces whole, so readers never see a half-updated
+set; hot paths read ``get_settings_snapshot().support`` and friends directly.
+"""
 from __future__ import annotations
 
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 from database import get_db_session, close_db_session
-from database.operations import SystemSettingsService
-from database.models import AccountSale
+from database.operations import _parse_setting_value
+from database.models import AccountSale, SystemSettings
+from database.settings_feed import settings_feed
+from utils.cache_engine import cache_engine
 
-_DEFAULT_CACHE_TTL = 120  # seconds
-_cache: Dict[str, Dict[str, Any]] = {}
+USER_SALES_CACHE_SIZE = int(os.getenv('USER_SALES_CACHE_SIZE', '5000'))
+SETTINGS_CACHE_TTL = int(os.getenv('SETTINGS_CACHE_TTL', '3600'))
+
+# One namespace per kind of value (TTLs in seconds); expired entries keep being
+# served while one refresh reloads them. The settings snapshot is dropped by
+# the settings change feed as soon as any process writes a setting, so its TTL
+# is only a backstop.
+_snapshot_cache = cache_engine.namespace('settings_snapshot', ttl=SETTINGS_CACHE_TTL, maxsize=1, stale_ttl=600)
+_sale_stats_cache = cache_engine.namespace('sale_stats', ttl=120, maxsize=1, stale_ttl=600)
+_user_sales_cache = cache_engine.namespace('user_sales', ttl=120, maxsize=USER_SALES_CACHE_SIZE, stale_ttl=60)
+
+
+def _drop_settings_caches() -> None:
+    """Forget everything derived from system_settings (sale stats embed the price defaults)."""
+    for cache in (_snapshot_cache, _sale_stats_cache):
+        cache.invalidate()
+
+
+settings_feed.subscribe(_drop_settings_caches)
 
 DEFAULT_SUPPORT_CONFIG = {
     "main_button_label": "💬 Support",
@@ -26,6 +53,18 @@ DEFAULT_SUPPORT_CONFIG = {
     "response_time": "< 2 hours",
 }
 
+# Support field -> (setting key, env var)
+SUPPORT_SETTING_KEYS = {
+    "main_button_label": ("support_main_button_label", "SUPPORT_MAIN_BUTTON_LABEL"),
+    "main_button_url": ("support_main_button_url", "SUPPORT_MAIN_BUTTON_URL"),
+    "live_chat_label": ("support_live_chat_label", "SUPPORT_LIVE_CHAT_LABEL"),
+    "live_chat_url": ("support_live_chat_url", "SUPPORT_LIVE_CHAT_URL"),
+    "channel_label": ("support_channel_label", "SUPPORT_CHANNEL_LABEL"),
+    "channel_url": ("support_channel_url", "SUPPORT_CHANNEL_URL"),
+    "email": ("support_email", "SUPPORT_EMAIL"),
+    "response_time": ("support_response_time", "SUPPORT_RESPONSE_TIME"),
+}
+
 DEFAULT_VERIFICATION_CHANNELS: List[Dict[str, str]] = [
     {
         "name": "📢 Bot Updates",
@@ -54,27 +93,6 @@ DEFAULT_SALE_PRICE_DEFAULTS = {
 }
 
 
-def _now() -> datetime:
-    return datetime.utcnow()
-
-
-def _get_cached(key: str) -> Optional[Any]:
-    entry = _cache.get(key)
-    if not entry:
-        return None
-    if entry["expires_at"] <= _now():
-        _cache.pop(key, None)
-        return None
-    return entry["value"]
-
-
-def _set_cached(key: str, value: Any, ttl_seconds: int = _DEFAULT_CACHE_TTL) -> None:
-    _cache[key] = {
-        "value": value,
-        "expires_at": _now() + timedelta(seconds=ttl_seconds),
-    }
-
-
 def _maybe_parse_json(value: str) -> Any:
     """Attempt to parse a JSON string; fall back to raw value."""
     if not isinstance(value, str):
@@ -92,24 +110,8 @@ def _maybe_parse_json(value: str) -> Any:
     return value
 
 
-def get_config_value(*, setting_key: Optional[str] = None, env_var: Optional[str] = None, default: Any = None) -> Any:
-    """Resolve a configuration value from SystemSettings, env, or default."""
-    value: Any = None
-
-    if setting_key:
-        cache_key = f"setting:{setting_key}"
-        cached = _get_cached(cache_key)
-        if cached is not None:
-            value = cached
-        else:
-            db = get_db_session()
-            try:
-                value = SystemSettingsService.get_setting(db, setting_key, None)
-            finally:
-                close_db_session(db)
-            if value is not None:
-                _set_cached(cache_key, value)
-
+def _resolve(value: Any, env_var: Optional[str], default: Any) -> Any:
+    """Apply the env override and the default to a stored value (stored wins, then env, then default)."""
     if (value is None or value == "") and env_var:
         env_value = os.getenv(env_var)
         if env_value:
@@ -121,72 +123,71 @@ def get_config_value(*, setting_key: Optional[str] = None, env_var: Optional[str
     return value
 
 
-def get_support_settings() -> Dict[str, Any]:
-    cached = _get_cached("support_settings")
-    if cached:
-        return cached
-
-    support_config = DEFAULT_SUPPORT_CONFIG.copy()
-    support_config.update(
-        {
-            "main_button_label": get_config_value(
-                setting_key="support_main_button_label",
-                env_var="SUPPORT_MAIN_BUTTON_LABEL",
-                default=DEFAULT_SUPPORT_CONFIG["main_button_label"],
-            ),
-            "main_button_url": get_config_value(
-                setting_key="support_main_button_url",
-                env_var="SUPPORT_MAIN_BUTTON_URL",
-                default=DEFAULT_SUPPORT_CONFIG["main_button_url"],
-            ),
-            "live_chat_label": get_config_value(
-                setting_key="support_live_chat_label",
-                env_var="SUPPORT_LIVE_CHAT_LABEL",
-                default=DEFAULT_SUPPORT_CONFIG["live_chat_label"],
-            ),
-            "live_chat_url": get_config_value(
-                setting_key="support_live_chat_url",
-                env_var="SUPPORT_LIVE_CHAT_URL",
-                default=DEFAULT_SUPPORT_CONFIG["live_chat_url"],
-            ),
-            "channel_label": get_config_value(
-                setting_key="support_channel_label",
-                env_var="SUPPORT_CHANNEL_LABEL",
-                default=DEFAULT_SUPPORT_CONFIG["channel_label"],
-            ),
-            "channel_url": get_config_value(
-                setting_key="support_channel_url",
-                env_var="SUPPORT_CHANNEL_URL",
-                default=DEFAULT_SUPPORT_CONFIG["channel_url"],
-            ),
-            "email": get_config_value(
-                setting_key="support_email",
-                env_var="SUPPORT_EMAIL",
-                default=DEFAULT_SUPPORT_CONFIG["email"],
-            ),
-            "response_time": get_config_value(
-                setting_key="support_response_time",
-                env_var="SUPPORT_RESPONSE_TIME",
-                default=DEFAULT_SUPPORT_CONFIG["response_time"],
-            ),
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Every system setting at one point in time, parsed, with the hot-path views resolved."""
+
+    values: Mapping[str, Any]
+    support: Mapping[str, Any]
+    verification_channels: Tuple[Mapping[str, Any], ...]
+    sale_price_defaults: Mapping[str, float]
+
+    def get(self, setting_key: str, env_var: Optional[str] = None, default: Any = None) -> Any:
+        return _resolve(self.values.get(setting_key), env_var, default)
+
+    @classmethod
+    def build(cls, values: Dict[str, Any]) -> "SettingsSnapshot":
+        """Derive the snapshot from parsed ``{key: value}`` settings."""
+        values = MappingProxyType(dict(values))
+        support = {
+            field: _resolve(values.get(setting_key), env_var, DEFAULT_SUPPORT_CONFIG[field])
+            for field, (setting_key, env_var) in SUPPORT_SETTING_KEYS.items()
         }
-    )
+        price_defaults = _resolve(values.get("sale_price_defaults"), "SALE_PRICE_DEFAULTS", None)
+        if not isinstance(price_defaults, dict):
+            price_defaults = {}
+        return cls(
+            values=values,
+            support=MappingProxyType(support),
+            verification_channels=tuple(
+                MappingProxyType(channel)
+                for channel in _normalize_channels(
+                    _resolve(values.get("verification_required_channels"), "VERIFICATION_REQUIRED_CHANNELS", None)
+                )
+            ),
+            sale_price_defaults=MappingProxyType({**DEFAULT_SALE_PRICE_DEFAULTS, **price_defaults}),
+        )
+
+
+def _load_snapshot() -> SettingsSnapshot:
+    db = get_db_session()
+    try:
+        rows = db.execute(select(SystemSettings.key, SystemSettings.value)).all()
+    finally:
+        close_db_session(db)
+    return SettingsSnapshot.build({key: _parse_setting_value(value) for key, value in rows if value is not None})
+
+
+def get_settings_snapshot() -> SettingsSnapshot:
+    """The current settings snapshot (one query per refresh for all settings)."""
+    return _snapshot_cache.get_or_load("snapshot", _load_snapshot)
+
+
+def get_config_value(*, setting_key: Optional[str] = None, env_var: Optional[str] = None, default: Any = None) -> Any:
+    """Resolve a configuration value from SystemSettings, env, or default."""
+    value = get_settings_snapshot().values.get(setting_key) if setting_key else None
+    return _resolve(value, env_var, default)
+
 
-    _set_cached("support_settings", support_config, ttl_seconds=60)
-    return support_config
+def get_support_settings() -> Dict[str, Any]:
+    return dict(get_settings_snapshot().support)
 
 
 def get_verification_channels() -> List[Dict[str, Any]]:
-    cached = _get_cached("verification_channels")
-    if cached is not None:
-        return cached
+    return [dict(channel) for channel in get_settings_snapshot().verification_channels]
 
-    channels = get_config_value(
-        setting_key="verification_required_channels",
-        env_var="VERIFICATION_REQUIRED_CHANNELS",
-        default=None,
-    )
 
+def _normalize_channels(channels: Any) -> List[Dict[str, Any]]:
     parsed: Optional[List[Dict[str, Any]]] = None
     if channels:
         if isinstance(channels, list):
@@ -213,7 +214,6 @@ def get_verification_channels() -> List[Dict[str, Any]]:
             }
         )
 
-    _set_cached("verification_channels", normalized, ttl_seconds=300)
     return normalized
 
 
@@ -224,15 +224,11 @@ def _coalesce_price(value: Optional[float], fallback: float) -> float:
 
 
 def get_sale_stats() -> Dict[str, Any]:
-    cached = _get_cached("sale_stats")
-    if cached:
-        return cached
+    return _sale_stats_cache.get_or_load("sale_stats", _load_sale_stats)
+
 
-    defaults = get_config_value(
-        setting_key="sale_price_defaults",
-        env_var="SALE_PRICE_DEFAULTS",
-        default=DEFAULT_SALE_PRICE_DEFAULTS,
-    ) or DEFAULT_SALE_PRICE_DEFAULTS
+def _load_sale_stats() -> Dict[str, Any]:
+    defaults = get_settings_snapshot().sale_price_defaults
 
     db = get_db_session()
     try:
@@ -264,7 +260,6 @@ def get_sale_stats() -> Dict[str, Any]:
         "price_max": _coalesce_price(price_max, defaults["max"]),
     }
 
-    _set_cached("sale_stats", stats, ttl_seconds=120)
     return stats
 
 
@@ -273,20 +268,14 @@ def get_recommended_sale_price() -> float:
     avg_price = stats.get("price_avg")
     if avg_price:
         return round(float(avg_price), 2)
-    defaults = get_config_value(
-        setting_key="sale_price_defaults",
-        env_var="SALE_PRICE_DEFAULTS",
-        default=DEFAULT_SALE_PRICE_DEFAULTS,
-    )
-    return round(float(defaults.get("avg", DEFAULT_SALE_PRICE_DEFAULTS["avg"])), 2)
+    return round(float(get_settings_snapshot().sale_price_defaults["avg"]), 2)
 
 
 def get_user_sales_metrics(user_id: int) -> Dict[str, Any]:
-    cache_key = f"user_sales:{user_id}"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
+    return _user_sales_cache.get_or_load(user_id, lambda: _load_user_sales_metrics(user_id))
+
 
+def _load_user_sales_metrics(user_id: int) -> Dict[str, Any]:
     db = get_db_session()
     try:
         total_sales = db.query(func.count(AccountSale.id)).filter(AccountSale.seller_id == user_id).scalar() or 0
@@ -312,5 +301,4 @@ def get_user_sales_metrics(user_id: int) -> Dict[str, Any]:
         "total_earnings": round(float(total_earnings), 2),
     }
 
-    _set_cached(cache_key, metrics, ttl_seconds=120)
     return metrics
\ No newline at end of file
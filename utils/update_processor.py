@@ -0,0 +1,147 @@
+"""
+Concurrent update processing with per-user ordering.
+
+Without an update processor python-telegram-bot handles one update at a time,
+so a user waiting on a slow query or ``send_message`` delays everyone.
+``OrderedUpdateProcessor`` runs updates from different users in parallel, up
+to a global cap, while updates from the same user (or chat, for updates
+without a sender) run strictly in arrival order - ConversationHandler states
+and the request scope see the same sequence as with sequential processing.
+
+Handlers still make synchronous DB calls, and a sync session can keep its
+pooled connection across an ``await``; keep the cap below the sync pool size
+(``pool_size + max_overflow`` in database/__init__.py) so a blocking checkout
+can never stall the event loop.
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '16'))
+UPDATE_SLOW_WAIT_SECONDS = float(os.getenv('UPDATE_SLOW_WAIT_SECONDS', '2'))
+WAIT_SAMPLES = 1000
+
+
+class _Lane:
+    """FIFO lock for one user's updates plus the number of updates using it."""
+
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # asyncio.Lock wakes waiters in FIFO order
+        self.users = 0
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Parallel across users, sequential within a user, capped globally."""
+
+    def __init__(self, max_concurrent_updates: int = None, slow_wait_seconds: float = None):
+        # The base class takes its semaphore *before* do_process_update. Give it no
+        # effective limit so updates queued behind their own user never hold a global
+        # slot; the real cap is applied once an update is next in its lane.
+        super().__init__(sys.maxsize)
+        self._cap = max_concurrent_updates or UPDATE_CONCURRENCY
+        self.slow_wait_seconds = UPDATE_SLOW_WAIT_SECONDS if slow_wait_seconds is None else slow_wait_seconds
+        self._slots = asyncio.Semaphore(self._cap)
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._queued = 0
+        self._running = 0
+        self._processed = 0
+        self._max_wait = 0.0
+        self._waits: deque = deque(maxlen=WAIT_SAMPLES)
+
+    @property
+    def concurrency_cap(self) -> int:
+        """Updates allowed to run at once (``max_concurrent_updates`` is the unbounded base limit)."""
+        return self._cap
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[Hashable]:
+        """Updates sharing a key run in order; ``None`` means no ordering needed."""
+        user = getattr(update, 'effective_user', None)
+        if user is not None:
+            return ('user', user.id)
+        chat = getattr(update, 'effective_chat', None)
+        if chat is not None:
+            return ('chat', chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.ordering_key(update)
+        lane = None
+        if key is not None:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = _Lane()
+            lane.users += 1
+
+        enqueued = time.monotonic()
+        started = False
+        self._queued += 1
+        try:
+            async with lane.lock if lane is not None else nullcontext():
+                async with self._slots:
+                    self._queued -= 1
+                    started = True
+                    self._record_wait(update, time.monotonic() - enqueued)
+                    self._running += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self._running -= 1
+                        self._processed += 1
+        except asyncio.CancelledError:
+            if not started:
+                # Cancelled while queued: the handler coroutine never ran
+                self._queued -= 1
+                coroutine.close()
+            raise
+        finally:
+            if lane is not None:
+                lane.users -= 1
+                if lane.users == 0:
+                    del self._lanes[key]
+
+    def _record_wait(self, update: object, wait: float) -> None:
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        if wait >= self.slow_wait_seconds:
+            logger.warning(
+                f"Update {getattr(update, 'update_id', '?')} waited {wait:.2f}s to start "
+                f"({self._queued} queued, {self._running} running)"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time metrics (waits over the last samples)."""
+        waits: List[float] = sorted(self._waits)
+
+        def percentile(fraction: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000
+
+        return {
+            'max_concurrent_updates': self._cap,
+            'running': self._running,
+            'queued': self._queued,
+            'active_lanes': len(self._lanes),
+            'processed': self._processed,
+            'wait_p50_ms': round(percentile(0.5), 1),
+            'wait_p95_ms': round(percentile(0.95), 1),
+            'wait_max_ms': round(self._max_wait * 1000, 1),
+        }
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,176 @@
+"""
+Asyncio HTTP server for webhook updates and the WebApp forms
+Runs on the bot's event loop (aiohttp) instead of a thread
+
+Routes:
+- ``POST <webhook path>``: Telegram updates, checked against the secret token
+  header and handed to the Application's update queue
+- ``GET /<name>.html``: the embedded forms, with ETag revalidation and gzip
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+WEBAPP_DIR = os.path.dirname(os.path.abspath(__file__))
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+}
+
+
+def derive_secret_token(bot_token: str) -> str:
+    """Stable webhook secret derived from the bot token (when WEBHOOK_SECRET is unset)."""
+    return hashlib.sha256(f"webhook:{bot_token}".encode()).hexdigest()[:32]
+
+
+@dataclass
+class StaticAsset:
+    """One form file held in memory, plain and gzipped."""
+    mtime: float
+    body: bytes
+    gzipped: bytes
+    etag: str
+    content_type: str
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gz"'
+
+
+class StaticCache:
+    """Serves files from one directory, re-reading a file only when its mtime changes."""
+
+    def __init__(self, directory: str = WEBAPP_DIR):
+        self.directory = directory
+        self._assets: Dict[str, StaticAsset] = {}
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1])
+        if content_type is None or '/' in name or '\\' in name or name.startswith('.'):
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        asset = self._assets.get(name)
+        if asset is None or asset.mtime != mtime:
+            with open(path, 'rb') as f:
+                body = f.read()
+            asset = StaticAsset(
+                mtime=mtime,
+                body=body,
+                gzipped=gzip.compress(body, compresslevel=9, mtime=0),
+                etag=f'"{hashlib.sha1(body).hexdigest()[:16]}"',
+                content_type=content_type,
+            )
+            self._assets[name] = asset
+        return asset
+
+
+def _serve_asset(request: web.Request, asset: StaticAsset) -> web.Response:
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '') and len(asset.gzipped) < len(asset.body)
+    etag = asset.gzip_etag if use_gzip else asset.etag
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'no-cache',  # Always revalidate; unchanged forms cost a 304
+        'Vary': 'Accept-Encoding',
+        **CORS_HEADERS,
+    }
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if if_none_match and (if_none_match == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]):
+        return web.Response(status=304, headers=headers)
+
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return web.Response(
+        body=asset.gzipped if use_gzip else asset.body,
+        headers=headers,
+        content_type=asset.content_type.split(';')[0],
+        charset='utf-8',
+    )
+
+
+def create_web_app(application=None, secret_token: Optional[str] = None,
+                   webhook_path: str = WEBHOOK_PATH, static_dir: str = WEBAPP_DIR) -> web.Application:
+    """
+    Build the aiohttp app. The webhook route is only added when a
+    python-telegram-bot ``application`` is given.
+    """
+    static = StaticCache(static_dir)
+
+    async def handle_static(request: web.Request) -> web.Response:
+        asset = static.get(request.match_info['name'])
+        if asset is None:
+            raise web.HTTPNotFound()
+        return _serve_asset(request, asset)
+
+    async def handle_preflight(request: web.Request) -> web.Response:
+        return web.Response(status=200, headers=CORS_HEADERS)
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret_token and request.headers.get(SECRET_HEADER) != secret_token:
+            logger.warning(f"Rejected webhook request from {request.remote}: bad secret token")
+            raise web.HTTPForbidden()
+        try:
+            data = await request.json(loads=json.loads)
+            update = Update.de_json(data, application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Rejected malformed webhook update: {e}")
+            raise web.HTTPBadRequest()
+        if update is None:
+            raise web.HTTPBadRequest()
+        # Acknowledge at once; the update processor handles it on this event loop
+        await application.update_queue.put(update)
+        return web.Response(status=200)
+
+    app = web.Application(client_max_size=1024 * 1024)
+    if application is not None:
+        app.router.add_post(webhook_path, handle_update)
+    app.router.add_get('/{name}', handle_static)
+    app.router.add_route('OPTIONS', '/{tail:.*}', handle_preflight)
+    return app
+
+
+class AsyncWebServer:
+    """Starts and stops the aiohttp app on the running event loop."""
+
+    def __init__(self, host: str = WEBAPP_HOST, port: int = WEBAPP_PORT):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, app: web.Application) -> None:
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"HTTP server listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("HTTP server stopped")
@@ -0,0 +1,53 @@
+"""
+Replay recorded Telegram updates against a local webhook server.
+
+Usage:
+    python -m webapp.replay_updates updates.json [--url http://localhost:8080/telegram/webhook]
+
+The file may hold one update object, a JSON list of updates, or one update per
+line. The secret header defaults to WEBHOOK_SECRET, or the value the bot
+derives from BOT_TOKEN.
+"""
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, List
+
+import aiohttp
+
+from webapp.async_server import SECRET_HEADER, WEBAPP_PORT, WEBHOOK_PATH, derive_secret_token
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+async def replay(updates: List[Dict[str, Any]], url: str, secret: str) -> None:
+    headers = {SECRET_HEADER: secret} if secret else {}
+    async with aiohttp.ClientSession() as session:
+        for update in updates:
+            async with session.post(url, json=update, headers=headers) as response:
+                print(f"update {update.get('update_id', '?')}: HTTP {response.status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('file', help='JSON file with recorded updates')
+    parser.add_argument('--url', default=f"http://localhost:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    parser.add_argument('--secret', default=None, help='secret token header value')
+    args = parser.parse_args()
+
+    token = os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('BOT_TOKEN')
+    secret = args.secret or os.getenv('WEBHOOK_SECRET') or (derive_secret_token(token) if token else '')
+    asyncio.run(replay(load_updates(args.file), args.url, secret))
+
+
+if __name__ == '__main__':
+    main()